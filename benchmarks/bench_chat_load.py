@@ -0,0 +1,248 @@
+# benchmarks/bench_chat_load.py
+"""
+Load test for the chat API: an asyncio load generator driving main.app
+in-process (httpx ASGITransport) with a weighted register/login/chat/history
+mix
+
+MongoDB is mongomock unless --mongo-uri is given; Cohere is replaced by a
+synthetic LLM that sleeps --llm-ms (+- --llm-jitter-ms) per call, so runs are
+reproducible and free. Reports throughput, p50/p95/p99 latency per operation
+and event-loop lag (how late a 10 ms ticker wakes up: anything blocking the
+loop, such as a synchronous LLM call, shows up here).
+
+--baseline compares against a previous --output file and exits 1 when p95
+latency or throughput regress by more than --max-regression.
+
+Usage:
+    python -m benchmarks.bench_chat_load --duration 20 --concurrency 32 --output results/load.json
+    python -m benchmarks.bench_chat_load --mix chat=80,history=20 --baseline results/load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import report
+from server.instrumentation import LatencyHistogram
+
+DEFAULT_MIX = "chat=70,history=20,login=8,register=2"
+SYMPTOMS = ["headache", "fever", "sore throat", "back pain", "cough", "dizziness", "nausea", "rash"]
+
+class FakeCohere:
+    """Stands in for cohere.Client: fixed latency, canned text"""
+
+    class Reply:
+        def __init__(self, text: str):
+            self.text = text
+
+    def __init__(self, latency_ms: float, jitter_ms: float, seed: int = 0):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.random = random.Random(seed)
+        self.calls = 0
+
+    def chat(self, message: str, **kwargs):
+        self.calls += 1
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        if delay:
+            time.sleep(delay)
+        return self.Reply("Rest, stay hydrated and see a doctor if symptoms last more than three days.")
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ("register", "login", "chat", "history"):
+            raise ValueError(f"Unknown operation in --mix: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def load_app(args):
+    """Import main against the chosen database with the synthetic LLM installed"""
+    os.environ["DATABASE_NAME"] = args.database
+    os.environ.setdefault("INDEX_AUDIT", "off")
+    # Virtual clients share one IP and a few users; budgets would turn the run into 429s
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+    os.environ["COHERE_API_KEY"] = "synthetic"
+    if args.mongo_uri:
+        os.environ["MONGODB_URI"] = args.mongo_uri
+    else:
+        from unittest.mock import patch
+        import mongomock
+        shared = mongomock.MongoClient()
+        patch("pymongo.MongoClient", side_effect=lambda *a, **kw: shared).start()
+
+    import main
+    if args.mongo_uri:
+        main.connection_manager.client(args.mongo_uri).drop_database(args.database)
+    main._cohere_client = FakeCohere(args.llm_ms, args.llm_jitter_ms, args.seed)
+    return main
+
+class LoadGenerator:
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.mix = parse_mix(args.mix)
+        self.users: List[Dict[str, Any]] = []
+        self.latency = {op: LatencyHistogram() for op in self.mix}
+        self.errors = {op: 0 for op in self.mix}
+        self.registered = 0
+
+    async def register(self) -> Optional[Dict[str, Any]]:
+        self.registered += 1
+        name = f"load_{self.args.seed}_{self.registered}"
+        response = await self.client.post("/auth/register", json={
+            "username": name, "email": f"{name}@example.com", "password": "load-test-pw", "full_name": name
+        })
+        if response.status_code != 200:
+            return None
+        user = {
+            "username": name,
+            "headers": {"Authorization": f"Bearer {response.json()['access_token']}"},
+            "sessions": [f"{name}_s{i}" for i in range(self.args.sessions_per_user)]
+        }
+        self.users.append(user)
+        return user
+
+    async def login(self) -> bool:
+        user = self.random.choice(self.users)
+        response = await self.client.post("/auth/login", json={"username": user["username"], "password": "load-test-pw"})
+        return response.status_code == 200
+
+    async def chat(self) -> bool:
+        user = self.random.choice(self.users)
+        response = await self.client.post("/chat", headers=user["headers"], json={
+            "message": f"I have had {self.random.choice(SYMPTOMS)} for {self.random.randint(1, 7)} days",
+            "session_id": self.random.choice(user["sessions"])
+        })
+        return response.status_code == 200
+
+    async def history(self) -> bool:
+        user = self.random.choice(self.users)
+        response = await self.client.get(f"/history/{self.random.choice(user['sessions'])}",
+                                         headers=user["headers"], params={"limit": 50})
+        return response.status_code == 200
+
+    async def run_op(self, op: str):
+        started = time.perf_counter()
+        try:
+            ok = await getattr(self, op)() if op != "register" else await self.register() is not None
+        except Exception:
+            ok = False
+        self.latency[op].record(time.perf_counter() - started)
+        if not ok:
+            self.errors[op] += 1
+
+    async def worker(self, deadline: float):
+        ops, weights = list(self.mix), list(self.mix.values())
+        while time.perf_counter() < deadline:
+            await self.run_op(self.random.choices(ops, weights)[0])
+
+async def loop_lag_monitor(histogram: LatencyHistogram, stop: asyncio.Event, interval: float = 0.01):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        histogram.record(max(0.0, time.perf_counter() - expected))
+
+def latency_summary(histogram: LatencyHistogram) -> Dict[str, Any]:
+    return {
+        "count": histogram.count,
+        "p50_ms": round(histogram.percentile(50) * 1000, 2),
+        "p95_ms": round(histogram.percentile(95) * 1000, 2),
+        "p99_ms": round(histogram.percentile(99) * 1000, 2),
+        "max_ms": round(histogram.max * 1000, 2)
+    }
+
+async def run(args) -> Dict[str, Any]:
+    import httpx
+
+    main = load_app(args)
+    async with main.lifespan(main.app):
+        deadline = time.perf_counter() + 30
+        while not main.is_ready():
+            if time.perf_counter() > deadline:
+                raise RuntimeError(f"API not ready: {main.readiness}")
+            await asyncio.sleep(0.01)
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            generator = LoadGenerator(client, args)
+            for _ in range(args.users):
+                if await generator.register() is None:
+                    raise RuntimeError("Seeding users failed")
+
+            lag = LatencyHistogram()
+            stop = asyncio.Event()
+            monitor = asyncio.create_task(loop_lag_monitor(lag, stop))
+            started = time.perf_counter()
+            await asyncio.gather(*(generator.worker(started + args.duration) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await monitor
+
+        stages = main.metrics.snapshot()
+
+    total = sum(h.count for h in generator.latency.values())
+    return {
+        "benchmark": "chat_load",
+        "target": "mongodb" if args.mongo_uri else "mongomock",
+        "config": {
+            "duration_s": args.duration, "concurrency": args.concurrency, "users": args.users,
+            "mix": generator.mix, "llm_ms": args.llm_ms, "llm_jitter_ms": args.llm_jitter_ms, "seed": args.seed
+        },
+        "requests": total,
+        "errors": sum(generator.errors.values()),
+        "throughput_rps": round(total / elapsed, 1),
+        "operations": {
+            op: {**latency_summary(h), "errors": generator.errors[op], "rps": round(h.count / elapsed, 1)}
+            for op, h in generator.latency.items()
+        },
+        "event_loop_lag": latency_summary(lag),
+        "server_stages": stages
+    }
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Regressions beyond max_regression (fraction) in throughput or per-op p95"""
+    problems = []
+    if results["throughput_rps"] < baseline["throughput_rps"] * (1 - max_regression):
+        problems.append(f"throughput {baseline['throughput_rps']} -> {results['throughput_rps']} rps")
+    for op, current in results["operations"].items():
+        previous = baseline.get("operations", {}).get(op)
+        if previous and previous["count"] and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            problems.append(f"{op} p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=None, help="Real MongoDB URI (default: mongomock)")
+    parser.add_argument("--database", default="healthbot_bench")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent virtual clients")
+    parser.add_argument("--users", type=int, default=20, help="Users registered before the run")
+    parser.add_argument("--sessions-per-user", type=int, default=3)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operations, e.g. chat=70,history=30")
+    parser.add_argument("--llm-ms", type=float, default=5.0, help="Synthetic LLM latency")
+    parser.add_argument("--llm-jitter-ms", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Previous --output file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed regression fraction")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            results["regressions"] = compare(results, json.load(f), args.max_regression)
+    report(results, args.output)
+    if results.get("regressions"):
+        print("Regressions: " + "; ".join(results["regressions"]), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
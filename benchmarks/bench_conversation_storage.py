@@ -0,0 +1,106 @@
+# benchmarks/bench_conversation_storage.py
+"""
+Per-turn vs bucketed conversation storage: write and read costs
+
+For each model, writes --sessions x --turns turns (in write-behind sized
+batches) and then reads every full history and the LLM context window.
+Reports wall time, round trips and documents returned per read.
+
+Usage:
+    python -m benchmarks.bench_conversation_storage --sessions 100 --turns 200 --rtt-ms 1
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from benchmarks.common import LatencyDatabase, add_target_arguments, open_database, report
+from database.conversation_store import BucketedConversationStore, TurnConversationStore
+
+def make_turns(sessions, turns_per_session):
+    base = datetime(2026, 1, 1)
+    for t in range(turns_per_session):
+        for s in range(sessions):
+            yield {
+                "_id": ObjectId(),
+                "user_id": f"user{s % 10}",
+                "session_id": f"session_{s}",
+                "message": f"Symptom description {t} " * 4,
+                "response": f"Advice for turn {t} " * 12,
+                "timestamp": base + timedelta(seconds=t * sessions + s)
+            }
+
+def run_store(store, database, args):
+    store.ensure_indexes()
+    counter = database.counter
+
+    counter["round_trips"] = 0
+    started = time.perf_counter()
+    batch = []
+    for turn in make_turns(args.sessions, args.turns):
+        batch.append(turn)
+        if len(batch) >= args.write_batch:
+            store.insert_turns(batch)
+            batch = []
+    store.insert_turns(batch)
+    write_seconds = time.perf_counter() - started
+    write_trips = counter["round_trips"]
+
+    counter["round_trips"] = 0
+    started = time.perf_counter()
+    for s in range(args.sessions):
+        history = store.history(f"session_{s}", f"user{s % 10}")
+        assert len(history) == args.turns
+    history_seconds = time.perf_counter() - started
+    history_trips = counter["round_trips"]
+
+    started = time.perf_counter()
+    for s in range(args.sessions):
+        store.context_turns(f"session_{s}", 20)
+    context_seconds = time.perf_counter() - started
+
+    docs_stored = store.collection._collection.count_documents({})
+
+    total_turns = args.sessions * args.turns
+    return {
+        "documents_stored": docs_stored,
+        "write_seconds": round(write_seconds, 3),
+        "turns_written_per_sec": round(total_turns / write_seconds, 1),
+        "write_round_trips": write_trips,
+        "history_reads_per_sec": round(args.sessions / history_seconds, 1),
+        "history_round_trips_per_read": round(history_trips / args.sessions, 2),
+        "documents_per_history_read": round(docs_stored / args.sessions, 2),
+        "context_reads_per_sec": round(args.sessions / context_seconds, 1)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_target_arguments(parser)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--bucket-size", type=int, default=50)
+    parser.add_argument("--write-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    results = {}
+    for name in ("turns", "bucketed"):
+        database = LatencyDatabase(open_database(args), args.rtt_ms)
+        if name == "turns":
+            store = TurnConversationStore(database)
+        else:
+            store = BucketedConversationStore(database, bucket_size=args.bucket_size)
+        results[name] = run_store(store, database, args)
+
+    report({
+        "benchmark": "conversation_storage",
+        "sessions": args.sessions,
+        "turns_per_session": args.turns,
+        "bucket_size": args.bucket_size,
+        "rtt_ms": args.rtt_ms,
+        "results": results
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_index_cost.py
+"""
+Insert and update throughput with the previous vs slimmed MongoDBIndexes
+
+messages: batched inserts (what save_messages and the write batcher do)
+conversations: the per-message counter update ($inc/$set updated_at)
+
+mongomock does not maintain secondary indexes, so only --mongo-uri runs
+show the real difference.
+
+Usage:
+    python -m benchmarks.bench_index_cost --mongo-uri mongodb://localhost:27017 --docs 20000
+"""
+
+import argparse
+import time
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel, UpdateOne
+
+from benchmarks.common import LatencyDatabase, add_target_arguments, open_database, report
+from database.index_cost import insert_throughput, sample_conversation, sample_message
+from database.mongodb.schema import MongoDBIndexes
+
+# Index sets MongoDBIndexes created before it was slimmed
+PREVIOUS_MESSAGE_INDEXES = [
+    IndexModel([("conversation_id", ASCENDING), ("created_at", ASCENDING)], name="idx_conversation_timeline"),
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="idx_user_messages"),
+    IndexModel([("content", TEXT)], default_language="english", weights={"content": 10},
+               name="idx_message_content_search"),
+    IndexModel([("message_type", ASCENDING), ("created_at", DESCENDING)], name="idx_message_type"),
+    IndexModel([("embedding", "2dsphere")], name="idx_embedding", sparse=True),
+    IndexModel([("user_id", ASCENDING), ("message_type", ASCENDING), ("created_at", DESCENDING)],
+               name="idx_user_message_analytics"),
+    IndexModel([("is_temporary", ASCENDING), ("created_at", ASCENDING)], expireAfterSeconds=86400,
+               partialFilterExpression={"is_temporary": True}, name="idx_temp_messages_ttl"),
+    IndexModel([("metadata.$**", ASCENDING)], name="idx_message_metadata")
+]
+
+PREVIOUS_CONVERSATION_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("started_at", DESCENDING), ("status", ASCENDING)],
+               name="idx_user_conversations"),
+    IndexModel([("status", ASCENDING), ("updated_at", DESCENDING)], name="idx_active_conversations"),
+    IndexModel([("user_id", ASCENDING), ("external_id", ASCENDING)], unique=True, sparse=True,
+               name="idx_user_external_id"),
+    IndexModel([("started_at", ASCENDING), ("ended_at", ASCENDING)], name="idx_date_range"),
+    IndexModel([("metadata.total_messages", ASCENDING)], name="idx_message_count", sparse=True),
+    IndexModel([("metadata.$**", ASCENDING)], name="idx_metadata"),
+    IndexModel([("user_id", ASCENDING), ("started_at", ASCENDING)], partialFilterExpression={"status": "active"},
+               name="idx_ongoing_conversations")
+]
+
+def message_inserts(database, indexes, args):
+    collection = database["messages"]
+    collection.drop()
+    collection.create_indexes(indexes)
+    return insert_throughput(collection, sample_message, args.docs, args.batch)
+
+def conversation_updates(database, indexes, args):
+    collection = database["conversations"]
+    collection.drop()
+    collection.create_indexes(indexes)
+    conversations = [sample_conversation(i) for i in range(max(1, args.docs // 20))]
+    collection.insert_many(conversations)
+    ids = [c["_id"] for c in conversations]
+
+    started = time.perf_counter()
+    for start in range(0, args.docs, args.batch):
+        collection.bulk_write([
+            UpdateOne({"_id": ids[i % len(ids)]},
+                      {"$inc": {"message_count": 1, "metadata.total_messages": 1},
+                       "$set": {"updated_at": sample_message(i)["created_at"]}})
+            for i in range(start, min(start + args.batch, args.docs))
+        ], ordered=False)
+    return args.docs / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_target_arguments(parser)
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=100)
+    args = parser.parse_args()
+
+    index_sets = {
+        "previous": (PREVIOUS_MESSAGE_INDEXES, PREVIOUS_CONVERSATION_INDEXES),
+        "slim": (MongoDBIndexes.message_indexes(), MongoDBIndexes.conversation_indexes())
+    }
+
+    results = {}
+    for name, (message_indexes, conversation_indexes) in index_sets.items():
+        database = LatencyDatabase(open_database(args), args.rtt_ms)
+        results[name] = {
+            "message_indexes": len(message_indexes) + 1,
+            "message_inserts_per_sec": round(message_inserts(database, message_indexes, args), 1),
+            "conversation_indexes": len(conversation_indexes) + 1,
+            "conversation_updates_per_sec": round(conversation_updates(database, conversation_indexes, args), 1)
+        }
+
+    report({
+        "benchmark": "index_cost",
+        "docs": args.docs,
+        "batch": args.batch,
+        "target": "mongodb" if args.mongo_uri else "mongomock (secondary indexes not maintained)",
+        "results": results,
+        "message_insert_speedup": round(
+            results["slim"]["message_inserts_per_sec"] / results["previous"]["message_inserts_per_sec"], 2),
+        "conversation_update_speedup": round(
+            results["slim"]["conversation_updates_per_sec"] / results["previous"]["conversation_updates_per_sec"], 2)
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
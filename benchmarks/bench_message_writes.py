@@ -0,0 +1,83 @@
+# benchmarks/bench_message_writes.py
+"""
+Message persistence benchmark: writes/sec for
+  legacy   - insert_one per message + update_one per message (old save_message)
+  turn     - HealthBotDatabase.save_turn (one insert_many + one $inc/$set + one rollup bulk_write)
+  batched  - save_turn with cross-request write batching enabled
+
+Usage:
+    python -m benchmarks.bench_message_writes --turns 2000 --rtt-ms 2 --threads 8
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.common import LatencyDatabase, add_target_arguments, open_database, report
+from database.healthbot_db import HealthBotDatabase
+
+def legacy_save_turn(database, conversation_id, user_id, user_content, assistant_content):
+    """Pre-fix behaviour: two round trips per message"""
+    for content, message_type in ((user_content, "user"), (assistant_content, "assistant")):
+        database.messages.insert_one({
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "content": content,
+            "message_type": message_type,
+            "created_at": datetime.utcnow()
+        })
+        database.conversations.update_one(
+            {"_id": conversation_id},
+            {"$inc": {"message_count": 1}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+
+def run_mode(mode, raw_db, args):
+    database = LatencyDatabase(raw_db, args.rtt_ms)
+    healthbot_db = HealthBotDatabase(database)
+    conversations = [healthbot_db.create_conversation(f"user{i}") for i in range(args.conversations)]
+    database.counter["round_trips"] = 0
+
+    if mode == "batched":
+        healthbot_db.enable_write_batching(max_batch=args.batch_size, max_delay_ms=args.max_delay_ms)
+
+    def one_turn(i):
+        conversation_id = conversations[i % len(conversations)]
+        if mode == "legacy":
+            legacy_save_turn(database, conversation_id, "user", f"question {i}", f"answer {i}")
+        else:
+            healthbot_db.save_turn(conversation_id, "user", f"question {i}", f"answer {i}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(one_turn, range(args.turns)))
+    healthbot_db.flush_writes()
+    elapsed = time.perf_counter() - started
+
+    messages = args.turns * 2
+    return {
+        "messages": messages,
+        "elapsed_seconds": round(elapsed, 3),
+        "writes_per_sec": round(messages / elapsed, 1),
+        "round_trips": database.counter["round_trips"],
+        "round_trips_per_turn": round(database.counter["round_trips"] / args.turns, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_target_arguments(parser)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--max-delay-ms", type=float, default=20)
+    parser.add_argument("--modes", default="legacy,turn,batched")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(","):
+        results[mode] = run_mode(mode, open_database(args), args)
+    report({"benchmark": "message_writes", "rtt_ms": args.rtt_ms, "results": results}, args.output)
+
+if __name__ == "__main__":
+    main()
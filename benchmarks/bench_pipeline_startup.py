@@ -0,0 +1,105 @@
+# benchmarks/bench_pipeline_startup.py
+"""
+Cold import and first query of the medical data pipeline, offline
+
+Each run is a fresh interpreter with an empty DuckDB extension directory
+(a new container) and DUCKDB_OFFLINE=1:
+
+  legacy          what every MedicalDataPipeline() used to do: connect, then
+                  INSTALL/LOAD httpfs and parquet. Without network this
+                  fails; the error and time until it surfaced are reported
+  import_s        import data_pipelines.orchestration.medical_data_pipeline
+  construct_s     MedicalDataPipeline()
+  first_query_s   first analyze_with_duckdb() over a small Arrow table
+                  (opens the database; loads no extension)
+
+Usage:
+    python -m benchmarks.bench_pipeline_startup --runs 5 --output results/pipeline_startup.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LEGACY = r"""
+import json, os, time
+import duckdb
+started = time.perf_counter()
+error = None
+try:
+    conn = duckdb.connect(':memory:', config={"extension_directory": os.environ["DUCKDB_EXTENSION_DIRECTORY"]})
+    for statement in ("INSTALL httpfs", "LOAD httpfs", "INSTALL parquet", "LOAD parquet"):
+        conn.execute(statement)
+except Exception as exc:
+    error = f"{type(exc).__name__}: {str(exc).splitlines()[0]}"
+print(json.dumps({"setup_s": time.perf_counter() - started, "error": error}))
+"""
+
+CURRENT = r"""
+import json, time
+started = time.perf_counter()
+import data_pipelines.orchestration.medical_data_pipeline as module
+imported = time.perf_counter()
+pipeline = module.MedicalDataPipeline()
+constructed = time.perf_counter()
+import pyarrow as pa
+pipeline.analyze_with_duckdb(pa.table({"rating": [1, 2, 3]}), "SELECT avg(rating) FROM temp_data")
+queried = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "construct_s": constructed - imported,
+    "first_query_s": queried - constructed,
+    "extensions_loaded": sorted(pipeline.duckdb.loaded_extensions)
+}))
+"""
+
+def run_child(code: str, timeout: float) -> dict:
+    extensions = tempfile.mkdtemp(prefix="duckdb_ext_")
+    env = dict(os.environ, DUCKDB_EXTENSION_DIRECTORY=extensions, DUCKDB_OFFLINE="1", PYTHONDONTWRITEBYTECODE="1")
+    try:
+        result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                                capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"setup_s": timeout, "error": "timed out"}
+    finally:
+        shutil.rmtree(extensions, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "child failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a child is abandoned")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    legacy = [run_child(LEGACY, args.timeout) for _ in range(args.runs)]
+    current = [run_child(CURRENT, args.timeout) for _ in range(args.runs)]
+    timings = [key for key in current[0] if key.endswith("_s")]
+
+    report({
+        "benchmark": "pipeline_startup",
+        "runs": args.runs,
+        "legacy": {
+            "median_setup_s": round(statistics.median(r["setup_s"] for r in legacy), 4),
+            "errors": sorted({r["error"] for r in legacy if r["error"]})
+        },
+        "current": {
+            "median": {key: round(statistics.median(r[key] for r in current), 4) for key in timings},
+            "max": {key: round(max(r[key] for r in current), 4) for key in timings},
+            "extensions_loaded": current[0]["extensions_loaded"]
+        }
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
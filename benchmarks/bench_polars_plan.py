@@ -0,0 +1,196 @@
+# benchmarks/bench_polars_plan.py
+"""
+Eager pandas/Polars transforms vs one lazy Polars plan, on a synthetic
+conversation dataset (10M rows by default)
+
+The dataset is written once as Parquet partitioned by day (date=YYYY-MM-DD,
+like data_pipelines/export/mongo_parquet.py). Both variants answer the same
+question - per topic and day over the last week: user messages, mean
+response time and share of 4-5 star ratings - and hand the result to DuckDB:
+
+    eager  the previous MedicalDataPipeline path: read everything into
+           pandas, convert to Polars, materialize after every step, convert
+           back to pandas for DuckDB
+    lazy   build_plan() over the Parquet directory: the date filter prunes
+           partitions, only the used columns are read, and the result goes
+           to DuckDB as Arrow
+
+Each variant runs in a fresh process so peak RSS is comparable.
+
+Usage:
+    python -m benchmarks.bench_polars_plan --rows 10000000 --output results/polars_plan.json
+    python -m benchmarks.bench_polars_plan --rows 1000000 --data /tmp/conversations --keep
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import report
+
+DAYS = 30
+TOPICS = ["fever", "headache", "cough", "back pain", "nutrition", "sleep", "anxiety", "rash"]
+FIRST_DAY = date(2026, 1, 1)
+WINDOW_START = datetime.combine(FIRST_DAY + timedelta(days=DAYS - 7), datetime.min.time())
+
+TRANSFORMATIONS = [
+    {"type": "filter", "condition": {"op": "and", "args": [
+        # On the partition column, so whole days are skipped without opening their files
+        {"op": ">=", "args": ["date", {"lit": WINDOW_START.date()}]},
+        {"op": ">=", "args": ["timestamp", {"lit": WINDOW_START}]},
+        {"op": "==", "args": ["message_type", {"lit": "user"}]}
+    ]}},
+    {"type": "derive", "columns": {
+        "day": {"fn": "date", "args": ["timestamp"]},
+        "satisfied": {"fn": "cast", "dtype": "int", "args": [
+            {"fn": "fill_null", "args": [{"op": ">=", "args": ["rating", {"lit": 4}]}, {"lit": False}]}
+        ]}
+    }},
+    {"type": "aggregate", "group_by": ["topic", "day"], "aggs": {
+        "messages": {"fn": "count"},
+        "response_ms": {"fn": "mean", "column": "response_ms"},
+        "satisfied": {"fn": "mean", "column": "satisfied"}
+    }}
+]
+
+ANALYSIS = """
+    SELECT topic, sum(messages) AS messages, avg(response_ms) AS response_ms, avg(satisfied) AS satisfied
+    FROM temp_data GROUP BY topic ORDER BY messages DESC
+"""
+
+def generate(path: str, rows: int, seed: int):
+    """Write rows synthetic turns as one Parquet file per day"""
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rng = np.random.default_rng(seed)
+    per_day = rows // DAYS
+    topics = pa.array(TOPICS)
+    for day in range(DAYS):
+        n = per_day + (rows % DAYS if day == DAYS - 1 else 0)
+        start = np.datetime64(FIRST_DAY + timedelta(days=day), "ms")
+        rating = rng.integers(1, 6, n).astype("int8")
+        table = pa.table({
+            "user_id": rng.zipf(1.3, n).clip(max=1_000_000).astype("int64"),
+            "session_id": rng.integers(0, rows // 20 + 1, n),
+            "timestamp": pa.array(start + rng.integers(0, 86_400_000, n).astype("timedelta64[ms]")),
+            "message_type": pa.DictionaryArray.from_arrays(
+                pa.array(rng.integers(0, 2, n).astype("int8")), pa.array(["user", "assistant"])),
+            "topic": pa.DictionaryArray.from_arrays(pa.array(rng.integers(0, len(TOPICS), n).astype("int8")), topics),
+            "message_len": rng.integers(5, 2000, n).astype("int32"),
+            "response_ms": rng.gamma(2.0, 400.0, n).astype("float32"),
+            # Most turns are never rated
+            "rating": pa.array(rating, mask=rng.random(n) > 0.1)
+        })
+        directory = os.path.join(path, f"date={FIRST_DAY + timedelta(days=day)}")
+        os.makedirs(directory, exist_ok=True)
+        pq.write_table(table, os.path.join(directory, "part-0.parquet"), row_group_size=256_000)
+
+def run_eager(path: str):
+    """The previous MedicalDataPipeline path, step by step"""
+    import duckdb
+    import pandas as pd
+    import polars as pl
+
+    df = pd.read_parquet(path)
+    frame = pl.from_pandas(df)
+    frame = frame.filter(pl.col("timestamp") >= WINDOW_START)
+    frame = frame.filter(pl.col("message_type") == "user")
+    frame = frame.with_columns(
+        pl.col("timestamp").dt.date().alias("day"),
+        (pl.col("rating") >= 4).fill_null(False).cast(pl.Int64).alias("satisfied")
+    )
+    frame = frame.group_by(["topic", "day"]).agg(
+        pl.len().alias("messages"), pl.col("response_ms").mean(), pl.col("satisfied").mean()
+    )
+    conn = duckdb.connect()
+    conn.register("temp_data", frame.to_pandas())
+    return conn.execute(ANALYSIS).fetchall()
+
+def run_lazy(path: str):
+    import duckdb
+
+    from data_pipelines.transform.polars_plan import build_plan
+
+    table = build_plan(path, TRANSFORMATIONS).collect().to_arrow()
+    conn = duckdb.connect()
+    conn.register("temp_data", table)
+    return conn.execute(ANALYSIS).fetchall()
+
+def child(variant: str, path: str):
+    # Imports and DuckDB's one-time Arrow/pandas scanner setup stay outside the timed region
+    import duckdb
+    import pandas as pd
+    import pyarrow as pa
+
+    import data_pipelines.transform.polars_plan  # noqa: F401
+    conn = duckdb.connect()
+    conn.register("warm_arrow", pa.table({"x": [1]}))
+    conn.register("warm_pandas", pd.DataFrame({"x": [1]}))
+    conn.execute("SELECT * FROM warm_arrow, warm_pandas").fetchall()
+    conn.close()
+    started = time.perf_counter()
+    rows = (run_eager if variant == "eager" else run_lazy)(path)
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "result": [[topic, int(messages), round(response, 3), round(satisfied, 4)]
+                   for topic, messages, response, satisfied in rows]
+    }))
+
+def measure(variant: str, path: str):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_polars_plan", "--variant", variant, "--data", path],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--data", help="Dataset directory (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated dataset")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--variant", choices=["eager", "lazy"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    if args.variant:
+        child(args.variant, args.data)
+        return
+
+    path = args.data or tempfile.mkdtemp(prefix="conversations_")
+    try:
+        if not os.path.isdir(path) or not os.listdir(path):
+            started = time.perf_counter()
+            generate(path, args.rows, args.seed)
+            print(f"Generated {args.rows} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        runs = {variant: [measure(variant, path) for _ in range(args.repeat)] for variant in ("eager", "lazy")}
+        best = {variant: min(results, key=lambda r: r["seconds"]) for variant, results in runs.items()}
+        report({
+            "benchmark": "polars_plan",
+            "config": {"rows": args.rows, "days": DAYS, "window_days": 7, "repeat": args.repeat},
+            "dataset_mb": round(sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path)
+                                    for f in files) / 2**20, 1),
+            "eager": {k: v for k, v in best["eager"].items() if k != "result"},
+            "lazy": {k: v for k, v in best["lazy"].items() if k != "result"},
+            "speedup": round(best["eager"]["seconds"] / best["lazy"]["seconds"], 2),
+            "results_match": best["eager"]["result"] == best["lazy"]["result"]
+        }, args.output)
+    finally:
+        if not args.keep and not args.data:
+            shutil.rmtree(path, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
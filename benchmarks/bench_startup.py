@@ -0,0 +1,100 @@
+# benchmarks/bench_startup.py
+"""
+Cold start of the API: import of main, first served request and readiness
+
+Each run is a fresh interpreter, so module imports are measured cold:
+  import_s          python -c "import main"
+  first_request_s   import + lifespan start + first /health response
+  ready_s           import until /ready answers 200 (MongoDB pinged, indexes
+                    provisioned, cache invalidation started)
+cohere_import_s is what the SDK import costs; main no longer pays it at
+import time.
+
+Runs against mongomock unless --mongo-uri is given.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --mongo-uri mongodb://localhost:27017
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import json, sys, time
+started = time.perf_counter()
+if not sys.argv[1]:
+    from unittest.mock import patch
+    import mongomock
+    patch("pymongo.MongoClient", side_effect=lambda *a, **kw: mongomock.MongoClient()).start()
+
+import main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    client.get("/health").raise_for_status()
+    first_request = time.perf_counter()
+    deadline = first_request + float(sys.argv[2])
+    while client.get("/ready").status_code != 200:
+        if time.perf_counter() > deadline:
+            raise SystemExit("not ready before timeout")
+        time.sleep(0.005)
+    ready = time.perf_counter()
+
+print(json.dumps({
+    "import_s": imported - started,
+    "first_request_s": first_request - started,
+    "ready_s": ready - started
+}))
+"""
+
+def run_child(code: str, args, env) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", code, args.mongo_uri or "", str(args.timeout)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=args.timeout + 60
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "child failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def cohere_import_time(env) -> float:
+    code = "import time; t = time.perf_counter(); import cohere; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    return float(result.stdout.strip()) if result.returncode == 0 else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", default=None, help="Real MongoDB URI (default: mongomock)")
+    parser.add_argument("--database", default="healthbot_bench")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds to wait for /ready")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_NAME=args.database, PYTHONDONTWRITEBYTECODE="1")
+    if args.mongo_uri:
+        env["MONGODB_URI"] = args.mongo_uri
+
+    runs = [run_child(CHILD, args, env) for _ in range(args.runs)]
+    cohere_s = cohere_import_time(env)
+
+    report({
+        "benchmark": "startup",
+        "runs": args.runs,
+        "target": "mongodb" if args.mongo_uri else "mongomock",
+        "median": {key: round(statistics.median(r[key] for r in runs), 4) for key in runs[0]},
+        "max": {key: round(max(r[key] for r in runs), 4) for key in runs[0]},
+        "cohere_import_s": round(cohere_s, 4) if cohere_s is not None else None
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
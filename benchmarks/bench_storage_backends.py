@@ -0,0 +1,121 @@
+# benchmarks/bench_storage_backends.py
+"""
+MongoDB vs SQLite storage backends on the chat and history workloads
+
+  chat     per message: read the 20-turn context window of the session,
+           then persist turns the way the write-behind queue does
+           (--write-batch turns per insert_turns + record_turns)
+  history  per request: history_version probe, first 50-turn page of the
+           session, and the user's first page of sessions
+
+Both backends run the repositories main.py uses: TurnConversationStore and
+SessionIndex on MongoDB (mongomock unless --mongo-uri; --rtt-ms simulates
+the network), SQLiteStorage on a temporary WAL database file.
+
+Usage:
+    python -m benchmarks.bench_storage_backends --sessions 200 --turns 50
+    python -m benchmarks.bench_storage_backends --mongo-uri mongodb://localhost:27017 --output results/storage.json
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from benchmarks.common import LatencyDatabase, add_target_arguments, open_database, report
+from database.conversation_store import TurnConversationStore
+from database.session_index import SessionIndex
+from database.sqlite_store import SQLiteStorage
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3)
+    }
+
+def run_backend(store, sessions_index, args):
+    store.ensure_indexes()
+    sessions_index.ensure_indexes()
+    base = datetime(2026, 1, 1)
+
+    context_latency, pending = [], []
+    started = time.perf_counter()
+    for t in range(args.turns):
+        for s in range(args.sessions):
+            session_id = f"session_{s}"
+            began = time.perf_counter()
+            store.context_turns(session_id, 20)
+            context_latency.append(time.perf_counter() - began)
+            pending.append({
+                "_id": ObjectId(),
+                "user_id": str(s % args.users + 1),
+                "session_id": session_id,
+                "message": f"Symptom description {t} " * 4,
+                "response": f"Advice for turn {t} " * 12,
+                "timestamp": base + timedelta(milliseconds=(t * args.sessions + s) * 10)
+            })
+            if len(pending) >= args.write_batch:
+                sessions_index.record_turns(store.insert_turns(pending))
+                pending = []
+    if pending:
+        sessions_index.record_turns(store.insert_turns(pending))
+    chat_seconds = time.perf_counter() - started
+
+    history_latency = []
+    started = time.perf_counter()
+    for s in range(args.sessions):
+        user_id = str(s % args.users + 1)
+        began = time.perf_counter()
+        store.history_version(f"session_{s}", user_id)
+        page = list(store.iter_history(f"session_{s}", user_id, limit=50))
+        sessions_index.list_sessions(user_id, 20)
+        history_latency.append(time.perf_counter() - began)
+        assert len(page) == min(args.turns, 51)
+    history_seconds = time.perf_counter() - started
+
+    chats = args.sessions * args.turns
+    return {
+        "chats_per_sec": round(chats / chat_seconds, 1),
+        "context_read": percentiles(context_latency),
+        "history_requests_per_sec": round(args.sessions / history_seconds, 1),
+        "history_request": percentiles(history_latency)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_target_arguments(parser)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--write-batch", type=int, default=100)
+    args = parser.parse_args()
+
+    database = LatencyDatabase(open_database(args), args.rtt_ms)
+    results = {"mongo": run_backend(TurnConversationStore(database), SessionIndex(database), args)}
+
+    directory = tempfile.mkdtemp(prefix="sqlite_bench_")
+    storage = SQLiteStorage(os.path.join(directory, "healthbot.db"))
+    try:
+        results["sqlite"] = run_backend(storage.conversations, storage.sessions, args)
+    finally:
+        storage.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+    report({
+        "benchmark": "storage_backends",
+        "target": "mongodb" if args.mongo_uri else "mongomock",
+        "sessions": args.sessions,
+        "turns_per_session": args.turns,
+        "write_batch": args.write_batch,
+        "rtt_ms": args.rtt_ms,
+        "results": results
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# benchmarks/bench_unique_users.py
+"""
+Distinct users over a time range: exact distinct() vs HyperLogLog sketches
+
+Synthetic activity (Zipf-ish: a few heavy users, a long tail) is written to
+an events collection indexed on (created_at, user_id) and fed to
+UniqueUserSketches at each --precision. Every range is then answered both
+ways; the report gives query time, relative error against the exact count
+and the stored sketch size. distinct() cost grows with the events in range,
+the sketch query with the number of hour/day documents it merges.
+
+Usage:
+    python -m benchmarks.bench_unique_users --days 30 --users 20000 --events 200000
+    python -m benchmarks.bench_unique_users --mongo-uri mongodb://localhost:27017 --precision 10 12 14
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING
+
+from benchmarks.common import LatencyDatabase, add_target_arguments, open_database, report
+from database.hyperloglog import UniqueUserSketches
+
+def generate_events(args):
+    rng = random.Random(args.seed)
+    start = datetime(2026, 1, 1)
+    span = args.days * 86400
+    for _ in range(args.events):
+        # Heavy users dominate traffic, as in real chat logs
+        user = int(args.users * rng.random() ** 2)
+        yield {"user_id": f"user-{user}", "created_at": start + timedelta(seconds=rng.randrange(span))}
+
+def timed(fn, repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_target_arguments(parser)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--precision", type=int, nargs="+", default=[10, 12, 14])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per query")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    raw = open_database(args)
+    database = LatencyDatabase(raw, args.rtt_ms) if args.rtt_ms else raw
+    events = list(generate_events(args))
+    raw["events"].create_index([("created_at", ASCENDING), ("user_id", ASCENDING)])
+    raw["events"].insert_many([dict(event) for event in events])
+
+    sketches = {}
+    ingest = {}
+    for precision in args.precision:
+        store = UniqueUserSketches(database, collection=f"analytics_hll_p{precision}", precision=precision,
+                                   flush_interval=float("inf"), worker_id="bench")
+        started = time.perf_counter()
+        for event in events:
+            store.add(event["user_id"], event["created_at"])
+        store.flush()
+        ingest[precision] = round(len(events) / (time.perf_counter() - started))
+        sketches[precision] = store
+
+    first = datetime(2026, 1, 1)
+    ranges = {
+        "1 day": (first + timedelta(days=3), first + timedelta(days=4)),
+        "7 days": (first + timedelta(days=3), first + timedelta(days=10)),
+        "full range": (first, first + timedelta(days=args.days)),
+        "partial days": (first + timedelta(days=1, hours=7), first + timedelta(days=min(args.days, 6), hours=15))
+    }
+
+    queries = {}
+    for label, (start, end) in ranges.items():
+        window = {"created_at": {"$gte": start, "$lt": end}}
+        exact, exact_ms = timed(lambda: len(database["events"].distinct("user_id", window)), args.repeat)
+        row = {"exact": exact, "exact_ms": round(exact_ms, 2), "sketch": {}}
+        for precision, store in sketches.items():
+            result, sketch_ms = timed(lambda: store.unique_users(start, end), args.repeat)
+            row["sketch"][precision] = {
+                **result,
+                "ms": round(sketch_ms, 2),
+                "relative_error": round((result["estimate"] - exact) / exact, 4) if exact else 0.0,
+                "within_bounds": result["low"] <= exact <= result["high"]
+            }
+        queries[label] = row
+
+    report({
+        "benchmark": "unique_users",
+        "target": "mongodb" if args.mongo_uri else "mongomock",
+        "config": {"days": args.days, "users": args.users, "events": args.events, "rtt_ms": args.rtt_ms},
+        "sketch_ingest_events_per_s": ingest,
+        "sketch_bytes": {p: 1 << p for p in args.precision},
+        "sketch_documents": {p: raw[f"analytics_hll_p{p}"].count_documents({}) for p in args.precision},
+        "queries": queries
+    }, args.output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/bench_warehouse_load.py
+"""
+Row-at-a-time executemany vs Parquet-staged bulk loading, in rows/s
+
+    executemany  the previous _load_to_snowflake pattern: the frame is split
+                 into 1000-row chunks and each chunk is sent with
+                 executemany(INSERT ... VALUES (?, ...)), one commit per chunk
+    bulk         BulkLoader: zstd Parquet staging files, then one bulk load
+                 (DuckDB: INSERT ... SELECT FROM read_parquet; SQLite: one
+                 transaction of prepared inserts fed by Arrow batches)
+
+Both run against local DuckDB and SQLite files so no warehouse account is
+needed. DuckDB (columnar, like the warehouses) shows the gap that carries
+over to Snowflake/BigQuery, where each executemany chunk is also a network
+round trip. In-process SQLite is already row-oriented, so its bulk path is
+bounded by the same inserts plus the staging write/read and lands slightly
+below executemany; it is a correctness target, not a speed one.
+
+Usage:
+    python -m benchmarks.bench_warehouse_load --rows 1000000 --output results/warehouse_load.json
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.common import report
+
+def generate(rows: int, seed: int):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "user_id": pd.Series(rng.integers(0, 50_000, rows)).map("user-{}".format),
+        "session_id": rng.integers(0, rows // 20 + 1, rows),
+        "timestamp": pd.Timestamp("2026-01-01") + pd.to_timedelta(rng.integers(0, 30 * 86_400, rows), unit="s"),
+        "message_type": rng.choice(["user", "assistant"], rows),
+        "rating": rng.integers(1, 6, rows),
+        "response_ms": rng.gamma(2.0, 400.0, rows)
+    })
+
+def executemany_load(connect, frame, table: str) -> float:
+    """Chunks of 1000 rows, one executemany and commit each"""
+    conn = connect()
+    types = {"int64": "BIGINT", "float64": "DOUBLE"}
+    columns = ", ".join(f"{name} {types.get(str(dtype), 'VARCHAR')}" for name, dtype in frame.dtypes.items())
+    conn.execute(f"CREATE TABLE {table} ({columns})")
+    rows = frame.astype({"timestamp": str}).values.tolist()
+    statement = f"INSERT INTO {table} VALUES ({', '.join(['?'] * len(frame.columns))})"
+    started = time.perf_counter()
+    for start in range(0, len(rows), 1000):
+        conn.executemany(statement, rows[start:start + 1000])
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed
+
+def bulk_load(target, frame, table: str, staging_dir: str) -> float:
+    from data_pipelines.load.warehouse_loader import BulkLoader
+
+    started = time.perf_counter()
+    BulkLoader(target, staging_dir=staging_dir).load(frame, table)
+    elapsed = time.perf_counter() - started
+    target.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--executemany-rows", type=int, default=200_000,
+                        help="Rows for the executemany baseline (it is slow; rows/s is comparable)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write JSON results to this file")
+    args = parser.parse_args()
+
+    import duckdb
+
+    from data_pipelines.load.warehouse_loader import DuckDBTarget, SQLiteTarget
+
+    frame = generate(args.rows, args.seed)
+    baseline = frame.head(args.executemany_rows)
+    directory = tempfile.mkdtemp(prefix="warehouse_bench_")
+    results = {"benchmark": "warehouse_load",
+               "config": {"rows": args.rows, "executemany_rows": len(baseline)}}
+    try:
+        for name, connect, target in (
+            ("duckdb", lambda: duckdb.connect(os.path.join(directory, "em.duckdb")),
+             lambda: DuckDBTarget(os.path.join(directory, "bulk.duckdb"))),
+            ("sqlite", lambda: sqlite3.connect(os.path.join(directory, "em.db")),
+             lambda: SQLiteTarget(os.path.join(directory, "bulk.db")))
+        ):
+            old = executemany_load(connect, baseline, "conversations")
+            new = bulk_load(target(), frame, "conversations", directory)
+            results[name] = {
+                "executemany_rows_per_s": round(len(baseline) / old),
+                "bulk_rows_per_s": round(len(frame) / new),
+                "speedup": round((len(frame) / new) / (len(baseline) / old), 1)
+            }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    report(results, args.output)
+
+if __name__ == "__main__":
+    main()
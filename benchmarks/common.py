@@ -0,0 +1,90 @@
+# benchmarks/common.py
+"""
+Shared helpers for the benchmark scripts
+Targets an in-memory mongomock database by default, or a real deployment
+with --mongo-uri. --rtt-ms adds a simulated network round trip per call so
+round-trip savings show up even against mongomock.
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict
+
+# Collection methods that cost one server round trip
+ROUND_TRIP_METHODS = {
+    "insert_one", "insert_many", "update_one", "update_many", "bulk_write",
+    "find_one", "find_one_and_update", "delete_one", "delete_many",
+    "count_documents", "aggregate", "find", "distinct", "create_index",
+}
+
+class LatencyCollection:
+    """Collection proxy that sleeps rtt seconds before each round trip"""
+
+    def __init__(self, collection, rtt: float, counter: Dict[str, int]):
+        self._collection = collection
+        self._rtt = rtt
+        self._counter = counter
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name not in ROUND_TRIP_METHODS:
+            return attr
+
+        def call(*args, **kwargs):
+            self._counter["round_trips"] += 1
+            if self._rtt:
+                time.sleep(self._rtt)
+            return attr(*args, **kwargs)
+        return call
+
+    def __getitem__(self, name):
+        return self._collection[name]
+
+class LatencyDatabase:
+    """Database proxy handing out LatencyCollection wrappers"""
+
+    def __init__(self, database, rtt_ms: float = 0.0):
+        self._database = database
+        self._rtt = rtt_ms / 1000
+        self.counter = {"round_trips": 0}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        return LatencyCollection(self._database[name], self._rtt, self.counter)
+
+    def list_collection_names(self):
+        return self._database.list_collection_names()
+
+def add_target_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--mongo-uri", default=None, help="Real MongoDB URI (default: mongomock)")
+    parser.add_argument("--database", default="healthbot_bench")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="Simulated round-trip latency")
+    parser.add_argument("--output", help="Write JSON results to this file")
+
+def open_database(args, fresh: bool = True):
+    """Return the raw database for --mongo-uri, or a fresh mongomock one"""
+    if args.mongo_uri:
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+        if fresh:
+            client.drop_database(args.database)
+        return client[args.database]
+
+    import mongomock
+    return mongomock.MongoClient()[args.database]
+
+def report(results: Dict[str, Any], output: str = None):
+    """Print results and optionally persist them for regression comparison"""
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), **results}
+    text = json.dumps(results, indent=2, default=str)
+    print(text)
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
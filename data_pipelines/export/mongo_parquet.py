@@ -0,0 +1,344 @@
+# data_pipelines/export/mongo_parquet.py
+"""
+Incremental columnar export of MongoDB collections to partitioned Parquet
+
+Documents are read in _id order above a per-collection watermark, buffered
+per partition and written as Arrow record batches (one Parquet row group of
+up to --batch-rows rows each) to Hive-style partitions:
+
+    <out>/<collection>/date=2026-03-10/user_bucket=07/part-<from>-<seq>.parquet
+
+so DuckDB (or Polars) can prune by day and user hash, and heavy analytics
+run on a laptop instead of against the production cluster. Memory stays
+bounded by --buffer-rows buffered rows (every partition is written out when
+it is reached) plus one open writer per partition touched since the last
+commit.
+
+Progress is committed every --commit-rows rows: open writers are closed,
+their .tmp files renamed into place and the watermark saved. Part files are
+named after the watermark they started from, so files left by an
+interrupted run (always named after the last saved watermark) are removed
+before it resumes, and nothing is exported twice.
+
+ObjectIds are generated client-side and some writers buffer (write-behind
+transcripts), so a smaller _id can become visible after a larger one. Only
+_ids older than --settle-seconds are exported; the rest wait for the next
+run.
+
+With CONVERSATION_STORAGE=bucketed, turns are appended to existing
+conversation_buckets documents, so the bucket _id says nothing about when a
+turn arrived. That export unwinds the turns and keeps its watermark on the
+turn _id instead (each row is one turn, bucket_id names its bucket).
+
+Usage:
+    python -m data_pipelines.export.mongo_parquet --out exports
+    python -m data_pipelines.export.mongo_parquet --out exports --collections messages --batch-rows 20000
+
+    duckdb> SELECT date, count(*) FROM read_parquet('exports/messages/**/*.parquet', hive_partitioning=true)
+            GROUP BY date ORDER BY date;
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "_export_state.json"
+DEFAULT_USER_BUCKETS = 16
+
+@dataclass(frozen=True)
+class ExportSpec:
+    """Columns of one exported collection
+
+    fields maps column -> string | int | float | timestamp | bool | json
+    (json columns hold nested values serialized as text). The partition
+    date comes from the first time field present on a document.
+
+    unwind names an array of _id-carrying elements exported one row each;
+    columns are read from the element unless parent_fields maps them to a
+    field of the enclosing document.
+    """
+    collection: str
+    fields: Dict[str, str]
+    time_fields: Tuple[str, ...]
+    user_field: str = "user_id"
+    unwind: Optional[str] = None
+    parent_fields: Optional[Dict[str, str]] = None
+
+EXPORTS = {
+    # Turn documents (main.py) and conversation headers (HealthBotDatabase) share the collection
+    "conversations": ExportSpec("conversations", {
+        "_id": "string", "user_id": "string", "session_id": "string", "message": "string",
+        "response": "string", "timestamp": "timestamp", "title": "string", "status": "string",
+        "started_at": "timestamp", "updated_at": "timestamp", "message_count": "int", "metadata": "json"
+    }, ("timestamp", "started_at")),
+    # Turns of CONVERSATION_STORAGE=bucketed, one row per turn
+    "conversation_buckets": ExportSpec("conversation_buckets", {
+        "_id": "string", "bucket_id": "string", "user_id": "string", "session_id": "string",
+        "message": "string", "response": "string", "timestamp": "timestamp"
+    }, ("timestamp",), unwind="turns",
+       parent_fields={"bucket_id": "_id", "user_id": "user_id", "session_id": "session_id"}),
+    "messages": ExportSpec("messages", {
+        "_id": "string", "conversation_id": "string", "user_id": "string", "message_type": "string",
+        "content": "string", "created_at": "timestamp", "metadata": "json"
+    }, ("created_at",)),
+    "analytics_events": ExportSpec("analytics_events", {
+        "_id": "string", "event_type": "string", "user_id": "string", "conversation_id": "string",
+        "message_preview": "string", "timestamp": "timestamp"
+    }, ("timestamp",))
+}
+
+# ============ CONVERSION ============
+
+def arrow_schema(spec: ExportSpec):
+    import pyarrow as pa
+
+    types = {
+        "string": pa.string(), "json": pa.string(), "int": pa.int64(), "float": pa.float64(),
+        "bool": pa.bool_(), "timestamp": pa.timestamp("ms")
+    }
+    return pa.schema([(name, types[kind]) for name, kind in spec.fields.items()])
+
+def coerce(value: Any, kind: str) -> Any:
+    """Fit a BSON value to its column type; values that do not fit become null"""
+    if value is None:
+        return None
+    if kind == "timestamp":
+        if isinstance(value, datetime):
+            return value.replace(tzinfo=None)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+            except ValueError:
+                return None
+        return None
+    if kind == "json":
+        return json.dumps(value, default=str)
+    if kind == "string":
+        return value if isinstance(value, str) else str(value)
+    try:
+        return {"int": int, "float": float, "bool": bool}[kind](value)
+    except (TypeError, ValueError):
+        return None
+
+def user_bucket(user_id: Any, buckets: int) -> int:
+    """Stable hash partition of a user id (Python's hash() is salted per process)"""
+    digest = hashlib.blake2b(str(user_id or "").encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big") % buckets
+
+def to_row(doc: Dict[str, Any], spec: ExportSpec, buckets: int) -> Tuple[Tuple[str, int], Dict[str, Any]]:
+    """(partition, row) for one document"""
+    row = {name: coerce(doc.get(name), kind) for name, kind in spec.fields.items()}
+    at = next((row[f] for f in spec.time_fields if row.get(f) is not None), None)
+    if at is None:
+        # No usable timestamp: the ObjectId still records when the document was created
+        at = doc["_id"].generation_time.replace(tzinfo=None) if isinstance(doc["_id"], ObjectId) else datetime(1970, 1, 1)
+    return (at.strftime("%Y-%m-%d"), user_bucket(doc.get(spec.user_field), buckets)), row
+
+# ============ STATE ============
+
+class ExportState:
+    """Per-collection watermarks, saved atomically next to the exported files"""
+
+    def __init__(self, root: str):
+        self.path = os.path.join(root, STATE_FILE)
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def watermark(self, collection: str) -> Optional[str]:
+        return self.state.get(collection, {}).get("watermark")
+
+    def advance(self, collection: str, watermark: str, rows: int, files: int):
+        entry = self.state.setdefault(collection, {"rows": 0, "files": 0})
+        entry["watermark"] = watermark
+        entry["rows"] += rows
+        entry["files"] += files
+        entry["updated_at"] = datetime.utcnow().isoformat()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+# ============ EXPORTER ============
+
+class ParquetExporter:
+    def __init__(self, database, root: str, batch_rows: int = 10_000, buffer_rows: int = 100_000,
+                 commit_rows: int = 200_000, user_buckets: int = DEFAULT_USER_BUCKETS,
+                 settle: timedelta = timedelta(minutes=5), compression: str = "zstd",
+                 max_open_writers: int = 256):
+        self.database = database
+        self.root = root
+        self.batch_rows = batch_rows
+        self.buffer_rows = max(buffer_rows, batch_rows)
+        self.commit_rows = commit_rows
+        self.user_buckets = user_buckets
+        self.settle = settle
+        self.compression = compression
+        self.max_open_writers = max_open_writers
+        self.state = ExportState(root)
+
+    def _query(self, watermark: Optional[str]) -> Dict[str, Any]:
+        bounds = {}
+        if watermark:
+            bounds["$gt"] = ObjectId(watermark)
+        if self.settle:
+            bounds["$lt"] = ObjectId.from_datetime(datetime.utcnow() - self.settle)
+        return {"_id": bounds} if bounds else {}
+
+    def _cursor(self, spec: ExportSpec, watermark: Optional[str]):
+        """Documents (or unwound elements, re-keyed by their own _id) in _id order"""
+        collection = self.database[spec.collection]
+        bounds = self._query(watermark).get("_id")
+        if not spec.unwind:
+            return collection.find({"_id": bounds} if bounds else {}).sort("_id", 1).batch_size(self.batch_rows)
+
+        element = spec.unwind
+        match = {f"{element}._id": bounds} if bounds else {}
+        parents = spec.parent_fields or {}
+        project = {name: f"${parents[name]}" if name in parents else f"${element}.{name}" for name in spec.fields}
+        return collection.aggregate([
+            {"$match": match},
+            {"$unwind": f"${element}"},
+            {"$match": match},
+            {"$project": project},
+            {"$sort": {"_id": 1}}
+        ], allowDiskUse=True, batchSize=self.batch_rows)
+
+    def _clean_interrupted(self, directory: str, prefix: str):
+        """Remove .tmp files and parts of a run that never committed"""
+        if not os.path.isdir(directory):
+            return
+        for dirpath, _, filenames in os.walk(directory):
+            for filename in filenames:
+                if filename.endswith(".tmp") or filename.startswith(f"part-{prefix}-"):
+                    os.remove(os.path.join(dirpath, filename))
+
+    def export(self, collection: str) -> Dict[str, Any]:
+        """Export documents above the saved watermark; returns rows and files written"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        spec = EXPORTS[collection]
+        schema = arrow_schema(spec)
+        directory = os.path.join(self.root, collection)
+        watermark = self.state.watermark(collection)
+        prefix = watermark or "0"
+        self._clean_interrupted(directory, prefix)
+
+        started = time.perf_counter()
+        buffers: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+        writers: Dict[Tuple[str, int], Tuple[Any, str]] = {}
+        totals = {"rows": 0, "files": 0, "commits": 0}
+        pending = {"rows": 0, "buffered": 0, "last_id": None, "seq": 0}
+
+        def write_partition(partition: Tuple[str, int]):
+            rows = buffers.pop(partition)
+            if partition not in writers:
+                date, bucket = partition
+                part_dir = os.path.join(directory, f"date={date}", f"user_bucket={bucket:02d}")
+                os.makedirs(part_dir, exist_ok=True)
+                path = os.path.join(part_dir, f"part-{prefix}-{pending['seq']:05d}.parquet")
+                pending["seq"] += 1
+                writers[partition] = (pq.ParquetWriter(f"{path}.tmp", schema, compression=self.compression), path)
+            writers[partition][0].write_batch(pa.RecordBatch.from_pylist(rows, schema=schema))
+            pending["buffered"] -= len(rows)
+
+        def write_buffers():
+            for partition in list(buffers):
+                write_partition(partition)
+
+        def commit():
+            nonlocal prefix
+            write_buffers()
+            for writer, path in writers.values():
+                writer.close()
+                os.replace(f"{path}.tmp", path)
+            if pending["last_id"] is not None:
+                self.state.advance(collection, pending["last_id"], pending["rows"], len(writers))
+                prefix = pending["last_id"]
+                totals["rows"] += pending["rows"]
+                totals["files"] += len(writers)
+                totals["commits"] += 1
+            writers.clear()
+            pending.update(rows=0, last_id=None, seq=0)
+
+        cursor = self._cursor(spec, watermark)
+        try:
+            for doc in cursor:
+                partition, row = to_row(doc, spec, self.user_buckets)
+                rows = buffers.setdefault(partition, [])
+                rows.append(row)
+                pending["buffered"] += 1
+                pending["rows"] += 1
+                pending["last_id"] = str(doc["_id"])
+                if len(rows) >= self.batch_rows:
+                    write_partition(partition)
+                elif pending["buffered"] >= self.buffer_rows:
+                    write_buffers()
+                if pending["rows"] >= self.commit_rows or len(writers) + len(buffers) >= self.max_open_writers:
+                    commit()
+            commit()
+        finally:
+            cursor.close()
+            for writer, _ in writers.values():
+                writer.close()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Exported {totals['rows']} {collection} rows to {totals['files']} files in {elapsed:.1f}s")
+        return {**totals, "collection": collection, "watermark": self.state.watermark(collection),
+                "seconds": round(elapsed, 2)}
+
+    def export_all(self, collections: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return [self.export(name) for name in collections or EXPORTS]
+
+def parquet_glob(root: str, collection: str) -> str:
+    """Glob DuckDB's read_parquet(..., hive_partitioning=true) takes for an exported collection"""
+    return os.path.join(root, collection, "**", "*.parquet")
+
+def main(argv: Optional[List[str]] = None):
+    from dotenv import load_dotenv
+
+    from database.mongodb.pool import connection_manager
+
+    parser = argparse.ArgumentParser(description="Incrementally export MongoDB collections to Parquet")
+    parser.add_argument("--out", default="exports", help="Export root directory")
+    parser.add_argument("--collections", nargs="+", choices=sorted(EXPORTS), default=None)
+    parser.add_argument("--batch-rows", type=int, default=10_000, help="Rows per Arrow record batch")
+    parser.add_argument("--buffer-rows", type=int, default=100_000, help="Rows buffered across partitions")
+    parser.add_argument("--commit-rows", type=int, default=200_000, help="Rows between watermark commits")
+    parser.add_argument("--user-buckets", type=int, default=DEFAULT_USER_BUCKETS)
+    parser.add_argument("--settle-seconds", type=float, default=300, help="Skip _ids younger than this")
+    parser.add_argument("--mongo-uri", default=None)
+    parser.add_argument("--database", default=None)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    exporter = ParquetExporter(
+        connection_manager.database(args.database, args.mongo_uri or os.getenv("MONGODB_URI")),
+        args.out,
+        batch_rows=args.batch_rows,
+        buffer_rows=args.buffer_rows,
+        commit_rows=args.commit_rows,
+        user_buckets=args.user_buckets,
+        settle=timedelta(seconds=args.settle_seconds)
+    )
+    print(json.dumps(exporter.export_all(args.collections), indent=2))
+
+if __name__ == "__main__":
+    main()
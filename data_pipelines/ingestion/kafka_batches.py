@@ -0,0 +1,251 @@
+# data_pipelines/ingestion/kafka_batches.py
+"""
+Windowed micro-batch extraction from Kafka into Arrow tables
+
+One long-lived consumer (auto-commit off) polls raw bytes; records are
+grouped into a batch until max_records arrive or max_wait_s elapses,
+whichever comes first, then decoded in one call (pyarrow's multithreaded
+NDJSON reader over the concatenated values) instead of json.loads per
+message. Each batch is an Arrow table with the event fields plus
+_topic, _partition, _offset and _kafka_ts columns; nested objects such as
+"data" are flattened to data.user_id etc.
+
+Offsets are committed at-least-once: a batch's offsets are committed when
+the next batch is requested from batches() (the consumer of the generator
+has finished with it) or when commit() is called. A crash while a batch is
+processed re-delivers it, and rewind() re-delivers every batch handed out
+since the last commit without restarting.
+
+If the bulk decode fails (a malformed message), that batch falls back to
+decoding message by message (orjson when installed) and malformed messages,
+tombstones (null values) and messages whose field types conflict with the
+rest of the batch are counted and skipped.
+
+Usage:
+    batcher = KafkaMicroBatcher(["healthbot.medical.queries"], "localhost:9092", "analytics")
+    for table in batcher.batches():
+        process(table)
+    batcher.close()
+"""
+
+import io
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+    _loads: Callable[[bytes], Any] = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+META_COLUMNS = ("_topic", "_partition", "_offset", "_kafka_ts")
+
+def decode_values(values: List[Optional[bytes]], schema=None) -> Tuple[Any, List[int]]:
+    """(Arrow table, indexes of the decoded values) for a list of JSON messages
+
+    Null values (tombstones on compacted topics) are skipped like malformed ones.
+    """
+    import pyarrow as pa
+    import pyarrow.json as pj
+
+    present = [index for index, value in enumerate(values) if value is not None]
+    parse_options = pj.ParseOptions(explicit_schema=schema, unexpected_field_behavior="ignore") if schema \
+        else pj.ParseOptions()
+    if present:
+        try:
+            # Serialized JSON has no raw newlines, so the values are already NDJSON
+            table = pj.read_json(io.BytesIO(b"\n".join(values[index] for index in present)),
+                                 parse_options=parse_options)
+            if table.num_rows == len(present):
+                return table, present
+        except (pa.ArrowInvalid, ValueError):
+            pass
+
+    rows, kept = [], []
+    for index in present:
+        value = values[index]
+        try:
+            row = _loads(value)
+        except ValueError:
+            continue
+        if isinstance(row, dict):
+            rows.append(row)
+            kept.append(index)
+    try:
+        return pa.Table.from_pylist(rows, schema=schema), kept
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        pass
+
+    # A field whose type differs between messages (or from the schema): keep the
+    # rows that fit and skip the rest as malformed, so the batch still commits
+    schema = schema or _infer_schema(rows)
+    fits = [position for position, row in enumerate(rows) if _fits(row, schema)]
+    return pa.Table.from_pylist([rows[position] for position in fits], schema=schema), \
+        [kept[position] for position in fits]
+
+def _infer_schema(rows: List[Dict[str, Any]]):
+    """Each field typed from all its values, or from its first convertible value when they conflict"""
+    import pyarrow as pa
+
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    fields = []
+    for name in names:
+        values = [row.get(name) for row in rows]
+        try:
+            field_type = pa.array(values).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            field_type = pa.null()
+            for value in values:
+                if value is None:
+                    continue
+                try:
+                    field_type = pa.array([value]).type
+                    break
+                except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+                    continue
+        fields.append((name, field_type))
+    return pa.schema(fields)
+
+def _fits(row: Dict[str, Any], schema) -> bool:
+    import pyarrow as pa
+
+    try:
+        pa.Table.from_pylist([row], schema=schema)
+        return True
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return False
+
+def flatten(table):
+    """data.user_id instead of a data struct column"""
+    import pyarrow as pa
+
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+    return table
+
+class KafkaMicroBatcher:
+    """Reusable consumer yielding Arrow tables per count or time window"""
+
+    def __init__(self, topics: Sequence[str], bootstrap_servers: Any = "localhost:9092",
+                 group_id: str = "healthbot-pipeline", max_records: int = 10_000, max_wait_s: float = 1.0,
+                 schema=None, consumer=None, **consumer_options):
+        self.topics = list(topics)
+        self.bootstrap_servers = bootstrap_servers
+        self.group_id = group_id
+        self.max_records = max_records
+        self.max_wait_s = max_wait_s
+        self.schema = schema
+        self.consumer_options = consumer_options
+        self._consumer = consumer
+        # Per partition: next offset to commit, and the first offset handed out since the last commit
+        self._pending: Dict[Any, int] = {}
+        self._uncommitted_from: Dict[Any, int] = {}
+        self.stats = {"batches": 0, "records": 0, "malformed": 0, "commits": 0, "rewinds": 0}
+
+    @property
+    def consumer(self):
+        """Created on first use and kept for the life of the batcher"""
+        if self._consumer is None:
+            from kafka import KafkaConsumer
+
+            options = {"auto_offset_reset": "earliest", "max_poll_records": min(self.max_records, 5000),
+                       **self.consumer_options}
+            self._consumer = KafkaConsumer(
+                *self.topics,
+                bootstrap_servers=self.bootstrap_servers,
+                group_id=self.group_id,
+                enable_auto_commit=False,
+                **options
+            )
+        return self._consumer
+
+    def poll_batch(self) -> Optional[Any]:
+        """Collect one window of records; None if nothing arrived within max_wait_s"""
+        import pyarrow as pa
+
+        deadline = time.monotonic() + self.max_wait_s
+        values: List[Optional[bytes]] = []
+        meta: Dict[str, List[Any]] = {name: [] for name in META_COLUMNS}
+        offsets: Dict[Any, int] = {}
+        starts: Dict[Any, int] = {}
+        while len(values) < self.max_records:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            polled = self.consumer.poll(timeout_ms=int(remaining * 1000) or 1,
+                                        max_records=self.max_records - len(values))
+            for partition, records in polled.items():
+                for record in records:
+                    values.append(record.value)
+                    meta["_topic"].append(record.topic)
+                    meta["_partition"].append(record.partition)
+                    meta["_offset"].append(record.offset)
+                    meta["_kafka_ts"].append(record.timestamp)
+                if records:
+                    starts.setdefault(partition, records[0].offset)
+                    offsets[partition] = records[-1].offset + 1
+        if not values:
+            return None
+
+        table, kept = decode_values(values, self.schema)
+        malformed = len(values) - len(kept)
+        if malformed:
+            logger.warning(f"Skipped {malformed} malformed or null Kafka messages")
+        for name, column in meta.items():
+            array = pa.array(column if not malformed else [column[i] for i in kept])
+            if name == "_kafka_ts":
+                array = array.cast(pa.timestamp("ms"))
+            table = table.append_column(name, array)
+
+        self._pending.update(offsets)
+        for partition, offset in starts.items():
+            self._uncommitted_from.setdefault(partition, offset)
+        self.stats["batches"] += 1
+        self.stats["records"] += len(kept)
+        self.stats["malformed"] += malformed
+        return flatten(table)
+
+    def commit(self):
+        """Commit the offsets of every batch handed out so far"""
+        if not self._pending:
+            return
+        from kafka.structs import OffsetAndMetadata
+
+        self.consumer.commit({tp: OffsetAndMetadata(offset, "", -1) for tp, offset in self._pending.items()})
+        self._pending.clear()
+        self._uncommitted_from.clear()
+        self.stats["commits"] += 1
+
+    def rewind(self):
+        """Seek back to the last commit, so uncommitted batches (say, a failed load) are delivered again"""
+        if not self._uncommitted_from:
+            return
+        for tp, offset in self._uncommitted_from.items():
+            self.consumer.seek(tp, offset)
+        self._pending.clear()
+        self._uncommitted_from.clear()
+        self.stats["rewinds"] += 1
+
+    def batches(self, max_batches: Optional[int] = None, stop_when_idle: bool = False) -> Iterator[Any]:
+        """Yield Arrow tables; the previous batch is committed before the next poll"""
+        produced = 0
+        while max_batches is None or produced < max_batches:
+            self.commit()
+            table = self.poll_batch()
+            if table is None:
+                if stop_when_idle:
+                    return
+                continue
+            produced += 1
+            yield table
+
+    def close(self, commit: bool = False):
+        if self._consumer is not None:
+            if commit:
+                self.commit()
+            self._consumer.close()
+            self._consumer = None
@@ -0,0 +1,416 @@
+# data_pipelines/ingestion/knowledge_ingestion.py
+"""
+Streaming bulk ingestion of medical knowledge into MongoDB
+Reads JSONL / CSV / Parquet in chunks, deduplicates by content hash,
+chunks and embeds in a process pool and writes unordered insert_many batches
+
+Usage:
+    python -m data_pipelines.ingestion.knowledge_ingestion guidelines.jsonl \
+        --category guidelines --workers 4 --batch-size 500
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+DEFAULT_EMBEDDING_DIM = 384
+COHERE_EMBED_MODEL = "embed-english-v3.0"
+
+# ============ READERS ============
+
+def detect_format(path: str) -> str:
+    """Guess input format from the file extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Unsupported input format: {ext}")
+
+def iter_record_batches(path: str, fmt: str, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Yield lists of raw records without loading the whole file"""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield record_batch.to_pylist()
+        return
+
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "jsonl":
+            rows = (json.loads(line) for line in f if line.strip())
+        elif fmt == "csv":
+            rows = csv.DictReader(f)
+        else:
+            raise ValueError(f"Unsupported input format: {fmt}")
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+# ============ CHUNKING & HASHING ============
+
+_WHITESPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so formatting-only differences hash the same"""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+def content_hash(text: str) -> str:
+    """Stable dedup key for a chunk of knowledge"""
+    return hashlib.sha256(normalize_text(text).lower().encode("utf-8")).hexdigest()
+
+def chunk_text(text: str, max_chars: int = 1200, overlap: int = 150) -> List[str]:
+    """Split text on sentence boundaries into chunks of at most max_chars"""
+    if not 0 <= overlap < max_chars:
+        # Hard splits advance by max_chars - overlap, which must be positive
+        raise ValueError(f"overlap must be in [0, max_chars): overlap={overlap}, max_chars={max_chars}")
+    text = normalize_text(text)
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    chunks = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            # Hard split for sentences longer than a chunk
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars - overlap:]
+        candidate = f"{current} {sentence}".strip()
+        if len(candidate) > max_chars:
+            chunks.append(current)
+            tail = current[-overlap:] if overlap else ""
+            current = f"{tail} {sentence}".strip()
+            if len(current) > max_chars:
+                current = sentence
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+# ============ EMBEDDING ============
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder (offline, no model download)"""
+
+    name = "hashing"
+
+    def __init__(self, dim: int = DEFAULT_EMBEDDING_DIM):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for text in texts:
+            vec = [0.0] * self.dim
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dim
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vec[bucket] += sign
+            norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+            vectors.append([v / norm for v in vec])
+        return vectors
+
+class CohereEmbedder:
+    """Cohere embeddings (one client per worker process)"""
+
+    name = COHERE_EMBED_MODEL
+    dim = 1024
+
+    def __init__(self, api_key: str):
+        import cohere
+        self.client = cohere.Client(api_key=api_key)
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        response = self.client.embed(
+            texts=texts,
+            model=COHERE_EMBED_MODEL,
+            input_type="search_document"
+        )
+        return [list(vec) for vec in response.embeddings]
+
+def build_embedder(kind: str, dim: int = DEFAULT_EMBEDDING_DIM):
+    if kind == "cohere":
+        api_key = os.getenv("COHERE_API_KEY")
+        if not api_key:
+            raise RuntimeError("COHERE_API_KEY is required for --embedder cohere")
+        return CohereEmbedder(api_key)
+    if kind == "hashing":
+        return HashingEmbedder(dim)
+    raise ValueError(f"Unknown embedder: {kind}")
+
+# Per-process state, populated by the pool initializer
+_worker_embedder = None
+_worker_options: Dict[str, Any] = {}
+
+def _init_worker(embedder_kind: str, dim: int, options: Dict[str, Any]):
+    global _worker_embedder, _worker_options
+    _worker_embedder = build_embedder(embedder_kind, dim)
+    _worker_options = options
+
+def prepare_documents(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Chunk, hash and embed a batch of raw records (runs in a worker process)"""
+    options = _worker_options
+    text_field = options.get("text_field", "content")
+    docs = []
+    seen = set()
+
+    for record in records:
+        title = record.get("title") or ""
+        tags = record.get("tags") or []
+        if isinstance(tags, str):
+            tags = [t.strip() for t in tags.split(",") if t.strip()]
+
+        for index, chunk in enumerate(chunk_text(record.get(text_field) or "", options.get("max_chars", 1200),
+                                                   options.get("overlap", 150))):
+            key = content_hash(chunk)
+            if key in seen:
+                continue
+            seen.add(key)
+            docs.append({
+                "title": title,
+                "content": chunk,
+                "category": record.get("category") or options.get("category", "general"),
+                "subcategory": record.get("subcategory"),
+                "tags": tags,
+                "source": record.get("source") or options.get("source"),
+                "chunk_index": index,
+                "content_hash": key,
+                "confidence_score": float(record.get("confidence") or options.get("confidence", 0.8)),
+                "usage_count": 0
+            })
+
+    if docs:
+        embeddings = _worker_embedder.embed([d["content"] for d in docs])
+        for doc, vector in zip(docs, embeddings):
+            doc["embedding"] = vector
+            doc["embedding_model"] = _worker_embedder.name
+    return docs
+
+# ============ MONGO WRITER ============
+
+def ensure_knowledge_indexes(collection, dim: int):
+    """Unique hash index for dedup plus an Atlas vector index on embeddings"""
+    # Partial: documents added by HealthBotDatabase.add_medical_knowledge have no
+    # content_hash, and a plain unique index would reject them as duplicate nulls
+    collection.create_index(
+        [("content_hash", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"content_hash": {"$exists": True}},
+        name="idx_content_hash_unique"
+    )
+    try:
+        from pymongo.operations import SearchIndexModel
+
+        collection.create_search_index(SearchIndexModel(
+            definition={
+                "mappings": {
+                    "dynamic": True,
+                    "fields": {
+                        "embedding": {"type": "knnVector", "dimensions": dim, "similarity": "cosine"}
+                    }
+                }
+            },
+            name="idx_knowledge_vector"
+        ))
+    except Exception as e:
+        # Search indexes only exist on Atlas (and fail if already present)
+        logger.info(f"Vector search index not created: {e}")
+
+def write_batch(collection, docs: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Unordered insert_many; duplicate hashes are counted, not fatal"""
+    if not docs:
+        return {"inserted": 0, "duplicates": 0}
+
+    now = datetime.utcnow()
+    for doc in docs:
+        doc["created_at"] = now
+
+    try:
+        result = collection.insert_many(docs, ordered=False)
+        return {"inserted": len(result.inserted_ids), "duplicates": 0}
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        fatal = [err for err in errors if err.get("code") != DUPLICATE_KEY_ERROR]
+        if fatal:
+            raise
+        return {"inserted": e.details.get("nInserted", 0), "duplicates": len(errors)}
+
+# ============ CHECKPOINTS ============
+
+class Checkpoint:
+    """Tracks how many input records have been durably written"""
+
+    def __init__(self, path: Optional[str], source: str):
+        self.path = path
+        self.source = source
+        self.state = {"source": source, "records_done": 0, "inserted": 0, "duplicates": 0}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("source") == source:
+                self.state.update(saved)
+            else:
+                logger.warning(f"Checkpoint {path} belongs to {saved.get('source')}, starting fresh")
+
+    @property
+    def records_done(self) -> int:
+        return self.state["records_done"]
+
+    def advance(self, records: int, inserted: int, duplicates: int):
+        self.state["records_done"] += records
+        self.state["inserted"] += inserted
+        self.state["duplicates"] += duplicates
+        self.state["updated_at"] = datetime.utcnow().isoformat()
+        if self.path:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_path, self.path)
+
+# ============ PIPELINE ============
+
+def _skip_done(batches: Iterator[List[Dict[str, Any]]], skip: int) -> Iterator[List[Dict[str, Any]]]:
+    for batch in batches:
+        if skip >= len(batch):
+            skip -= len(batch)
+            continue
+        yield batch[skip:]
+        skip = 0
+
+def ingest_file(
+    path: str,
+    collection,
+    fmt: Optional[str] = None,
+    batch_size: int = 500,
+    workers: int = os.cpu_count() or 1,
+    embedder: str = "hashing",
+    dim: int = DEFAULT_EMBEDDING_DIM,
+    checkpoint_path: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Stream a file into the knowledge collection and return a throughput report"""
+    fmt = fmt or detect_format(path)
+    options = dict(options or {})
+    options.setdefault("source", os.path.basename(path))
+    checkpoint = Checkpoint(checkpoint_path, os.path.abspath(path))
+    if checkpoint.records_done:
+        logger.info(f"Resuming {path} after {checkpoint.records_done} records")
+
+    ensure_knowledge_indexes(collection, dim if embedder == "hashing" else CohereEmbedder.dim)
+    batches = _skip_done(iter_record_batches(path, fmt, batch_size), checkpoint.records_done)
+
+    totals = {"records": 0, "chunks": 0, "inserted": 0, "duplicates": 0}
+    started = time.perf_counter()
+
+    def commit(records: List[Dict[str, Any]], docs: List[Dict[str, Any]]):
+        written = write_batch(collection, docs)
+        checkpoint.advance(len(records), written["inserted"], written["duplicates"])
+        totals["records"] += len(records)
+        totals["chunks"] += len(docs)
+        totals["inserted"] += written["inserted"]
+        totals["duplicates"] += written["duplicates"]
+        elapsed = time.perf_counter() - started
+        logger.info(f"{totals['records']} records, {totals['inserted']} inserted "
+                    f"({totals['inserted'] / elapsed:.1f} docs/sec)")
+
+    if workers <= 0:
+        _init_worker(embedder, dim, options)
+        for records in batches:
+            commit(records, prepare_documents(records))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(embedder, dim, options)) as pool:
+            # Commit in submission order so the checkpoint only covers contiguous work
+            in_flight = deque()
+            for records in batches:
+                in_flight.append((records, pool.submit(prepare_documents, records)))
+                if len(in_flight) >= workers * 2:
+                    done_records, future = in_flight.popleft()
+                    commit(done_records, future.result())
+            while in_flight:
+                done_records, future = in_flight.popleft()
+                commit(done_records, future.result())
+
+    elapsed = time.perf_counter() - started
+    return {
+        **totals,
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_sec": round(totals["inserted"] / elapsed, 1) if elapsed else 0.0,
+        "resumed_from": checkpoint.records_done - totals["records"]
+    }
+
+def main(argv: Optional[List[str]] = None):
+    from database.mongodb.pool import connection_manager
+
+    parser = argparse.ArgumentParser(description="Bulk-load medical knowledge into MongoDB")
+    parser.add_argument("path", help="JSONL, CSV or Parquet file")
+    parser.add_argument("--format", choices=["jsonl", "csv", "parquet"])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Process pool size (0 runs inline)")
+    parser.add_argument("--embedder", choices=["hashing", "cohere"], default="hashing")
+    parser.add_argument("--dim", type=int, default=DEFAULT_EMBEDDING_DIM)
+    parser.add_argument("--max-chars", type=int, default=1200)
+    parser.add_argument("--overlap", type=int, default=150, help="Characters repeated between chunks")
+    parser.add_argument("--text-field", default="content")
+    parser.add_argument("--category", default="general")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <path>.ckpt.json)")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGODB_URI"))
+    parser.add_argument("--database", default=os.getenv("DATABASE_NAME", "healthbot"))
+    args = parser.parse_args(argv)
+    if not 0 <= args.overlap < args.max_chars:
+        parser.error("--overlap must be at least 0 and less than --max-chars")
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        collection = connection_manager.database(args.database, args.mongo_uri)["medical_knowledge"]
+        report = ingest_file(
+            args.path,
+            collection,
+            fmt=args.format,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            embedder=args.embedder,
+            dim=args.dim,
+            checkpoint_path=args.checkpoint or f"{args.path}.ckpt.json",
+            options={"text_field": args.text_field, "category": args.category, "max_chars": args.max_chars,
+                     "overlap": args.overlap}
+        )
+    finally:
+        connection_manager.close()
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+# data_pipelines/load/warehouse_loader.py
+"""
+Bulk warehouse loading through compressed Parquet staging files
+
+Rows are never inserted one statement at a time. BulkLoader writes the data
+(pandas, Polars or Arrow) to zstd Parquet files of at most rows_per_file
+rows, uploads the files to the target in parallel, then issues one bulk
+load for all of them:
+
+    snowflake  PUT file://... @%table (parallel)  ->  COPY INTO table ... PURGE
+    bigquery   one PARQUET load job per file (parallel)  ->  wait for all jobs
+    duckdb     files read in place  ->  INSERT INTO table SELECT * FROM read_parquet([...])
+    sqlite     files streamed as record batches into one transaction of
+               prepared INSERTs (local testing target; SQLite cannot read Parquet)
+
+Tables are created from the Parquet schema when missing (Snowflake before
+the PUT, since the table stage only exists with its table; BigQuery load
+jobs create them). All calls block, including connecting and closing:
+async callers run load_with_config (or their own BulkLoader.load) in a
+thread (asyncio.to_thread).
+
+Usage:
+    loader = BulkLoader(DuckDBTarget("warehouse.duckdb"))
+    loader.load(frame, "conversations")      # {"rows", "files", "bytes", "seconds", "rows_per_s"}
+"""
+
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROWS_PER_FILE = 250_000
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_$]*(\.[A-Za-z_][A-Za-z0-9_$]*){0,2}$")
+
+def check_identifier(name: str) -> str:
+    """Table names are interpolated into SQL, so only plain (dotted) identifiers are accepted"""
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid table name: {name!r}")
+    return name
+
+def to_arrow(data: Any):
+    """Arrow table from pandas, Polars or Arrow data"""
+    import pyarrow as pa
+
+    if isinstance(data, pa.Table):
+        return data
+    if hasattr(data, "to_arrow"):
+        if hasattr(data, "collect"):
+            data = data.collect()
+        return data.to_arrow()
+    return pa.Table.from_pandas(data, preserve_index=False)
+
+def stage_parquet(data: Any, directory: str, rows_per_file: int = DEFAULT_ROWS_PER_FILE,
+                  compression: str = "zstd") -> List[str]:
+    """Write data as numbered Parquet files; returns their paths"""
+    import pyarrow.parquet as pq
+
+    table = to_arrow(data)
+    os.makedirs(directory, exist_ok=True)
+    prefix = uuid.uuid4().hex[:12]
+    paths = []
+    for index, start in enumerate(range(0, max(table.num_rows, 1), rows_per_file)):
+        path = os.path.join(directory, f"{prefix}-{index:05d}.parquet")
+        pq.write_table(table.slice(start, rows_per_file), path, compression=compression)
+        paths.append(path)
+    return paths
+
+# ============ TARGETS ============
+
+class DuckDBTarget:
+    """Local DuckDB database file (or :memory:); reads staged files directly"""
+
+    name = "duckdb"
+    parallel_uploads = False
+
+    def __init__(self, path: str = ":memory:", connection=None):
+        import duckdb
+
+        self.conn = connection or duckdb.connect(path)
+
+    def upload(self, path: str, table: str) -> str:
+        return path
+
+    def copy(self, refs: List[str], table: str, schema) -> int:
+        files = "[" + ", ".join("'" + ref.replace("'", "''") + "'" for ref in refs) + "]"
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT * FROM read_parquet({files}) LIMIT 0")
+        self.conn.execute(f"INSERT INTO {table} BY NAME SELECT * FROM read_parquet({files})")
+        return sum(pq_rows(ref) for ref in refs)
+
+    def close(self):
+        self.conn.close()
+
+SQLITE_TYPES = {"int": "INTEGER", "uint": "INTEGER", "bool": "INTEGER", "float": "REAL", "double": "REAL",
+                "halffloat": "REAL", "decimal": "REAL"}
+
+def sqlite_type(arrow_type) -> str:
+    text = str(arrow_type)
+    for prefix, sql_type in SQLITE_TYPES.items():
+        if text.startswith(prefix):
+            return sql_type
+    if text.startswith(("binary", "large_binary")):
+        return "BLOB"
+    return "TEXT"
+
+class SQLiteTarget:
+    """Local SQLite file: one transaction of prepared INSERTs per load"""
+
+    name = "sqlite"
+    parallel_uploads = False
+
+    def __init__(self, path: str = ":memory:", batch_rows: int = 50_000):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.batch_rows = batch_rows
+
+    def upload(self, path: str, table: str) -> str:
+        return path
+
+    def copy(self, refs: List[str], table: str, schema) -> int:
+        import pyarrow.parquet as pq
+
+        columns = ", ".join(f'"{field.name}" {sqlite_type(field.type)}' for field in schema)
+        names = ", ".join(f'"{field.name}"' for field in schema)
+        statement = f"INSERT INTO {table} ({names}) VALUES ({', '.join('?' * len(schema))})"
+        rows = 0
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+            for ref in refs:
+                for batch in pq.ParquetFile(ref).iter_batches(batch_size=self.batch_rows):
+                    values = [_sqlite_values(column) for column in batch.columns]
+                    self.conn.executemany(statement, zip(*values))
+                    rows += batch.num_rows
+        return rows
+
+    def close(self):
+        self.conn.close()
+
+def _sqlite_values(column) -> List[Any]:
+    """Python values SQLite accepts (timestamps/dates as ISO text)"""
+    import pyarrow as pa
+
+    if pa.types.is_timestamp(column.type) or pa.types.is_date(column.type):
+        column = column.cast(pa.string())
+    return column.to_pylist()
+
+SNOWFLAKE_TYPES = {"int": "NUMBER", "uint": "NUMBER", "bool": "BOOLEAN", "float": "FLOAT", "double": "FLOAT",
+                   "halffloat": "FLOAT", "decimal": "FLOAT", "timestamp": "TIMESTAMP_NTZ", "date": "DATE",
+                   "string": "VARCHAR", "large_string": "VARCHAR", "binary": "BINARY", "large_binary": "BINARY"}
+
+def snowflake_type(arrow_type) -> str:
+    text = str(arrow_type)
+    for prefix, sql_type in SNOWFLAKE_TYPES.items():
+        if text.startswith(prefix):
+            return sql_type
+    return "VARIANT"  # lists, structs and maps
+
+def table_stage(table: str) -> str:
+    """Snowflake table stage: @%table, or @schema.%table / @db.schema.%table for qualified names"""
+    qualifier, _, name = table.rpartition(".")
+    return f"@{qualifier}.%{name}" if qualifier else f"@%{name}"
+
+class SnowflakeTarget:
+    """Files PUT to the table stage in parallel, then one COPY INTO"""
+
+    name = "snowflake"
+    parallel_uploads = True
+
+    def __init__(self, config: Dict[str, Any]):
+        import snowflake.connector
+
+        self.config = config
+        self.conn = snowflake.connector.connect(
+            account=config['account'],
+            user=config['user'],
+            password=config['password'],
+            warehouse=config['warehouse'],
+            database=config['database'],
+            schema=config['schema']
+        )
+
+    def prepare(self, table: str, schema):
+        """The table (and with it its table stage) must exist before the first PUT"""
+        columns = ", ".join(f'"{field.name}" {snowflake_type(field.type)}' for field in schema)
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+
+    def upload(self, path: str, table: str) -> str:
+        # One cursor per upload thread; PUT compresses nothing further (Parquet already is)
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"PUT 'file://{path}' {table_stage(table)} AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
+        return os.path.basename(path)
+
+    def copy(self, refs: List[str], table: str, schema) -> int:
+        files = ", ".join(f"'{ref}'" for ref in refs)
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"COPY INTO {table} FROM {table_stage(table)} FILES = ({files}) "
+                f"FILE_FORMAT = (TYPE = PARQUET) MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE PURGE = TRUE"
+            )
+            return sum(row[3] for row in cursor.fetchall() if len(row) > 3 and isinstance(row[3], int))
+
+    def close(self):
+        self.conn.close()
+
+class BigQueryTarget:
+    """One Parquet load job per staged file, started in parallel"""
+
+    name = "bigquery"
+    parallel_uploads = True
+
+    def __init__(self, config: Dict[str, Any]):
+        from google.cloud import bigquery
+
+        self.bigquery = bigquery
+        self.client = bigquery.Client(project=config.get('project'))
+        self.dataset = f"{config['project']}.{config['dataset']}"
+
+    def upload(self, path: str, table: str):
+        job_config = self.bigquery.LoadJobConfig(
+            source_format=self.bigquery.SourceFormat.PARQUET,
+            write_disposition=self.bigquery.WriteDisposition.WRITE_APPEND
+        )
+        with open(path, "rb") as f:
+            return self.client.load_table_from_file(f, f"{self.dataset}.{table}", job_config=job_config)
+
+    def copy(self, refs: List[Any], table: str, schema) -> int:
+        return sum(job.result().output_rows or 0 for job in refs)
+
+    def close(self):
+        self.client.close()
+
+def pq_rows(path: str) -> int:
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(path).metadata.num_rows
+
+def build_target(config: Dict[str, Any]):
+    kind = config['type']
+    if kind == 'duckdb':
+        return DuckDBTarget(config.get('path', ':memory:'))
+    if kind == 'sqlite':
+        return SQLiteTarget(config.get('path', ':memory:'))
+    if kind == 'snowflake':
+        return SnowflakeTarget(config)
+    if kind == 'bigquery':
+        return BigQueryTarget(config)
+    raise ValueError(f"Unsupported warehouse type: {kind} (duckdb, sqlite, snowflake, bigquery)")
+
+# ============ LOADER ============
+
+class BulkLoader:
+    """Stages data as Parquet and bulk-loads it into one target"""
+
+    def __init__(self, target, staging_dir: Optional[str] = None, rows_per_file: int = DEFAULT_ROWS_PER_FILE,
+                 upload_workers: int = 4, compression: str = "zstd", keep_staging: bool = False):
+        self.target = target
+        self.staging_dir = staging_dir
+        self.rows_per_file = rows_per_file
+        self.upload_workers = upload_workers
+        self.compression = compression
+        self.keep_staging = keep_staging
+
+    def load(self, data: Any, table: str) -> Dict[str, Any]:
+        """Stage, upload and bulk-load data into table"""
+        table = check_identifier(table)
+        started = time.perf_counter()
+        directory = tempfile.mkdtemp(prefix="stage_", dir=self.staging_dir)
+        try:
+            arrow_table = to_arrow(data)
+            if hasattr(self.target, "prepare"):
+                self.target.prepare(table, arrow_table.schema)
+            paths = stage_parquet(arrow_table, directory, self.rows_per_file, self.compression)
+            staged = time.perf_counter()
+            workers = min(self.upload_workers, len(paths)) if self.target.parallel_uploads else 1
+            if workers > 1:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warehouse-upload") as pool:
+                    refs = list(pool.map(lambda path: self.target.upload(path, table), paths))
+            else:
+                refs = [self.target.upload(path, table) for path in paths]
+            uploaded = time.perf_counter()
+            rows = self.target.copy(refs, table, arrow_table.schema) if arrow_table.num_rows else 0
+            size = sum(os.path.getsize(path) for path in paths)
+        finally:
+            if not self.keep_staging:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Loaded {rows} rows into {self.target.name}:{table} from {len(paths)} files in {elapsed:.2f}s")
+        return {
+            "target": self.target.name,
+            "table": table,
+            "rows": rows,
+            "files": len(paths),
+            "bytes": size,
+            "stage_s": round(staged - started, 3),
+            "upload_s": round(uploaded - staged, 3),
+            "copy_s": round(elapsed - (uploaded - started), 3),
+            "seconds": round(elapsed, 3),
+            "rows_per_s": round(rows / elapsed) if elapsed else rows
+        }
+
+def load_with_config(data: Any, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Connect to the configured target, load data into config['table'] and disconnect"""
+    target = build_target(config)
+    try:
+        loader = BulkLoader(
+            target,
+            staging_dir=config.get('staging_dir'),
+            rows_per_file=config.get('rows_per_file', DEFAULT_ROWS_PER_FILE),
+            upload_workers=config.get('upload_workers', 4)
+        )
+        return loader.load(data, config['table'])
+    finally:
+        target.close()
@@ -0,0 +1,314 @@
+# data_pipelines/orchestration/dag_executor.py
+"""
+In-process DAG executor for pipeline stages
+
+Every stage starts as soon as the stages it depends on have finished, so
+independent branches (two sources, or loads into two warehouses) run
+concurrently. Each stage runs where it fits:
+
+    async    coroutine functions, awaited on the event loop (extract, load)
+    thread   blocking functions, in asyncio.to_thread
+    process  CPU-bound Polars/DuckDB work, in a spawn-context process pool
+
+Arrow tables cross the process boundary as Arrow IPC files in a scratch
+directory (/dev/shm when available), never as pickles: the parent writes
+an input once, the worker memory-maps it, and the worker's result comes
+back the same way. A table that already lives in an IPC file (an earlier
+process stage, a cache hit) is handed over by path without being written
+again. Process stage functions must be importable module-level functions.
+
+Stages with inputs are cached: the key hashes the stage name, function,
+params and the digests of its inputs. Source stages are fingerprinted by
+content, other stages by their cache key, so an unchanged extract skips
+every cached stage downstream. Cached outputs (Arrow results only) are IPC
+files under cache_dir, memory-mapped on a hit.
+
+Usage:
+    executor = DAGExecutor(cache_dir=".dag_cache")
+    run = await executor.run([
+        Stage("extract", pipeline.extract_from_source, params={"source_type": "s3", "config": {...}}),
+        Stage("transform", polars_stage, deps=["extract"], kind="process", params={"transformations": [...]}),
+        Stage("load", pipeline.load_to_warehouse, deps=["transform"], params={"warehouse_config": {...}})
+    ])
+    run.outputs["transform"], run.stats
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGE_KINDS = ("async", "thread", "process")
+
+@dataclass
+class Stage:
+    """One node of the DAG; fn(*outputs of deps, **params)"""
+    name: str
+    fn: Callable[..., Any]
+    deps: List[str] = field(default_factory=list)
+    kind: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+    cache: Optional[bool] = None
+
+    def __post_init__(self):
+        if self.kind is None:
+            self.kind = "async" if inspect.iscoroutinefunction(self.fn) else "thread"
+        if self.kind not in STAGE_KINDS:
+            raise ValueError(f"Stage {self.name}: kind must be one of {STAGE_KINDS}")
+        if self.kind == "process" and inspect.iscoroutinefunction(self.fn):
+            raise ValueError(f"Stage {self.name}: coroutine functions cannot run in a process")
+        if self.cache is None:
+            # Sources (extract) must see fresh data every run
+            self.cache = bool(self.deps)
+
+class StageError(RuntimeError):
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"Stage {stage} failed: {error!r}")
+        self.stage = stage
+        self.error = error
+
+@dataclass
+class DAGRun:
+    outputs: Dict[str, Any]
+    stats: Dict[str, Dict[str, Any]]
+    seconds: float
+
+# ============ ARROW HANDOFF ============
+
+def as_arrow(value: Any) -> Optional[Any]:
+    """Arrow table for pandas/Polars/Arrow values, None for anything else"""
+    import pyarrow as pa
+
+    if isinstance(value, pa.Table):
+        return value
+    module = type(value).__module__.split(".")[0]
+    if module == "polars":
+        return (value.collect() if hasattr(value, "collect") else value).to_arrow()
+    if module == "pandas" and hasattr(value, "columns"):
+        return pa.Table.from_pandas(value, preserve_index=False)
+    return None
+
+def write_ipc(table, path: str) -> str:
+    import pyarrow as pa
+
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return path
+
+def read_ipc(path: str):
+    """Memory-mapped table; its buffers stay valid after the file is unlinked"""
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+class _HashSink:
+    """Write-only file that feeds everything written to it into a hash"""
+
+    closed = False
+
+    def __init__(self, hasher):
+        self.hasher = hasher
+
+    def write(self, data) -> int:
+        self.hasher.update(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+def fingerprint(value: Any) -> str:
+    """Content hash of a table or of any other value
+
+    A table is hashed as the IPC stream of its rechunked copy: raw chunk
+    buffers would ignore slice offsets (two slices of one table share
+    them) and depend on how the rows happen to be chunked.
+    """
+    import pyarrow as pa
+
+    hasher = hashlib.blake2b(digest_size=16)
+    table = as_arrow(value)
+    if table is None:
+        hasher.update(json.dumps(value, sort_keys=True, default=_json_default).encode())
+        return hasher.hexdigest()
+    table = table.combine_chunks()
+    with pa.ipc.new_stream(pa.PythonFile(_HashSink(hasher), mode="w"), table.schema) as writer:
+        writer.write_table(table)
+    return hasher.hexdigest()
+
+def _json_default(value: Any) -> str:
+    if as_arrow(value) is not None:
+        return fingerprint(value)
+    return repr(value)
+
+def _run_in_process(fn: Callable[..., Any], inputs: List[tuple], params: Dict[str, Any], out_path: str):
+    """Worker side: map inputs, run fn, write an Arrow result to out_path"""
+    args = [read_ipc(value) if kind == "ipc" else value for kind, value in inputs]
+    result = fn(*args, **params)
+    table = as_arrow(result)
+    if table is None:
+        return "value", result
+    return "ipc", write_ipc(table, out_path)
+
+def _scratch_root() -> Optional[str]:
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+# ============ EXECUTOR ============
+
+class DAGExecutor:
+    """Runs Stage graphs; reusable across runs (the process pool is kept)"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_processes: Optional[int] = None,
+                 scratch_dir: Optional[str] = None):
+        self.cache_dir = cache_dir
+        self.max_processes = max_processes or max(1, min(4, os.cpu_count() or 1))
+        self.scratch_dir = scratch_dir or _scratch_root()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a parent with Polars/DuckDB thread pools running can deadlock
+            self._pool = ProcessPoolExecutor(max_workers=self.max_processes,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    @staticmethod
+    def order(stages: List[Stage]) -> List[Stage]:
+        """Topological order; unknown dependencies and cycles raise ValueError"""
+        by_name = {stage.name: stage for stage in stages}
+        if len(by_name) != len(stages):
+            raise ValueError("Stage names must be unique")
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in by_name]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+        ordered, state = [], {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Cycle in DAG: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in by_name[name].deps:
+                visit(dep, path + [name])
+            state[name] = "done"
+            ordered.append(by_name[name])
+
+        for stage in stages:
+            visit(stage.name, [])
+        return ordered
+
+    def cache_key(self, stage: Stage, input_digests: List[str]) -> str:
+        hasher = hashlib.blake2b(digest_size=16)
+        hasher.update(stage.name.encode())
+        hasher.update(f"{getattr(stage.fn, '__module__', '')}.{getattr(stage.fn, '__qualname__', '')}".encode())
+        hasher.update(json.dumps(stage.params, sort_keys=True, default=_json_default).encode())
+        for digest in input_digests:
+            hasher.update(digest.encode())
+        return hasher.hexdigest()
+
+    async def run(self, stages: List[Stage]) -> DAGRun:
+        """Run every stage, each as soon as its dependencies are done"""
+        ordered = self.order(stages)
+        started = time.perf_counter()
+        scratch = tempfile.mkdtemp(prefix="dag_", dir=self.scratch_dir)
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        outputs: Dict[str, Any] = {}
+        ipc_paths: Dict[str, str] = {}
+        digests: Dict[str, str] = {}
+        stats: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def execute(stage: Stage):
+            await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+            stage_started = time.perf_counter()
+            key = self.cache_key(stage, [digests[dep] for dep in stage.deps])
+            cache_path = os.path.join(self.cache_dir, f"{key}.arrow") if self.cache_dir and stage.cache else None
+            cached = cache_path is not None and os.path.exists(cache_path)
+            try:
+                if cached:
+                    result, path = read_ipc(cache_path), cache_path
+                else:
+                    result, path = await self._execute(stage, outputs, ipc_paths, scratch, cache_path)
+            except Exception as e:
+                raise StageError(stage.name, e) from e
+
+            outputs[stage.name] = result
+            if path:
+                ipc_paths[stage.name] = path
+            digests[stage.name] = key if stage.deps else fingerprint(result)
+            table = as_arrow(result)
+            stats[stage.name] = {
+                "kind": stage.kind,
+                "cached": cached,
+                "rows": table.num_rows if table is not None else None,
+                "seconds": round(time.perf_counter() - stage_started, 4)
+            }
+            logger.info(f"Stage {stage.name} ({stage.kind}) {'cache hit' if cached else 'done'} "
+                        f"in {stats[stage.name]['seconds']}s")
+
+        try:
+            for stage in ordered:
+                tasks[stage.name] = asyncio.create_task(execute(stage), name=f"stage:{stage.name}")
+            try:
+                await asyncio.gather(*tasks.values())
+            except BaseException:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+                raise
+        finally:
+            # Results read from scratch files stay valid: they are memory-mapped
+            shutil.rmtree(scratch, ignore_errors=True)
+        return DAGRun(outputs=outputs, stats=stats, seconds=round(time.perf_counter() - started, 4))
+
+    async def _execute(self, stage: Stage, outputs: Dict[str, Any], ipc_paths: Dict[str, str],
+                       scratch: str, cache_path: Optional[str]):
+        """(result, IPC path or None) for one stage that missed the cache"""
+        args = [outputs[dep] for dep in stage.deps]
+        if stage.kind == "process":
+            inputs = []
+            for dep, value in zip(stage.deps, args):
+                if dep not in ipc_paths and as_arrow(value) is not None:
+                    ipc_paths[dep] = write_ipc(as_arrow(value), os.path.join(scratch, f"{dep}.arrow"))
+                inputs.append(("ipc", ipc_paths[dep]) if dep in ipc_paths else ("value", value))
+            out_path = cache_path or os.path.join(scratch, f"{stage.name}.arrow")
+            loop = asyncio.get_running_loop()
+            kind, value = await loop.run_in_executor(self.pool, _run_in_process, stage.fn, inputs, stage.params,
+                                                     out_path)
+            return (read_ipc(value), value) if kind == "ipc" else (value, None)
+
+        if stage.kind == "async":
+            result = await stage.fn(*args, **stage.params)
+        else:
+            result = await asyncio.to_thread(stage.fn, *args, **stage.params)
+        table = as_arrow(result)
+        if table is not None:
+            result = table
+            if cache_path:
+                return result, write_ipc(table, cache_path)
+        return result, None
@@ -0,0 +1,174 @@
+# data_pipelines/orchestration/duckdb_runtime.py
+"""
+Lazily created DuckDB database with a small connection pool
+
+Nothing is opened at construction: the database (in memory, or an on-disk
+file for intermediate tables that should survive restarts) is created on
+the first checkout. Each checkout hands out a cursor of that one database,
+so callers in different threads share tables and loaded extensions but not
+temporary views or registered frames.
+
+Extensions are never installed up front. Parquet and JSON are built into
+DuckDB; httpfs (s3://, gs://, http(s)://, hf://) and azure (az://, abfss://)
+are loaded the first time a remote path is read. A missing extension is
+installed only when the runtime is not offline; offline, or with
+DUCKDB_EXTENSION_DIRECTORY pointing at a pre-populated directory baked
+into the image, nothing touches the network.
+
+Environment:
+    PIPELINE_DUCKDB_PATH        database file (default :memory:)
+    PIPELINE_DUCKDB_POOL_SIZE   concurrent checkouts (default 4)
+    PIPELINE_DUCKDB_THREADS     DuckDB worker threads (default: DuckDB's choice)
+    DUCKDB_EXTENSION_DIRECTORY  where extensions are loaded/installed from
+    DUCKDB_OFFLINE              1 = never INSTALL, fail with a clear error instead
+
+Usage:
+    runtime = DuckDBRuntime("pipeline.duckdb")
+    with runtime.connection() as conn:
+        conn.execute("SELECT 42").fetchall()
+    runtime.cache_table("daily_topics", frame)     # kept across restarts
+"""
+
+import logging
+import os
+import queue
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Set
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+REMOTE_EXTENSIONS = {
+    "s3": "httpfs", "s3a": "httpfs", "s3n": "httpfs", "r2": "httpfs", "gs": "httpfs", "gcs": "httpfs",
+    "http": "httpfs", "https": "httpfs", "hf": "httpfs",
+    "az": "azure", "azure": "azure", "abfss": "azure"
+}
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def remote_extension(path: str) -> Optional[str]:
+    """Extension needed to read path, or None for local files"""
+    scheme, sep, _ = path.partition("://")
+    return REMOTE_EXTENSIONS.get(scheme.lower()) if sep else None
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").lower() in ("1", "true", "yes", "on")
+
+class DuckDBRuntime:
+    """One DuckDB database per runtime, opened on first use"""
+
+    def __init__(self, path: Optional[str] = None, pool_size: Optional[int] = None,
+                 threads: Optional[int] = None, extension_directory: Optional[str] = None,
+                 offline: Optional[bool] = None):
+        self.path = path or os.getenv("PIPELINE_DUCKDB_PATH", ":memory:")
+        self.pool_size = pool_size or int(os.getenv("PIPELINE_DUCKDB_POOL_SIZE", "4"))
+        self.threads = threads or (int(os.getenv("PIPELINE_DUCKDB_THREADS")) if os.getenv("PIPELINE_DUCKDB_THREADS")
+                                   else None)
+        self.extension_directory = extension_directory or os.getenv("DUCKDB_EXTENSION_DIRECTORY")
+        self.offline = _env_flag("DUCKDB_OFFLINE") if offline is None else offline
+        self._lock = threading.Lock()
+        self._database = None
+        self._idle: "queue.LifoQueue" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self.loaded_extensions: Set[str] = set()
+
+    @property
+    def opened(self) -> bool:
+        return self._database is not None
+
+    def _open(self):
+        with self._lock:
+            if self._database is None:
+                if self.path != ":memory:":
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                # Extensions are loaded explicitly (ensure_extension), never fetched behind our back
+                config = {"autoinstall_known_extensions": False, "autoload_known_extensions": False}
+                if self.extension_directory:
+                    config["extension_directory"] = self.extension_directory
+                if self.threads:
+                    config["threads"] = self.threads
+                self._database = duckdb.connect(self.path, config=config)
+                logger.info(f"Opened DuckDB database {self.path}")
+            return self._database
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Check out a cursor; at most pool_size are out at once"""
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open().cursor()
+            try:
+                yield conn
+            except Exception:
+                # A failed statement may leave a transaction open; don't hand that cursor out again
+                conn.close()
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    # ============ EXTENSIONS ============
+
+    def ensure_extension(self, name: str):
+        """LOAD name, installing it first only when allowed"""
+        if name in self.loaded_extensions:
+            return
+        with self.connection() as conn:
+            try:
+                conn.execute(f"LOAD {name}")
+            except duckdb.IOException:
+                if self.offline:
+                    raise RuntimeError(
+                        f"DuckDB extension {name} is not installed and DUCKDB_OFFLINE is set; "
+                        f"install it into {self.extension_directory or '~/.duckdb/extensions'} at build time"
+                    ) from None
+                logger.info(f"Installing DuckDB extension {name}")
+                conn.execute(f"INSTALL {name}")
+                conn.execute(f"LOAD {name}")
+        self.loaded_extensions.add(name)
+
+    def ensure_remote(self, path: str):
+        """Load whatever extension reading path requires (nothing for local files)"""
+        extension = remote_extension(path)
+        if extension:
+            self.ensure_extension(extension)
+
+    # ============ CACHED TABLES ============
+
+    def cache_table(self, name: str, source: Any):
+        """Store a query result (SQL string) or a frame/Arrow table as table name, replacing it"""
+        if not _IDENTIFIER.match(name):
+            raise ValueError(f"Invalid table name: {name!r}")
+        with self.connection() as conn:
+            if isinstance(source, str):
+                conn.execute(f"CREATE OR REPLACE TABLE {name} AS {source}")
+                return
+            conn.register("_cache_source", source)
+            try:
+                conn.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM _cache_source")
+            finally:
+                conn.unregister("_cache_source")
+
+    def cached_table(self, name: str) -> Optional[Any]:
+        """Arrow table of a cached table, or None if it was never stored"""
+        if not _IDENTIFIER.match(name):
+            raise ValueError(f"Invalid table name: {name!r}")
+        with self.connection() as conn:
+            exists = conn.execute(
+                "SELECT count(*) FROM duckdb_tables() WHERE table_name = ? AND NOT temporary", [name]
+            ).fetchone()[0]
+            return conn.execute(f"SELECT * FROM {name}").to_arrow_table() if exists else None
+
+    def close(self):
+        with self._lock:
+            while not self._idle.empty():
+                self._idle.get_nowait().close()
+            if self._database is not None:
+                self._database.close()
+                self._database = None
+            self.loaded_extensions.clear()
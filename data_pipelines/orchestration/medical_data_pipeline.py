@@ -2,33 +2,59 @@
 """
 ETL Pipeline for Medical Data Processing
 Supports: Pandas, Polars, DuckDB for data transformations
+
+Importing this module opens nothing: DuckDB is created on first use by
+DuckDBRuntime (see duckdb_runtime.py for PIPELINE_DUCKDB_PATH and offline
+extension handling) and the module-level data_pipeline is built on first
+access.
 """
 
 import pandas as pd
 import polars as pl
 import duckdb
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
 import asyncio
-from kafka import KafkaProducer, KafkaConsumer
 import json
 import logging
 
+from data_pipelines.ingestion.kafka_batches import KafkaMicroBatcher
+from data_pipelines.load.warehouse_loader import load_with_config
+from data_pipelines.orchestration.dag_executor import DAGExecutor, DAGRun, Stage
+from data_pipelines.orchestration.duckdb_runtime import DuckDBRuntime
+from data_pipelines.transform.polars_plan import build_plan
+
 logger = logging.getLogger(__name__)
 
+def polars_stage(data: Any, transformations: List[Dict]) -> Any:
+    """Process-pool DAG stage: lazy Polars plan over an Arrow table"""
+    return build_plan(data, transformations).collect().to_arrow()
+
+def duckdb_stage(data: Any, query: str) -> Any:
+    """Process-pool DAG stage: DuckDB query over temp_data, Arrow in and out"""
+    conn = duckdb.connect()
+    try:
+        conn.register('temp_data', data)
+        return conn.execute(query).to_arrow_table()
+    finally:
+        conn.close()
+
 class MedicalDataPipeline:
     """Enterprise data pipeline for medical data processing"""
     
-    def __init__(self):
-        self.duckdb_conn = duckdb.connect(':memory:')
-        self._setup_duckdb_extensions()
-        
-    def _setup_duckdb_extensions(self):
-        """Setup DuckDB extensions for advanced analytics"""
-        self.duckdb_conn.execute("INSTALL httpfs")
-        self.duckdb_conn.execute("LOAD httpfs")
-        self.duckdb_conn.execute("INSTALL parquet")
-        self.duckdb_conn.execute("LOAD parquet")
+    def __init__(self, duckdb_path: Optional[str] = None, runtime: Optional[DuckDBRuntime] = None):
+        # No connection or extension install here; both happen on first use
+        self.duckdb = runtime or DuckDBRuntime(duckdb_path)
+        self._kafka_batchers: Dict[tuple, KafkaMicroBatcher] = {}
+        self._dag_executor: Optional[DAGExecutor] = None
+    
+    def close(self):
+        for batcher in self._kafka_batchers.values():
+            batcher.close()
+        self._kafka_batchers.clear()
+        if self._dag_executor is not None:
+            self._dag_executor.close()
+        self.duckdb.close()
     
     async def extract_from_source(self, source_type: str, config: Dict) -> pd.DataFrame:
         """Extract data from various sources"""
@@ -45,117 +71,104 @@ class MedicalDataPipeline:
     
     async def _extract_from_s3(self, config: Dict) -> pd.DataFrame:
         """Extract data from AWS S3"""
-        import boto3
-        s3 = boto3.client('s3')
-        
-        bucket = config['bucket']
-        key = config['key']
-        
-        # Use DuckDB to query S3 files directly
-        query = f"SELECT * FROM read_parquet('s3://{bucket}/{key}')"
-        result = self.duckdb_conn.execute(query).fetchdf()
-        return result
-    
-    async def _extract_from_kafka(self, config: Dict) -> pd.DataFrame:
-        """Extract data from Kafka streams"""
-        consumer = KafkaConsumer(
-            config['topic'],
-            bootstrap_servers=config['bootstrap_servers'],
-            value_deserializer=lambda x: json.loads(x.decode('utf-8'))
-        )
-        
-        messages = []
-        for msg in consumer:
-            messages.append(msg.value)
-            if len(messages) >= config.get('batch_size', 100):
-                break
+        url = f"s3://{config['bucket']}/{config['key']}"
         
-        return pd.DataFrame(messages)
+        # Use DuckDB to query S3 files directly; httpfs is loaded on the first remote read
+        self.duckdb.ensure_remote(url)
+        with self.duckdb.connection() as conn:
+            return conn.execute(f"SELECT * FROM read_parquet('{url}')").fetchdf()
     
-    def transform_with_polars(self, df: pd.DataFrame, transformations: List[Dict]) -> pl.DataFrame:
-        """Transform data using Polars for high performance"""
-        pl_df = pl.from_pandas(df)
-        
-        for transform in transformations:
-            if transform['type'] == 'filter':
-                pl_df = pl_df.filter(eval(f"pl_df.{transform['condition']}"))
-            elif transform['type'] == 'aggregate':
-                pl_df = pl_df.group_by(transform['group_by']).agg(
-                    [pl.col(col).mean().alias(f"{col}_mean") for col in transform['columns']]
-                )
-            elif transform['type'] == 'join':
-                other_df = transform['other_df']
-                pl_df = pl_df.join(other_df, on=transform['on'], how=transform['how'])
-            elif transform['type'] == 'window':
-                pl_df = pl_df.with_columns([
-                    pl.col(col).rolling_mean(window_size=transform['window']).alias(f"{col}_rolling_mean")
-                    for col in transform['columns']
-                ])
-        
-        return pl_df
+    def _kafka_batcher(self, config: Dict) -> KafkaMicroBatcher:
+        """One long-lived consumer per (topic, servers, group), reused across extractions"""
+        key = (config['topic'], str(config['bootstrap_servers']), config.get('group_id', 'healthbot-pipeline'))
+        if key not in self._kafka_batchers:
+            self._kafka_batchers[key] = KafkaMicroBatcher(
+                [config['topic']],
+                config['bootstrap_servers'],
+                group_id=key[2],
+                max_records=config.get('batch_size', 10_000),
+                max_wait_s=config.get('max_wait_s', 1.0)
+            )
+        return self._kafka_batchers[key]
     
-    def analyze_with_duckdb(self, data: pl.DataFrame, analysis_query: str) -> Any:
-        """Perform advanced analytics using DuckDB"""
-        # Register DataFrame as temporary table
-        self.duckdb_conn.register('temp_data', data.to_pandas())
+    async def _extract_from_kafka(self, config: Dict) -> pd.DataFrame:
+        """Extract one count/time window from Kafka
         
-        # Execute analysis query
-        result = self.duckdb_conn.execute(analysis_query).fetchdf()
-        return result
+        Nothing is committed here: call commit_kafka once the window is
+        loaded. A window extracted earlier but never committed (its load
+        failed) is delivered again.
+        """
+        batcher = self._kafka_batcher(config)
+        await asyncio.to_thread(batcher.rewind)
+        table = await asyncio.to_thread(batcher.poll_batch)
+        return table.to_pandas() if table is not None else pd.DataFrame()
     
-    async def load_to_warehouse(self, data: pd.DataFrame, warehouse_config: Dict):
-        """Load data to cloud data warehouse"""
-        warehouse_type = warehouse_config['type']
-        
-        if warehouse_type == 'bigquery':
-            await self._load_to_bigquery(data, warehouse_config)
-        elif warehouse_type == 'snowflake':
-            await self._load_to_snowflake(data, warehouse_config)
-        elif warehouse_type == 'redshift':
-            await self._load_to_redshift(data, warehouse_config)
-        elif warehouse_type == 'databricks':
-            await self._load_to_databricks(data, warehouse_config)
+    async def commit_kafka(self, *loaded: Any, config: Dict):
+        """Commit the Kafka windows extracted with this config; loaded are the
+        outputs of the stages that must finish first (the DAG's loads)"""
+        await asyncio.to_thread(self._kafka_batcher(config).commit)
+        return loaded
     
-    async def _load_to_bigquery(self, data: pd.DataFrame, config: Dict):
-        """Load data to Google BigQuery"""
-        from google.cloud import bigquery
-        
-        client = bigquery.Client()
-        table_id = f"{config['project']}.{config['dataset']}.{config['table']}"
-        
-        job = client.load_table_from_dataframe(data, table_id)
-        job.result()  # Wait for job to complete
-        
-        logger.info(f"Loaded {len(data)} rows to BigQuery")
+    async def stream_from_kafka(self, config: Dict) -> AsyncIterator[Any]:
+        """Continuous stage: Arrow tables per window, each committed once the next one is requested"""
+        batcher = self._kafka_batcher(config)
+        while True:
+            await asyncio.to_thread(batcher.commit)
+            table = await asyncio.to_thread(batcher.poll_batch)
+            if table is not None:
+                yield table
     
-    async def _load_to_snowflake(self, data: pd.DataFrame, config: Dict):
-        """Load data to Snowflake"""
-        import snowflake.connector
-        
-        conn = snowflake.connector.connect(
-            account=config['account'],
-            user=config['user'],
-            password=config['password'],
-            warehouse=config['warehouse'],
-            database=config['database'],
-            schema=config['schema']
-        )
+    async def _extract_from_database(self, config: Dict) -> pd.DataFrame:
+        """Incrementally export a MongoDB collection to Parquet, then query the files with DuckDB
         
-        cursor = conn.cursor()
+        config: collection, export_dir (default exports), optional query over
+        the `source` view, mongo_uri, database, settle_seconds
+        """
+        from data_pipelines.export.mongo_parquet import ParquetExporter, parquet_glob
+        from database.mongodb.pool import connection_manager
         
-        # Write data to staging table
-        staging_table = f"{config['schema']}.{config['table']}_staging"
-        cursor.execute(f"CREATE OR REPLACE TABLE {staging_table} AS SELECT * FROM {config['table']} LIMIT 0")
+        root = config.get('export_dir', 'exports')
+        database = connection_manager.database(config.get('database'), config.get('mongo_uri'))
+        exporter = ParquetExporter(database, root, settle=timedelta(seconds=config.get('settle_seconds', 300)))
+        await asyncio.to_thread(exporter.export, config['collection'])
         
-        # Use COPY command or write in batches
-        for chunk in np.array_split(data, len(data)//1000 + 1):
-            cursor.executemany(
-                f"INSERT INTO {staging_table} VALUES ({','.join(['%s']*len(data.columns))})",
-                chunk.values.tolist()
+        files = parquet_glob(root, config['collection'])
+        self.duckdb.ensure_remote(files)
+        with self.duckdb.connection() as conn:
+            conn.execute(
+                f"CREATE OR REPLACE TEMP VIEW source AS SELECT * FROM read_parquet('{files}', hive_partitioning=true)"
             )
+            return conn.execute(config.get('query', 'SELECT * FROM source')).fetchdf()
+    
+    def transform_with_polars(self, df: Any, transformations: List[Dict],
+                              lazy: bool = False) -> Union[pl.DataFrame, pl.LazyFrame]:
+        """Transform data with one lazy Polars plan built from a declarative spec
         
-        cursor.close()
-        conn.close()
+        df may be a pandas/Polars frame, an Arrow table or a Parquet path
+        (filters and projections are then pushed into the scan). See
+        data_pipelines/transform/polars_plan.py for the spec format.
+        """
+        plan = build_plan(df, transformations)
+        return plan if lazy else plan.collect()
+    
+    def analyze_with_duckdb(self, data: Any, analysis_query: str) -> Any:
+        """Perform advanced analytics using DuckDB"""
+        # Arrow buffers are scanned in place, no pandas round trip
+        if isinstance(data, pl.LazyFrame):
+            data = data.collect()
+        if isinstance(data, pl.DataFrame):
+            data = data.to_arrow()
+        with self.duckdb.connection() as conn:
+            conn.register('temp_data', data)
+            try:
+                return conn.execute(analysis_query).fetchdf()
+            finally:
+                conn.unregister('temp_data')
+    
+    async def load_to_warehouse(self, data: Any, warehouse_config: Dict) -> Dict[str, Any]:
+        """Bulk-load data to a warehouse through Parquet staging files (see warehouse_loader)"""
+        # Connecting and closing block too, so the whole load runs off the event loop
+        return await asyncio.to_thread(load_with_config, data, warehouse_config)
     
     def create_dbt_model(self, model_name: str, sql_query: str):
         """Create dbt model for transformations"""
@@ -188,9 +201,55 @@ models:
         with open(f"data_pipelines/transformations/{model_name}.yml", 'w') as f:
             f.write(model_yaml)
     
+    def dag_stages(self, dag_config: Dict) -> List[Stage]:
+        """extract -> transform [-> analyze] -> load per warehouse [-> commit for Kafka]
+        
+        dag_config: source_type, source_config, transformations, optional
+        analysis_query, warehouse_config (one config or a list; loads into
+        several warehouses run concurrently)
+        """
+        stages = [
+            Stage('extract', self.extract_from_source,
+                  params={'source_type': dag_config['source_type'], 'config': dag_config['source_config']}),
+            Stage('transform', polars_stage, deps=['extract'], kind='process',
+                  params={'transformations': dag_config.get('transformations', [])})
+        ]
+        last = 'transform'
+        if dag_config.get('analysis_query'):
+            stages.append(Stage('analyze', duckdb_stage, deps=['transform'], kind='process',
+                                params={'query': dag_config['analysis_query']}))
+            last = 'analyze'
+        warehouses = dag_config.get('warehouse_config') or []
+        if isinstance(warehouses, dict):
+            warehouses = [warehouses]
+        loads = []
+        for index, warehouse_config in enumerate(warehouses):
+            name = 'load' if len(warehouses) == 1 else f"load_{warehouse_config['type']}_{index}"
+            stages.append(Stage(name, self.load_to_warehouse, deps=[last], cache=False,
+                                params={'warehouse_config': warehouse_config}))
+            loads.append(name)
+        if dag_config['source_type'] == 'kafka':
+            # Offsets advance only after every load succeeded; a failed run re-reads the window
+            stages.append(Stage('commit', self.commit_kafka, deps=loads or [last], cache=False,
+                                params={'config': dag_config['source_config']}))
+        return stages
+    
+    async def run_dag(self, dag_config: Dict) -> DAGRun:
+        """Run extract -> transform -> load in-process (see dag_executor.py); no Airflow needed
+        
+        CPU-bound stages run in a process pool and receive Arrow tables as
+        memory-mapped IPC files; transform/analyze outputs are cached under
+        dag_config['cache_dir'] (default .dag_cache) keyed by input hash.
+        """
+        if self._dag_executor is None:
+            self._dag_executor = DAGExecutor(cache_dir=dag_config.get('cache_dir', '.dag_cache'),
+                                             max_processes=dag_config.get('max_processes'))
+        return await self._dag_executor.run(self.dag_stages(dag_config))
+    
     def run_airflow_dag(self, dag_config: Dict):
-        """Generate Airflow DAG configuration"""
+        """Generate Airflow DAG configuration (run_dag runs the same pipeline in-process)"""
         dag_code = f'''
+import asyncio
 from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python_operator import PythonOperator
@@ -219,13 +278,14 @@ def extract_task(**context):
     """Extract data from source"""
     from data_pipelines.orchestration.medical_data_pipeline import MedicalDataPipeline
     pipeline = MedicalDataPipeline()
-    data = await pipeline.extract_from_source('{dag_config['source_type']}', {dag_config['source_config']})
+    data = asyncio.run(pipeline.extract_from_source('{dag_config['source_type']}', {dag_config['source_config']}))
     return data
 
 def transform_task(**context):
     """Transform data"""
     ti = context['ti']
     data = ti.xcom_pull(task_ids='extract')
+    from data_pipelines.orchestration.medical_data_pipeline import MedicalDataPipeline
     pipeline = MedicalDataPipeline()
     transformed = pipeline.transform_with_polars(data, {dag_config['transformations']})
     return transformed
@@ -234,8 +294,9 @@ def load_task(**context):
     """Load to warehouse"""
     ti = context['ti']
     data = ti.xcom_pull(task_ids='transform')
+    from data_pipelines.orchestration.medical_data_pipeline import MedicalDataPipeline
     pipeline = MedicalDataPipeline()
-    await pipeline.load_to_warehouse(data, {dag_config['warehouse_config']})
+    asyncio.run(pipeline.load_to_warehouse(data, {dag_config['warehouse_config']}))
 
 extract = PythonOperator(
     task_id='extract',
@@ -266,5 +327,13 @@ extract >> transform >> load
         
         return dag_code
 
-# Initialize pipeline
-data_pipeline = MedicalDataPipeline()
+# Initialize pipeline on first access (module __getattr__), not at import
+_data_pipeline: Optional[MedicalDataPipeline] = None
+
+def __getattr__(name: str):
+    global _data_pipeline
+    if name == "data_pipeline":
+        if _data_pipeline is None:
+            _data_pipeline = MedicalDataPipeline()
+        return _data_pipeline
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
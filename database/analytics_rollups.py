@@ -0,0 +1,250 @@
+# database/analytics_rollups.py
+"""
+Precomputed analytics rollups, maintained incrementally at write time
+
+One small document per hour, per day and one all-time total:
+    {_id: "d:2026-01-31", granularity: "day", period: <start>,
+     users, conversations, messages, chat_requests, medical_queries,
+     feedback_count, rating_sum, active_users}
+Writers $inc the three documents in one unordered bulk_write, so dashboard
+queries read O(days) tiny documents instead of counting whole collections.
+_ids sort chronologically within a granularity, so range reads use the _id
+index and the rollups need no secondary index.
+
+Active users are distinct, so they cannot simply be incremented: a marker
+{_id: "d:2026-01-31:<user_id>"} is upserted per (user, day) and per
+(user, hour), and active_users is incremented only when the upsert created
+it. Markers already written by this process are remembered, so steady-state
+traffic does not pay for them. Distinct users over a window of several days
+are estimated by merging HyperLogLog sketches (database/hyperloglog.py), so
+the cost stays O(days) however many users were active.
+
+Usage (backfill from existing collections):
+    python -m database.analytics_rollups --rebuild
+"""
+
+import argparse
+import os
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ASCENDING, UpdateOne
+
+from database.hyperloglog import UniqueUserSketches
+
+COUNTERS = ("users", "conversations", "messages", "chat_requests", "medical_queries",
+            "feedback_count", "rating_sum", "active_users")
+HOUR, DAY, ALL = "hour", "day", "all"
+ALL_TIME_ID = "all"
+# Hour markers only matter during their hour; day markers back window queries
+MARKER_TTL = {HOUR: timedelta(days=2), DAY: timedelta(days=400)}
+
+def period_key(granularity: str, at: datetime) -> Tuple[str, datetime]:
+    """(_id, period start) of the rollup document covering at"""
+    if granularity == HOUR:
+        start = at.replace(minute=0, second=0, microsecond=0)
+        return f"h:{start:%Y-%m-%dT%H}", start
+    if granularity == DAY:
+        start = at.replace(hour=0, minute=0, second=0, microsecond=0)
+        return f"d:{start:%Y-%m-%d}", start
+    return ALL_TIME_ID, datetime(1970, 1, 1)
+
+def parse_timestamp(value: Any) -> datetime:
+    """Event timestamps arrive as datetimes or ISO strings (Kafka)"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError:
+            pass
+    return datetime.utcnow()
+
+class AnalyticsRollups:
+    """Hourly, daily and all-time counters with exact active-user counts"""
+
+    def __init__(self, database, collection: str = "analytics_rollups",
+                 markers: str = "analytics_active_users", seen_cache: int = 50_000):
+        self.collection = database[collection]
+        self.markers = database[markers]
+        self.sketches = UniqueUserSketches(database)
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+        self._seen_limit = seen_cache
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self):
+        self.markers.create_index([("expires_at", ASCENDING)], name="idx_active_marker_ttl", expireAfterSeconds=0)
+        self.sketches.ensure_indexes()
+
+    def flush(self):
+        """Persist buffered distinct-user sketches"""
+        self.sketches.flush()
+
+    # ============ WRITES ============
+
+    def _new_markers(self, events: List[Tuple[datetime, Dict[str, float], Optional[str]]]) -> List[Tuple[str, datetime]]:
+        """Upsert (user, hour/day) markers not seen yet; returns the periods that gained a user"""
+        candidates = {}
+        for at, _, user_id in events:
+            if not user_id:
+                continue
+            for granularity in (HOUR, DAY):
+                key, start = period_key(granularity, at)
+                marker_id = f"{key}:{user_id}"
+                with self._lock:
+                    seen = marker_id in self._seen
+                if not seen:
+                    candidates[marker_id] = (granularity, key, start, user_id)
+        if not candidates:
+            return []
+
+        ids = list(candidates)
+        result = self.markers.bulk_write([
+            UpdateOne(
+                {"_id": marker_id},
+                {"$setOnInsert": {
+                    "user_id": candidates[marker_id][3],
+                    "period": candidates[marker_id][2],
+                    "expires_at": candidates[marker_id][2] + MARKER_TTL[candidates[marker_id][0]]
+                }},
+                upsert=True
+            )
+            for marker_id in ids
+        ], ordered=False)
+
+        with self._lock:
+            for marker_id in ids:
+                self._seen[marker_id] = None
+            while len(self._seen) > self._seen_limit:
+                self._seen.popitem(last=False)
+        return [(candidates[ids[index]][1], candidates[ids[index]][2]) for index in result.upserted_ids]
+
+    def record_many(self, events: Iterable[Tuple[datetime, Dict[str, float], Optional[str]]]):
+        """Fold (timestamp, counters, user_id) events into the rollups with one bulk write"""
+        events = list(events)
+        increments: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        periods: Dict[str, Tuple[str, datetime]] = {}
+
+        def add(key: str, granularity: str, start: datetime, field: str, amount: float):
+            increments[key][field] += amount
+            periods[key] = (granularity, start)
+
+        for at, counters, user_id in events:
+            if user_id:
+                self.sketches.add(user_id, at)
+            for granularity in (HOUR, DAY, ALL):
+                key, start = period_key(granularity, at)
+                for field, amount in counters.items():
+                    if amount:
+                        add(key, granularity, start, field, amount)
+
+        for key, start in self._new_markers(events):
+            add(key, HOUR if key.startswith("h:") else DAY, start, "active_users", 1)
+
+        if not increments:
+            return
+        self.collection.bulk_write([
+            UpdateOne(
+                {"_id": key},
+                {"$inc": dict(fields), "$setOnInsert": {"granularity": periods[key][0], "period": periods[key][1]}},
+                upsert=True
+            )
+            for key, fields in increments.items()
+        ], ordered=False)
+
+    def record(self, counters: Dict[str, float], at: Optional[datetime] = None, user_id: Optional[str] = None):
+        self.record_many([(at or datetime.utcnow(), counters, user_id)])
+
+    def record_active(self, user_id: str, at: Optional[datetime] = None):
+        self.record_many([(at or datetime.utcnow(), {}, user_id)])
+
+    # ============ READS ============
+
+    def series(self, granularity: str = DAY, days: int = 30, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Rollup documents covering the last days, oldest first"""
+        until = until or datetime.utcnow()
+        first, _ = period_key(granularity, until - timedelta(days=days))
+        last, _ = period_key(granularity, until)
+        return list(self.collection.find({"_id": {"$gte": first, "$lte": last}}).sort("_id", ASCENDING))
+
+    def unique_users(self, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Estimated distinct users in [start, end) at hour resolution, with error bounds"""
+        return self.sketches.unique_users(start, end)
+
+    def active_users(self, days: int = 30, until: Optional[datetime] = None) -> int:
+        """Distinct users active on the days covered by totals(days, until) (HyperLogLog estimate)"""
+        until = until or datetime.utcnow()
+        _, first = period_key(DAY, until - timedelta(days=days))
+        _, last = period_key(DAY, until)
+        return self.unique_users(first, last + timedelta(days=1))["estimate"]
+
+    def totals(self, days: int = 30, until: Optional[datetime] = None) -> Dict[str, Any]:
+        """Counters summed over the daily rollups in the window"""
+        totals = {field: 0 for field in COUNTERS}
+        for doc in self.series(DAY, days, until):
+            for field in COUNTERS:
+                totals[field] += doc.get(field, 0)
+        totals["active_user_days"] = totals.pop("active_users")
+        totals["active_users"] = self.active_users(days, until)
+        return totals
+
+    def all_time(self) -> Dict[str, Any]:
+        doc = self.collection.find_one({"_id": ALL_TIME_ID}) or {}
+        return {field: doc.get(field, 0) for field in COUNTERS if field != "active_users"}
+
+    # ============ BACKFILL ============
+
+    def rebuild(self, database) -> int:
+        """Recompute rollups from users, conversations, messages and feedback; returns documents written"""
+        self.collection.delete_many({})
+        self.markers.delete_many({})
+        self.sketches.collection.delete_many({})
+        self.sketches = UniqueUserSketches(self.collection.database)
+        with self._lock:
+            self._seen.clear()
+
+        sources = [
+            ("users", "created_at", None, lambda doc: {"users": 1}),
+            ("conversations", "started_at", "user_id", lambda doc: {"conversations": 1}),
+            ("messages", "created_at", "user_id", lambda doc: {"messages": 1}),
+            ("feedback", "created_at", "user_id",
+             lambda doc: {"feedback_count": 1, "rating_sum": doc.get("rating") or 0})
+        ]
+        for collection, time_field, user_field, counters in sources:
+            projection = {time_field: 1, "rating": 1, **({user_field: 1} if user_field else {})}
+            batch = []
+            for doc in database[collection].find({time_field: {"$type": "date"}}, projection):
+                batch.append((doc[time_field], counters(doc), doc.get(user_field) if user_field else None))
+                if len(batch) >= 1000:
+                    self.record_many(batch)
+                    batch = []
+            if batch:
+                self.record_many(batch)
+        self.flush()
+        return self.collection.count_documents({})
+
+def main():
+    from dotenv import load_dotenv
+
+    from database.mongodb.pool import connection_manager
+
+    parser = argparse.ArgumentParser(description="Maintain precomputed analytics rollups")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all rollups from source collections")
+    parser.add_argument("--days", type=int, default=30, help="Window for the printed totals")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database = connection_manager.database()
+    rollups = AnalyticsRollups(database)
+    rollups.ensure_indexes()
+    if args.rebuild:
+        print(f"Rebuilt {rollups.rebuild(database)} rollup documents")
+    print(rollups.totals(args.days))
+
+if __name__ == "__main__":
+    main()
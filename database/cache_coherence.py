@@ -0,0 +1,407 @@
+# database/cache_coherence.py
+"""
+Cross-worker cache coherence for in-process caches
+Tails MongoDB change streams (or a Kafka topic / in-memory bus as fallback)
+on users, conversations (or conversation_buckets, with bucketed storage)
+and medical_knowledge and invalidates local entries
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ("users", "conversations", "medical_knowledge")
+RAG_UPDATES_TOPIC = "healthbot.rag.updates"
+
+# Fields that cached lookups are keyed by, per collection
+TAG_FIELDS = {
+    "users": ("_id", "username", "email"),
+    "conversations": ("_id", "session_id", "user_id"),
+    "conversation_buckets": ("session_id", "user_id"),
+    "medical_knowledge": ("_id", "category"),
+}
+# Collections whose documents are cached under another collection's tags:
+# bucketed turns invalidate the same session_id tags as per-turn documents
+TAG_NAMESPACES = {"conversation_buckets": "conversations"}
+
+_MISSING = object()
+
+def make_tag(collection: str, field: str, value: Any) -> str:
+    return f"{collection}:{field}:{value}"
+
+def tags_for_document(collection: str, doc: Optional[Dict[str, Any]]) -> Set[str]:
+    """All invalidation tags a document touches"""
+    if not doc:
+        return set()
+    namespace = TAG_NAMESPACES.get(collection, collection)
+    return {
+        make_tag(namespace, field, doc[field])
+        for field in TAG_FIELDS.get(collection, ("_id",))
+        if doc.get(field) is not None
+    }
+
+def watched_collections(conversation_collection: str = "conversations") -> tuple:
+    """WATCHED_COLLECTIONS plus wherever the active conversation store keeps turns"""
+    return tuple(dict.fromkeys(WATCHED_COLLECTIONS + (conversation_collection,)))
+
+class LocalCache:
+    """Thread-safe TTL + LRU cache whose entries carry invalidation tags
+
+    Every invalidation bumps a generation. While loads are in flight, the
+    generation each invalidated key and tag was last bumped at is kept, so a
+    load that started before an invalidation of its key or tags is returned
+    but not cached.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._tag_index: Dict[str, Set[Any]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._loading: Dict[int, int] = {}  # start generation -> loads in flight
+        self._invalidated_keys: Dict[Any, int] = {}
+        self._invalidated_tags: Dict[str, int] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "stale_loads": 0}
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def set(self, key: Any, value: Any, tags: Iterable[str] = ()):
+        with self._lock:
+            self._store(key, value, frozenset(tags))
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any], tags: Callable[[Any], Iterable[str]] = None) -> Any:
+        """Return cached value or load, cache and return it"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        with self._lock:
+            started = self._generation
+            self._loading[started] = self._loading.get(started, 0) + 1
+        try:
+            value = loader()
+            value_tags = frozenset(tags(value) if tags and value is not None else ())
+        except BaseException:
+            with self._lock:
+                self._finish_load(started)
+            raise
+        with self._lock:
+            stale = self._invalidated_keys.get(key, 0) > started or any(
+                self._invalidated_tags.get(tag, 0) > started for tag in value_tags
+            )
+            self._finish_load(started)
+            if stale:
+                # An invalidation arrived while loading: the value may predate it
+                self.stats["stale_loads"] += 1
+            elif value is not None:
+                self._store(key, value, value_tags)
+        return value
+
+    def invalidate(self, key: Any):
+        with self._lock:
+            self._generation += 1
+            if self._loading:
+                self._invalidated_keys[key] = self._generation
+            if key in self._entries:
+                self._remove(key)
+                self.stats["invalidations"] += 1
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                if self._loading:
+                    self._invalidated_tags[tag] = self._generation
+                for key in list(self._tag_index.get(tag, ())):
+                    self._remove(key)
+                    removed += 1
+            self.stats["invalidations"] += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _store(self, key: Any, value: Any, tags: frozenset):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, time.monotonic() + self.ttl_seconds, tags)
+        for tag in tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _finish_load(self, started: int):
+        """Forget invalidations no load in flight can have raced with"""
+        self._loading[started] -= 1
+        if not self._loading[started]:
+            del self._loading[started]
+        if not self._loading:
+            self._invalidated_keys.clear()
+            self._invalidated_tags.clear()
+            return
+        oldest = min(self._loading)
+        for marks in (self._invalidated_keys, self._invalidated_tags):
+            for name in [name for name, generation in marks.items() if generation <= oldest]:
+                del marks[name]
+
+    def _remove(self, key: Any):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+# ============ INVALIDATION SOURCES ============
+
+class InMemoryBus:
+    """Single-process fallback: local invalidation only, TTL bounds staleness"""
+
+    name = "memory"
+
+    def start(self, listener: Callable[[str, Set[str]], None]):
+        pass
+
+    def publish(self, collection: str, tags: Set[str]):
+        pass
+
+    def stop(self):
+        pass
+
+class ChangeStreamSource:
+    """Tails a database-level change stream; writers need not publish"""
+
+    name = "changestream"
+
+    def __init__(self, db, collections: Iterable[str] = WATCHED_COLLECTIONS):
+        self.db = db
+        self.collections = list(collections)
+        self._stream = None
+        self._thread = None
+        self._running = False
+        self._resume_token = None
+
+    def open(self):
+        """Open the stream eagerly so unsupported deployments fail fast"""
+        self._stream = self.db.watch(
+            [{"$match": {"ns.coll": {"$in": self.collections}}}],
+            full_document="updateLookup"
+        )
+
+    def start(self, listener: Callable[[str, Set[str]], None]):
+        if self._stream is None:
+            self.open()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(listener,), name="cache-changestream", daemon=True)
+        self._thread.start()
+
+    def _run(self, listener):
+        while self._running:
+            try:
+                for change in self._stream:
+                    self._resume_token = change.get("_id")
+                    collection = change["ns"]["coll"]
+                    tags = tags_for_document(collection, change.get("fullDocument"))
+                    tags |= tags_for_document(collection, change.get("documentKey"))
+                    listener(collection, tags)
+                    if not self._running:
+                        return
+            except Exception as e:
+                if not self._running:
+                    return
+                logger.warning(f"Change stream interrupted, resuming: {e}")
+                time.sleep(1)
+                self._stream = self.db.watch(
+                    [{"$match": {"ns.coll": {"$in": self.collections}}}],
+                    full_document="updateLookup",
+                    resume_after=self._resume_token
+                )
+
+    def publish(self, collection: str, tags: Set[str]):
+        """Writes are observed through the change stream itself"""
+
+    def stop(self):
+        self._running = False
+        if self._stream is not None:
+            self._stream.close()
+
+def _decode_event(raw: Optional[bytes]) -> Optional[Dict[str, Any]]:
+    """None for tombstones and undecodable records, which are skipped (raising would stall the partition)"""
+    try:
+        return json.loads(raw.decode("utf-8")) if raw is not None else None
+    except ValueError:
+        logger.warning("Skipped undecodable cache invalidation record")
+        return None
+
+class KafkaInvalidationSource:
+    """Broadcasts invalidations over healthbot.rag.updates to every worker"""
+
+    name = "kafka"
+
+    def __init__(self, bootstrap_servers: str, topic: str = RAG_UPDATES_TOPIC):
+        from kafka import KafkaConsumer, KafkaProducer
+
+        self.topic = topic
+        self.origin = uuid.uuid4().hex
+        self.producer = KafkaProducer(
+            bootstrap_servers=bootstrap_servers,
+            value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+            linger_ms=5
+        )
+        # No consumer group: every worker must see every invalidation
+        self.consumer = KafkaConsumer(
+            topic,
+            bootstrap_servers=bootstrap_servers,
+            group_id=None,
+            auto_offset_reset="latest",
+            value_deserializer=_decode_event
+        )
+        self._thread = None
+        self._running = False
+
+    def start(self, listener: Callable[[str, Set[str]], None]):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(listener,), name="cache-kafka", daemon=True)
+        self._thread.start()
+
+    def _run(self, listener):
+        while self._running:
+            try:
+                for records in self.consumer.poll(timeout_ms=500).values():
+                    for record in records:
+                        event = record.value
+                        if not isinstance(event, dict) or event.get("event_type") != "cache_invalidation":
+                            continue
+                        data = event.get("data", {})
+                        if data.get("origin") == self.origin:
+                            continue  # Already applied locally
+                        listener(data["collection"], set(data.get("tags", [])))
+            except Exception as e:
+                if not self._running:
+                    return
+                # A broker outage or an undecodable record must not end invalidation for good
+                logger.warning(f"Kafka invalidation poll failed, retrying: {e}")
+                time.sleep(1)
+
+    def publish(self, collection: str, tags: Set[str]):
+        self.producer.send(self.topic, value={
+            "event_id": str(uuid.uuid4()),
+            "event_type": "cache_invalidation",
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": {"collection": collection, "tags": sorted(tags), "origin": self.origin}
+        })
+
+    def stop(self):
+        self._running = False
+        self.producer.flush(timeout=5)
+        self.consumer.close()
+        self.producer.close()
+
+# ============ COORDINATOR ============
+
+class CacheCoherence:
+    """Owns named caches and applies invalidations from the active source"""
+
+    def __init__(self, source=None):
+        self.source = source or InMemoryBus()
+        self.caches: Dict[str, LocalCache] = {}
+        self.events_applied = 0
+        self._started = False
+
+    def cache(self, name: str, max_entries: int = 10000, ttl_seconds: float = None) -> LocalCache:
+        """Get or create a named cache"""
+        if name not in self.caches:
+            ttl = ttl_seconds if ttl_seconds is not None else float(os.getenv("CACHE_TTL_SECONDS", "300"))
+            self.caches[name] = LocalCache(max_entries=max_entries, ttl_seconds=ttl)
+        return self.caches[name]
+
+    def start(self, source=None):
+        """Start listening; a source picked at startup replaces the default bus"""
+        if not self._started:
+            if source is not None:
+                self.source = source
+            self.source.start(self._apply)
+            self._started = True
+            logger.info(f"Cache coherence started ({self.source.name})")
+
+    def stop(self):
+        if self._started:
+            self.source.stop()
+            self._started = False
+
+    def _apply(self, collection: str, tags: Set[str]):
+        self.events_applied += 1
+        for cache in self.caches.values():
+            cache.invalidate_tags(tags)
+
+    def notify_write(self, collection: str, doc: Dict[str, Any]):
+        """Call after a write: invalidate locally now, then tell other workers"""
+        tags = tags_for_document(collection, doc)
+        self._apply(collection, tags)
+        self.source.publish(collection, tags)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "source": self.source.name,
+            "events_applied": self.events_applied,
+            "caches": {name: {"entries": len(c), **c.stats} for name, c in self.caches.items()}
+        }
+
+def build_invalidation_source(db=None, mode: str = None, collections: Iterable[str] = WATCHED_COLLECTIONS):
+    """Pick change streams, then Kafka, then the in-memory bus
+
+    mode: auto | changestream | kafka | memory (default: CACHE_INVALIDATION env)
+    collections: what a change stream watches (see watched_collections)
+    """
+    mode = (mode or os.getenv("CACHE_INVALIDATION", "auto")).lower()
+
+    if mode in ("auto", "changestream") and db is not None:
+        try:
+            source = ChangeStreamSource(db, collections)
+            source.open()
+            return source
+        except Exception as e:
+            # Standalone mongod and mongomock have no change streams
+            logger.info(f"Change streams unavailable: {e}")
+            if mode == "changestream":
+                raise
+
+    if mode in ("auto", "kafka"):
+        bootstrap = os.getenv("KAFKA_BOOTSTRAP_SERVERS")
+        if bootstrap or mode == "kafka":
+            try:
+                return KafkaInvalidationSource(bootstrap or "localhost:9092")
+            except Exception as e:
+                logger.info(f"Kafka invalidation unavailable: {e}")
+                if mode == "kafka":
+                    raise
+
+    if mode == "auto":
+        logger.warning("⚠️ Cache coherence using in-memory bus; caches are not shared across workers")
+    return InMemoryBus()
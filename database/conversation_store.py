@@ -0,0 +1,234 @@
+# database/conversation_store.py
+"""
+Conversation transcript storage models used by main.py
+  turns    - one document per turn (session_id, message, response, timestamp)
+  bucketed - fixed-size buckets of turns per session, so a whole history
+             is read from one or two documents instead of hundreds
+"""
+
+import math
+import os
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database.pagination import decode_cursor, keyset_filter, keyset_sort
+
+TURN_FIELDS = ("_id", "message", "response", "timestamp")
+DEFAULT_BUCKET_SIZE = 50
+DUPLICATE_KEY_ERROR = 11000
+
+def turn_key(turn: Dict[str, Any]):
+    """Total order of turns within a session: (timestamp, _id)"""
+    return (turn.get("timestamp") or datetime.min, turn["_id"])
+
+class TurnConversationStore:
+    """One document per turn in the conversations collection"""
+
+    name = "turns"
+
+    def __init__(self, database, collection: str = "conversations"):
+        self.collection = database[collection]
+
+    def ensure_indexes(self):
+        self.collection.create_index(
+            [("session_id", ASCENDING), ("timestamp", ASCENDING)],
+            name="idx_session_timeline"
+        )
+
+    def insert_turns(self, turns: List[Dict[str, Any]], skip_existing: bool = False) -> List[Dict[str, Any]]:
+        """Replayed turns are rejected by the _id index, so skip_existing is free
+
+        Returns the turns that were actually written.
+        """
+        if not turns:
+            return []
+        try:
+            self.collection.insert_many(turns, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            rejected = {err["index"] for err in errors}
+            return [turn for i, turn in enumerate(turns) if i not in rejected]
+        return turns
+
+    def context_turns(self, session_id: str, limit: int = 20, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent turns of a session (of one user, when given), oldest first"""
+        query = {"session_id": session_id} if user_id is None else {"session_id": session_id, "user_id": user_id}
+        turns = list(self.collection.find(
+            query,
+            {"_id": 1, "message": 1, "response": 1, "timestamp": 1}
+        ).sort("timestamp", DESCENDING).limit(limit))
+        turns.reverse()
+        return turns
+
+    def history(self, session_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """Full history of a session, oldest first"""
+        return list(self.collection.find(
+            {"session_id": session_id, "user_id": user_id},
+            {"_id": 1, "message": 1, "response": 1, "timestamp": 1}
+        ).sort("timestamp", ASCENDING))
+
+    def iter_history(self, session_id: str, user_id: str, after: Optional[str] = None, limit: Optional[int] = None):
+        """Stream history oldest first, starting strictly after a keyset cursor"""
+        cursor = self.collection.find(
+            keyset_filter({"session_id": session_id, "user_id": user_id}, "timestamp", after=after),
+            {"_id": 1, "message": 1, "response": 1, "timestamp": 1},
+            batch_size=200
+        ).sort(keyset_sort("timestamp"))
+        # One extra row tells the caller whether another page exists
+        return cursor.limit(limit + 1) if limit else cursor
+
+    def history_version(self, session_id: str, user_id: str) -> str:
+        """Turns are append-only, so the newest _id identifies the history"""
+        latest = self.collection.find_one(
+            {"session_id": session_id, "user_id": user_id},
+            {"_id": 1},
+            sort=[("timestamp", DESCENDING), ("_id", DESCENDING)]
+        )
+        return str(latest["_id"]) if latest else "empty"
+
+class BucketedConversationStore:
+    """Turns packed into fixed-size bucket documents per session
+
+    Bucket document:
+        {session_id, user_id, count, first_ts, last_ts,
+         turns: [{_id, message, response, timestamp}, ...]}
+    """
+
+    name = "bucketed"
+
+    def __init__(self, database, collection: str = "conversation_buckets", bucket_size: int = DEFAULT_BUCKET_SIZE):
+        self.collection = database[collection]
+        self.bucket_size = bucket_size
+
+    def ensure_indexes(self):
+        # Serves the append upsert (session, user, count < size) and timeline reads
+        self.collection.create_index(
+            [("session_id", ASCENDING), ("user_id", ASCENDING), ("first_ts", ASCENDING)],
+            name="idx_bucket_timeline"
+        )
+        self.collection.create_index(
+            [("session_id", ASCENDING), ("last_ts", DESCENDING)],
+            name="idx_bucket_recent"
+        )
+
+    def _append_op(self, turn: Dict[str, Any]) -> UpdateOne:
+        timestamp = turn.get("timestamp") or datetime.now()
+        return UpdateOne(
+            {
+                "session_id": turn["session_id"],
+                "user_id": turn.get("user_id"),
+                "count": {"$lt": self.bucket_size}
+            },
+            {
+                "$push": {"turns": {field: turn[field] for field in TURN_FIELDS if field in turn}},
+                "$inc": {"count": 1},
+                "$min": {"first_ts": timestamp},
+                "$max": {"last_ts": timestamp}
+            },
+            upsert=True
+        )
+
+    def insert_turns(self, turns: List[Dict[str, Any]], skip_existing: bool = False) -> List[Dict[str, Any]]:
+        """One ordered bulk_write; ordering keeps bucket capacity exact per session
+
+        skip_existing drops turns whose _id is already bucketed (journal replay),
+        at the cost of one extra query. Returns the turns that were written.
+        """
+        if skip_existing and turns:
+            existing = set()
+            for bucket in self.collection.find(
+                {
+                    "session_id": {"$in": list({t["session_id"] for t in turns})},
+                    "turns._id": {"$in": [t["_id"] for t in turns if "_id" in t]}
+                },
+                {"turns._id": 1}
+            ):
+                existing.update(t["_id"] for t in bucket["turns"])
+            turns = [t for t in turns if t.get("_id") not in existing]
+        if turns:
+            self.collection.bulk_write([self._append_op(turn) for turn in turns], ordered=True)
+        return turns
+
+    def context_turns(self, session_id: str, limit: int = 20, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent turns of a session (of one user, when given), oldest first"""
+        query = {"session_id": session_id} if user_id is None else {"session_id": session_id, "user_id": user_id}
+        buckets = list(self.collection.find(
+            query,
+            {"turns": 1}
+        ).sort("last_ts", DESCENDING).limit(math.ceil(limit / self.bucket_size) + 1))
+        turns = [turn for bucket in buckets for turn in bucket["turns"]]
+        turns.sort(key=lambda t: t.get("timestamp") or datetime.min)
+        return turns[-limit:]
+
+    def history(self, session_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """Full history of a session, oldest first"""
+        buckets = self.collection.find(
+            {"session_id": session_id, "user_id": user_id},
+            {"turns": 1}
+        ).sort("first_ts", ASCENDING)
+        turns = [turn for bucket in buckets for turn in bucket["turns"]]
+        turns.sort(key=lambda t: t.get("timestamp") or datetime.min)
+        return turns
+
+    def iter_history(self, session_id: str, user_id: str, after: Optional[str] = None, limit: Optional[int] = None):
+        """Stream history oldest first, starting strictly after a keyset cursor
+
+        limit is not pushed down: buckets are read lazily, two at a time.
+        """
+        query = {"session_id": session_id, "user_id": user_id}
+        start = None
+        if after:
+            start = decode_cursor(after)
+            query["last_ts"] = {"$gte": start[0]}
+        buckets = self.collection.find(query, {"turns": 1}, batch_size=2).sort("first_ts", ASCENDING)
+        for bucket in buckets:
+            for turn in sorted(bucket["turns"], key=turn_key):
+                if start is None or turn_key(turn) > start:
+                    yield turn
+
+    def history_version(self, session_id: str, user_id: str) -> str:
+        """Newest bucket plus its fill level identifies the history"""
+        latest = self.collection.find_one(
+            {"session_id": session_id, "user_id": user_id},
+            {"_id": 1, "count": 1},
+            sort=[("last_ts", DESCENDING)]
+        )
+        return f"{latest['_id']}:{latest['count']}" if latest else "empty"
+
+def build_conversation_store(database, storage: Optional[str] = None):
+    """Store selected by CONVERSATION_STORAGE (turns | bucketed)"""
+    storage = (storage or os.getenv("CONVERSATION_STORAGE", "turns")).lower()
+    if storage == "bucketed":
+        return BucketedConversationStore(
+            database,
+            bucket_size=int(os.getenv("CONVERSATION_BUCKET_SIZE", str(DEFAULT_BUCKET_SIZE)))
+        )
+    if storage == "turns":
+        return TurnConversationStore(database)
+    raise ValueError(f"Unknown CONVERSATION_STORAGE: {storage}")
+
+def group_into_buckets(turns: List[Dict[str, Any]], bucket_size: int = DEFAULT_BUCKET_SIZE) -> List[Dict[str, Any]]:
+    """Pack per-turn documents (already sorted by timestamp) into bucket documents"""
+    by_session = defaultdict(list)
+    for turn in turns:
+        by_session[(turn["session_id"], turn.get("user_id"))].append(turn)
+
+    buckets = []
+    for (session_id, user_id), session_turns in by_session.items():
+        for start in range(0, len(session_turns), bucket_size):
+            chunk = session_turns[start:start + bucket_size]
+            buckets.append({
+                "session_id": session_id,
+                "user_id": user_id,
+                "count": len(chunk),
+                "first_ts": chunk[0].get("timestamp"),
+                "last_ts": chunk[-1].get("timestamp"),
+                "turns": [{field: t[field] for field in TURN_FIELDS if field in t} for t in chunk]
+            })
+    return buckets
@@ -3,16 +3,173 @@
 Complete MongoDB Atlas Integration for HealthBot AI
 """
 
-from pymongo import MongoClient, ASCENDING, DESCENDING
-from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime, timedelta
+from collections import defaultdict
 import hashlib
+import logging
 import os
+import threading
 from dotenv import load_dotenv
 
+from database.analytics_rollups import AnalyticsRollups
+from database.trending_queries import TrendingQueries
+from database.mongodb.pool import connection_manager
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+def _as_object_id(value):
+    """Conversation ids are handed out as strings; stored _ids are ObjectIds"""
+    if isinstance(value, str):
+        try:
+            return ObjectId(value)
+        except InvalidId:
+            return value
+    return value
+
+class MessageWriteBatcher:
+    """Buffers message documents and flushes them every max_delay_ms or
+    max_batch messages: one insert_many plus one bulk_write of per-conversation
+    $inc/$set updates, however many requests contributed
+
+    Message ids are handed out before the write, so a failed flush never
+    drops anything: messages go back to the front of the queue (their _ids
+    make the retry idempotent) and counter updates that did not apply are
+    kept for the next flush."""
+    
+    def __init__(self, database, max_batch=200, max_delay_ms=20, rollups=None):
+        self.db = database
+        self.rollups = rollups
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._pending = []
+        # conversation_id -> [message count, last created_at] written but not yet counted
+        self._uncounted = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self.flushes = 0
+        self.failed_flushes = 0
+        self._thread = threading.Thread(target=self._run, name="message-write-batcher", daemon=True)
+        self._thread.start()
+    
+    def add(self, docs):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MessageWriteBatcher is closed")
+            self._pending.extend(docs)
+            full = len(self._pending) >= self.max_batch
+        if full:
+            self._wakeup.set()
+    
+    def _run(self):
+        delay = self.max_delay
+        while not self._closed:
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
+            failures = self.failed_flushes
+            self.flush()
+            # Database is down; back off instead of hammering it
+            delay = min(5.0, max(delay * 2, 0.1)) if self.failed_flushes > failures else self.max_delay
+    
+    def flush(self):
+        """Write buffered messages; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                docs, self._pending = self._pending, []
+            if not docs and not self._uncounted:
+                return 0
+            
+            try:
+                self._insert(docs)
+            except Exception as e:
+                with self._lock:
+                    self._pending[:0] = docs
+                self.failed_flushes += 1
+                logger.warning(f"Flushing {len(docs)} messages failed, will retry: {e}")
+                return 0
+            
+            for doc in docs:
+                counted = self._uncounted.setdefault(doc['conversation_id'], [0, doc['created_at']])
+                counted[0] += 1
+                counted[1] = max(counted[1], doc['created_at'])
+            try:
+                self._apply_counts()
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.warning(f"Updating message counts of {len(self._uncounted)} conversations failed, "
+                               f"will retry: {e}")
+                return len(docs)
+            
+            if self.rollups and docs:
+                try:
+                    self.rollups.record_many((doc['created_at'], {'messages': 1}, doc['user_id']) for doc in docs)
+                except Exception as e:
+                    logger.warning(f"Recording message rollups failed: {e}")
+            self.flushes += 1
+            return len(docs)
+    
+    def _insert(self, docs):
+        """insert_many where messages already stored by an earlier attempt count as written"""
+        if not docs:
+            return
+        try:
+            self.db.messages.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            if any(err.get('code') != DUPLICATE_KEY_ERROR for err in e.details.get('writeErrors', [])):
+                raise
+    
+    def _apply_counts(self):
+        if not self._uncounted:
+            return
+        ids = list(self._uncounted)
+        ops = [
+            UpdateOne(
+                {'_id': _as_object_id(conversation_id)},
+                {'$inc': {'message_count': self._uncounted[conversation_id][0]},
+                 '$max': {'updated_at': self._uncounted[conversation_id][1]}}
+            )
+            for conversation_id in ids
+        ]
+        try:
+            self.db.conversations.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: everything except the reported failures was applied
+            failed = {err['index'] for err in e.details.get('writeErrors', [])}
+            self._uncounted = {ids[i]: self._uncounted[ids[i]] for i in failed}
+            raise
+        self._uncounted = {}
+    
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        if self._pending or self._uncounted:
+            logger.error(f"MessageWriteBatcher closed with {len(self._pending)} unwritten messages and "
+                         f"{len(self._uncounted)} uncounted conversations")
+
 class HealthBotDatabase:
-    def __init__(self):
+    def __init__(self, database=None):
+        self._batcher = None
+        self.rollups = None
+        self.trending = None
+        if database is not None:
+            # Injected database (tests, benchmarks, shared clients)
+            self.db = database
+            self.available = True
+            self.rollups = AnalyticsRollups(database)
+            self.trending = TrendingQueries(database)
+            return
+        
         username = os.getenv('MONGO_USERNAME')
         password = os.getenv('MONGO_PASSWORD')
         cluster = os.getenv('MONGO_CLUSTER')
@@ -26,9 +183,13 @@ class HealthBotDatabase:
         connection_string = f'mongodb+srv://{username}:{password}@{cluster}/?retryWrites=true&w=majority'
         
         try:
-            self.client = MongoClient(connection_string)
+            self.client = connection_manager.client(connection_string)
             self.db = self.client[db_name]
             self.available = True
+            # Dashboard counters maintained at write time (see database/analytics_rollups.py)
+            self.rollups = AnalyticsRollups(self.db)
+            # Bounded top-K of normalized medical queries (see database/trending_queries.py)
+            self.trending = TrendingQueries(self.db)
             print("✅ HealthBot AI connected to MongoDB Atlas")
             self._setup_collections_and_indexes()
         except Exception as e:
@@ -44,6 +205,7 @@ class HealthBotDatabase:
         
         users = self.db.users
         users.create_index([('email', ASCENDING)], unique=True)
+        users.create_index([('username', ASCENDING)], unique=True, sparse=True)
         users.create_index([('email', ASCENDING), ('is_active', ASCENDING)])
         users.create_index([('created_at', DESCENDING)])
         users.create_index([('full_name', 'text'), ('email', 'text')])
@@ -54,8 +216,7 @@ class HealthBotDatabase:
             self.db.create_collection('conversations')
         
         conv = self.db.conversations
-        conv.create_index([('user_id', ASCENDING), ('started_at', DESCENDING)])
-        conv.create_index([('status', ASCENDING), ('updated_at', DESCENDING)])
+        conv.create_index([('user_id', ASCENDING), ('status', ASCENDING), ('updated_at', DESCENDING)])
         conv.create_index([('user_id', ASCENDING), ('external_id', ASCENDING)], unique=True, sparse=True)
         print("  ✓ Conversations collection ready")
         
@@ -64,9 +225,8 @@ class HealthBotDatabase:
             self.db.create_collection('messages')
         
         msgs = self.db.messages
+        # Every index here is updated on each message insert; keep only what queries use
         msgs.create_index([('conversation_id', ASCENDING), ('created_at', ASCENDING)])
-        msgs.create_index([('user_id', ASCENDING), ('created_at', DESCENDING)])
-        msgs.create_index([('conversation_id', ASCENDING), ('message_type', ASCENDING)])
         msgs.create_index([('content', 'text')])
         print("  ✓ Messages collection ready")
         
@@ -89,8 +249,21 @@ class HealthBotDatabase:
         feedback.create_index([('rating', ASCENDING)])
         print("  ✓ Feedback collection ready")
         
+        # 6. Analytics rollups (hourly/daily counters; only active-user markers need an index)
+        self.rollups.ensure_indexes()
+        self.trending.ensure_indexes()
+        print("  ✓ Analytics rollups ready")
+        
         print("✅ All collections and indexes setup complete")
     
+    def _record_rollup(self, record, *args):
+        """Rollups and active-user markers are derived data: a failure is logged
+        and never fails (or invites a retry of) a write that already committed"""
+        try:
+            record(*args)
+        except Exception as e:
+            logger.warning(f"Analytics rollup update failed: {e}")
+    
     # ============ USER METHODS ============
     def create_user(self, email, full_name, password_hash=None):
         """Create a new user"""
@@ -110,6 +283,7 @@ class HealthBotDatabase:
         
         try:
             result = self.db.users.insert_one(user_data)
+            self._record_rollup(self.rollups.record, {'users': 1}, user_data['created_at'])
             return str(result.inserted_id)
         except Exception as e:
             print(f"Error creating user: {e}")
@@ -127,10 +301,12 @@ class HealthBotDatabase:
         if not self.available:
             return
         
+        now = datetime.utcnow()
         self.db.users.update_one(
-            {'_id': user_id},
-            {'': {'last_active': datetime.utcnow()}}
+            {'_id': _as_object_id(user_id)},
+            {'$set': {'last_active': now}}
         )
+        self._record_rollup(self.rollups.record_active, str(user_id), now)
     
     # ============ CONVERSATION METHODS ============
     def create_conversation(self, user_id, title=None):
@@ -148,6 +324,7 @@ class HealthBotDatabase:
         }
         
         result = self.db.conversations.insert_one(conv_data)
+        self._record_rollup(self.rollups.record, {'conversations': 1}, conv_data['started_at'], user_id)
         return str(result.inserted_id)
     
     def get_user_conversations(self, user_id, limit=50):
@@ -166,35 +343,70 @@ class HealthBotDatabase:
         if not self.available:
             return None
         
-        from bson import ObjectId
         return self.db.conversations.find_one({'_id': ObjectId(conversation_id)})
     
     # ============ MESSAGE METHODS ============
-    def save_message(self, conversation_id, user_id, content, message_type='user'):
-        """Save a message to conversation"""
-        if not self.available:
-            return None
-        
-        message_data = {
+    def _message_doc(self, conversation_id, user_id, content, message_type, created_at):
+        return {
+            '_id': ObjectId(),
             'conversation_id': conversation_id,
             'user_id': user_id,
             'content': content,
             'message_type': message_type,
-            'created_at': datetime.utcnow()
+            'created_at': created_at
         }
-        
-        result = self.db.messages.insert_one(message_data)
-        
-        # Update conversation message count and last update
-        self.db.conversations.update_one(
-            {'_id': conversation_id},
-            {
-                '': {'message_count': 1},
-                '': {'updated_at': datetime.utcnow()}
-            }
+    
+    def save_message(self, conversation_id, user_id, content, message_type='user'):
+        """Save a message to conversation"""
+        ids = self.save_messages(conversation_id, user_id, [(content, message_type)])
+        return ids[0] if ids else None
+    
+    def save_turn(self, conversation_id, user_id, user_content, assistant_content):
+        """Save a user message and the assistant reply together"""
+        return self.save_messages(
+            conversation_id, user_id,
+            [(user_content, 'user'), (assistant_content, 'assistant')]
         )
+    
+    def save_messages(self, conversation_id, user_id, messages):
+        """Save (content, message_type) pairs with one insert and one counter update"""
+        if not self.available or not messages:
+            return []
         
-        return str(result.inserted_id)
+        now = datetime.utcnow()
+        docs = [
+            # Keep turn order stable when created_at ties
+            self._message_doc(conversation_id, user_id, content, message_type, now + timedelta(microseconds=i))
+            for i, (content, message_type) in enumerate(messages)
+        ]
+        
+        if self._batcher:
+            self._batcher.add(docs)
+        else:
+            self.db.messages.insert_many(docs, ordered=True)
+            self.db.conversations.update_one(
+                {'_id': _as_object_id(conversation_id)},
+                {'$inc': {'message_count': len(docs)}, '$set': {'updated_at': docs[-1]['created_at']}}
+            )
+            self._record_rollup(self.rollups.record, {'messages': len(docs)}, now, user_id)
+        
+        return [str(doc['_id']) for doc in docs]
+    
+    def enable_write_batching(self, max_batch=200, max_delay_ms=20):
+        """Coalesce message writes across requests into periodic bulk writes"""
+        if self.available and self._batcher is None:
+            self._batcher = MessageWriteBatcher(self.db, max_batch, max_delay_ms, self.rollups)
+        return self._batcher
+    
+    def flush_writes(self):
+        """Stop batching and write anything still buffered"""
+        if self._batcher:
+            self._batcher.close()
+            self._batcher = None
+        if self.rollups:
+            self.rollups.flush()
+        if self.trending:
+            self.trending.flush()
     
     def get_conversation_messages(self, conversation_id, limit=100):
         """Get all messages in a conversation"""
@@ -249,7 +461,7 @@ class HealthBotDatabase:
             return []
         
         results = self.db.medical_knowledge.find(
-            {'': {'': query}}
+            {'$text': {'$search': query}}
         ).sort([('confidence_score', DESCENDING)]).limit(limit)
         
         return list(results)
@@ -280,42 +492,46 @@ class HealthBotDatabase:
         }
         
         result = self.db.feedback.insert_one(feedback_data)
+        self._record_rollup(
+            self.rollups.record, {'feedback_count': 1, 'rating_sum': rating or 0}, feedback_data['created_at'], user_id
+        )
         return str(result.inserted_id)
     
     def get_feedback_stats(self):
-        """Get feedback statistics"""
+        """Get feedback statistics (one rollup document, not a collection scan)"""
         if not self.available:
             return {}
         
-        total = self.db.feedback.count_documents({})
-        avg_rating = self.db.feedback.aggregate([
-            {'': {'_id': None, 'avg': {'': ''}}}
-        ])
+        totals = self.rollups.all_time()
+        count = totals['feedback_count']
         
         return {
-            'total_feedback': total,
-            'average_rating': next(avg_rating, {}).get('avg', 0)
+            'total_feedback': count,
+            'average_rating': totals['rating_sum'] / count if count else 0
         }
     
     # ============ ANALYTICS METHODS ============
     def get_user_activity_stats(self, days=30):
-        """Get user activity statistics"""
+        """Get user activity statistics from the daily rollups (O(days) documents)"""
         if not self.available:
             return {}
         
-        from datetime import timedelta
-        cutoff = datetime.utcnow() - timedelta(days=days)
-        
-        active_users = self.db.users.count_documents({'last_active': {'': cutoff}})
-        total_conversations = self.db.conversations.count_documents({'started_at': {'': cutoff}})
-        total_messages = self.db.messages.count_documents({'created_at': {'': cutoff}})
+        totals = self.rollups.totals(days)
         
         return {
-            'active_users': active_users,
-            'conversations': total_conversations,
-            'messages': total_messages,
+            'active_users': totals['active_users'],
+            'new_users': totals['users'],
+            'conversations': totals['conversations'],
+            'messages': totals['messages'],
             'period_days': days
         }
+    
+    def get_trending_queries(self, limit=10, hours=24):
+        """Most frequent medical queries over the last hours (merged top-K summaries)"""
+        if not self.available:
+            return []
+        
+        return self.trending.trending(limit, hours)
 
 # Create global instance
 db = HealthBotDatabase()
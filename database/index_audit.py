@@ -0,0 +1,323 @@
+# database/index_audit.py
+"""
+Index provisioning and query-plan audit for the queries main.py issues
+Every query the API runs is registered as a QueryShape. Required indexes
+are derived from those shapes with the Equality-Sort-Range rule, missing
+ones are created at startup, and each shape is explain()ed so a
+collection scan or in-memory sort is reported instead of found in
+production.
+
+Usage:
+    python -m database.index_audit                      # report only
+    python -m database.index_audit --apply --fail-on-collscan   # CI
+"""
+
+import argparse
+import logging
+import os
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$ne", "$nin", "$exists", "$regex", "$not"}
+EQUALITY_OPERATORS = {"$eq", "$in"}
+BAD_STAGES = {"COLLSCAN", "SORT"}
+
+@dataclass
+class QueryShape:
+    """One query as the application issues it (values are placeholders)"""
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: List[Tuple[str, int]] = field(default_factory=list)
+    limit: int = 0
+
+@dataclass
+class RequiredIndex:
+    """Index derived from a query shape, split into its ESR segments"""
+    collection: str
+    equality: List[str]
+    sort: List[Tuple[str, int]]
+    range: List[str]
+    source: str = ""
+    filter: Dict[str, Any] = field(default_factory=dict)
+    text: bool = False
+
+    @property
+    def keys(self) -> List[Tuple[str, Any]]:
+        if self.text:
+            return [("$**", "text")]
+        return ([(f, ASCENDING) for f in self.equality] + list(self.sort)
+                + [(f, ASCENDING) for f in self.range])
+
+    @property
+    def name(self) -> str:
+        return "idx_auto_" + "_".join(f"{f.replace('.', '_')}_{d}" for f, d in self.keys)
+
+# ============ DERIVATION ============
+
+def _classify(filter_doc: Dict[str, Any], equality: List[str], ranges: List[str]):
+    for key, value in filter_doc.items():
+        if key.startswith("$"):
+            continue
+        if isinstance(value, dict) and any(op.startswith("$") for op in value):
+            ops = set(value)
+            target = equality if ops <= EQUALITY_OPERATORS else ranges
+        else:
+            target = equality
+        if key not in equality and key not in ranges:
+            target.append(key)
+
+def derive_indexes(shape: QueryShape) -> List[RequiredIndex]:
+    """ESR: equality fields, then the sort keys in order, then range fields
+
+    A top-level $or needs an index per branch, so each branch is combined
+    with the rest of the filter and derived separately.
+    """
+    base = {k: v for k, v in shape.filter.items() if k != "$or"}
+    branches = shape.filter.get("$or") or [{}]
+    if "$text" in base:
+        # $text can only run on a text index, whatever else the query filters on
+        return [RequiredIndex(shape.collection, [], [], [], shape.name, base, text=True)]
+
+    derived = []
+    for branch in branches:
+        equality, ranges = [], []
+        _classify(base, equality, ranges)
+        _classify(branch, equality, ranges)
+        sort = [(f, d) for f, d in shape.sort if f not in equality]
+        sorted_fields = {f for f, _ in sort}
+        derived.append(RequiredIndex(
+            collection=shape.collection,
+            equality=equality,
+            sort=sort,
+            range=[f for f in ranges if f not in sorted_fields],
+            source=shape.name,
+            filter={**base, **branch}
+        ))
+    return derived
+
+def satisfies(existing: Sequence[Tuple[str, Any]], required: RequiredIndex,
+              partial: Optional[Dict[str, Any]] = None) -> bool:
+    """Does an existing index serve the equality and sort segments?
+
+    Equality fields may appear in any order and the sort segment may be
+    fully reversed. Range fields are only required when there is nothing
+    else to seek on; otherwise they narrow the scan but do not change the plan.
+    A partial index qualifies only if the query implies its filter, and
+    equality fields pinned by that filter may be left out of its keys.
+    """
+    existing = [(f, d) for f, d in existing]
+    if partial and any(required.filter.get(k) != v for k, v in partial.items()):
+        return False
+    if required.text:
+        return any(d == "text" for _, d in existing)
+    if any(not isinstance(d, int) for _, d in existing):
+        return False  # text, 2dsphere and hashed indexes cannot serve these shapes
+
+    pinned = set(partial or {})
+    n = 0
+    while n < len(existing) and existing[n][0] in required.equality:
+        n += 1
+    if not set(required.equality) - {f for f, _ in existing[:n]} <= pinned:
+        return False
+
+    segment = existing[n:n + len(required.sort)]
+    if [f for f, _ in segment] != [f for f, _ in required.sort]:
+        return False
+    if len({d * want for (_, d), (_, want) in zip(segment, required.sort)}) > 1:
+        return False
+
+    if not required.equality and not required.sort and required.range:
+        return existing[0][0] in required.range
+    return True
+
+def _dedupe(required: List[RequiredIndex]) -> List[RequiredIndex]:
+    """Drop derived indexes that another derived index already satisfies"""
+    kept = []
+    for candidate in sorted(required, key=lambda r: -len(r.keys)):
+        if not any(other.collection == candidate.collection and satisfies(other.keys, candidate)
+                   for other in kept):
+            kept.append(candidate)
+    return kept
+
+# ============ RECONCILIATION ============
+
+def reconcile_indexes(database, shapes: List[QueryShape], apply: bool = True) -> Dict[str, Any]:
+    """Create indexes the registered queries need and do not yet have
+
+    Existing indexes are never dropped; see the index cost analyzer for that.
+    """
+    required = _dedupe([r for shape in shapes for r in derive_indexes(shape)])
+    report = {"satisfied": [], "created": [], "missing": []}
+
+    existing_by_collection = {}
+    for req in required:
+        if req.collection not in existing_by_collection:
+            existing_by_collection[req.collection] = [
+                (list(index["key"].items()), index.get("partialFilterExpression"))
+                for index in database[req.collection].list_indexes()
+            ]
+        existing = existing_by_collection[req.collection]
+
+        entry = {"collection": req.collection, "keys": req.keys, "query": req.source}
+        if any(satisfies(keys, req, partial) for keys, partial in existing):
+            report["satisfied"].append(entry)
+        elif apply and not req.text:
+            # Text indexes need their field list chosen by hand
+            database[req.collection].create_index(req.keys, name=req.name)
+            existing.append((req.keys, None))
+            report["created"].append({**entry, "name": req.name})
+            logger.info(f"Created index {req.name} on {req.collection} for {req.source}")
+        else:
+            report["missing"].append(entry)
+    return report
+
+# ============ EXPLAIN AUDIT ============
+
+def plan_stages(plan: Any) -> List[str]:
+    """Every stage name in an explain plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+def explain_shape(database, shape: QueryShape) -> Dict[str, Any]:
+    command = {"find": shape.collection, "filter": shape.filter}
+    if shape.sort:
+        command["sort"] = dict(shape.sort)
+    if shape.limit:
+        command["limit"] = shape.limit
+    explained = database.command("explain", command, verbosity="queryPlanner")
+    winning = explained.get("queryPlanner", {}).get("winningPlan", {})
+    stages = plan_stages(winning)
+    return {
+        "query": shape.name,
+        "collection": shape.collection,
+        "stages": stages,
+        "problems": sorted(BAD_STAGES.intersection(stages))
+    }
+
+def audit_query_plans(database, shapes: List[QueryShape]) -> Dict[str, Any]:
+    """explain() every shape and flag collection scans and blocking sorts"""
+    results, problems, unavailable = [], [], []
+    for shape in shapes:
+        try:
+            result = explain_shape(database, shape)
+        except Exception as e:
+            unavailable.append({"query": shape.name, "error": str(e)})
+            continue
+        results.append(result)
+        if result["problems"]:
+            problems.append(result)
+            logger.error(f"Query '{shape.name}' on {shape.collection} uses "
+                         f"{', '.join(result['problems'])}: {result['stages']}")
+    return {"plans": results, "problems": problems, "unavailable": unavailable}
+
+def run_index_audit(database, shapes: List[QueryShape], apply: bool = True) -> Dict[str, Any]:
+    """Reconcile then explain; used at API startup"""
+    indexes = reconcile_indexes(database, shapes, apply=apply)
+    plans = audit_query_plans(database, shapes)
+    return {"indexes": indexes, **plans}
+
+# ============ REGISTRY ============
+
+USER_SHAPES = [
+    QueryShape("login_by_username", "users", {"username": "?"}, limit=1),
+    QueryShape("register_duplicate_check", "users", {"$or": [{"username": "?"}, {"email": "?"}]}, limit=1)
+]
+
+SESSION_SHAPES = [
+    QueryShape("session_list", "sessions", {"user_id": "?"},
+               [("updated_at", DESCENDING), ("_id", DESCENDING)], limit=21),
+    QueryShape("session_summaries", "sessions", {"user_id": "?", "session_id": {"$in": ["?"]}}),
+    QueryShape("session_summary_upsert", "sessions", {"user_id": "?", "session_id": "?"})
+]
+
+TURN_SHAPES = [
+    # main.py always scopes context to the requesting user
+    QueryShape("context_turns", "conversations", {"session_id": "?", "user_id": "?"}, [("timestamp", DESCENDING)],
+               limit=20),
+    QueryShape("session_history", "conversations", {"session_id": "?", "user_id": "?"},
+               [("timestamp", ASCENDING), ("_id", ASCENDING)]),
+    QueryShape("history_version", "conversations", {"session_id": "?", "user_id": "?"},
+               [("timestamp", DESCENDING), ("_id", DESCENDING)], limit=1)
+]
+
+BUCKET_SHAPES = [
+    QueryShape("context_buckets", "conversation_buckets", {"session_id": "?", "user_id": "?"},
+               [("last_ts", DESCENDING)], limit=2),
+    QueryShape("bucket_history", "conversation_buckets", {"session_id": "?", "user_id": "?"},
+               [("first_ts", ASCENDING)]),
+    QueryShape("bucket_append", "conversation_buckets", {"session_id": "?", "user_id": "?", "count": {"$lt": 50}}),
+    QueryShape("bucket_version", "conversation_buckets", {"session_id": "?", "user_id": "?"},
+               [("last_ts", DESCENDING)], limit=1)
+]
+
+# Queries from HealthBotDatabase and database/repositories (the messages model)
+REPOSITORY_SHAPES = [
+    QueryShape("user_by_email", "users", {"email": "?"}, limit=1),
+    QueryShape("active_users", "users", {"is_active": True, "is_verified": True},
+               [("last_active_at", DESCENDING)], limit=100),
+    QueryShape("user_conversations", "conversations", {"user_id": "?", "status": "active"},
+               [("started_at", DESCENDING), ("_id", DESCENDING)], limit=51),
+    QueryShape("recent_user_conversations", "conversations", {"user_id": "?", "status": "active"},
+               [("updated_at", DESCENDING)], limit=50),
+    QueryShape("conversation_messages", "messages", {"conversation_id": "?"},
+               [("created_at", ASCENDING), ("_id", ASCENDING)], limit=101),
+    QueryShape("llm_context_messages", "messages", {"conversation_id": "?"},
+               [("created_at", DESCENDING)], limit=10),
+    QueryShape("search_messages", "messages", {"user_id": "?", "$text": {"$search": "?"}},
+               [("created_at", DESCENDING)], limit=50)
+]
+
+def main_query_shapes(storage: str = "turns") -> List[QueryShape]:
+    """Queries issued by main.py for the configured conversation storage"""
+    conversation_shapes = BUCKET_SHAPES if storage == "bucketed" else TURN_SHAPES
+    return USER_SHAPES + SESSION_SHAPES + conversation_shapes
+
+def main():
+    from dotenv import load_dotenv
+
+    from database.mongodb.pool import connection_manager
+
+    parser = argparse.ArgumentParser(description="Provision and audit indexes for main.py queries")
+    parser.add_argument("--apply", action="store_true", help="Create missing indexes")
+    parser.add_argument("--fail-on-collscan", action="store_true",
+                        help="Exit non-zero if any query plan scans a collection or sorts in memory")
+    parser.add_argument("--storage", default=None, help="Conversation storage (turns | bucketed)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    database = connection_manager.database()
+    storage = (args.storage or os.getenv("CONVERSATION_STORAGE", "turns")).lower()
+    result = run_index_audit(database, main_query_shapes(storage), apply=args.apply)
+
+    for entry in result["indexes"]["created"]:
+        print(f"created  {entry['collection']}.{entry['name']}  ({entry['query']})")
+    for entry in result["indexes"]["missing"]:
+        print(f"MISSING  {entry['collection']} {entry['keys']}  ({entry['query']})")
+    for plan in result["plans"]:
+        status = "FAIL" if plan["problems"] else "ok"
+        print(f"{status:8} {plan['collection']}.{plan['query']}: {' > '.join(plan['stages'])}")
+    for entry in result["unavailable"]:
+        print(f"skipped  {entry['query']}: {entry['error']}")
+
+    if args.fail_on_collscan and (result["problems"] or result["indexes"]["missing"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
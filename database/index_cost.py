@@ -0,0 +1,273 @@
+# database/index_cost.py
+"""
+Index cost analyzer: what each secondary index costs on writes and whether
+anything reads it
+
+For every index on a collection it reports
+  - usage since the last restart ($indexStats accesses.ops)
+  - write overhead, measured by replaying sample inserts into a scratch
+    collection with only that index present (--measure)
+  - whether a registered query shape (database/index_audit.py) needs it
+and recommends the minimal set: _id, unique and TTL constraints, one index
+per registered query and anything observed in use. --apply creates what is
+missing; the rest is only reported, because $indexStats counters are per
+node and reset on restart (an index used only on a secondary, or since the
+last restart, looks unused). Drops need an explicit --drop NAME.
+
+Usage:
+    python -m database.index_cost --collection messages --measure
+    python -m database.index_cost --collection messages --apply
+    python -m database.index_cost --collection messages --apply --drop idx_user_messages
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from pymongo import IndexModel
+
+from database.index_audit import REPOSITORY_SHAPES, QueryShape, derive_indexes, main_query_shapes, reconcile_indexes, satisfies
+
+logger = logging.getLogger(__name__)
+
+# Index options that are not creation arguments
+INDEX_META_FIELDS = {"v", "ns", "key", "name", "background"}
+
+# ============ SAMPLE DOCUMENTS ============
+
+def sample_message(i: int) -> Dict[str, Any]:
+    return {
+        "conversation_id": str(ObjectId()) if i % 20 == 0 else f"conv_{i // 20}",
+        "user_id": f"user_{i % 50}",
+        "content": f"I have had a headache and mild fever for {i % 7} days, what should I do?",
+        "message_type": "user" if i % 2 == 0 else "assistant",
+        "created_at": datetime(2026, 1, 1) + timedelta(seconds=i),
+        "metadata": {"tokens": 40 + i % 30, "model": "command-r"},
+        "is_temporary": False
+    }
+
+def sample_user(i: int) -> Dict[str, Any]:
+    return {
+        "username": f"user_{i}",
+        "email": f"user_{i}@example.com",
+        "full_name": f"Test User {i}",
+        "is_active": True,
+        "is_verified": i % 3 == 0,
+        "created_at": datetime(2026, 1, 1) + timedelta(seconds=i),
+        "last_active_at": datetime(2026, 1, 2) + timedelta(seconds=i),
+        "preferences": {"language": "en", "units": "metric"}
+    }
+
+def sample_conversation(i: int) -> Dict[str, Any]:
+    return {
+        "user_id": f"user_{i % 50}",
+        "status": "active",
+        "external_id": f"ext_{i}",
+        "title": f"Conversation {i}",
+        "started_at": datetime(2026, 1, 1) + timedelta(seconds=i),
+        "updated_at": datetime(2026, 1, 1) + timedelta(seconds=i),
+        "message_count": 0,
+        "metadata": {"total_messages": 0, "source": "web"}
+    }
+
+SAMPLE_DOCUMENTS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "messages": sample_message,
+    "users": sample_user,
+    "conversations": sample_conversation
+}
+
+# ============ MEASUREMENT ============
+
+def index_model(index: Dict[str, Any]) -> IndexModel:
+    """IndexModel from a list_indexes() entry, keeping its options"""
+    options = {k: v for k, v in index.items() if k not in INDEX_META_FIELDS}
+    return IndexModel(list(index["key"].items()), name=index["name"], **options)
+
+def index_usage(collection) -> Optional[Dict[str, int]]:
+    """Accesses per index since the server started, or None if unsupported"""
+    try:
+        stats = collection.aggregate([{"$indexStats": {}}])
+        return {s["name"]: int(s.get("accesses", {}).get("ops", 0)) for s in stats}
+    except Exception as e:
+        logger.warning(f"$indexStats unavailable for {collection.name}: {e}")
+        return None
+
+def insert_throughput(collection, make_doc: Callable[[int], Dict[str, Any]],
+                      docs: int = 2000, batch: int = 100) -> float:
+    """Documents per second for batched inserts into collection"""
+    started = time.perf_counter()
+    for start in range(0, docs, batch):
+        collection.insert_many([make_doc(i) for i in range(start, min(start + batch, docs))], ordered=False)
+    return docs / (time.perf_counter() - started)
+
+def measure_write_overhead(database, collection: str, indexes: List[Dict[str, Any]],
+                           make_doc: Callable[[int], Dict[str, Any]], docs: int = 2000,
+                           batch: int = 100) -> Dict[str, Any]:
+    """Insert cost of each index on its own, relative to _id only"""
+    scratch = database[f"__index_cost_{collection}"]
+
+    def run(models: List[IndexModel]) -> float:
+        scratch.drop()
+        if models:
+            scratch.create_indexes(models)
+        return insert_throughput(scratch, make_doc, docs, batch)
+
+    try:
+        baseline = run([])
+        per_index = {}
+        for index in indexes:
+            if index["name"] == "_id_":
+                continue
+            rate = run([index_model(index)])
+            per_index[index["name"]] = {
+                "docs_per_sec": round(rate, 1),
+                "us_per_doc": round((1 / rate - 1 / baseline) * 1e6, 2),
+                "overhead_pct": round((baseline / rate - 1) * 100, 1)
+            }
+    finally:
+        scratch.drop()
+    return {"baseline_docs_per_sec": round(baseline, 1), "per_index": per_index}
+
+# ============ RECOMMENDATION ============
+
+def recommend_indexes(collection: str, indexes: List[Dict[str, Any]], shapes: List[QueryShape],
+                      usage: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Split existing indexes into keep/drop and list required ones that are missing"""
+    keep: Dict[str, str] = {}
+    for index in indexes:
+        if index["name"] == "_id_":
+            keep[index["name"]] = "primary key"
+        elif index.get("unique"):
+            keep[index["name"]] = "unique constraint"
+        elif "expireAfterSeconds" in index:
+            keep[index["name"]] = "TTL expiry"
+
+    required = [r for shape in shapes if shape.collection == collection for r in derive_indexes(shape)]
+    candidates = {
+        id(req): [
+            index for index in indexes
+            if satisfies(list(index["key"].items()), req, index.get("partialFilterExpression"))
+        ]
+        for req in required
+    }
+    # Indexes that have to be created anyway may make existing ones redundant
+    planned = [req for req in required if not candidates[id(req)]]
+    missing = [{"keys": req.keys, "query": req.source, "text": req.text} for req in planned]
+
+    for req in required:
+        if any(not p.text and satisfies(p.keys, req) for p in planned):
+            continue
+        if any(index["name"] in keep for index in candidates[id(req)]):
+            continue
+        if candidates[id(req)]:
+            # Narrowest index that does the job keeps write cost lowest
+            best = min(candidates[id(req)], key=lambda index: len(index["key"]))
+            keep[best["name"]] = f"serves {req.source}"
+
+    drop = []
+    for index in indexes:
+        if index["name"] in keep:
+            continue
+        ops = (usage or {}).get(index["name"], 0)
+        if ops:
+            keep[index["name"]] = f"used {ops} times since restart"
+        else:
+            drop.append({"name": index["name"], "keys": list(index["key"].items())})
+
+    return {
+        "keep": [{"name": name, "reason": reason} for name, reason in keep.items()],
+        "drop": drop,
+        "missing": missing
+    }
+
+def analyze_collection(database, collection: str, shapes: List[QueryShape],
+                       measure: bool = False, docs: int = 2000) -> Dict[str, Any]:
+    indexes = list(database[collection].list_indexes())
+    usage = index_usage(database[collection])
+    report = {
+        "collection": collection,
+        "indexes": [index["name"] for index in indexes],
+        "usage": usage,
+        "recommendation": recommend_indexes(collection, indexes, shapes, usage)
+    }
+    if measure and collection in SAMPLE_DOCUMENTS:
+        report["write_overhead"] = measure_write_overhead(
+            database, collection, indexes, SAMPLE_DOCUMENTS[collection], docs
+        )
+    return report
+
+def apply_recommendation(database, collection: str, recommendation: Dict[str, Any],
+                         shapes: List[QueryShape], allow_drop: Iterable[str] = ()) -> Dict[str, Any]:
+    """Create whatever the registered queries lack, then drop the unneeded
+    indexes named in allow_drop
+
+    Creating first means no query is left without an index in between.
+    Recommended drops that are not allowed are returned as skipped.
+    """
+    created = reconcile_indexes(database, [s for s in shapes if s.collection == collection])["created"]
+    allowed = set(allow_drop)
+    dropped, skipped = [], []
+    for index in recommendation["drop"]:
+        if index["name"] not in allowed:
+            skipped.append(index["name"])
+            continue
+        database[collection].drop_index(index["name"])
+        dropped.append(index["name"])
+        logger.info(f"Dropped index {index['name']} on {collection}")
+    return {"dropped": dropped, "skipped": skipped, "created": [c["name"] for c in created]}
+
+def main():
+    from dotenv import load_dotenv
+
+    from database.mongodb.pool import connection_manager
+
+    parser = argparse.ArgumentParser(description="Measure index cost and recommend a minimal index set")
+    parser.add_argument("--collection", action="append", help="Collection to analyze (repeatable)")
+    parser.add_argument("--measure", action="store_true", help="Measure per-index insert overhead")
+    parser.add_argument("--docs", type=int, default=2000, help="Documents inserted per measurement")
+    parser.add_argument("--apply", action="store_true", help="Create missing indexes and drop those given by --drop")
+    parser.add_argument("--drop", action="append", default=[], metavar="NAME",
+                        help="Index --apply may drop if recommended (repeatable)")
+    parser.add_argument("--storage", default=None, help="Conversation storage (turns | bucketed)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    database = connection_manager.database()
+    storage = (args.storage or os.getenv("CONVERSATION_STORAGE", "turns")).lower()
+    shapes = main_query_shapes(storage) + REPOSITORY_SHAPES
+
+    for collection in args.collection or ["messages", "conversations", "users"]:
+        report = analyze_collection(database, collection, shapes, args.measure, args.docs)
+        recommendation = report["recommendation"]
+        overhead = report.get("write_overhead", {}).get("per_index", {})
+
+        print(f"\n{collection}")
+        if report["usage"] is None:
+            print("  ($indexStats unavailable: recommendations use registered queries only)")
+        for entry in recommendation["keep"]:
+            cost = overhead.get(entry["name"])
+            print(f"  keep     {entry['name']:40} {entry['reason']}"
+                  + (f"  (+{cost['overhead_pct']}% insert cost)" if cost else ""))
+        for entry in recommendation["drop"]:
+            cost = overhead.get(entry["name"])
+            print(f"  drop     {entry['name']:40} no registered query, no ops on this node since restart"
+                  + (f"  (+{cost['overhead_pct']}% insert cost)" if cost else ""))
+        for entry in recommendation["missing"]:
+            print(f"  missing  {entry['keys']} for {entry['query']}")
+
+        if args.apply:
+            result = apply_recommendation(database, collection, recommendation, shapes, args.drop)
+            print(f"  applied: dropped {result['dropped']}, created {result['created']}")
+            if result["skipped"]:
+                print(f"  not dropped (pass --drop NAME after checking every node): {result['skipped']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# database/migrate_conversation_buckets.py
+"""
+Migrate per-turn conversation documents into bucketed session documents
+
+Streams `conversations` sorted by (session_id, timestamp), packs each
+session into buckets and writes them to `conversation_buckets`. The tool
+can be re-run after an interruption, also while bucketed writes are live:
+a session that already has buckets is compared by turn _id, skipped when
+every turn is bucketed, and otherwise re-bucketed from the union of its
+bucketed and missing turns. New buckets are written before the old ones are
+removed, and an old bucket is only removed while its count is unchanged; a
+turn pushed into it meanwhile makes the session go round again. The source
+collection is left untouched.
+
+Usage:
+    python -m database.migrate_conversation_buckets --bucket-size 50
+    python -m database.migrate_conversation_buckets --dry-run
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING
+
+from database.mongodb.pool import connection_manager
+from database.conversation_store import DEFAULT_BUCKET_SIZE, BucketedConversationStore, group_into_buckets, turn_key
+
+load_dotenv()
+
+# Re-bucketing rounds per session before giving up (each lost race with a live write costs one)
+MAX_RESUME_ROUNDS = 5
+
+def migrate(database, bucket_size=DEFAULT_BUCKET_SIZE, source="conversations",
+            target="conversation_buckets", dry_run=False, write_batch=500):
+    """Copy turns into buckets; returns migration counters"""
+    store = BucketedConversationStore(database, collection=target, bucket_size=bucket_size)
+    if not dry_run:
+        store.ensure_indexes()
+
+    stats = {"turns": 0, "sessions": 0, "skipped_sessions": 0, "resumed_sessions": 0, "buckets": 0}
+    pending = []
+
+    def write_session(turns):
+        # Checked as the cursor advances: distinct() over every session id outgrows one reply
+        if database[target].find_one({"session_id": turns[0]["session_id"]}, {"_id": 1}):
+            resume_session(turns)
+            return
+        buckets = group_into_buckets(turns, bucket_size)
+        stats["turns"] += len(turns)
+        stats["sessions"] += 1
+        stats["buckets"] += len(buckets)
+        pending.extend(buckets)
+        if len(pending) >= write_batch:
+            flush()
+
+    def resume_session(turns):
+        session_id = turns[0]["session_id"]
+        for _ in range(MAX_RESUME_ROUNDS):
+            old = list(database[target].find({"session_id": session_id}))
+            # Keyed by _id: an interrupted round leaves turns in two buckets
+            bucketed = {turn["_id"]: {**turn, "session_id": bucket["session_id"], "user_id": bucket.get("user_id")}
+                        for bucket in old for turn in bucket["turns"]}
+            missing = [turn for turn in turns if turn["_id"] not in bucketed]
+            if not missing and len(bucketed) == sum(len(bucket["turns"]) for bucket in old):
+                stats["skipped_sessions"] += 1
+                return
+            buckets = group_into_buckets(sorted([*bucketed.values(), *missing], key=turn_key), bucket_size)
+            if dry_run:
+                break
+            database[target].insert_many(buckets, ordered=False)
+            # A bucket that received a live turn since the find is kept; the next round folds it in
+            removed = sum(database[target].delete_one({"_id": bucket["_id"], "count": bucket["count"]}).deleted_count
+                          for bucket in old)
+            if removed == len(old):
+                break
+        else:
+            raise RuntimeError(f"Session {session_id} kept changing; re-run the migration once it is idle")
+        stats["turns"] += len(missing)
+        stats["resumed_sessions"] += 1
+        stats["buckets"] += len(buckets)
+
+    def flush():
+        if pending and not dry_run:
+            database[target].insert_many(pending, ordered=False)
+        pending.clear()
+
+    cursor = database[source].find(
+        {"session_id": {"$exists": True}},
+        {"_id": 1, "session_id": 1, "user_id": 1, "message": 1, "response": 1, "timestamp": 1}
+    ).sort([("session_id", ASCENDING), ("timestamp", ASCENDING)])
+
+    current_session, turns = None, []
+    for turn in cursor:
+        if turn["session_id"] != current_session:
+            if turns:
+                write_session(turns)
+            current_session, turns = turn["session_id"], []
+        turns.append(turn)
+    if turns:
+        write_session(turns)
+    flush()
+
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate conversations to bucketed storage")
+    parser.add_argument("--bucket-size", type=int, default=DEFAULT_BUCKET_SIZE)
+    parser.add_argument("--source", default="conversations")
+    parser.add_argument("--target", default="conversation_buckets")
+    parser.add_argument("--dry-run", action="store_true", help="Count buckets without writing")
+    args = parser.parse_args()
+
+    database = connection_manager.database()
+
+    started = time.perf_counter()
+    stats = migrate(database, args.bucket_size, args.source, args.target, args.dry_run)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'[dry run] ' if args.dry_run else ''}Migrated {stats['turns']} turns from "
+          f"{stats['sessions']} sessions into {stats['buckets']} buckets "
+          f"({stats['resumed_sessions']} sessions completed, {stats['skipped_sessions']} already migrated) "
+          f"in {elapsed:.1f}s")
+    print("Set CONVERSATION_STORAGE=bucketed to serve reads and writes from buckets")
+
+if __name__ == "__main__":
+    main()
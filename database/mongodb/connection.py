@@ -12,6 +12,8 @@ import os
 from dotenv import load_dotenv
 import logging
 
+from database.mongodb.pool import connection_manager
+
 load_dotenv()
 logger = logging.getLogger(__name__)
 
@@ -38,14 +40,8 @@ class MongoDBConnection:
             # Build connection string
             connection_string = f"mongodb+srv://{username}:{password}@{cluster}/?retryWrites=true&w=majority"
             
-            self._client = AsyncIOMotorClient(
-                connection_string,
-                maxPoolSize=50,
-                minPoolSize=10,
-                maxIdleTimeMS=30000,
-                connectTimeoutMS=5000,
-                serverSelectionTimeoutMS=5000
-            )
+            # Shared Motor client; pool sizes come from MONGO_*_POOL_SIZE
+            self._client = connection_manager.async_client(connection_string)
             
             # Test connection
             await self._client.admin.command('ping')
@@ -55,10 +51,11 @@ class MongoDBConnection:
         return self._db
     
     async def disconnect(self):
-        """Close MongoDB connection"""
+        """Release the shared client (the manager owns and closes the pool)"""
         if self._client:
-            self._client.close()
-            logger.info("MongoDB connection closed")
+            self._client = None
+            self._db = None
+            logger.info("MongoDB connection released")
     
     async def get_db(self) -> AsyncIOMotorDatabase:
         """Get database instance"""
@@ -0,0 +1,293 @@
+# database/mongodb/pool.py
+"""
+Process-wide MongoDB connection manager
+One MongoClient and at most one Motor client per URI, sized from the
+environment and created on first use. Clients connect lazily, so importing
+a module never opens sockets. Pool activity (checked-out connections,
+checkout wait time, failures) is recorded by a pymongo ConnectionPoolListener.
+
+Environment:
+    MONGO_MAX_POOL_SIZE                 connections per pool (default 50)
+    MONGO_MIN_POOL_SIZE                 warm connections kept open (default 0)
+    MONGO_MAX_IDLE_MS                   idle connection lifetime (default 30000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS         max wait for a free connection (default 0 = unbounded)
+    MONGO_CONNECT_TIMEOUT_MS            (default 5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS   (default 5000)
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import pymongo
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+load_dotenv()
+
+def resolve_mongo_uri() -> Optional[str]:
+    """MONGODB_URI, or an Atlas URI built from MONGO_USERNAME/PASSWORD/CLUSTER"""
+    uri = os.getenv("MONGODB_URI")
+    if uri:
+        return uri
+    username = os.getenv("MONGO_USERNAME")
+    password = os.getenv("MONGO_PASSWORD")
+    cluster = os.getenv("MONGO_CLUSTER")
+    if all([username, password, cluster]):
+        return f"mongodb+srv://{username}:{password}@{cluster}/?retryWrites=true&w=majority"
+    return None
+
+def pool_options() -> Dict[str, Any]:
+    """Client keyword arguments shared by the sync and async clients"""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_MS", "30000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    }
+    wait_queue_timeout = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "0"))
+    if wait_queue_timeout:
+        options["waitQueueTimeoutMS"] = wait_queue_timeout
+    return options
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool utilization across every client the manager owns
+
+    Checkout wait is measured between the started and checked-out events,
+    which pymongo emits on the thread doing the checkout.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools = 0
+            self.open_connections = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.pool_clears = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pools": self.pools,
+                "open_connections": self.open_connections,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_max * 1000, 3),
+                "pool_clears": self.pool_clears
+            }
+
+    # ============ LISTENER EVENTS ============
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        waited = time.perf_counter() - started if started else 0.0
+        self._local.started = None
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+class LazyCollection:
+    """Collection handle that resolves the client on first use"""
+
+    def __init__(self, database: "LazyDatabase", name: str):
+        self._database = database
+        self._name = name
+        self._collection = None
+
+    def _resolve(self):
+        if self._collection is None:
+            self._collection = self._database._resolve()[self._name]
+        return self._collection
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __getitem__(self, name):
+        return self._resolve()[name]
+
+class LazyDatabase:
+    """Database handle for module-level wiring
+
+    Even with connect=False, pymongo resolves mongodb+srv DNS records when a
+    client is constructed; this defers that until a query actually runs.
+    """
+
+    def __init__(self, manager: "ConnectionManager", name: Optional[str] = None, uri: Optional[str] = None):
+        self._manager = manager
+        self._name = name
+        self._uri = uri
+
+    def _resolve(self):
+        return self._manager.database(self._name, self._uri)
+
+    @property
+    def name(self) -> str:
+        return self._name or os.getenv("DATABASE_NAME", "healthbot")
+
+    def __getitem__(self, name) -> LazyCollection:
+        return LazyCollection(self, name)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+class ConnectionManager:
+    """Shared MongoClient / AsyncIOMotorClient per URI
+
+    pymongo and Motor cannot share a socket pool, so a process that uses
+    both holds at most two pools per deployment, each capped by
+    MONGO_MAX_POOL_SIZE.
+    """
+
+    def __init__(self, options: Optional[Dict[str, Any]] = None):
+        self._options = options
+        self._lock = threading.Lock()
+        self._clients: Dict[str, Any] = {}
+        self._async_clients: Dict[str, Any] = {}
+        self.metrics = PoolMetrics()
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        return self._options if self._options is not None else pool_options()
+
+    def _uri(self, uri: Optional[str]) -> Optional[str]:
+        return uri or resolve_mongo_uri()
+
+    def client(self, uri: Optional[str] = None):
+        """Shared pymongo client; sockets open on the first operation"""
+        uri = self._uri(uri)
+        key = uri or ""
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = pymongo.MongoClient(
+                    uri, connect=False, event_listeners=[self.metrics], **self.options
+                )
+            return self._clients[key]
+
+    def database(self, name: Optional[str] = None, uri: Optional[str] = None):
+        return self.client(uri)[name or os.getenv("DATABASE_NAME", "healthbot")]
+
+    def lazy_database(self, name: Optional[str] = None, uri: Optional[str] = None) -> LazyDatabase:
+        """Handle that creates the client on first query, not at import"""
+        return LazyDatabase(self, name, uri)
+
+    def async_client(self, uri: Optional[str] = None):
+        """Shared Motor client (imported lazily: sync-only processes never load it)"""
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        uri = self._uri(uri)
+        key = uri or ""
+        with self._lock:
+            if key not in self._async_clients:
+                self._async_clients[key] = AsyncIOMotorClient(
+                    uri, event_listeners=[self.metrics], **self.options
+                )
+            return self._async_clients[key]
+
+    def async_database(self, name: Optional[str] = None, uri: Optional[str] = None):
+        return self.async_client(uri)[name or os.getenv("DATABASE_NAME", "healthbot")]
+
+    # ============ HEALTH ============
+
+    def ping(self, uri: Optional[str] = None) -> Dict[str, Any]:
+        """Round trip to the server through the shared sync pool"""
+        started = time.perf_counter()
+        try:
+            self.client(uri).admin.command("ping")
+            return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    async def async_ping(self, uri: Optional[str] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            await self.async_client(uri).admin.command("ping")
+            return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def stats(self) -> Dict[str, Any]:
+        max_pool_size = self.options["maxPoolSize"]
+        snapshot = self.metrics.snapshot()
+        return {
+            "sync_clients": len(self._clients),
+            "async_clients": len(self._async_clients),
+            "max_pool_size": max_pool_size,
+            "utilization": round(snapshot["checked_out"] / max_pool_size, 3) if max_pool_size else 0.0,
+            **snapshot
+        }
+
+    def health(self) -> Dict[str, Any]:
+        return {"ping": self.ping(), "pool": self.stats()}
+
+    def close(self):
+        with self._lock:
+            for client in list(self._clients.values()) + list(self._async_clients.values()):
+                client.close()
+            self._clients.clear()
+            self._async_clients.clear()
+
+# Global connection manager
+connection_manager = ConnectionManager()
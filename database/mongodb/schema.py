@@ -14,71 +14,51 @@ import logging
 logger = logging.getLogger(__name__)
 
 class MongoDBIndexes:
-    """All optimized indexes for HealthBot AI"""
+    """All optimized indexes for HealthBot AI
+    
+    users, conversations and messages carry only the indexes a registered
+    query needs plus unique/TTL constraints (see database/index_cost.py);
+    every extra index is maintained on each insert and update.
+    """
     
     @staticmethod
-    async def create_user_indexes(collection):
-        """Create indexes for Users collection"""
-        indexes = [
-            # Primary unique index on email
+    def user_indexes() -> List[IndexModel]:
+        return [
+            # Primary unique index on email (also serves email lookups)
             IndexModel([("email", ASCENDING)], unique=True, name="idx_email_unique"),
             
-            # Compound index for authentication
-            IndexModel([("email", ASCENDING), ("is_active", ASCENDING)], name="idx_auth"),
-            
-            # Index for sorting by creation date
-            IndexModel([("created_at", DESCENDING)], name="idx_created_at"),
+            # Login and registration look users up by username
+            IndexModel([("username", ASCENDING)], unique=True, sparse=True, name="idx_username_unique"),
             
-            # Partial index for active users only
+            # Partial index for active users only, newest activity first
             IndexModel(
-                [("last_active_at", DESCENDING)],
+                [("is_verified", ASCENDING), ("last_active_at", DESCENDING)],
                 partialFilterExpression={"is_active": True},
                 name="idx_active_users"
             ),
             
-            # Text search index for user lookup
-            IndexModel(
-                [("full_name", TEXT), ("email", TEXT)],
-                default_language="english",
-                weights={"full_name": 10, "email": 5},
-                name="idx_user_text_search"
-            ),
-            
-            # Wildcard index for flexible user preferences
-            IndexModel([("preferences.$**", ASCENDING)], name="idx_preferences"),
-            
             # TTL index for temporary users cleanup
             IndexModel(
                 [("created_at", ASCENDING)],
                 expireAfterSeconds=2592000,  # 30 days
                 partialFilterExpression={"is_permanent": False},
                 name="idx_temp_users_ttl"
-            ),
-            
-            # Geospatial index for location-based services (future)
-            IndexModel([("location", GEO2D)], name="idx_location", sparse=True)
+            )
         ]
-        
-        try:
-            await collection.create_indexes(indexes)
-            logger.info("✅ User indexes created successfully")
-        except Exception as e:
-            logger.error(f"Error creating user indexes: {e}")
     
     @staticmethod
-    async def create_conversation_indexes(collection):
-        """Create indexes for Conversations collection"""
-        indexes = [
-            # Most common query: get user conversations sorted by date
+    def conversation_indexes() -> List[IndexModel]:
+        return [
+            # Most common query: a user's active conversations, newest first (keyset on _id)
             IndexModel(
-                [("user_id", ASCENDING), ("started_at", DESCENDING), ("status", ASCENDING)],
+                [("user_id", ASCENDING), ("status", ASCENDING), ("started_at", DESCENDING), ("_id", DESCENDING)],
                 name="idx_user_conversations"
             ),
             
-            # Index for active conversations monitoring
+            # Recently updated conversations for the sidebar
             IndexModel(
-                [("status", ASCENDING), ("updated_at", DESCENDING)],
-                name="idx_active_conversations"
+                [("user_id", ASCENDING), ("status", ASCENDING), ("updated_at", DESCENDING)],
+                name="idx_user_recent_conversations"
             ),
             
             # Unique constraint for external_id per user
@@ -87,54 +67,18 @@ class MongoDBIndexes:
                 unique=True,
                 name="idx_user_external_id",
                 sparse=True
-            ),
-            
-            # Index for date range queries
-            IndexModel(
-                [("started_at", ASCENDING), ("ended_at", ASCENDING)],
-                name="idx_date_range"
-            ),
-            
-            # Index for conversation analysis
-            IndexModel(
-                [("metadata.total_messages", ASCENDING)],
-                name="idx_message_count",
-                sparse=True
-            ),
-            
-            # Wildcard for flexible metadata queries
-            IndexModel([("metadata.$**", ASCENDING)], name="idx_metadata"),
-            
-            # Partial index for ongoing conversations
-            IndexModel(
-                [("user_id", ASCENDING), ("started_at", ASCENDING)],
-                partialFilterExpression={"status": "active"},
-                name="idx_ongoing_conversations"
             )
         ]
-        
-        try:
-            await collection.create_indexes(indexes)
-            logger.info("✅ Conversation indexes created successfully")
-        except Exception as e:
-            logger.error(f"Error creating conversation indexes: {e}")
     
     @staticmethod
-    async def create_message_indexes(collection):
-        """Create indexes for Messages collection (most critical for performance)"""
-        indexes = [
-            # Compound index for conversation timeline
+    def message_indexes() -> List[IndexModel]:
+        return [
+            # Conversation timeline, keyset-paged on (created_at, _id)
             IndexModel(
-                [("conversation_id", ASCENDING), ("created_at", ASCENDING)],
+                [("conversation_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
                 name="idx_conversation_timeline"
             ),
             
-            # Index for user message history
-            IndexModel(
-                [("user_id", ASCENDING), ("created_at", DESCENDING)],
-                name="idx_user_messages"
-            ),
-            
             # Text search index for message content
             IndexModel(
                 [("content", TEXT)],
@@ -143,39 +87,63 @@ class MongoDBIndexes:
                 name="idx_message_content_search"
             ),
             
-            # Compound index for filtering by message type
-            IndexModel(
-                [("message_type", ASCENDING), ("created_at", DESCENDING)],
-                name="idx_message_type"
-            ),
-            
-            # Index for vector similarity search (for RAG)
-            IndexModel(
-                [("embedding", "2dsphere")],
-                name="idx_embedding",
-                sparse=True
-            ),
-            
-            # Index for analytics queries
-            IndexModel(
-                [("user_id", ASCENDING), ("message_type", ASCENDING), ("created_at", DESCENDING)],
-                name="idx_user_message_analytics"
-            ),
-            
-            # TTL index for temporary message cleanup
+            # TTL index for temporary message cleanup (partial, so regular messages skip it)
             IndexModel(
                 [("is_temporary", ASCENDING), ("created_at", ASCENDING)],
                 expireAfterSeconds=86400,  # 24 hours
                 partialFilterExpression={"is_temporary": True},
                 name="idx_temp_messages_ttl"
-            ),
-            
-            # Wildcard for message metadata
-            IndexModel([("metadata.$**", ASCENDING)], name="idx_message_metadata")
+            )
         ]
+    
+    @staticmethod
+    async def drop_changed_indexes(collection, models: List[IndexModel]) -> List[str]:
+        """Drop existing indexes whose name now comes with different keys
         
+        create_indexes fails with IndexKeySpecsConflict on such an index, and
+        since a collection's indexes go in one command, none of them would be
+        created. Text indexes are stored as _fts/_ftsx keys and are skipped.
+        """
+        existing = await collection.index_information()
+        dropped = []
+        for model in models:
+            spec = model.document
+            keys = list(spec["key"].items())
+            current = existing.get(spec["name"])
+            if current is None or any(direction == TEXT for _, direction in keys):
+                continue
+            if [(field, direction) for field, direction in current["key"]] != keys:
+                await collection.drop_index(spec["name"])
+                dropped.append(spec["name"])
+                logger.info(f"Dropped index {spec['name']} on {collection.name} to recreate it with {keys}")
+        return dropped
+    
+    @staticmethod
+    async def create_user_indexes(collection):
+        """Create indexes for Users collection"""
         try:
-            await collection.create_indexes(indexes)
+            await MongoDBIndexes.drop_changed_indexes(collection, MongoDBIndexes.user_indexes())
+            await collection.create_indexes(MongoDBIndexes.user_indexes())
+            logger.info("✅ User indexes created successfully")
+        except Exception as e:
+            logger.error(f"Error creating user indexes: {e}")
+    
+    @staticmethod
+    async def create_conversation_indexes(collection):
+        """Create indexes for Conversations collection"""
+        try:
+            await MongoDBIndexes.drop_changed_indexes(collection, MongoDBIndexes.conversation_indexes())
+            await collection.create_indexes(MongoDBIndexes.conversation_indexes())
+            logger.info("✅ Conversation indexes created successfully")
+        except Exception as e:
+            logger.error(f"Error creating conversation indexes: {e}")
+    
+    @staticmethod
+    async def create_message_indexes(collection):
+        """Create indexes for Messages collection (most critical for performance)"""
+        try:
+            await MongoDBIndexes.drop_changed_indexes(collection, MongoDBIndexes.message_indexes())
+            await collection.create_indexes(MongoDBIndexes.message_indexes())
             logger.info("✅ Message indexes created successfully")
         except Exception as e:
             logger.error(f"Error creating message indexes: {e}")
@@ -286,7 +254,7 @@ class MongoDBSchema:
         collections_config = {
             "users": {
                 "validator": {
-                    "\": {
+                    "$jsonSchema": {
                         "bsonType": "object",
                         "required": ["email", "full_name", "created_at"],
                         "properties": {
@@ -300,7 +268,7 @@ class MongoDBSchema:
             },
             "conversations": {
                 "validator": {
-                    "\": {
+                    "$jsonSchema": {
                         "bsonType": "object",
                         "required": ["user_id", "started_at"],
                         "properties": {
@@ -311,7 +279,7 @@ class MongoDBSchema:
             },
             "messages": {
                 "validator": {
-                    "\": {
+                    "$jsonSchema": {
                         "bsonType": "object",
                         "required": ["conversation_id", "user_id", "content", "message_type"],
                         "properties": {
@@ -325,7 +293,7 @@ class MongoDBSchema:
         for coll_name, config in collections_config.items():
             try:
                 # Create collection if not exists
-                if coll_name not await db.list_collection_names():
+                if coll_name not in await db.list_collection_names():
                     await db.create_collection(coll_name, **config)
                     logger.info(f"✅ Created collection: {coll_name}")
             except Exception as e:
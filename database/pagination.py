@@ -0,0 +1,71 @@
+# database/pagination.py
+"""
+Keyset (seek) pagination helpers shared by the sync stores and async repositories
+A page cursor is the (sort value, _id) of the last document returned,
+so every page costs one index seek instead of skipping N documents.
+"""
+
+import base64
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+
+ASCENDING = 1
+DESCENDING = -1
+
+# Stored datetimes come back naive, so cursors must decode the same way
+JSON_OPTIONS = json_util.DEFAULT_JSON_OPTIONS.with_options(tz_aware=False)
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    """Opaque cursor pointing just past doc"""
+    raw = json_util.dumps({"v": doc.get(sort_field), "id": doc["_id"]})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")), json_options=JSON_OPTIONS)
+        return data["v"], data["id"]
+    except Exception as e:
+        raise InvalidCursor(f"Invalid pagination cursor: {e}")
+
+def keyset_filter(base: Dict[str, Any], sort_field: str, direction: int = ASCENDING,
+                  after: Optional[str] = None) -> Dict[str, Any]:
+    """Add the 'strictly after cursor' predicate to base"""
+    if not after:
+        return dict(base)
+    value, last_id = decode_cursor(after)
+    op = "$gt" if direction == ASCENDING else "$lt"
+    return {
+        **base,
+        "$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, "_id": {op: last_id}}
+        ]
+    }
+
+def keyset_sort(sort_field: str, direction: int = ASCENDING) -> List[Tuple[str, int]]:
+    """_id tiebreaker keeps the order total when sort values collide"""
+    return [(sort_field, direction), ("_id", direction)]
+
+def split_page(docs: List[Dict[str, Any]], limit: int, sort_field: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """docs were fetched with limit + 1; trim and return the next cursor"""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1], sort_field)
+    return docs, None
+
+def make_etag(*parts: Any) -> str:
+    """Weak ETag from the parts that identify a response's content"""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
@@ -9,6 +9,7 @@ from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorCollection
 from pymongo import ReturnDocument
 from database.mongodb.connection import mongodb
+from database.pagination import ASCENDING, keyset_filter, keyset_sort, split_page
 import logging
 
 logger = logging.getLogger(__name__)
@@ -79,6 +80,28 @@ class BaseRepository:
         
         return results
     
+    async def find_page(
+        self,
+        filter: Dict[str, Any],
+        sort_field: str,
+        direction: int = ASCENDING,
+        limit: int = 100,
+        after: Optional[str] = None,
+        projection: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Keyset pagination on (sort_field, _id); pass next_cursor back as after"""
+        collection = await self.get_collection()
+        cursor = collection.find(
+            keyset_filter(filter, sort_field, direction, after),
+            projection
+        ).sort(keyset_sort(sort_field, direction)).limit(limit + 1)
+        
+        docs = [doc async for doc in cursor]
+        docs, next_cursor = split_page(docs, limit, sort_field)
+        for doc in docs:
+            doc["_id"] = str(doc["_id"])
+        return {"items": docs, "next_cursor": next_cursor}
+    
     async def update(
         self,
         id: str,
@@ -91,7 +114,7 @@ class BaseRepository:
         
         result = await collection.find_one_and_update(
             {"_id": ObjectId(id)},
-            {"\": data},
+            {"$set": data},
             return_document=ReturnDocument.AFTER,
             upsert=upsert
         )
@@ -154,14 +177,15 @@ class ConversationRepository(BaseRepository):
         self,
         user_id: str,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[Dict[str, Any]]:
-        """Get user conversations with pagination (uses compound index)"""
-        return await self.find_many(
+        after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get a page of user conversations, newest first (uses compound index)"""
+        return await self.find_page(
             {"user_id": user_id, "status": "active"},
-            sort=[("started_at", -1)],
+            "started_at",
+            direction=-1,
             limit=limit,
-            skip=offset
+            after=after
         )
     
     async def get_active_conversation(self, user_id: str) -> Optional[Dict[str, Any]]:
@@ -178,17 +202,19 @@ class MessageRepository(BaseRepository):
         self,
         conversation_id: str,
         limit: int = 100,
-        before_timestamp: datetime = None
-    ) -> List[Dict[str, Any]]:
-        """Get messages in a conversation (uses compound index)"""
+        before_timestamp: datetime = None,
+        after: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Get a page of messages in a conversation (uses compound index)"""
         filter = {"conversation_id": conversation_id}
         if before_timestamp:
-            filter["created_at"] = {"\": before_timestamp}
+            filter["created_at"] = {"$lt": before_timestamp}
         
-        return await self.find_many(
+        return await self.find_page(
             filter,
-            sort=[("created_at", 1)],
-            limit=limit
+            "created_at",
+            limit=limit,
+            after=after
         )
     
     async def search_messages(
@@ -202,7 +228,7 @@ class MessageRepository(BaseRepository):
         cursor = collection.find(
             {
                 "user_id": user_id,
-                "\": {"\": search_term}
+                "$text": {"$search": search_term}
             }
         ).sort([("created_at", -1)]).limit(limit)
         
@@ -227,9 +253,9 @@ class MedicalKnowledgeRepository(BaseRepository):
         collection = await self.get_collection()
         
         cursor = collection.find(
-            {"\": {"\": search_query}},
-            {"score": {"\": "textScore"}}
-        ).sort([("score", {"\": "textScore"}), ("confidence_score", -1)]).limit(limit)
+            {"$text": {"$search": search_query}},
+            {"score": {"$meta": "textScore"}}
+        ).sort([("score", {"$meta": "textScore"}), ("confidence_score", -1)]).limit(limit)
         
         results = []
         async for doc in cursor:
@@ -0,0 +1,196 @@
+# database/session_index.py
+"""
+Per-user session index: one summary document per chat session
+    {user_id, session_id, title, created_at, updated_at, turn_count}
+Kept up to date incrementally as transcript batches are flushed, so the
+session list is an index range scan instead of an aggregation over every
+conversation turn.
+
+Usage (backfill from existing transcripts):
+    python -m database.session_index --rebuild
+"""
+
+import argparse
+import os
+import sys
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from database.conversation_store import turn_key
+from database.pagination import keyset_filter, keyset_sort, split_page
+
+DUPLICATE_KEY_ERROR = 11000
+SESSION_FIELDS = {"_id": 1, "session_id": 1, "title": 1, "created_at": 1, "updated_at": 1, "turn_count": 1}
+
+def session_title(message: Optional[str]) -> str:
+    """Title shown in the session list: the start of the first message"""
+    if not message:
+        return "New Chat"
+    return message[:40] + ("..." if len(message) > 40 else "")
+
+class SessionIndex:
+    """Maintained summary of each user's chat sessions"""
+
+    def __init__(self, database, collection: str = "sessions"):
+        self.collection = database[collection]
+
+    def ensure_indexes(self):
+        self.collection.create_index(
+            [("user_id", ASCENDING), ("session_id", ASCENDING)],
+            name="idx_user_session",
+            unique=True
+        )
+        # Matches keyset_sort("updated_at", DESCENDING), so pages never sort in memory
+        self.collection.create_index(
+            [("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)],
+            name="idx_user_recent"
+        )
+
+    def _summary_ops(self, turns: List[Dict[str, Any]]) -> List[UpdateOne]:
+        """One upsert per session touched by the batch"""
+        by_session = defaultdict(list)
+        for turn in turns:
+            by_session[(turn.get("user_id"), turn["session_id"])].append(turn)
+
+        ops = []
+        for (user_id, session_id), session_turns in by_session.items():
+            session_turns.sort(key=turn_key)
+            first, last = session_turns[0], session_turns[-1]
+            ops.append(UpdateOne(
+                {"user_id": user_id, "session_id": session_id},
+                {
+                    "$setOnInsert": {"title": session_title(first.get("message"))},
+                    "$min": {"created_at": first["timestamp"]},
+                    "$max": {"updated_at": last["timestamp"]},
+                    "$inc": {"turn_count": len(session_turns)}
+                },
+                upsert=True
+            ))
+        return ops
+
+    def record_turns(self, turns: List[Dict[str, Any]]):
+        """Fold newly persisted turns into their session summaries
+
+        Only pass turns that were actually written, otherwise replays
+        would be counted twice; batches that may already be partly stored
+        go through refresh() instead.
+        """
+        ops = self._summary_ops(turns)
+        if not ops:
+            return
+        try:
+            self.collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Two workers upserting the same new session: the loser retries as an update
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            self.collection.bulk_write([ops[err["index"]] for err in errors], ordered=False)
+
+    def list_sessions(self, user_id: str, limit: int = 20,
+                      after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Most recently active sessions first, with the cursor for the next page
+
+        updated_at moves as users keep chatting, so a session that becomes
+        active mid-pagination reappears on the first page rather than later ones.
+        """
+        docs = list(self.collection.find(
+            keyset_filter({"user_id": user_id}, "updated_at", DESCENDING, after),
+            SESSION_FIELDS
+        ).sort(keyset_sort("updated_at", DESCENDING)).limit(limit + 1))
+        return split_page(docs, limit, "updated_at")
+
+    def get_sessions(self, user_id: str, session_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not session_ids:
+            return {}
+        return {
+            doc["session_id"]: doc
+            for doc in self.collection.find({"user_id": user_id, "session_id": {"$in": session_ids}}, SESSION_FIELDS)
+        }
+
+    def refresh(self, store, turns: List[Dict[str, Any]]) -> int:
+        """Recompute the summaries of the sessions these turns belong to
+
+        Idempotent, so it is safe for replayed batches: the turns may or may
+        not have been stored (and counted) by an earlier attempt.
+        """
+        sessions = {(turn.get("user_id"), turn["session_id"]) for turn in turns}
+        return self.rebuild(store, sessions) if sessions else 0
+
+    def rebuild(self, store, sessions: Optional[Set[Tuple[Any, str]]] = None) -> int:
+        """Recompute summaries from stored transcripts (every session, or the
+        given (user_id, session_id) pairs); returns sessions written"""
+        pipeline = []
+        if sessions is not None:
+            pipeline.append({"$match": {"$or": [
+                {"user_id": user_id, "session_id": session_id} for user_id, session_id in sessions
+            ]}})
+        if store.name == "bucketed":
+            pipeline += [
+                {"$unwind": "$turns"},
+                {"$project": {
+                    "user_id": 1,
+                    "session_id": 1,
+                    "message": "$turns.message",
+                    "timestamp": "$turns.timestamp"
+                }}
+            ]
+        else:
+            pipeline.append({"$match": {"session_id": {"$exists": True}}})
+        pipeline += [
+            {"$sort": {"timestamp": ASCENDING}},
+            {"$group": {
+                "_id": {"user_id": "$user_id", "session_id": "$session_id"},
+                "first_message": {"$first": "$message"},
+                "created_at": {"$min": "$timestamp"},
+                "updated_at": {"$max": "$timestamp"},
+                "turn_count": {"$sum": 1}
+            }}
+        ]
+
+        ops, written = [], 0
+        for row in store.collection.aggregate(pipeline, allowDiskUse=True):
+            key = row["_id"]
+            ops.append(UpdateOne(
+                {"user_id": key.get("user_id"), "session_id": key["session_id"]},
+                {"$set": {
+                    "title": session_title(row.get("first_message")),
+                    "created_at": row["created_at"],
+                    "updated_at": row["updated_at"],
+                    "turn_count": row["turn_count"]
+                }},
+                upsert=True
+            ))
+            if len(ops) >= 500:
+                self.collection.bulk_write(ops, ordered=False)
+                written, ops = written + len(ops), []
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+            written += len(ops)
+        return written
+
+def main():
+    from dotenv import load_dotenv
+
+    from database.conversation_store import build_conversation_store
+    from database.mongodb.pool import connection_manager
+
+    parser = argparse.ArgumentParser(description="Maintain the per-user session index")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all summaries from transcripts")
+    args = parser.parse_args()
+
+    load_dotenv()
+    database = connection_manager.database()
+    index = SessionIndex(database)
+    index.ensure_indexes()
+    if args.rebuild:
+        count = index.rebuild(build_conversation_store(database))
+        print(f"Rebuilt {count} session summaries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,503 @@
+# database/sqlite_store.py
+"""
+SQLite storage backend for single-node and edge deployments (STORAGE_BACKEND=sqlite)
+Works on the config/healthbot.db schema (users, conversations, sessions,
+feedback) and implements the interfaces main.py uses on MongoDB:
+
+  SQLiteUsers                find_one / insert_one on users
+  SQLiteConversationStore    the conversation_store interface (insert_turns,
+                             context_turns, history, iter_history, history_version)
+  SQLiteSessionIndex         the SessionIndex interface (record_turns,
+                             refresh, list_sessions, get_sessions)
+
+Each thread gets its own connection (sqlite3 connections are not safe to
+share), opened in WAL mode so readers never block the writer. Statements
+use ? parameters and are compiled once per connection (sqlite3's statement
+cache); every write batch is a single BEGIN IMMEDIATE transaction.
+
+Columns the app needs beyond the original schema (conversations.turn_id,
+sessions.title/updated_at/turn_count) are added in place, and the indexes
+(session_id, timestamp, turn_id), (user_id, session_id) and (user_id,
+updated_at) are created on first use; session ids are unique per user, as
+in MongoDB. Turn _ids and keyset cursors stay ObjectId-based, so the API is
+unchanged.
+
+Environment:
+    SQLITE_PATH            database file (default config/healthbot.db; not
+                           :memory:, which would give each thread its own database)
+    SQLITE_BUSY_TIMEOUT_MS wait for the write lock (default 5000)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from pymongo.results import InsertOneResult
+
+from database.conversation_store import turn_key
+from database.pagination import decode_cursor, split_page
+from database.session_index import session_title
+
+DEFAULT_PATH = os.path.join("config", "healthbot.db")
+HISTORY_PAGE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    email TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    full_name TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    role TEXT DEFAULT 'user'
+);
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    username TEXT NOT NULL,
+    session_id TEXT,
+    message TEXT NOT NULL,
+    response TEXT NOT NULL,
+    ai_used BOOLEAN DEFAULT 0,
+    model_used TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    conversation_id INTEGER,
+    rating INTEGER NOT NULL,
+    comment TEXT,
+    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+"""
+
+# Added to the original tables; (table, column, definition)
+MIGRATIONS = [
+    ("conversations", "turn_id", "TEXT"),
+    ("sessions", "title", "TEXT"),
+    ("sessions", "updated_at", "TIMESTAMP"),
+    ("sessions", "turn_count", "INTEGER DEFAULT 0"),
+]
+
+# The original sessions table has UNIQUE (session_id), but session ids are only
+# unique per user (main.py defaults to session_<unix seconds>); SQLite cannot
+# drop a column constraint, so the table is copied without it
+SESSIONS_REBUILD = """
+CREATE TABLE sessions_rebuilt (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    title TEXT,
+    updated_at TIMESTAMP,
+    turn_count INTEGER DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+INSERT INTO sessions_rebuilt (id, session_id, user_id, created_at, title, updated_at, turn_count)
+    SELECT id, session_id, user_id, created_at, title, updated_at, turn_count FROM sessions;
+DROP TABLE sessions;
+ALTER TABLE sessions_rebuilt RENAME TO sessions;
+"""
+
+INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_conversations_turn ON conversations (turn_id);
+CREATE INDEX IF NOT EXISTS idx_conversations_session_ts ON conversations (session_id, timestamp, turn_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_user_session ON sessions (user_id, session_id);
+CREATE INDEX IF NOT EXISTS idx_sessions_user_recent ON sessions (user_id, updated_at);
+"""
+
+def to_sql_time(value: Optional[datetime]) -> Optional[str]:
+    """Fixed-width text, so string order is time order (turns are stored at ms precision)"""
+    return value.isoformat(sep=" ", timespec="milliseconds") if value else None
+
+def from_sql_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def to_object_id(value: str) -> Any:
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+class SQLiteEngine:
+    """Connection per thread on one database file"""
+
+    def __init__(self, path: Optional[str] = None, busy_timeout_ms: Optional[int] = None):
+        self.path = path or os.getenv("SQLITE_PATH", DEFAULT_PATH)
+        self.busy_timeout_ms = busy_timeout_ms or int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[sqlite3.Connection] = []
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self.transactions = 0
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection; the schema is created before first use, so
+        requests that arrive before warm-up never see missing tables"""
+        conn = self._thread_connection()
+        if not self._schema_ready:
+            self.ensure_schema()
+        return conn
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # isolation_level=None: reads autocommit, writes use explicit transactions
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False,
+                                   cached_statements=256, timeout=self.busy_timeout_ms / 1000)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self, conn: Optional[sqlite3.Connection] = None) -> Iterator[sqlite3.Connection]:
+        """One BEGIN IMMEDIATE ... COMMIT; the write lock is taken up front, so no upgrade deadlocks"""
+        conn = conn or self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        self.transactions += 1
+
+    def ensure_schema(self):
+        """Create missing tables, columns and indexes; backfill legacy rows once"""
+        with self._schema_lock:
+            if not self._schema_ready:
+                self._migrate()
+
+    def _migrate(self):
+        with self.transaction(self._thread_connection()) as conn:
+            for statement in filter(str.strip, SCHEMA.split(";")):
+                conn.execute(statement)
+            for table, column, definition in MIGRATIONS:
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            if self._session_id_globally_unique(conn):
+                for statement in filter(str.strip, SESSIONS_REBUILD.split(";")):
+                    conn.execute(statement)
+            # Rows written by the old SQLite server: ObjectId-shaped turn ids, summaries from their turns
+            conn.execute("UPDATE conversations SET turn_id = printf('%024x', id) WHERE turn_id IS NULL")
+            # CURRENT_TIMESTAMP has no milliseconds; pad so text order stays time order
+            conn.execute("UPDATE conversations SET timestamp = timestamp || '.000' WHERE length(timestamp) = 19")
+            conn.execute("UPDATE sessions SET created_at = created_at || '.000' WHERE length(created_at) = 19")
+            conn.execute("""
+                UPDATE sessions SET
+                    turn_count = (SELECT count(*) FROM conversations c
+                                  WHERE c.session_id = sessions.session_id AND c.user_id = sessions.user_id),
+                    updated_at = coalesce((SELECT max(timestamp) FROM conversations c
+                                           WHERE c.session_id = sessions.session_id
+                                           AND c.user_id = sessions.user_id), created_at)
+                WHERE updated_at IS NULL
+            """)
+            for statement in filter(str.strip, INDEXES.split(";")):
+                conn.execute(statement)
+        self._schema_ready = True
+
+    @staticmethod
+    def _session_id_globally_unique(conn: sqlite3.Connection) -> bool:
+        """True for the legacy UNIQUE (session_id) constraint"""
+        for _, name, unique, origin, _ in conn.execute("PRAGMA index_list(sessions)"):
+            if unique and origin == "u":
+                if [row[2] for row in conn.execute(f"PRAGMA index_info('{name}')")] == ["session_id"]:
+                    return True
+        return False
+
+    def ping(self) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            self.connection().execute("SELECT 1").fetchone()
+            return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+        except sqlite3.Error as e:
+            return {"ok": False, "error": str(e)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "connections": len(self._connections), "transactions": self.transactions}
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+        self._schema_ready = False
+
+# ============ REPOSITORIES ============
+
+class SQLiteUsers:
+    """find_one / insert_one over the users table, with Mongo-style filters"""
+
+    COLUMNS = ("_id", "username", "email", "password", "full_name", "created_at", "role")
+    SELECT = "SELECT id, username, email, password, full_name, created_at, role FROM users"
+
+    def __init__(self, engine: SQLiteEngine):
+        self.engine = engine
+        self.name = "users"
+
+    def _condition(self, filter: Dict[str, Any]) -> Tuple[str, List[Any]]:
+        """Equality on users columns and $or of those; anything else is a programming error"""
+        clauses, params = [], []
+        for field, value in filter.items():
+            if field == "$or":
+                parts = [self._condition(part) for part in value]
+                clauses.append("(" + " OR ".join(sql for sql, _ in parts) + ")")
+                params.extend(p for _, part_params in parts for p in part_params)
+            elif field in self.COLUMNS and not isinstance(value, dict):
+                clauses.append(f"{'id' if field == '_id' else field} = ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported users filter: {field}")
+        return " AND ".join(clauses) or "1", params
+
+    def find_one(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        where, params = self._condition(filter)
+        row = self.engine.connection().execute(f"{self.SELECT} WHERE {where} LIMIT 1", params).fetchone()
+        if row is None:
+            return None
+        user = dict(zip(self.COLUMNS, row))
+        user["created_at"] = from_sql_time(user["created_at"])
+        return user
+
+    def insert_one(self, doc: Dict[str, Any]) -> InsertOneResult:
+        try:
+            with self.engine.transaction() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO users (username, email, password, full_name, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (doc["username"], doc["email"], doc["password"], doc.get("full_name"),
+                     to_sql_time(doc.get("created_at") or datetime.now()))
+                )
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(str(e))
+        doc["_id"] = cursor.lastrowid
+        return InsertOneResult(cursor.lastrowid, True)
+
+class SQLiteConversationStore:
+    """One row per turn in conversations, read through (session_id, timestamp)"""
+
+    name = "sqlite"
+    TURN_COLUMNS = "turn_id, message, response, timestamp"
+
+    def __init__(self, engine: SQLiteEngine):
+        self.engine = engine
+
+    def ensure_indexes(self):
+        self.engine.ensure_schema()
+
+    @staticmethod
+    def _turn(row) -> Dict[str, Any]:
+        turn_id, message, response, timestamp = row
+        return {"_id": to_object_id(turn_id), "message": message, "response": response,
+                "timestamp": from_sql_time(timestamp)}
+
+    def insert_turns(self, turns: List[Dict[str, Any]], skip_existing: bool = False) -> List[Dict[str, Any]]:
+        """Whole batch in one transaction; replayed turns are ignored by the turn_id index
+
+        Returns the turns that were actually written.
+        """
+        written = []
+        if not turns:
+            return written
+        with self.engine.transaction() as conn:
+            for turn in turns:
+                turn.setdefault("_id", ObjectId())
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO conversations (turn_id, user_id, username, session_id, message, response, "
+                    "timestamp) VALUES (?, ?, coalesce((SELECT username FROM users WHERE id = ?), ''), ?, ?, ?, ?)",
+                    (str(turn["_id"]), turn.get("user_id"), turn.get("user_id"), turn["session_id"],
+                     turn.get("message") or "", turn.get("response") or "",
+                     to_sql_time(turn.get("timestamp") or datetime.now()))
+                )
+                if cursor.rowcount:
+                    written.append(turn)
+        return written
+
+    def context_turns(self, session_id: str, limit: int = 20, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most recent turns of a session (of one user, when given), oldest first"""
+        sql = f"SELECT {self.TURN_COLUMNS} FROM conversations WHERE session_id = ?"
+        params: List[Any] = [session_id]
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        rows = self.engine.connection().execute(
+            f"{sql} ORDER BY timestamp DESC, turn_id DESC LIMIT ?", params + [limit]
+        ).fetchall()
+        return [self._turn(row) for row in reversed(rows)]
+
+    def history(self, session_id: str, user_id: str) -> List[Dict[str, Any]]:
+        """Full history of a session, oldest first"""
+        return list(self.iter_history(session_id, user_id))
+
+    def _page(self, session_id: str, user_id: str, start: Optional[tuple], limit: int) -> List[Dict[str, Any]]:
+        sql = f"SELECT {self.TURN_COLUMNS} FROM conversations WHERE session_id = ? AND user_id = ?"
+        params: List[Any] = [session_id, user_id]
+        if start is not None:
+            timestamp, last_id = to_sql_time(start[0]), str(start[1])
+            sql += " AND (timestamp > ? OR (timestamp = ? AND turn_id > ?))"
+            params += [timestamp, timestamp, last_id]
+        sql += " ORDER BY timestamp, turn_id LIMIT ?"
+        return [self._turn(row) for row in self.engine.connection().execute(sql, params + [limit])]
+
+    def iter_history(self, session_id: str, user_id: str, after: Optional[str] = None, limit: Optional[int] = None):
+        """Stream history oldest first, starting strictly after a keyset cursor
+
+        Each page is fetched completely, so the iterator can be advanced from
+        different threads (StreamingResponse does) without sharing a cursor.
+        """
+        start = decode_cursor(after) if after else None
+        remaining = limit + 1 if limit else None
+        while remaining is None or remaining > 0:
+            page = self._page(session_id, user_id, start, min(HISTORY_PAGE, remaining or HISTORY_PAGE))
+            yield from page
+            if remaining is not None:
+                remaining -= len(page)
+            if len(page) < HISTORY_PAGE:
+                return
+            start = turn_key(page[-1])
+
+    def history_version(self, session_id: str, user_id: str) -> str:
+        """Turns are append-only, so the newest turn id identifies the history"""
+        row = self.engine.connection().execute(
+            "SELECT turn_id FROM conversations WHERE session_id = ? AND user_id = ? "
+            "ORDER BY timestamp DESC, turn_id DESC LIMIT 1",
+            (session_id, user_id)
+        ).fetchone()
+        return row[0] if row else "empty"
+
+class SQLiteSessionIndex:
+    """Session summaries kept in the sessions table"""
+
+    COLUMNS = ("_id", "session_id", "title", "created_at", "updated_at", "turn_count")
+    SELECT = "SELECT id, session_id, title, created_at, updated_at, turn_count FROM sessions"
+
+    def __init__(self, engine: SQLiteEngine):
+        self.engine = engine
+
+    def ensure_indexes(self):
+        self.engine.ensure_schema()
+
+    def _session(self, row) -> Dict[str, Any]:
+        session = dict(zip(self.COLUMNS, row))
+        session["created_at"] = from_sql_time(session["created_at"])
+        session["updated_at"] = from_sql_time(session["updated_at"])
+        session["turn_count"] = session["turn_count"] or 0
+        return session
+
+    def record_turns(self, turns: List[Dict[str, Any]]):
+        """Fold newly persisted turns into their session summaries, one upsert per session"""
+        by_session = defaultdict(list)
+        for turn in turns:
+            by_session[(turn.get("user_id"), turn["session_id"])].append(turn)
+        if not by_session:
+            return
+        rows = []
+        for (user_id, session_id), session_turns in by_session.items():
+            session_turns.sort(key=turn_key)
+            rows.append((session_id, user_id, session_title(session_turns[0].get("message")),
+                         to_sql_time(session_turns[0]["timestamp"]), to_sql_time(session_turns[-1]["timestamp"]),
+                         len(session_turns)))
+        with self.engine.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO sessions (session_id, user_id, title, created_at, updated_at, turn_count) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, session_id) DO UPDATE SET "
+                "title = coalesce(title, excluded.title), "
+                "created_at = min(coalesce(created_at, excluded.created_at), excluded.created_at), "
+                "updated_at = max(coalesce(updated_at, excluded.updated_at), excluded.updated_at), "
+                "turn_count = coalesce(turn_count, 0) + excluded.turn_count",
+                rows
+            )
+
+    def refresh(self, store, turns: List[Dict[str, Any]]) -> int:
+        """Recompute the summaries of the sessions these turns belong to from
+        the conversations table; idempotent, so replayed batches are safe"""
+        sessions = {(turn.get("user_id"), turn["session_id"]) for turn in turns}
+        rows = []
+        with self.engine.transaction() as conn:
+            for user_id, session_id in sessions:
+                created_at, updated_at, turn_count = conn.execute(
+                    "SELECT min(timestamp), max(timestamp), count(*) FROM conversations "
+                    "WHERE session_id = ? AND user_id = ?", (session_id, user_id)
+                ).fetchone()
+                if not turn_count:
+                    continue
+                first = conn.execute(
+                    "SELECT message FROM conversations WHERE session_id = ? AND user_id = ? "
+                    "ORDER BY timestamp, turn_id LIMIT 1", (session_id, user_id)
+                ).fetchone()
+                rows.append((session_id, user_id, session_title(first[0]), created_at, updated_at, turn_count))
+            conn.executemany(
+                "INSERT INTO sessions (session_id, user_id, title, created_at, updated_at, turn_count) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, session_id) DO UPDATE SET "
+                "title = excluded.title, created_at = excluded.created_at, "
+                "updated_at = excluded.updated_at, turn_count = excluded.turn_count",
+                rows
+            )
+        return len(rows)
+
+    def list_sessions(self, user_id: str, limit: int = 20,
+                      after: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Most recently active sessions first, with the cursor for the next page"""
+        sql = f"{self.SELECT} WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if after:
+            updated_at, last_id = decode_cursor(after)
+            updated_at = to_sql_time(updated_at)
+            sql += " AND (updated_at < ? OR (updated_at = ? AND id < ?))"
+            params += [updated_at, updated_at, last_id]
+        sql += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        rows = self.engine.connection().execute(sql, params + [limit + 1]).fetchall()
+        return split_page([self._session(row) for row in rows], limit, "updated_at")
+
+    def get_sessions(self, user_id: str, session_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not session_ids:
+            return {}
+        rows = self.engine.connection().execute(
+            f"{self.SELECT} WHERE user_id = ? AND session_id IN ({', '.join('?' * len(session_ids))})",
+            [user_id, *session_ids]
+        ).fetchall()
+        return {session["session_id"]: session for session in map(self._session, rows)}
+
+class SQLiteStorage:
+    """The repositories main.py needs, sharing one engine"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.engine = SQLiteEngine(path)
+        self.users = SQLiteUsers(self.engine)
+        self.conversations = SQLiteConversationStore(self.engine)
+        self.sessions = SQLiteSessionIndex(self.engine)
+
+    def ensure_schema(self):
+        self.engine.ensure_schema()
+
+    def ping(self, *args) -> Dict[str, Any]:
+        return self.engine.ping()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.engine.stats()
+
+    def close(self):
+        self.engine.close()
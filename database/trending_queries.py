@@ -0,0 +1,265 @@
+# database/trending_queries.py
+"""
+Trending medical questions with a bounded Space-Saving heavy-hitters summary
+
+Queries are normalized (case, punctuation, whitespace) so trivially
+different phrasings count together. Each worker keeps one Space-Saving
+summary of at most capacity queries per hour: a new query arriving when the
+summary is full replaces the least frequent one and inherits its count as
+error. Any query occurring more than total/capacity times in that hour is
+guaranteed to be kept, and a reported count overestimates the true one by
+at most its error (never more than the hour's minimum count).
+
+Summaries are flushed as one document per (hour, worker):
+    {_id: "h:2026-03-10T15:<worker>", period, total, min_count,
+     items: [{key, text, count, error}], expires_at}
+so storage is O(hours x capacity) however many distinct questions arrive,
+and writes are one $set per hour per flush interval instead of one random
+upsert per event. trending() merges the summaries in a window: counts and
+errors add up, and a query missing from a full summary may have had up to
+that summary's min_count there, which is added to its error.
+
+Usage:
+    python -m database.trending_queries --hours 24 --limit 20
+"""
+
+import argparse
+import heapq
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import ASCENDING
+
+from database.analytics_rollups import HOUR, period_key
+
+logger = logging.getLogger(__name__)
+
+MAX_QUERY_LENGTH = 200
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_query(text: str) -> str:
+    """Canonical form used as the counting key"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()[:MAX_QUERY_LENGTH]
+
+class SpaceSaving:
+    """Top-k counter over a stream using at most capacity entries"""
+
+    def __init__(self, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.texts: Dict[str, str] = {}
+        self.total = 0
+        # Lazy min-heap of (count, key); entries whose count is stale are skipped
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, key: str, text: Optional[str] = None, weight: int = 1):
+        self.total += weight
+        if key in self.counts:
+            self.counts[key] += weight
+        else:
+            error = 0
+            if len(self.counts) >= self.capacity:
+                error = self._evict_min()
+            self.counts[key] = error + weight
+            self.errors[key] = error
+            self.texts[key] = text or key
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _evict_min(self) -> int:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                del self.counts[key], self.errors[key], self.texts[key]
+                return count
+
+    @property
+    def min_count(self) -> int:
+        """Upper bound on the count of any query not in the summary"""
+        if len(self.counts) < self.capacity:
+            return 0
+        while self.counts.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0]
+
+    def top(self, k: Optional[int] = None) -> List[Dict[str, Any]]:
+        keys = heapq.nlargest(k or len(self.counts), self.counts, key=self.counts.__getitem__)
+        return [{"key": key, "text": self.texts[key], "count": self.counts[key], "error": self.errors[key]}
+                for key in keys]
+
+    @classmethod
+    def from_items(cls, capacity: int, items: List[Dict[str, Any]], total: int = 0) -> "SpaceSaving":
+        summary = cls(capacity)
+        for item in items[:capacity]:
+            summary.counts[item["key"]] = item["count"]
+            summary.errors[item["key"]] = item.get("error", 0)
+            summary.texts[item["key"]] = item.get("text") or item["key"]
+        summary.total = total
+        summary._heap = [(count, key) for key, count in summary.counts.items()]
+        heapq.heapify(summary._heap)
+        return summary
+
+# ============ PERSISTENCE ============
+
+class TrendingQueries:
+    """Per-hour, per-worker Space-Saving summaries of normalized queries, persisted in Mongo
+
+    Adds go to the in-memory summary of their hour; changed summaries are
+    written at most every flush_interval seconds (on the next add) and
+    before any read.
+    """
+
+    def __init__(self, database, collection: str = "medical_queries_topk", capacity: int = 1000,
+                 flush_interval: float = 30.0, worker_id: Optional[str] = None,
+                 retention: timedelta = timedelta(days=30)):
+        self.collection = database[collection]
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        # Unique per process start: a restarted worker never overwrites its predecessor's summary
+        self.worker_id = worker_id or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._summaries: Dict[str, Tuple[datetime, SpaceSaving]] = {}
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+
+    def ensure_indexes(self):
+        self.collection.create_index([("expires_at", ASCENDING)], name="idx_topk_ttl", expireAfterSeconds=0)
+
+    def add(self, query: str, at: Optional[datetime] = None):
+        """Never raises for storage errors: queries are recorded by the Kafka consumer"""
+        key = normalize_query(query)
+        if not key:
+            return
+        key_id, start = period_key(HOUR, at or datetime.utcnow())
+        with self._lock:
+            missing = key_id not in self._summaries
+        if missing:
+            # Loaded outside the lock so a slow read does not stall other writers
+            try:
+                loaded = self._load(key_id)
+            except Exception as e:
+                logger.warning(f"Loading trending summary {key_id} failed, query not recorded: {e}")
+                return
+        with self._lock:
+            if missing:
+                self._summaries.setdefault(key_id, (start, loaded))
+            self._summaries[key_id][1].add(key, query.strip()[:MAX_QUERY_LENGTH])
+            self._dirty.add(key_id)
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            try:
+                self.flush()
+            except Exception as e:
+                # Summaries stay dirty and are retried after the next flush_interval
+                logger.warning(f"Flushing trending summaries failed: {e}")
+
+    def _load(self, key_id: str) -> SpaceSaving:
+        """This worker's persisted summary for the hour, so a late event never overwrites it with less"""
+        doc = self.collection.find_one({"_id": f"{key_id}:{self.worker_id}"})
+        if doc:
+            return SpaceSaving.from_items(self.capacity, doc.get("items", []), doc.get("total", 0))
+        return SpaceSaving(self.capacity)
+
+    def flush(self):
+        """Write this worker's changed summaries and forget closed hours"""
+        with self._lock:
+            snapshots = {key_id: (start, summary.top(), summary.total, summary.min_count)
+                         for key_id, (start, summary) in self._summaries.items() if key_id in self._dirty}
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
+            cutoff = datetime.utcnow() - timedelta(hours=2)
+            for key_id in [k for k, (start, _) in self._summaries.items() if start < cutoff and k not in snapshots]:
+                del self._summaries[key_id]
+        for key_id, (start, items, total, min_count) in snapshots.items():
+            try:
+                self.collection.update_one(
+                    {"_id": f"{key_id}:{self.worker_id}"},
+                    {"$set": {
+                        "period": start,
+                        "worker": self.worker_id,
+                        "total": total,
+                        "min_count": min_count,
+                        "items": items,
+                        "expires_at": start + self.retention
+                    }},
+                    upsert=True
+                )
+            except Exception:
+                with self._lock:
+                    self._dirty.add(key_id)
+                raise
+
+    # ============ READS ============
+
+    def trending(self, limit: int = 10, hours: int = 24, until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Most frequent queries over the last hours (all workers), with their error bounds"""
+        self.flush()
+        until = until or datetime.utcnow()
+        first, _ = period_key(HOUR, until - timedelta(hours=hours - 1))
+        last, _ = period_key(HOUR, until)
+
+        counts: Dict[str, List[int]] = {}
+        # Shown text comes from the summary that saw the query most often
+        texts: Dict[str, Tuple[int, str]] = {}
+        floors_total = 0
+        for doc in self.collection.find({"_id": {"$gte": f"{first}:", "$lte": f"{last}:\uffff"}},
+                                        {"items": 1, "min_count": 1}):
+            floor = doc.get("min_count", 0)
+            floors_total += floor
+            for item in doc.get("items", []):
+                entry = counts.setdefault(item["key"], [0, 0, 0])
+                entry[0] += item["count"]
+                entry[1] += item.get("error", 0)
+                # Floors of the summaries that did report this query
+                entry[2] += floor
+                if item["count"] > texts.get(item["key"], (0, ""))[0]:
+                    texts[item["key"]] = (item["count"], item.get("text") or item["key"])
+
+        top = heapq.nlargest(limit, counts.items(), key=lambda kv: kv[1][0])
+        return [{
+            "query": texts[key][1],
+            "normalized": key,
+            "count": count,
+            "error": error + floors_total - floors_seen
+        } for key, (count, error, floors_seen) in top]
+
+    def warm_up_queries(self, limit: int = 20, hours: int = 24) -> List[str]:
+        """Representative texts of the top queries, e.g. to prefill a response cache"""
+        return [item["query"] for item in self.trending(limit, hours)]
+
+def main():
+    from dotenv import load_dotenv
+
+    from database.mongodb.pool import connection_manager
+
+    parser = argparse.ArgumentParser(description="Show trending medical queries")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    load_dotenv()
+    trending = TrendingQueries(connection_manager.database())
+    for item in trending.trending(args.limit, args.hours):
+        print(f"{item['count']:>8}  (+-{item['error']})  {item['query']}")
+
+if __name__ == "__main__":
+    main()
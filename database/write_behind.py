@@ -0,0 +1,263 @@
+# database/write_behind.py
+"""
+Write-behind persistence queue for chat transcripts
+Requests enqueue documents and return immediately; a background task
+batches them into insert_many calls every N ms or M documents. Every
+document is first appended to a local journal so a crash loses nothing:
+unflushed documents are replayed on the next start, and a batch whose
+flush failed is retried as a replay too (duplicates are skipped via their
+pre-assigned _id).
+"""
+
+import asyncio
+import glob
+import logging
+import os
+import tempfile
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import fcntl
+except ImportError:  # Windows: no orphan-journal recovery across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Keep replayed datetimes naive like the ones pymongo returns
+JOURNAL_JSON_OPTIONS = json_util.DEFAULT_JSON_OPTIONS.with_options(tz_aware=False)
+
+class WriteBehindQueue:
+    """Batches documents into a sink with a crash-safe local journal"""
+
+    def __init__(
+        self,
+        sink: Callable[[List[Dict[str, Any]]], Any],
+        name: str = "transcripts",
+        max_batch: int = 100,
+        flush_interval_ms: float = 50,
+        journal_dir: Optional[str] = None,
+        fsync: bool = False,
+        compact_bytes: int = 4 * 1024 * 1024,
+        on_flushed: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+        replay_sink: Optional[Callable[[List[Dict[str, Any]]], Any]] = None
+    ):
+        self.sink = sink
+        # Used for batches that may already be partly or fully written
+        # (journal-recovered documents, retries of a failed flush), for sinks
+        # that cannot rely on a unique _id to reject duplicates
+        self.replay_sink = replay_sink or sink
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self.journal_dir = journal_dir or os.path.join(tempfile.gettempdir(), "medibot_journal")
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self.on_flushed = on_flushed
+
+        self._pending: List[Dict[str, Any]] = []
+        self._replay_ids = set()
+        self._journal = None
+        self._journal_path = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._closing = False
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+            "recovered": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    # ============ LIFECYCLE ============
+
+    async def start(self):
+        """Open our journal, queue orphaned documents and start the flusher"""
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._open_journal()
+        await self._recover()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Write-behind queue '{self.name}' started (journal: {self._journal_path})")
+
+    async def close(self):
+        """Flush everything still queued; called on shutdown"""
+        self._closing = True
+        if self._task:
+            self._wake.set()
+            await self._task
+            self._task = None
+        while self._pending:
+            if not await self.flush():
+                logger.error(f"{len(self._pending)} {self.name} documents left in journal {self._journal_path}")
+                break
+        if self._journal:
+            if not self._pending:
+                # Every start creates a new journal, so an empty one is removed
+                os.remove(self._journal_path)
+            self._journal.close()
+            self._journal = None
+
+    # ============ PRODUCER SIDE ============
+
+    def enqueue(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Journal and queue a document; never touches the database"""
+        doc.setdefault("_id", ObjectId())
+        if self._journal is None:
+            # Not started (scripts, tests): write through
+            self._write([doc])
+            return doc
+
+        self._journal.write(json_util.dumps(doc) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+
+        self._pending.append(doc)
+        self.stats["enqueued"] += 1
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return doc
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def pending(self, **match) -> List[Dict[str, Any]]:
+        """Queued documents whose fields equal match (read-your-writes)"""
+        return [doc for doc in self._pending if all(doc.get(k) == v for k, v in match.items())]
+
+    def status(self) -> Dict[str, Any]:
+        return {"depth": self.depth, **self.stats}
+
+    # ============ FLUSHER ============
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._pending and not await self.flush():
+                # Sink is down; back off instead of hammering it
+                await asyncio.sleep(min(5.0, self.flush_interval * 20))
+
+    async def flush(self) -> bool:
+        """Write one batch; documents stay queued (and journaled) until written"""
+        async with self._flush_lock:
+            batch = self._pending[:self.max_batch]
+            if not batch:
+                return True
+
+            replay = any(doc["_id"] in self._replay_ids for doc in batch)
+            started = time.perf_counter()
+            try:
+                await run_in_threadpool(self._write, batch, replay)
+            except Exception as e:
+                # The sink may have written some or all of the batch before failing
+                self._replay_ids.update(doc["_id"] for doc in batch)
+                self.stats["failed_flushes"] += 1
+                logger.warning(f"Write-behind flush of {len(batch)} {self.name} documents failed: {e}")
+                return False
+
+            del self._pending[:len(batch)]
+            if replay:
+                self._replay_ids.difference_update(doc["_id"] for doc in batch)
+            self.stats["flushed"] += len(batch)
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            self._maybe_compact()
+            return True
+
+    def _write(self, docs: List[Dict[str, Any]], replay: bool = False):
+        try:
+            (self.replay_sink if replay else self.sink)(docs)
+        except BulkWriteError as e:
+            # Replayed documents that already made it are fine
+            errors = e.details.get("writeErrors", [])
+            if any(err.get("code") != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+        if self.on_flushed:
+            self.on_flushed(docs)
+
+    # ============ JOURNAL ============
+
+    def _open_journal(self):
+        """Create a fresh journal, locked before other workers can see it
+
+        It starts under a name the orphan scan does not match and is renamed
+        into place only once locked; otherwise a worker starting at the same
+        moment could claim (and delete) it. The random suffix keeps a
+        restarted container reusing our pid from appending to a dead
+        process's journal, which is recovered as an orphan instead.
+        """
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{self.name}-", suffix=".tmp", dir=self.journal_dir)
+        self._journal = os.fdopen(fd, "a+", encoding="utf-8")
+        if fcntl:
+            # Held for our lifetime so other workers know this journal is live
+            fcntl.flock(self._journal.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._journal_path = os.path.join(self.journal_dir, f"{self.name}-{os.getpid()}-{uuid.uuid4().hex[:8]}.journal")
+        os.rename(tmp_path, self._journal_path)
+
+    def _maybe_compact(self):
+        """Rewrite the journal with only unflushed documents once it grows"""
+        if self._pending and self._journal.tell() < self.compact_bytes:
+            return
+        self._journal.seek(0)
+        self._journal.truncate(0)
+        for doc in self._pending:
+            self._journal.write(json_util.dumps(doc) + "\n")
+        self._journal.flush()
+
+    def _claim_orphans(self) -> List[Dict[str, Any]]:
+        """Take over journals whose owning process has died"""
+        docs = []
+        if fcntl is None:
+            return docs
+        for path in glob.glob(os.path.join(self.journal_dir, f"{self.name}-*.journal")):
+            if path == self._journal_path:
+                continue
+            try:
+                f = open(path, "r+", encoding="utf-8")
+            except FileNotFoundError:
+                continue  # Claimed by another worker since the glob
+            with f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    # Another worker may have claimed and removed it before we locked it
+                    if os.stat(path).st_ino != os.fstat(f.fileno()).st_ino:
+                        continue
+                except OSError:
+                    continue  # Owner still running, or already claimed
+                orphaned = [json_util.loads(line, json_options=JOURNAL_JSON_OPTIONS) for line in f if line.strip()]
+                # Re-journal under our name before deleting the orphan
+                for doc in orphaned:
+                    self._journal.write(json_util.dumps(doc) + "\n")
+                self._journal.flush()
+                os.remove(path)
+            docs.extend(orphaned)
+        return docs
+
+    async def _recover(self):
+        """Queue documents from orphaned journals (including ours before a restart) for replay"""
+        docs = self._claim_orphans()
+
+        if docs:
+            # The flusher replays them like any other queued documents
+            self._pending.extend(docs)
+            self._replay_ids.update(doc["_id"] for doc in docs)
+            self.stats["recovered"] = len(docs)
+            self._wake.set()
+            logger.info(f"Recovered {len(docs)} {self.name} documents from journal")
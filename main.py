@@ -1,40 +1,114 @@
 ﻿# main.py - Complete Medical Chatbot with Conclusive Advice
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
 import jwt
 import bcrypt
 from dotenv import load_dotenv
-from pymongo import MongoClient
-import cohere
 import uvicorn
 import re
+import json
+import threading
+import time
+from starlette.concurrency import run_in_threadpool
+from database.mongodb.pool import connection_manager
+from server.instrumentation import InstrumentationMiddleware, metrics, span
+from server.loop_monitor import build_loop_monitor
+from server.ops_access import require_ops_token
+from server.rate_limit import build_rate_limiter, client_ip
+from database.cache_coherence import (CacheCoherence, build_invalidation_source, make_tag, tags_for_document,
+                                      watched_collections)
+from database.write_behind import WriteBehindQueue
+from database.conversation_store import build_conversation_store, turn_key
+from database.pagination import InvalidCursor, decode_cursor, encode_cursor, etag_matches, make_etag
+from database.session_index import SessionIndex, session_title
+from database.index_audit import main_query_shapes, run_index_audit
+from database.sqlite_store import SQLiteStorage
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Storage: mongo (default) or sqlite for single-node/edge deployments (see database/sqlite_store.py)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo').lower()
+if STORAGE_BACKEND not in ('mongo', 'sqlite'):
+    raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
 # MongoDB
 MONGODB_URI = os.getenv('MONGODB_URI')
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'healthbot')
-client = MongoClient(MONGODB_URI)
-db = client[DATABASE_NAME]
-users_collection = db['users']
-conversations_collection = db['conversations']
-print("✅ MongoDB Connected")
+# Shared pool; the client is created and connected on first query (see database/mongodb/pool.py)
+db = connection_manager.lazy_database(DATABASE_NAME, MONGODB_URI)
+if STORAGE_BACKEND == 'sqlite':
+    sqlite_storage = SQLiteStorage()
+    users_collection = sqlite_storage.users
+    conversation_store = sqlite_storage.conversations
+    session_index = sqlite_storage.sessions
+    print(f"✅ SQLite configured ({sqlite_storage.engine.path})")
+else:
+    sqlite_storage = None
+    users_collection = db['users']
+    conversations_collection = db['conversations']
+    conversation_store = build_conversation_store(db)
+    session_index = SessionIndex(db)
+    print("✅ MongoDB configured (connects on first use)")
+
+# In-process caches kept coherent across workers (see database/cache_coherence.py)
+cache_coherence = CacheCoherence()
+user_cache = cache_coherence.cache("users")
+history_cache = cache_coherence.cache("conversations")
+
+def persist_turns(turns: List[Dict], replay: bool = False):
+    """Store a batch of turns and fold the ones written into the session index
+
+    A replay (journal recovery, retry of a failed flush) may find the turns
+    already stored and counted, so its sessions are recomputed instead.
+    """
+    with span("insert_turns"):
+        written = conversation_store.insert_turns(turns, skip_existing=replay)
+    with span("session_index"):
+        if replay:
+            session_index.refresh(conversation_store, turns)
+        else:
+            session_index.record_turns(written)
+
+# Chat transcripts are persisted write-behind, off the request path
+transcript_queue = WriteBehindQueue(
+    sink=persist_turns,
+    replay_sink=lambda docs: persist_turns(docs, replay=True),
+    name="transcripts",
+    max_batch=int(os.getenv('TRANSCRIPT_BATCH_SIZE', '100')),
+    flush_interval_ms=float(os.getenv('TRANSCRIPT_FLUSH_MS', '50')),
+    journal_dir=os.getenv('TRANSCRIPT_JOURNAL_DIR'),
+    fsync=os.getenv('TRANSCRIPT_JOURNAL_FSYNC', 'false').lower() == 'true',
+    on_flushed=lambda docs: [cache_coherence.notify_write("conversations", doc) for doc in docs]
+)
 
-# Cohere AI
+# Cohere AI (SDK imported and client built on first use or during warm-up)
 COHERE_API_KEY = os.getenv('COHERE_API_KEY')
-co = None
-if COHERE_API_KEY:
-    try:
-        co = cohere.Client(api_key=COHERE_API_KEY)
-        print("✅ Cohere AI Ready")
-    except Exception as e:
-        print(f"⚠️ Cohere error: {e}")
+_cohere_client = None
+_cohere_lock = threading.Lock()
+
+def get_cohere():
+    global _cohere_client
+    if _cohere_client is None and COHERE_API_KEY:
+        with _cohere_lock:
+            if _cohere_client is None:
+                try:
+                    import cohere
+                    _cohere_client = cohere.Client(api_key=COHERE_API_KEY)
+                    print("✅ Cohere AI Ready")
+                except Exception as e:
+                    print(f"⚠️ Cohere error: {e}")
+    return _cohere_client
 
 SECRET_KEY = os.getenv('SECRET_KEY', 'medibot-secret-key-2026')
 ALGORITHM = "HS256"
@@ -57,11 +131,13 @@ class ChatRequest(BaseModel):
 
 def hash_password(password: str) -> str:
     salt = bcrypt.gensalt(rounds=12)
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+    with span("bcrypt"):
+        return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(password: str, hashed: str) -> bool:
     try:
-        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+        with span("bcrypt"):
+            return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
     except:
         return False
 
@@ -72,16 +148,48 @@ def create_token(data: dict) -> str:
 
 def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        return jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        with span("verify_token"):
+            return jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
     except:
         raise HTTPException(401, "Invalid token")
 
-def get_conversation_history(session_id: str, limit: int = 20):
-    history = list(conversations_collection.find(
-        {"session_id": session_id},
-        {"_id": 0, "message": 1, "response": 1}
-    ).sort("timestamp", 1).limit(limit))
-    return history
+# Token buckets: /chat per user (Cohere), /auth/* per client IP (bcrypt); see server/rate_limit.py
+rate_limiter = build_rate_limiter(db)
+
+async def limit_chat(token_data: dict = Depends(verify_token)):
+    if rate_limiter:
+        await rate_limiter.enforce("chat", f"user:{token_data.get('user_id')}")
+    return token_data
+
+async def limit_auth(request: Request):
+    if rate_limiter:
+        await rate_limiter.enforce("auth", f"ip:{client_ip(request)}")
+
+def with_pending_turns(history: List[Dict], **match) -> List[Dict]:
+    """Append turns still in the write-behind queue (read-your-writes)"""
+    pending = transcript_queue.pending(**match)
+    if not pending:
+        return history
+    stored = {h.get("_id") for h in history}
+    return history + [turn for turn in pending if turn["_id"] not in stored]
+
+def get_conversation_history(session_id: str, user_id: Optional[str] = None, limit: int = 20):
+    with span("history"):
+        history = history_cache.get_or_load(
+            ("context", session_id, user_id, limit),
+            lambda: conversation_store.context_turns(session_id, limit, user_id=user_id),
+            tags=lambda _: [make_tag("conversations", "session_id", session_id)]
+        )
+        match = {"session_id": session_id} if user_id is None else {"session_id": session_id, "user_id": user_id}
+        return with_pending_turns(history, **match)[-limit:]
+
+def get_user_by_username(username: str):
+    with span("user_lookup"):
+        return user_cache.get_or_load(
+            ("username", username),
+            lambda: users_collection.find_one({"username": username}),
+            tags=lambda user: tags_for_document("users", user)
+        )
 
 def generate_chat_title(messages: List[Dict]) -> str:
     """Generate chat title from first user message"""
@@ -106,6 +214,7 @@ def generate_conclusive_response(query: str, history: List[Dict]) -> str:
     # Count how many questions have been asked
     question_count = sum(1 for h in history if '?' in h.get('response', ''))
     
+    co = get_cohere()
     if not co:
         return "I'm an AI medical assistant. Please consult a doctor for medical advice."
     
@@ -135,14 +244,161 @@ Provide a helpful response. You may ask 1-2 clarifying questions maximum. Then p
 
 Response:"""
         
-        response = co.chat(message=prompt, model="command-a-03-2025", temperature=0.7, max_tokens=500)
+        with span("cohere"):
+            response = co.chat(message=prompt, model="command-a-03-2025", temperature=0.7, max_tokens=500)
         return response.text.strip() if response and response.text else "I'm here to help with your health concerns."
     except Exception as e:
         print(f"Cohere error: {e}")
         return "I'm here to help with your health concerns. Please consult a healthcare professional for medical advice."
 
-app = FastAPI(title="MediBot AI", version="7.0")
+# ============ STARTUP ============
+
+# Flags sync calls that stall the event loop (see server/loop_monitor.py)
+loop_monitor = build_loop_monitor()
+
+# Readiness of each dependency: pending | ready | failed | disabled
+readiness = {
+    "mongodb": "pending" if STORAGE_BACKEND == 'mongo' else "disabled",
+    "indexes": "pending",
+    "cache_coherence": "pending",
+    "cohere": "pending" if COHERE_API_KEY else "disabled"
+}
+if STORAGE_BACKEND == 'sqlite':
+    readiness["sqlite"] = "pending"
+STORAGE_COMPONENT = "sqlite" if STORAGE_BACKEND == 'sqlite' else "mongodb"
+STARTED_AT = time.monotonic()
+# Backoff between attempts of a failed warm-up step
+WARM_UP_RETRY_S = 1.0
+WARM_UP_MAX_RETRY_S = 60.0
+
+def is_ready() -> bool:
+    return readiness[STORAGE_COMPONENT] == "ready" and readiness["indexes"] in ("ready", "skipped")
+
+def ping_storage() -> Dict:
+    return sqlite_storage.ping() if sqlite_storage else connection_manager.ping(MONGODB_URI)
+
+async def warm_mongodb():
+    """Wait for MongoDB, then provision indexes and start cache invalidation"""
+    delay = 1.0
+    while True:
+        ping = await run_in_threadpool(connection_manager.ping, MONGODB_URI)
+        if ping["ok"]:
+            break
+        print(f"⚠️ MongoDB not reachable yet ({ping['error'][:80]}), retrying in {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 30.0)
+    readiness["mongodb"] = "ready"
+    print(f"✅ MongoDB Connected ({ping['latency_ms']} ms)")
+
+    await run_in_threadpool(conversation_store.ensure_indexes)
+    await run_in_threadpool(session_index.ensure_indexes)
+    if rate_limiter and hasattr(rate_limiter.store, "ensure_indexes"):
+        await run_in_threadpool(rate_limiter.store.ensure_indexes)
+    await audit_indexes()
+
+    # Bucketed storage writes turns to conversation_buckets; watch wherever they land
+    source = await run_in_threadpool(build_invalidation_source, db, None,
+                                     watched_collections(conversation_store.collection.name))
+    cache_coherence.start(source)
+    readiness["cache_coherence"] = "ready"
+
+async def warm_sqlite():
+    """Create/migrate the schema and indexes, then start local cache invalidation"""
+    await run_in_threadpool(sqlite_storage.ensure_schema)
+    readiness["sqlite"] = "ready"
+    readiness["indexes"] = "ready"
+    print(f"✅ SQLite ready ({sqlite_storage.engine.path})")
+    
+    # Single node: no change streams; Kafka if configured, else the in-memory bus
+    source = await run_in_threadpool(build_invalidation_source, None)
+    cache_coherence.start(source)
+    readiness["cache_coherence"] = "ready"
+
+async def audit_indexes():
+    """Create indexes our query shapes need and flag plans that still scan (INDEX_AUDIT=log|fail|off)"""
+    mode = os.getenv('INDEX_AUDIT', 'log').lower()
+    if mode == 'off':
+        readiness["indexes"] = "skipped"
+        return
+    result = await run_in_threadpool(run_index_audit, db, main_query_shapes(conversation_store.name))
+    readiness["indexes"] = "ready"
+    if result["problems"]:
+        names = ", ".join(p["query"] for p in result["problems"])
+        print(f"❌ Query plans with COLLSCAN or in-memory SORT: {names}")
+        if mode == 'fail':
+            # Stay out of the load balancer rather than crash-looping
+            readiness["indexes"] = "failed"
+
+async def warm_cohere():
+    if COHERE_API_KEY:
+        readiness["cohere"] = "ready" if await run_in_threadpool(get_cohere) else "failed"
+        if readiness["cohere"] == "failed":
+            raise RuntimeError("Cohere client could not be created")
+
+async def warm_with_retry(name: str, warm, components: Tuple[str, ...]):
+    """Run a warm-up step until it succeeds
+    
+    A failure marks the step's unfinished components failed, so /ready shows
+    why it is 503, and the step is retried with exponential backoff.
+    """
+    delay = WARM_UP_RETRY_S
+    while True:
+        try:
+            await warm()
+            return
+        except Exception:
+            for component in components:
+                if readiness[component] == "pending":
+                    readiness[component] = "failed"
+            logger.exception(f"{name} warm-up failed, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARM_UP_MAX_RETRY_S)
+
+async def warm_up():
+    if sqlite_storage:
+        warm_storage = warm_with_retry("SQLite", warm_sqlite, ("sqlite", "indexes", "cache_coherence"))
+    else:
+        warm_storage = warm_with_retry("MongoDB", warm_mongodb, ("mongodb", "indexes", "cache_coherence"))
+    await asyncio.gather(warm_storage, warm_with_retry("Cohere", warm_cohere, ("cohere",)))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve immediately; dependencies warm up in the background and /ready reports them
+    if loop_monitor:
+        loop_monitor.start()
+    await transcript_queue.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    app.state.warm_up = warm_up_task
+    try:
+        yield
+    finally:
+        warm_up_task.cancel()
+        await transcript_queue.close()
+        cache_coherence.stop()
+        connection_manager.close()
+        if sqlite_storage:
+            sqlite_storage.close()
+        if loop_monitor:
+            loop_monitor.stop()
+
+app = FastAPI(title="MediBot AI", version="7.0", lifespan=lifespan)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+# Outermost, so stage and total timings cover every other middleware
+app.add_middleware(InstrumentationMiddleware, server_timing=os.getenv('SERVER_TIMING', 'on').lower() != 'off')
+
+metrics.register_gauge("write_queue_depth", "Transcript turns waiting to be flushed", lambda: transcript_queue.depth)
+metrics.register_gauge("mongo_checked_out_connections", "Pooled MongoDB connections in use",
+                       lambda: connection_manager.metrics.snapshot()["checked_out"])
+metrics.register_gauge("ready", "1 once warm-up has finished", lambda: int(is_ready()))
+if rate_limiter:
+    for budget_name in rate_limiter.budgets:
+        metrics.register_gauge(f"rate_limited_{budget_name}_total", f"Requests rejected by the {budget_name} budget",
+                               lambda name=budget_name: rate_limiter.rejections[name])
+if loop_monitor:
+    metrics.register_gauge("event_loop_lag_p99_seconds", "99th percentile event-loop wake-up delay",
+                           lambda: loop_monitor.lag.percentile(99))
+    metrics.register_gauge("event_loop_stalls", "Times the loop was blocked past LOOP_BLOCK_THRESHOLD_MS",
+                           lambda: loop_monitor.stalls)
 
 @app.get("/")
 async def serve_frontend():
@@ -152,11 +408,52 @@ async def serve_frontend():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "database": "MongoDB Atlas", "ai": "active" if co else "inactive"}
+    """Liveness: the process is serving; never touches dependencies"""
+    return {
+        "status": "healthy",
+        "database": "SQLite" if sqlite_storage else "MongoDB Atlas",
+        "ai": "active" if _cohere_client else "inactive",
+        "ready": is_ready(),
+        "mongodb": connection_manager.stats() if not sqlite_storage else None,
+        "sqlite": sqlite_storage.stats() if sqlite_storage else None,
+        "write_queue": transcript_queue.status(),
+        "rate_limit": rate_limiter.stats() if rate_limiter else None
+    }
 
-@app.post("/auth/register")
+@app.get("/ready")
+async def ready():
+    """Readiness: warm-up finished and the storage backend answers a ping"""
+    ping = None
+    if is_ready():
+        ping = await run_in_threadpool(ping_storage)
+    ok = is_ready() and ping["ok"]
+    return JSONResponse(
+        {
+            "ready": ok,
+            "components": readiness,
+            f"{STORAGE_COMPONENT}_ping": ping,
+            "uptime_s": round(time.monotonic() - STARTED_AT, 3)
+        },
+        status_code=200 if ok else 503
+    )
+
+@app.get("/metrics", dependencies=[Depends(require_ops_token)])
+async def prometheus_metrics():
+    """Per-endpoint, per-stage latency histograms in the Prometheus text format"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/loop", dependencies=[Depends(require_ops_token)])
+async def debug_loop(limit: int = Query(10, ge=1, le=100)):
+    """Event-loop lag and the call sites that blocked it the longest"""
+    if not loop_monitor:
+        raise HTTPException(404, "Loop monitor disabled (LOOP_MONITOR=off)")
+    return loop_monitor.report(limit)
+
+@app.post("/auth/register", dependencies=[Depends(limit_auth)])
 async def register(user: UserRegister):
-    if users_collection.find_one({"$or": [{"username": user.username}, {"email": user.email}]}):
+    with span("user_lookup"):
+        exists = users_collection.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
+    if exists:
         raise HTTPException(400, "Username or email already exists")
     
     user_doc = {
@@ -166,13 +463,15 @@ async def register(user: UserRegister):
         "full_name": user.full_name,
         "created_at": datetime.now()
     }
-    result = users_collection.insert_one(user_doc)
+    with span("insert_user"):
+        result = users_collection.insert_one(user_doc)
+    cache_coherence.notify_write("users", user_doc)
     token = create_token({"sub": user.username, "user_id": str(result.inserted_id)})
     return {"access_token": token, "token_type": "bearer", "username": user.username}
 
-@app.post("/auth/login")
+@app.post("/auth/login", dependencies=[Depends(limit_auth)])
 async def login(user: UserLogin):
-    db_user = users_collection.find_one({"username": user.username})
+    db_user = get_user_by_username(user.username)
     if not db_user or not verify_password(user.password, db_user["password"]):
         raise HTTPException(401, "Invalid credentials")
     
@@ -180,41 +479,153 @@ async def login(user: UserLogin):
     return {"access_token": token, "token_type": "bearer", "username": db_user["username"]}
 
 @app.post("/chat")
-async def chat(request: ChatRequest, token_data: dict = Depends(verify_token)):
+async def chat(request: ChatRequest, token_data: dict = Depends(limit_chat)):
     session_id = request.session_id or f"session_{int(datetime.now().timestamp())}"
     
     # Get history for context and title generation
-    history = get_conversation_history(session_id, limit=20)
+    history = get_conversation_history(session_id, token_data.get("user_id"), limit=20)
     
     # Generate response
     response = generate_conclusive_response(request.message, history)
     
-    # Save conversation
-    conversations_collection.insert_one({
+    # Save conversation (millisecond timestamps, matching what MongoDB stores)
+    now = datetime.now()
+    turn = {
         "user_id": token_data.get("user_id"),
         "session_id": session_id,
         "message": request.message,
         "response": response,
-        "timestamp": datetime.now()
-    })
+        "timestamp": now.replace(microsecond=now.microsecond // 1000 * 1000)
+    }
+    with span("enqueue"):
+        transcript_queue.enqueue(turn)
+        cache_coherence.notify_write("conversations", turn)
     
     return {"response": response, "session_id": session_id, "timestamp": datetime.now().isoformat()}
 
-@app.get("/history/{session_id}")
-async def get_history(session_id: str, token_data: dict = Depends(verify_token)):
-    history = list(conversations_collection.find(
-        {"session_id": session_id, "user_id": token_data.get("user_id")},
-        {"_id": 0, "message": 1, "response": 1, "timestamp": 1}
-    ).sort("timestamp", 1))
-    
-    # Generate title from first message if available
-    title = "New Chat"
-    for msg in history:
-        if msg.get('message'):
-            title = msg['message'][:40] + ("..." if len(msg['message']) > 40 else "")
+def iter_history_json(session_id: str, user_id: str, limit: Optional[int], after: Optional[str]):
+    """Serialize a history page as it is read from the store"""
+    pending = transcript_queue.pending(session_id=session_id, user_id=user_id)
+    unflushed = {turn["_id"] for turn in pending}
+    start = decode_cursor(after) if after else None
+    
+    def turns():
+        for turn in conversation_store.iter_history(session_id, user_id, after=after, limit=limit):
+            unflushed.discard(turn["_id"])
+            yield turn
+        for turn in pending:
+            if turn["_id"] in unflushed and (start is None or turn_key(turn) > start):
+                yield turn
+    
+    yield '{"history":['
+    count, last, next_cursor, title = 0, None, None, None
+    for turn in turns():
+        if limit and count == limit:
+            next_cursor = encode_cursor(last, "timestamp")
             break
+        if title is None and not after and turn.get("message"):
+            title = session_title(turn["message"])
+        item = {"message": turn.get("message"), "response": turn.get("response"), "timestamp": turn["timestamp"].isoformat()}
+        yield ("," if count else "") + json.dumps(item)
+        count, last = count + 1, turn
+    
+    if title is None and not after:
+        title = "New Chat"
+    yield f'],"title":{json.dumps(title)},"next_cursor":{json.dumps(next_cursor)}}}'
+
+@app.get("/history/{session_id}")
+async def get_history(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    token_data: dict = Depends(verify_token)
+):
+    user_id = token_data.get("user_id")
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursor as e:
+            raise HTTPException(400, str(e))
+    
+    # Cheap version probe so unchanged histories are not re-sent
+    with span("history_version"):
+        version = await run_in_threadpool(conversation_store.history_version, session_id, user_id)
+    pending = transcript_queue.pending(session_id=session_id, user_id=user_id)
+    etag = make_etag(session_id, user_id, version, pending[-1]["_id"] if pending else "", limit, cursor)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    return StreamingResponse(
+        iter_history_json(session_id, user_id, limit, cursor),
+        media_type="application/json",
+        headers=headers
+    )
+
+def with_pending_sessions(sessions: List[Dict], next_cursor: Optional[str], user_id: str,
+                          limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Fold turns still in the write-behind queue into the first page (read-your-writes)
     
-    return {"history": history, "title": title}
+    The merged page is trimmed back to limit. The next cursor points past the
+    last listed session still on the page, so sessions pushed off it come next.
+    """
+    by_session = {}
+    for turn in transcript_queue.pending(user_id=user_id):
+        by_session.setdefault(turn["session_id"], []).append(turn)
+    if not by_session:
+        return sessions, next_cursor
+    
+    listed = {s["session_id"]: s for s in sessions}
+    stored = session_index.get_sessions(user_id, [sid for sid in by_session if sid not in listed])
+    merged = dict(listed)
+    for session_id, turns in by_session.items():
+        summary = listed.get(session_id) or stored.get(session_id)
+        if summary is None:
+            summary = {"session_id": session_id, "title": session_title(turns[0].get("message")),
+                       "created_at": turns[0]["timestamp"], "updated_at": turns[0]["timestamp"], "turn_count": 0}
+        # Copied, so listed sessions keep the stored sort key the cursor is built from
+        merged[session_id] = {**summary, "updated_at": max(summary["updated_at"], turns[-1]["timestamp"]),
+                              "turn_count": summary["turn_count"] + len(turns)}
+    page = sorted(merged.values(), key=lambda s: s["updated_at"], reverse=True)
+    if len(page) <= limit:
+        return page, next_cursor
+    
+    page = page[:limit]
+    on_page = {s["session_id"] for s in page}
+    kept = 0
+    while kept < len(sessions) and sessions[kept]["session_id"] in on_page:
+        kept += 1
+    if kept:
+        return page, encode_cursor(sessions[kept - 1], "updated_at")
+    # Nothing listed fits: the next page starts from the top of the index
+    return page, encode_cursor({"updated_at": datetime.max, "_id": ""}, "updated_at")
+
+@app.get("/sessions")
+async def list_sessions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    token_data: dict = Depends(verify_token)
+):
+    user_id = token_data.get("user_id")
+    try:
+        with span("sessions_query"):
+            sessions, next_cursor = await run_in_threadpool(session_index.list_sessions, user_id, limit, cursor)
+    except InvalidCursor as e:
+        raise HTTPException(400, str(e))
+    if not cursor:
+        sessions, next_cursor = with_pending_sessions(sessions, next_cursor, user_id, limit)
+    
+    return {
+        "sessions": [{
+            "session_id": s["session_id"],
+            "title": s.get("title") or "New Chat",
+            "created_at": s["created_at"].isoformat(),
+            "updated_at": s["updated_at"].isoformat(),
+            "turn_count": s.get("turn_count", 0)
+        } for s in sessions],
+        "next_cursor": next_cursor
+    }
 
 if __name__ == "__main__":
     print("\n" + "="*60)
@@ -0,0 +1,278 @@
+# server/instrumentation.py
+"""
+Hot-path instrumentation: per-stage span timers, Server-Timing headers and
+Prometheus metrics
+
+    with span("cohere"):
+        response = co.chat(...)
+
+Spans recorded while a request is in flight are attached to that request
+(a contextvar, so they follow run_in_threadpool) and reported in its
+Server-Timing header. When the request ends each stage's time lands in an
+in-process latency histogram keyed by (endpoint, stage); spans outside a
+request (background flushes) use endpoint "background". /metrics renders
+the histograms in the Prometheus text format.
+
+Histograms are HDR-style log-linear: 64 sub-buckets per power of two of
+microseconds, so any recorded value is within ~1.6% of its bucket and a
+record is one dict increment under a lock.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Prometheus bucket boundaries (seconds) the HDR counts are folded into
+EXPORT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BACKGROUND = "background"
+UNMATCHED = "unmatched"
+
+# ============ HISTOGRAM ============
+
+class LatencyHistogram:
+    """Log-linear histogram of durations in microseconds"""
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self._bits = sub_bucket_bits
+        self._half = 1 << (sub_bucket_bits - 1)
+        self._lock = threading.Lock()
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value: int) -> int:
+        if value < (1 << self._bits):
+            return value
+        shift = value.bit_length() - self._bits
+        return (1 << self._bits) + (shift - 1) * self._half + ((value >> shift) - self._half)
+
+    def _upper(self, index: int) -> int:
+        """Highest value that maps to the bucket"""
+        if index < (1 << self._bits):
+            return index
+        offset = index - (1 << self._bits)
+        shift = offset // self._half + 1
+        mantissa = offset % self._half + self._half
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        micros = max(0, int(seconds * 1e6))
+        index = self._index(micros)
+        with self._lock:
+            self._counts[index] = self._counts.get(index, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def _sorted_counts(self) -> Tuple[List[Tuple[int, int]], int, float]:
+        with self._lock:
+            return sorted(self._counts.items()), self.count, self.total
+
+    def percentile(self, q: float) -> float:
+        """Duration in seconds at quantile q (0-100)"""
+        counts, total_count, _ = self._sorted_counts()
+        if not total_count:
+            return 0.0
+        rank = max(1, int(q / 100 * total_count + 0.5))
+        seen, index = 0, counts[-1][0]
+        for index, count in counts:
+            seen += count
+            if seen >= rank:
+                break
+        # The top bucket's bound can overshoot the largest value actually seen
+        return min(self._upper(index) / 1e6, self.max)
+
+    def cumulative(self, bounds=EXPORT_BUCKETS) -> List[Tuple[float, int]]:
+        """(upper bound seconds, count <= bound) pairs for Prometheus buckets"""
+        counts, _, _ = self._sorted_counts()
+        result, seen, position = [], 0, 0
+        for bound in bounds:
+            limit = bound * 1e6
+            while position < len(counts) and self._upper(counts[position][0]) <= limit:
+                seen += counts[position][1]
+                position += 1
+            result.append((bound, seen))
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3)
+        }
+
+# ============ SPANS ============
+
+class RequestTimings:
+    """Stage durations for one request, in the order stages first ran
+
+    A stage entered more than once (e.g. two queries) is summed.
+    """
+
+    __slots__ = ("started", "stages")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.stages.items()]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+class Instrumentation:
+    """Histogram registry plus the Prometheus exposition"""
+
+    def __init__(self, namespace: str = "healthbot"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._requests: Dict[Tuple[str, str, int], int] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+    def histogram(self, endpoint: str, stage: str) -> LatencyHistogram:
+        key = (endpoint, stage)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def record(self, stage: str, seconds: float):
+        """Attach a stage duration to the current request, or record it as background work"""
+        timings = _current.get()
+        if timings is not None:
+            # Folded into the histograms when the request ends, once its route is known
+            timings.add(stage, seconds)
+        else:
+            self.histogram(BACKGROUND, stage).record(seconds)
+
+    @contextmanager
+    def span(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def count_request(self, endpoint: str, method: str, status: int):
+        key = (endpoint, method, status)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def register_gauge(self, name: str, help_text: str, read: Callable[[], float]):
+        """Value sampled when /metrics is scraped"""
+        self._gauges[name] = (help_text, read)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+    def _items(self) -> List[Tuple[Tuple[str, str], LatencyHistogram]]:
+        with self._lock:
+            return sorted(self._histograms.items(), key=lambda item: item[0])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Percentiles per endpoint and stage"""
+        result: Dict[str, Dict[str, Any]] = {}
+        for (endpoint, stage), histogram in self._items():
+            result.setdefault(endpoint, {})[stage] = histogram.snapshot()
+        return result
+
+    def render_prometheus(self) -> str:
+        ns = self.namespace
+        lines = [
+            f"# HELP {ns}_stage_duration_seconds Time spent per request stage (stage=\"total\" is the whole request)",
+            f"# TYPE {ns}_stage_duration_seconds histogram"
+        ]
+        for (endpoint, stage), histogram in self._items():
+            labels = f'endpoint="{_escape(endpoint)}",stage="{_escape(stage)}"'
+            for bound, count in histogram.cumulative():
+                lines.append(f'{ns}_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{ns}_stage_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{ns}_stage_duration_seconds_sum{{{labels}}} {histogram.total:.6f}")
+            lines.append(f"{ns}_stage_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        lines += [f"# HELP {ns}_requests_total Requests by endpoint, method and status",
+                  f"# TYPE {ns}_requests_total counter"]
+        with self._lock:
+            requests = sorted(self._requests.items())
+        for (endpoint, method, status), count in requests:
+            lines.append(f'{ns}_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",status="{status}"}} {count}')
+
+        for name, (help_text, read) in sorted(self._gauges.items()):
+            try:
+                value = float(read())
+            except Exception:
+                continue
+            lines += [f"# HELP {ns}_{name} {help_text}", f"# TYPE {ns}_{name} gauge", f"{ns}_{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# ============ MIDDLEWARE ============
+
+class InstrumentationMiddleware:
+    """Pure ASGI middleware: times each request and adds Server-Timing
+
+    Endpoints are labelled by route template (/history/{session_id}), never
+    the raw path, so label cardinality stays bounded. The header carries the
+    stages finished before the response started; for streamed bodies the
+    remaining stages still reach the histograms.
+    """
+
+    def __init__(self, app, instrumentation: "Instrumentation" = None, server_timing: bool = True):
+        self.app = app
+        self.instrumentation = instrumentation or metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = timings.server_timing(time.perf_counter() - timings.started)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            endpoint = route_label(scope)
+            for stage, seconds in timings.stages.items():
+                self.instrumentation.histogram(endpoint, stage).record(seconds)
+            self.instrumentation.histogram(endpoint, "total").record(time.perf_counter() - timings.started)
+            self.instrumentation.count_request(endpoint, scope["method"], status)
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED
+
+# Global registry
+metrics = Instrumentation()
+span = metrics.span
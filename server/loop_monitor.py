@@ -0,0 +1,208 @@
+# server/loop_monitor.py
+"""
+Event-loop watchdog: lag measurement and blocking-call attribution
+
+A heartbeat task wakes every interval and records how late it woke (loop
+lag). A watchdog thread checks the heartbeat; while it is older than the
+threshold the loop is blocked, so the thread samples the loop thread's stack
+(sys._current_frames) once per tick. Samples are grouped by call site (the
+innermost frame in this repository) and the blocking call (the innermost
+frame overall, e.g. bcrypt.checkpw), so the report ranks where blocking time
+is actually spent rather than which request happened to be slow.
+
+Each stall is logged once it ends, with the stack of its dominant site.
+
+Environment:
+    LOOP_MONITOR                 on | off (default on)
+    LOOP_BLOCK_THRESHOLD_MS      stall threshold (default 100)
+    LOOP_MONITOR_INTERVAL_MS     heartbeat / sampling period (default 20)
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.instrumentation import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MONITOR_FILE = os.path.abspath(__file__)
+STACK_LIMIT = 12
+
+def is_project_frame(filename: str) -> bool:
+    path = os.path.abspath(filename)
+    return (path.startswith(PROJECT_ROOT + os.sep) and path != MONITOR_FILE
+            and "site-packages" not in path and f"{os.sep}venv{os.sep}" not in path)
+
+def frame_label(frame: traceback.FrameSummary) -> str:
+    filename = frame.filename
+    if filename.startswith(PROJECT_ROOT + os.sep):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    else:
+        # Keep the package directory: bcrypt/__init__.py, not __init__.py
+        filename = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+    return f"{filename}:{frame.lineno} {frame.name}"
+
+def attribute(stack: List[traceback.FrameSummary]) -> Tuple[str, str]:
+    """(call site in our code, innermost blocking call) for a sampled stack"""
+    blocking = frame_label(stack[-1]) if stack else "unknown"
+    for frame in reversed(stack):
+        if is_project_frame(frame.filename):
+            return frame_label(frame), blocking
+    return blocking, blocking
+
+class BlockingSite:
+    __slots__ = ("site", "blocking_call", "samples", "stalls", "blocked_s", "max_stall_s", "stack")
+
+    def __init__(self, site: str, blocking_call: str):
+        self.site = site
+        self.blocking_call = blocking_call
+        self.samples = 0
+        self.stalls = 0
+        self.blocked_s = 0.0
+        self.max_stall_s = 0.0
+        self.stack: List[str] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "site": self.site,
+            "blocking_call": self.blocking_call,
+            "stalls": self.stalls,
+            "samples": self.samples,
+            "blocked_ms": round(self.blocked_s * 1000, 1),
+            "max_stall_ms": round(self.max_stall_s * 1000, 1),
+            "stack": self.stack
+        }
+
+class LoopMonitor:
+    """Watches one asyncio loop from a daemon thread"""
+
+    def __init__(self, threshold_ms: Optional[float] = None, interval_ms: Optional[float] = None):
+        self.threshold = (threshold_ms if threshold_ms is not None
+                          else float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))) / 1000
+        self.interval = (interval_ms if interval_ms is not None
+                         else float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "20"))) / 1000
+        self.lag = LatencyHistogram()
+        self._lock = threading.Lock()
+        self._sites: Dict[Tuple[str, str], BlockingSite] = {}
+        self._beat = time.perf_counter()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.stalls = 0
+
+    @property
+    def running(self) -> bool:
+        return self._heartbeat is not None and not self._heartbeat.done()
+
+    def start(self):
+        """Start monitoring the running loop (call from inside it)"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stopping.clear()
+        self._heartbeat = asyncio.get_running_loop().create_task(self._heartbeat_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        self._stopping.set()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    async def _heartbeat_loop(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self.lag.record(max(0.0, now - expected))
+            self._beat = now
+
+    # ============ WATCHDOG ============
+
+    def _sample(self) -> List[traceback.FrameSummary]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        return traceback.extract_stack(frame)[-STACK_LIMIT * 3:] if frame is not None else []
+
+    def _watch(self):
+        stall_started: Optional[float] = None
+        samples: Counter = Counter()
+        stacks: Dict[Tuple[str, str], List[traceback.FrameSummary]] = {}
+
+        while not self._stopping.wait(self.interval / 2):
+            beat = self._beat
+            blocked_for = time.perf_counter() - beat
+            if blocked_for > self.threshold + self.interval:
+                if stall_started is None:
+                    stall_started = beat + self.interval
+                stack = self._sample()
+                key = attribute(stack)
+                samples[key] += 1
+                stacks.setdefault(key, stack)
+            elif stall_started is not None:
+                self._finish_stall(beat - stall_started, samples, stacks)
+                stall_started, samples, stacks = None, Counter(), {}
+
+    def _finish_stall(self, duration: float, samples: Counter, stacks: Dict):
+        total = sum(samples.values())
+        if not total:
+            return
+        (site, blocking_call), _ = samples.most_common(1)[0]
+        with self._lock:
+            self.stalls += 1
+            for key, count in samples.items():
+                entry = self._sites.get(key)
+                if entry is None:
+                    entry = self._sites[key] = BlockingSite(*key)
+                    entry.stack = [frame_label(f) for f in stacks[key][-STACK_LIMIT:]]
+                share = duration * count / total
+                entry.samples += count
+                entry.stalls += 1
+                entry.blocked_s += share
+                entry.max_stall_s = max(entry.max_stall_s, share)
+        logger.warning(
+            f"Event loop blocked for {duration * 1000:.0f} ms at {site} ({blocking_call})\n"
+            + "".join(traceback.format_list(stacks[(site, blocking_call)][-STACK_LIMIT:]))
+        )
+
+    # ============ REPORTING ============
+
+    def top_sites(self, limit: int = 10) -> List[Dict[str, Any]]:
+        with self._lock:
+            sites = sorted(self._sites.values(), key=lambda s: s.blocked_s, reverse=True)
+            return [site.as_dict() for site in sites[:limit]]
+
+    def report(self, limit: int = 10) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "threshold_ms": self.threshold * 1000,
+            "interval_ms": self.interval * 1000,
+            "lag": self.lag.snapshot(),
+            "stalls": self.stalls,
+            "top_sites": self.top_sites(limit)
+        }
+
+    def reset(self):
+        with self._lock:
+            self._sites.clear()
+            self.stalls = 0
+        self.lag = LatencyHistogram()
+
+def build_loop_monitor() -> Optional[LoopMonitor]:
+    """LoopMonitor configured from the environment, or None if LOOP_MONITOR=off"""
+    if os.getenv("LOOP_MONITOR", "on").lower() == "off":
+        return None
+    return LoopMonitor()
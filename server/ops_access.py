@@ -0,0 +1,27 @@
+# server/ops_access.py
+"""
+Access control for operational endpoints (/metrics, /debug/*)
+
+They expose internals (endpoint latencies, queue depths, the source lines
+that block the event loop), so they are off unless OPS_TOKEN is set, and
+then served only to requests carrying it:
+
+    Authorization: Bearer <OPS_TOKEN>
+
+Prometheus sends it with `authorization: {credentials: <OPS_TOKEN>}` in the
+scrape config.
+"""
+
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+def require_ops_token(authorization: Optional[str] = Header(None)):
+    """FastAPI dependency: 404 while OPS_TOKEN is unset, 401 without the matching bearer token"""
+    token = os.getenv("OPS_TOKEN")
+    if not token:
+        raise HTTPException(404, "Not Found")
+    if not authorization or not hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {token}".encode("utf-8")):
+        raise HTTPException(401, "Invalid ops token", headers={"WWW-Authenticate": "Bearer"})
@@ -0,0 +1,199 @@
+# server/rate_limit.py
+"""
+Token-bucket rate limiting with separate budgets per endpoint class
+
+    chat  - per user, guards the Cohere quota and the event loop
+    auth  - per client IP, guards bcrypt (register / login)
+
+A budget "capacity/period" (e.g. 20/60) allows bursts of capacity requests
+and refills at capacity/period tokens per second. Buckets live in-process by
+default (one worker); RATE_LIMIT_BACKEND=mongo keeps them in a shared
+collection so every worker draws from the same bucket, updated atomically
+with one pipeline find_one_and_update per request.
+
+Rejected requests get 429 with Retry-After; rejections are counted per
+budget. If the shared backend is unreachable requests are let through
+(fail open) rather than taking the API down with it.
+
+Environment:
+    RATE_LIMIT_BACKEND            memory | mongo | off (default memory)
+    RATE_LIMIT_CHAT               chat budget (default 20/60)
+    RATE_LIMIT_AUTH               auth budget (default 10/60)
+    RATE_LIMIT_TRUST_FORWARDED    use X-Forwarded-For for client IPs (default false)
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pymongo import ASCENDING, ReturnDocument
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUDGETS = {"chat": "20/60", "auth": "10/60"}
+
+@dataclass(frozen=True)
+class Budget:
+    name: str
+    capacity: float
+    period: float
+
+    @property
+    def rate(self) -> float:
+        """Tokens added per second"""
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, name: str, spec: str) -> "Budget":
+        """'capacity/period_seconds', e.g. '20/60'"""
+        capacity, _, period = spec.partition("/")
+        budget = cls(name, float(capacity), float(period or 60))
+        if budget.capacity <= 0 or budget.period <= 0:
+            raise ValueError(f"Invalid rate limit for {name}: {spec}")
+        return budget
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    remaining: float
+    retry_after: float
+
+# ============ BACKENDS ============
+
+class MemoryBucketStore:
+    """Buckets in a bounded LRU; a bucket evicted while idle would be full anyway"""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, budget: Budget, key: str, cost: float = 1.0, now: Optional[float] = None) -> Decision:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (budget.capacity, now))
+            tokens = min(budget.capacity, tokens + max(0.0, now - updated) * budget.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return decide(budget, tokens, cost, allowed)
+
+class MongoBucketStore:
+    """Buckets shared by every worker: {_id: "<budget>:<key>", tokens, updated_at, expires_at}"""
+
+    blocking = True
+
+    def __init__(self, database, collection: str = "rate_limits"):
+        self.collection = database[collection]
+
+    def ensure_indexes(self):
+        # Idle buckets refill completely, so they can simply expire
+        self.collection.create_index([("expires_at", ASCENDING)], name="idx_rate_limit_ttl", expireAfterSeconds=0)
+
+    def take(self, budget: Budget, key: str, cost: float = 1.0, now: Optional[datetime] = None) -> Decision:
+        now = now or datetime.utcnow()
+        elapsed_s = {"$max": [0, {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}]}
+        doc = self.collection.find_one_and_update(
+            {"_id": f"{budget.name}:{key}"},
+            [
+                {"$set": {
+                    "tokens": {"$min": [budget.capacity, {"$add": [
+                        {"$ifNull": ["$tokens", budget.capacity]}, {"$multiply": [elapsed_s, budget.rate]}
+                    ]}]},
+                    "updated_at": now,
+                    "expires_at": now + timedelta(seconds=budget.period)
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return decide(budget, doc["tokens"], cost, doc["allowed"])
+
+def decide(budget: Budget, tokens: float, cost: float, allowed: bool) -> Decision:
+    retry_after = 0.0 if allowed else (cost - tokens) / budget.rate
+    return Decision(allowed, max(0.0, tokens), retry_after)
+
+# ============ LIMITER ============
+
+class RateLimiter:
+    def __init__(self, store, budgets: Dict[str, Budget]):
+        self.store = store
+        self.budgets = budgets
+        self.rejections: Counter = Counter()
+        self.backend_errors = 0
+
+    def check(self, budget_name: str, key: str, cost: float = 1.0) -> Decision:
+        budget = self.budgets.get(budget_name)
+        if budget is None:
+            return Decision(True, float("inf"), 0.0)
+        try:
+            decision = self.store.take(budget, key, cost)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Rate limit backend error, allowing request: {e}")
+            return Decision(True, 0.0, 0.0)
+        if not decision.allowed:
+            self.rejections[budget_name] += 1
+        return decision
+
+    async def enforce(self, budget_name: str, key: str, cost: float = 1.0):
+        """Raise 429 with Retry-After once the bucket is empty"""
+        if self.store.blocking:
+            decision = await run_in_threadpool(self.check, budget_name, key, cost)
+        else:
+            decision = self.check(budget_name, key, cost)
+        if not decision.allowed:
+            budget = self.budgets[budget_name]
+            raise HTTPException(429, "Too many requests, please slow down", headers={
+                "Retry-After": str(max(1, math.ceil(decision.retry_after))),
+                "X-RateLimit-Limit": f"{budget.capacity:g};w={budget.period:g}",
+                "X-RateLimit-Remaining": "0"
+            })
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": type(self.store).__name__,
+            "budgets": {name: f"{b.capacity:g}/{b.period:g}s" for name, b in self.budgets.items()},
+            "rejections": dict(self.rejections),
+            "backend_errors": self.backend_errors
+        }
+
+def client_ip(request: Request) -> str:
+    if os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true":
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def build_rate_limiter(database=None) -> Optional[RateLimiter]:
+    """RateLimiter configured from the environment, or None if RATE_LIMIT_BACKEND=off"""
+    backend = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "off":
+        return None
+    budgets = {}
+    for name, default in DEFAULT_BUDGETS.items():
+        spec = os.getenv(f"RATE_LIMIT_{name.upper()}", default)
+        if spec.lower() != "off":
+            budgets[name] = Budget.parse(name, spec)
+    if backend == "mongo":
+        if database is None:
+            raise ValueError("RATE_LIMIT_BACKEND=mongo needs a database")
+        return RateLimiter(MongoBucketStore(database), budgets)
+    if backend != "memory":
+        raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {backend}")
+    return RateLimiter(MemoryBucketStore(), budgets)
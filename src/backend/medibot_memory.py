@@ -11,16 +11,21 @@ import uvicorn
 import os
 import jwt
 import bcrypt
+import sys
 from dotenv import load_dotenv
-from pymongo import MongoClient
 import cohere
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from database.mongodb.pool import connection_manager
+from server.loop_monitor import build_loop_monitor
+from server.ops_access import require_ops_token
+
 load_dotenv()
 
 # MongoDB
 mongo_uri = os.getenv('MONGODB_URI')
 db_name = os.getenv('DATABASE_NAME', 'healthbot')
-client = MongoClient(mongo_uri)
+client = connection_manager.client(mongo_uri)
 db = client[db_name]
 users = db['users']
 conversations = db['conversations']
@@ -39,6 +44,19 @@ if cohere_key:
 app = FastAPI(title="MediBot AI - With Memory", version="10.0")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
+# Flags sync calls that stall the event loop (see server/loop_monitor.py)
+loop_monitor = build_loop_monitor()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    if loop_monitor:
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    if loop_monitor:
+        loop_monitor.stop()
+
 SECRET_KEY = os.getenv('SECRET_KEY', 'medibot-secret-key-2026')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
@@ -83,6 +101,12 @@ def verify_token(creds: HTTPAuthorizationCredentials = Depends(security)):
 async def health():
     return {"status": "healthy", "database": "MongoDB Atlas", "ai": "active", "memory": "enabled"}
 
+@app.get("/debug/loop", dependencies=[Depends(require_ops_token)])
+async def debug_loop():
+    if not loop_monitor:
+        raise HTTPException(404, "Loop monitor disabled (LOOP_MONITOR=off)")
+    return loop_monitor.report()
+
 @app.post("/auth/register")
 async def register(user: UserRegister):
     existing = users.find_one({"$or": [{"username": user.username}, {"email": user.email}]})
@@ -11,6 +11,7 @@ from kafka.errors import KafkaError
 import logging
 
 from kafka_config import config
+from database.analytics_rollups import parse_timestamp
 from database.healthbot_db import db
 
 logging.basicConfig(level=logging.INFO)
@@ -59,6 +60,7 @@ class HealthBotKafkaConsumer:
                 'message_preview': message[:100],
                 'timestamp': event_data.get('timestamp')
             })
+            db.rollups.record({'chat_requests': 1}, parse_timestamp(event_data.get('timestamp')), user_id)
     
     def process_user_feedback(self, event_data):
         """Process user feedback events"""
@@ -80,13 +82,11 @@ class HealthBotKafkaConsumer:
         
         logger.info(f"🔍 Medical query: {query[:50]}...")
         
-        # Track popular queries
+        # Track popular queries in the bounded top-K summary (flushed periodically)
         if db.available:
-            db.db.medical_queries_stats.update_one(
-                {'query': query},
-                {'': {'count': 1}, '': {'last_queried': event_data.get('timestamp')}},
-                upsert=True
-            )
+            at = parse_timestamp(event_data.get('timestamp'))
+            db.trending.add(query, at)
+            db.rollups.record({'medical_queries': 1}, at, data.get('user_id'))
     
     def start_consuming(self):
         """Start consuming messages"""
@@ -123,6 +123,8 @@ class HealthBotKafkaConsumer:
         self.running = False
         if self.consumer:
             self.consumer.close()
+        if db.available:
+            db.flush_writes()
         logger.info("Kafka consumer stopped")
 
 # Global consumer instance
@@ -0,0 +1,127 @@
+"""
+Unit tests for incrementally maintained analytics rollups
+"""
+
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from unittest.mock import patch
+
+from database.analytics_rollups import AnalyticsRollups, parse_timestamp
+from database.healthbot_db import HealthBotDatabase
+
+NOW = datetime(2026, 3, 10, 15, 30)
+
+class TestAnalyticsRollups:
+    """Test hourly/daily counters, distinct active users and backfill"""
+
+    @pytest.fixture
+    def database(self):
+        return mongomock.MongoClient().healthbot
+
+    @pytest.fixture
+    def rollups(self, database):
+        return AnalyticsRollups(database)
+
+    def test_counters_land_in_hour_day_and_all_time(self, rollups):
+        """Test one event increments its hour, its day and the all-time total"""
+        rollups.record({"messages": 2}, NOW, "u1")
+        rollups.record({"messages": 1}, NOW + timedelta(hours=1), "u1")
+        rollups.record({"messages": 5}, NOW - timedelta(days=2), "u2")
+
+        hours = rollups.series("hour", days=1, until=NOW + timedelta(hours=2))
+        assert [(doc["_id"], doc["messages"]) for doc in hours] == [("h:2026-03-10T15", 2), ("h:2026-03-10T16", 1)]
+        assert [doc["messages"] for doc in rollups.series("day", days=7, until=NOW)] == [5, 3]
+        assert rollups.all_time()["messages"] == 8
+
+    def test_active_users_are_distinct(self, rollups):
+        """Test repeat activity counts a user once per day and once per window"""
+        for hours in (0, 1, 2):
+            rollups.record_active("u1", NOW + timedelta(hours=hours))
+        rollups.record_active("u1", NOW - timedelta(days=1))
+        rollups.record_active("u2", NOW)
+
+        totals = rollups.totals(days=7, until=NOW + timedelta(hours=3))
+        assert rollups.series("day", days=0, until=NOW)[0]["active_users"] == 2
+        assert totals["active_user_days"] == 3
+        assert totals["active_users"] == 2
+
+    def test_seen_markers_skip_round_trips(self, rollups):
+        """Test a user already marked this hour costs no marker write"""
+        rollups.record({"messages": 1}, NOW, "u1")
+        with patch.object(rollups.markers, "bulk_write", wraps=rollups.markers.bulk_write) as marker_writes:
+            rollups.record({"messages": 1}, NOW, "u1")
+
+        marker_writes.assert_not_called()
+
+    def test_other_worker_markers_not_double_counted(self, database, rollups):
+        """Test a second process upserting an existing marker does not increment again"""
+        rollups.record_active("u1", NOW)
+        AnalyticsRollups(database).record_active("u1", NOW)
+
+        assert rollups.series("day", days=0, until=NOW)[0]["active_users"] == 1
+
+    def test_parse_kafka_timestamp(self):
+        """Test ISO strings from Kafka events become naive UTC datetimes"""
+        assert parse_timestamp("2026-03-10T15:30:00Z") == NOW
+        assert parse_timestamp(NOW) == NOW
+
+class TestHealthBotDatabaseRollups:
+    """Test HealthBotDatabase keeps rollups current and reads stats from them"""
+
+    @pytest.fixture
+    def healthbot_db(self):
+        return HealthBotDatabase(mongomock.MongoClient().healthbot)
+
+    def populate(self, healthbot_db):
+        healthbot_db.create_user("a@example.com", "A")
+        for user_id in ("u1", "u2"):
+            conversation_id = healthbot_db.create_conversation(user_id)
+            healthbot_db.save_turn(conversation_id, user_id, "Fever?", "Rest and fluids.")
+        healthbot_db.save_feedback("u1", None, 4)
+        healthbot_db.save_feedback("u2", None, 2)
+
+    def test_stats_match_source_collections(self, healthbot_db):
+        """Test activity and feedback stats agree with counting the collections"""
+        self.populate(healthbot_db)
+
+        stats = healthbot_db.get_user_activity_stats(days=30)
+
+        assert stats["messages"] == healthbot_db.db.messages.count_documents({}) == 4
+        assert stats["conversations"] == 2
+        assert stats["new_users"] == 1
+        assert stats["active_users"] == 2
+        assert healthbot_db.get_feedback_stats() == {"total_feedback": 2, "average_rating": 3.0}
+
+    def test_batched_messages_are_counted(self, healthbot_db):
+        """Test the write batcher folds its flush into the rollups"""
+        conversation_id = healthbot_db.create_conversation("u1")
+        healthbot_db.enable_write_batching(max_batch=1000, max_delay_ms=10000)
+        for i in range(3):
+            healthbot_db.save_turn(conversation_id, "u1", f"q{i}", f"a{i}")
+        healthbot_db.flush_writes()
+
+        assert healthbot_db.get_user_activity_stats()["messages"] == 6
+
+    def test_rollup_failure_does_not_fail_primary_writes(self, healthbot_db):
+        """Test a rollup outage is logged while users, conversations and messages still commit"""
+        with patch.object(AnalyticsRollups, "record", side_effect=ConnectionError("rollups down")), \
+                patch.object(AnalyticsRollups, "record_active", side_effect=ConnectionError("rollups down")):
+            user_id = healthbot_db.create_user("a@x.org", "A")
+            healthbot_db.update_user_active(user_id)
+            conversation_id = healthbot_db.create_conversation(user_id)
+            ids = healthbot_db.save_turn(conversation_id, user_id, "q", "a")
+            feedback_id = healthbot_db.save_feedback(user_id, conversation_id, 5)
+
+        assert user_id and conversation_id and feedback_id and len(ids) == 2
+        assert healthbot_db.get_conversation(conversation_id)["message_count"] == 2
+
+    def test_rebuild_matches_maintained_rollups(self, healthbot_db):
+        """Test a backfill from the source collections reproduces the live counters"""
+        self.populate(healthbot_db)
+        maintained = healthbot_db.rollups.totals(days=30)
+
+        AnalyticsRollups(healthbot_db.db).rebuild(healthbot_db.db)
+
+        assert healthbot_db.rollups.totals(days=30) == maintained
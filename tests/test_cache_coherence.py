@@ -0,0 +1,152 @@
+"""
+Unit tests for cross-worker cache coherence
+"""
+
+import pytest
+import mongomock
+from unittest.mock import Mock, patch
+
+from database.cache_coherence import (
+    CacheCoherence,
+    ChangeStreamSource,
+    InMemoryBus,
+    KafkaInvalidationSource,
+    LocalCache,
+    build_invalidation_source,
+    make_tag,
+    watched_collections
+)
+
+class TestCacheCoherence:
+    """Test local caches and invalidation routing"""
+
+    @pytest.fixture
+    def coherence(self):
+        coherence = CacheCoherence()
+        coherence.start()
+        yield coherence
+        coherence.stop()
+
+    def test_lru_eviction(self):
+        """Test oldest entry is evicted past max_entries"""
+        cache = LocalCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+
+    @patch("database.cache_coherence.time.monotonic")
+    def test_ttl_expiry(self, mock_time):
+        """Test entries expire after ttl_seconds"""
+        mock_time.return_value = 100.0
+        cache = LocalCache(ttl_seconds=10)
+        cache.set("a", 1)
+
+        mock_time.return_value = 111.0
+
+        assert cache.get("a") is None
+
+    def test_get_or_load_does_not_cache_none(self):
+        """Test missing documents are reloaded next time"""
+        cache = LocalCache()
+        loader = Mock(return_value=None)
+
+        cache.get_or_load("user", loader)
+        cache.get_or_load("user", loader)
+
+        assert loader.call_count == 2
+
+    def test_load_racing_an_invalidation_is_not_cached(self):
+        """Test a value loaded before a concurrent invalidation is returned but not stored"""
+        cache = LocalCache()
+        tag = make_tag("conversations", "session_id", "s1")
+
+        def load_then_invalidated():
+            cache.invalidate_tags([tag])  # Another worker's write lands mid-load
+            return ["stale"]
+
+        assert cache.get_or_load("s1", load_then_invalidated, tags=lambda _: [tag]) == ["stale"]
+        assert cache.get("s1") is None and cache.stats["stale_loads"] == 1
+
+        assert cache.get_or_load("s1", lambda: ["fresh"], tags=lambda _: [tag]) == ["fresh"]
+        assert cache.get("s1") == ["fresh"]
+
+    def test_notify_write_invalidates_by_tag(self, coherence):
+        """Test a write to a session drops every cached view of it"""
+        history = coherence.cache("conversations")
+        tag = make_tag("conversations", "session_id", "s1")
+        history.set(("context", "s1", 20), [{"message": "hi"}], tags=[tag])
+        history.set(("context", "s2", 20), [], tags=[make_tag("conversations", "session_id", "s2")])
+
+        coherence.notify_write("conversations", {"session_id": "s1", "message": "again"})
+
+        assert history.get(("context", "s1", 20)) is None
+        assert history.get(("context", "s2", 20)) == []
+
+    def test_change_stream_event_invalidates(self):
+        """Test change events are mapped to tags from documentKey"""
+        source = ChangeStreamSource(Mock())
+        source._stream = iter([{
+            "_id": {"_data": "token"},
+            "ns": {"db": "healthbot", "coll": "users"},
+            "documentKey": {"_id": "u1"}
+        }])
+        coherence = CacheCoherence(source)
+        users = coherence.cache("users")
+        users.set(("username", "alice"), {"_id": "u1"}, tags=[make_tag("users", "_id", "u1")])
+
+        source._running = True
+        source._run(lambda coll, tags: (coherence._apply(coll, tags), setattr(source, "_running", False)))
+
+        assert users.get(("username", "alice")) is None
+        assert source._resume_token == {"_data": "token"}
+
+    def test_bucket_changes_invalidate_session_history(self):
+        """Test bucketed storage is watched and a bucket update drops the session's cached history"""
+        db = Mock()
+        source = build_invalidation_source(db, "changestream", watched_collections("conversation_buckets"))
+        source._stream = iter([{
+            "_id": {"_data": "token"},
+            "ns": {"db": "healthbot", "coll": "conversation_buckets"},
+            "documentKey": {"_id": "b1"},
+            "fullDocument": {"_id": "b1", "session_id": "s1", "user_id": "u1", "count": 3}
+        }])
+        coherence = CacheCoherence(source)
+        history = coherence.cache("conversations")
+        history.set(("context", "s1", 20), [{"message": "hi"}], tags=[make_tag("conversations", "session_id", "s1")])
+
+        source._running = True
+        source._run(lambda coll, tags: (coherence._apply(coll, tags), setattr(source, "_running", False)))
+
+        assert "conversation_buckets" in db.watch.call_args[0][0][0]["$match"]["ns.coll"]["$in"]
+        assert history.get(("context", "s1", 20)) is None
+
+    @patch("database.cache_coherence.time.sleep")
+    def test_kafka_poll_errors_are_survived(self, sleep):
+        """Test a failed poll is logged and retried instead of ending the invalidation thread"""
+        source = KafkaInvalidationSource.__new__(KafkaInvalidationSource)
+        source.origin = "me"
+        source._running = True
+        record = Mock(value={"event_type": "cache_invalidation",
+                             "data": {"collection": "users", "tags": ["users:_id:u1"], "origin": "other"}})
+        source.consumer = Mock()
+        source.consumer.poll.side_effect = [ValueError("Expecting value: line 1 column 1"), {"tp": [record]}]
+        applied = []
+
+        source._run(lambda coll, tags: (applied.append(tags), setattr(source, "_running", False)))
+
+        assert applied == [{"users:_id:u1"}]
+        sleep.assert_called_once_with(1)
+
+    def test_falls_back_to_memory_bus(self):
+        """Test deployments without change streams or Kafka still work"""
+        db = mongomock.MongoClient().db
+        db.watch = Mock(side_effect=Exception("The $changeStream stage is only supported on replica sets"))
+
+        with patch.dict("os.environ", {}, clear=True):
+            source = build_invalidation_source(db)
+
+        assert isinstance(source, InMemoryBus)
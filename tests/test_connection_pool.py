@@ -0,0 +1,94 @@
+"""
+Unit tests for the shared MongoDB connection manager
+"""
+
+import pytest
+from unittest.mock import Mock, patch
+
+from database.mongodb.pool import ConnectionManager, PoolMetrics, pool_options, resolve_mongo_uri
+
+class TestConnectionManager:
+    """Test client sharing, configuration, health checks and pool metrics"""
+
+    @pytest.fixture
+    def manager(self):
+        return ConnectionManager(options={"maxPoolSize": 4, "minPoolSize": 0})
+
+    def test_one_client_per_uri(self, manager):
+        """Test every caller with the same URI shares one lazily connected client"""
+        with patch("pymongo.MongoClient", side_effect=lambda *a, **kw: Mock()) as mongo_client:
+            first = manager.client("mongodb://a")
+            second = manager.client("mongodb://a")
+            other = manager.client("mongodb://b")
+
+        assert first is second
+        assert other is not first
+        assert mongo_client.call_count == 2
+        kwargs = mongo_client.call_args.kwargs
+        assert kwargs["connect"] is False
+        assert kwargs["maxPoolSize"] == 4
+        assert kwargs["event_listeners"] == [manager.metrics]
+
+    def test_async_client_shared_and_configured(self, manager):
+        """Test the Motor client is created once with the same pool settings"""
+        with patch("motor.motor_asyncio.AsyncIOMotorClient") as motor_client:
+            first = manager.async_client("mongodb://a")
+            second = manager.async_client("mongodb://a")
+
+        assert first is second
+        motor_client.assert_called_once()
+        assert motor_client.call_args.kwargs["maxPoolSize"] == 4
+
+    def test_pool_options_from_environment(self, monkeypatch):
+        """Test pool sizes and timeouts come from the environment"""
+        monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+        monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "250")
+
+        options = pool_options()
+
+        assert options["maxPoolSize"] == 20
+        assert options["minPoolSize"] == 0
+        assert options["waitQueueTimeoutMS"] == 250
+
+    def test_resolve_uri_from_atlas_parts(self, monkeypatch):
+        """Test the Atlas URI is built when MONGODB_URI is not set"""
+        monkeypatch.delenv("MONGODB_URI", raising=False)
+        monkeypatch.setenv("MONGO_USERNAME", "u")
+        monkeypatch.setenv("MONGO_PASSWORD", "p")
+        monkeypatch.setenv("MONGO_CLUSTER", "c.example.net")
+
+        assert resolve_mongo_uri() == "mongodb+srv://u:p@c.example.net/?retryWrites=true&w=majority"
+
+    def test_ping_reports_failure(self, manager):
+        """Test health checks report errors instead of raising"""
+        client = Mock()
+        client.admin.command.side_effect = Exception("no servers")
+        with patch("pymongo.MongoClient", return_value=client):
+            result = manager.ping("mongodb://a")
+
+        assert result == {"ok": False, "error": "no servers"}
+
+    def test_metrics_track_checkouts_and_wait(self):
+        """Test checked-out count, peak and checkout failures"""
+        metrics = PoolMetrics()
+        event = Mock()
+
+        for _ in range(3):
+            metrics.connection_check_out_started(event)
+            metrics.connection_checked_out(event)
+        metrics.connection_checked_in(event)
+        metrics.connection_check_out_started(event)
+        metrics.connection_check_out_failed(event)
+
+        snapshot = metrics.snapshot()
+        assert snapshot["checked_out"] == 2
+        assert snapshot["max_checked_out"] == 3
+        assert snapshot["checkouts"] == 3
+        assert snapshot["checkout_failures"] == 1
+        assert snapshot["max_wait_ms"] >= 0
+
+    def test_stats_report_utilization(self, manager):
+        """Test utilization is checked-out connections over the pool cap"""
+        manager.metrics.connection_checked_out(Mock())
+
+        assert manager.stats()["utilization"] == 0.25
@@ -0,0 +1,150 @@
+"""
+Unit tests for per-turn and bucketed conversation storage
+"""
+
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from database.conversation_store import (
+    BucketedConversationStore,
+    TurnConversationStore,
+    build_conversation_store
+)
+from database.migrate_conversation_buckets import migrate
+
+def make_turn(i, session_id="s1", user_id="u1"):
+    return {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "session_id": session_id,
+        "message": f"question {i}",
+        "response": f"answer {i}",
+        "timestamp": datetime(2026, 1, 1) + timedelta(minutes=i)
+    }
+
+class TestConversationStore:
+    """Test both storage models return the same histories"""
+
+    @pytest.fixture
+    def database(self):
+        return mongomock.MongoClient().healthbot
+
+    @pytest.fixture(params=["turns", "bucketed"])
+    def store(self, request, database):
+        if request.param == "turns":
+            return TurnConversationStore(database)
+        return BucketedConversationStore(database, bucket_size=5)
+
+    def test_history_is_chronological(self, store):
+        """Test full history comes back oldest first"""
+        store.insert_turns([make_turn(i) for i in range(12)])
+
+        history = store.history("s1", "u1")
+
+        assert [h["message"] for h in history] == [f"question {i}" for i in range(12)]
+
+    def test_context_turns_are_most_recent(self, store):
+        """Test the LLM context window is the tail of the session"""
+        store.insert_turns([make_turn(i) for i in range(12)])
+
+        context = store.context_turns("s1", limit=4)
+
+        assert [h["message"] for h in context] == [f"question {i}" for i in range(8, 12)]
+
+    def test_history_is_scoped_to_user(self, store):
+        """Test another user's session id does not leak"""
+        store.insert_turns([make_turn(0), make_turn(1, user_id="u2")])
+
+        assert len(store.history("s1", "u1")) == 1
+
+    def test_buckets_roll_over_at_size(self, database):
+        """Test a new bucket is opened once the current one is full"""
+        store = BucketedConversationStore(database, bucket_size=5)
+        store.insert_turns([make_turn(i) for i in range(12)])
+
+        counts = sorted(b["count"] for b in store.collection.find())
+
+        assert counts == [2, 5, 5]
+
+    def test_replay_skips_existing_turns(self, database):
+        """Test journal replays do not duplicate bucketed turns"""
+        store = BucketedConversationStore(database, bucket_size=5)
+        turns = [make_turn(i) for i in range(3)]
+        store.insert_turns(turns)
+
+        store.insert_turns(turns + [make_turn(3)], skip_existing=True)
+
+        assert len(store.history("s1", "u1")) == 4
+
+    def test_build_rejects_unknown_storage(self, database):
+        """Test misconfiguration fails loudly"""
+        with pytest.raises(ValueError):
+            build_conversation_store(database, "columnar")
+
+    def test_migration_is_resumable(self, database):
+        """Test migration buckets every session once"""
+        database.conversations.insert_many(
+            [make_turn(i) for i in range(7)] + [make_turn(i, session_id="s2") for i in range(3)]
+        )
+
+        first = migrate(database, bucket_size=5)
+        second = migrate(database, bucket_size=5)
+
+        assert first == {"turns": 10, "sessions": 2, "skipped_sessions": 0, "resumed_sessions": 0, "buckets": 3}
+        assert second["skipped_sessions"] == 2
+        assert len(BucketedConversationStore(database).history("s1", "u1")) == 7
+
+    def test_interrupted_session_is_completed(self, database):
+        """Test a session with only some turns bucketed gets the rest, keeping turns written since cutover"""
+        database.conversations.insert_many([make_turn(i) for i in range(7)])
+        store = BucketedConversationStore(database, bucket_size=5)
+        store.insert_turns(list(database.conversations.find().sort("timestamp", 1).limit(5)))
+        live = make_turn(20)
+        store.insert_turns([live])
+
+        stats = migrate(database, bucket_size=5)
+
+        history = store.history("s1", "u1")
+        assert stats["resumed_sessions"] == 1 and stats["turns"] == 2
+        assert [turn["_id"] for turn in history] == sorted(
+            [doc["_id"] for doc in database.conversations.find()] + [live["_id"]])
+        assert database.conversation_buckets.count_documents({}) == 2
+
+    def test_crash_between_insert_and_delete_is_repaired(self, database):
+        """Test turns left in both old and new buckets are bucketed once on the next run"""
+        database.conversations.insert_many([make_turn(i) for i in range(3)])
+        migrate(database, bucket_size=5)
+        duplicate = database.conversation_buckets.find_one({}, {"_id": 0})
+        database.conversation_buckets.insert_one(duplicate)
+
+        migrate(database, bucket_size=5)
+
+        assert len(BucketedConversationStore(database).history("s1", "u1")) == 3
+
+    def test_turn_pushed_during_resume_is_kept(self, database, monkeypatch):
+        """Test a live turn appended to an old bucket mid-resume survives the re-bucketing"""
+        database.conversations.insert_many([make_turn(i) for i in range(4)])
+        store = BucketedConversationStore(database, bucket_size=5)
+        store.insert_turns(list(database.conversations.find().sort("timestamp", 1).limit(2)))
+        old_bucket = database.conversation_buckets.find_one()["_id"]
+        live = make_turn(20)
+        insert_many = mongomock.collection.Collection.insert_many
+        pushed = []
+
+        def insert_then_live_write(collection, docs, *args, **kwargs):
+            result = insert_many(collection, docs, *args, **kwargs)
+            if collection.name == "conversation_buckets" and not pushed:
+                pushed.append(live["_id"])
+                collection.update_one({"_id": old_bucket}, {"$push": {"turns": live}, "$inc": {"count": 1}})
+            return result
+
+        monkeypatch.setattr(mongomock.collection.Collection, "insert_many", insert_then_live_write)
+
+        stats = migrate(database, bucket_size=5)
+
+        history = store.history("s1", "u1")
+        assert stats["resumed_sessions"] == 1
+        assert [turn["_id"] for turn in history] == sorted(
+            [doc["_id"] for doc in database.conversations.find()] + [live["_id"]])
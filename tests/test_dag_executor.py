@@ -0,0 +1,175 @@
+"""
+Unit tests for the in-process DAG executor and MedicalDataPipeline.run_dag
+"""
+
+import asyncio
+import time
+
+import duckdb
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+
+from data_pipelines.orchestration.dag_executor import (DAGExecutor, Stage, StageError, _run_in_process, fingerprint,
+                                                       read_ipc, write_ipc)
+from data_pipelines.orchestration.medical_data_pipeline import MedicalDataPipeline
+
+def double_ratings(table):
+    return table.set_column(1, "rating", pc.multiply(table.column("rating"), 2))
+
+@pytest.fixture
+def turns():
+    return pa.table({"user_id": ["u1", "u2", "u3", "u1"], "rating": [5, 2, 4, 3]})
+
+class TestDAGExecutor:
+    """Test scheduling, Arrow IPC handoff, caching and failures"""
+
+    def test_independent_stages_run_concurrently(self, turns):
+        """Test two branches behind one source overlap instead of running back to back"""
+        async def source():
+            return turns
+
+        async def branch(table):
+            await asyncio.sleep(0.2)
+            return table.num_rows
+
+        executor = DAGExecutor()
+        started = time.perf_counter()
+        run = asyncio.run(executor.run([
+            Stage("extract", source),
+            Stage("left", branch, deps=["extract"]),
+            Stage("right", branch, deps=["extract"])
+        ]))
+
+        assert run.outputs["left"] == run.outputs["right"] == 4
+        assert time.perf_counter() - started < 0.35
+
+    def test_outputs_cached_by_input_hash(self, turns, tmp_path):
+        """Test an unchanged source skips cached stages and new data recomputes them"""
+        calls = []
+        source_data = [turns]
+
+        def transform(table):
+            calls.append(table.num_rows)
+            return double_ratings(table)
+
+        def stages():
+            return [Stage("extract", lambda: source_data[0]), Stage("transform", transform, deps=["extract"])]
+
+        executor = DAGExecutor(cache_dir=str(tmp_path))
+        first = asyncio.run(executor.run(stages()))
+        second = asyncio.run(executor.run(stages()))
+        source_data[0] = turns.slice(0, 2)
+        third = asyncio.run(executor.run(stages()))
+
+        assert calls == [4, 2]
+        assert second.stats["transform"]["cached"] and not third.stats["transform"]["cached"]
+        assert second.outputs["transform"].column("rating").to_pylist() == [10, 4, 8, 6]
+        assert first.stats["extract"]["cached"] is False
+
+    def test_fingerprint_follows_rows_not_buffers(self, turns):
+        """Test slices sharing buffers differ, and equal rows match however they are chunked"""
+        assert fingerprint(turns.slice(0, 2)) != fingerprint(turns.slice(2, 2))
+        rechunked = pa.concat_tables([turns.slice(0, 1), turns.slice(1)])
+        assert fingerprint(rechunked) == fingerprint(turns)
+
+    def test_process_handoff_uses_ipc_files(self, turns, tmp_path):
+        """Test the worker reads its input from a memory-mapped file and writes its result to one"""
+        source = write_ipc(turns, str(tmp_path / "extract.arrow"))
+
+        kind, path = _run_in_process(double_ratings, [("ipc", source)], {}, str(tmp_path / "transform.arrow"))
+
+        assert kind == "ipc" and path.endswith("transform.arrow")
+        assert read_ipc(path).column("rating").to_pylist() == [10, 4, 8, 6]
+
+    def test_invalid_graphs_and_failures(self, turns):
+        """Test unknown dependencies and cycles are rejected and a failure stops dependents"""
+        with pytest.raises(ValueError, match="unknown"):
+            DAGExecutor.order([Stage("load", len, deps=["transform"])])
+        with pytest.raises(ValueError, match="Cycle"):
+            DAGExecutor.order([Stage("a", len, deps=["b"]), Stage("b", len, deps=["a"])])
+
+        loaded = []
+
+        def broken(table):
+            raise KeyError("rating")
+
+        with pytest.raises(StageError) as error:
+            asyncio.run(DAGExecutor().run([
+                Stage("extract", lambda: turns),
+                Stage("transform", broken, deps=["extract"]),
+                Stage("load", loaded.append, deps=["transform"])
+            ]))
+        assert error.value.stage == "transform"
+        assert loaded == []
+
+    def test_pipeline_run_dag_end_to_end(self, turns, tmp_path, monkeypatch):
+        """Test extract -> process-pool transform/analyze -> DuckDB load runs without Airflow"""
+        pipeline = MedicalDataPipeline()
+
+        async def extract(source_type, config):
+            return turns.to_pandas()
+
+        monkeypatch.setattr(pipeline, "extract_from_source", extract)
+        warehouse = str(tmp_path / "warehouse.duckdb")
+        try:
+            run = asyncio.run(pipeline.run_dag({
+                "source_type": "database",
+                "source_config": {},
+                "transformations": [{"type": "filter", "condition": {"op": ">=", "args": ["rating", {"lit": 3}]}}],
+                "analysis_query": "SELECT user_id, sum(rating) AS rating FROM temp_data GROUP BY user_id",
+                "warehouse_config": {"type": "duckdb", "path": warehouse, "table": "user_ratings"},
+                "cache_dir": str(tmp_path / "cache"),
+                "max_processes": 1
+            }))
+        finally:
+            pipeline.close()
+
+        assert run.stats["transform"]["kind"] == "process"
+        assert run.outputs["load"]["rows"] == 2
+        rows = duckdb.connect(warehouse).execute("SELECT * FROM user_ratings ORDER BY user_id").fetchall()
+        assert rows == [("u1", 8), ("u3", 4)]
+
+    def test_kafka_window_committed_only_after_load(self, turns, tmp_path, monkeypatch):
+        """Test a failed load leaves the window uncommitted and the re-run reads it again"""
+        class Batcher:
+            def __init__(self):
+                self.calls = []
+
+            def rewind(self):
+                self.calls.append("rewind")
+
+            def poll_batch(self):
+                self.calls.append("poll")
+                return turns
+
+            def commit(self):
+                self.calls.append("commit")
+
+        batcher = Batcher()
+        pipeline = MedicalDataPipeline()
+        monkeypatch.setattr(pipeline, "_kafka_batcher", lambda config: batcher)
+        dag_config = {
+            "source_type": "kafka",
+            "source_config": {"topic": "q", "bootstrap_servers": "localhost:9092"},
+            "warehouse_config": {"type": "duckdb", "path": str(tmp_path / "w.duckdb"), "table": "events"},
+            "cache_dir": str(tmp_path / "cache"),
+            "max_processes": 1
+        }
+
+        async def broken_load(data, warehouse_config):
+            raise ConnectionError("warehouse down")
+
+        try:
+            with monkeypatch.context() as patched:
+                patched.setattr(pipeline, "load_to_warehouse", broken_load)
+                with pytest.raises(StageError):
+                    asyncio.run(pipeline.run_dag(dag_config))
+            assert batcher.calls == ["rewind", "poll"]
+
+            run = asyncio.run(pipeline.run_dag(dag_config))
+        finally:
+            pipeline.close()
+
+        assert batcher.calls == ["rewind", "poll", "rewind", "poll", "commit"]
+        assert run.outputs["load"]["rows"] == 4 and "commit" in run.stats
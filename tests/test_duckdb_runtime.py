@@ -0,0 +1,108 @@
+"""
+Unit tests for the lazy DuckDB runtime and the pipeline's offline startup
+"""
+
+import threading
+
+import pyarrow as pa
+import pytest
+
+from data_pipelines.orchestration import medical_data_pipeline as pipeline_module
+from data_pipelines.orchestration.duckdb_runtime import DuckDBRuntime, remote_extension
+
+class RecordingConnection:
+    """Connection stand-in recording executed statements"""
+
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.log.append(sql)
+
+class TestDuckDBRuntime:
+    """Test lazy opening, on-demand extensions, pooled cursors and cached tables"""
+
+    def test_nothing_opened_until_first_query(self):
+        """Test constructing the runtime and the pipeline opens no database"""
+        pipeline = pipeline_module.MedicalDataPipeline()
+        assert not pipeline.duckdb.opened
+
+        result = pipeline.analyze_with_duckdb(pa.table({"rating": [4, 5]}), "SELECT avg(rating) AS r FROM temp_data")
+
+        assert result["r"].tolist() == [4.5]
+        assert pipeline.duckdb.opened and pipeline.duckdb.loaded_extensions == set()
+        pipeline.close()
+
+    def test_module_pipeline_created_on_access(self):
+        """Test the module-level data_pipeline is built lazily and reused"""
+        pipeline_module._data_pipeline = None
+
+        first = pipeline_module.data_pipeline
+        assert pipeline_module.data_pipeline is first
+        with pytest.raises(AttributeError):
+            pipeline_module.missing_attribute
+
+    def test_extensions_only_for_remote_paths(self, monkeypatch):
+        """Test local paths load nothing and remote schemes load their extension once"""
+        runtime = DuckDBRuntime()
+        loaded = []
+        monkeypatch.setattr(runtime, "connection", lambda: RecordingConnection(loaded))
+
+        runtime.ensure_remote("exports/messages/**/*.parquet")
+        runtime.ensure_remote("s3://bucket/a.parquet")
+        runtime.ensure_remote("https://example.org/b.parquet")
+
+        assert loaded == ["LOAD httpfs"]
+        assert remote_extension("abfss://container/c.parquet") == "azure"
+
+    def test_offline_missing_extension_fails_without_install(self, tmp_path):
+        """Test offline mode never runs INSTALL and names the extension directory"""
+        runtime = DuckDBRuntime(extension_directory=str(tmp_path), offline=True)
+
+        with pytest.raises(RuntimeError, match=str(tmp_path)):
+            runtime.ensure_extension("httpfs")
+        assert list(tmp_path.iterdir()) == []
+        runtime.close()
+
+    def test_cached_tables_survive_reopen(self, tmp_path):
+        """Test intermediate tables persist in the on-disk database"""
+        path = str(tmp_path / "cache" / "pipeline.duckdb")
+        runtime = DuckDBRuntime(path)
+        runtime.cache_table("daily_topics", pa.table({"topic": ["fever", "cough"], "n": [3, 1]}))
+        runtime.cache_table("top_topic", "SELECT topic FROM daily_topics ORDER BY n DESC LIMIT 1")
+        runtime.close()
+
+        reopened = DuckDBRuntime(path)
+        assert reopened.cached_table("top_topic").to_pylist() == [{"topic": "fever"}]
+        assert reopened.cached_table("never_stored") is None
+        reopened.close()
+
+    def test_pool_bounds_concurrent_cursors(self):
+        """Test threads share tables through at most pool_size cursors"""
+        runtime = DuckDBRuntime(pool_size=2)
+        runtime.cache_table("numbers", "SELECT range AS n FROM range(1000)")
+        cursors, totals = set(), []
+        lock = threading.Lock()
+
+        def query():
+            with runtime.connection() as conn:
+                total = conn.execute("SELECT sum(n) FROM numbers").fetchone()[0]
+                with lock:
+                    cursors.add(id(conn))
+                    totals.append(total)
+
+        threads = [threading.Thread(target=query) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert totals == [499500] * 8
+        assert len(cursors) <= 2
+        runtime.close()
@@ -0,0 +1,111 @@
+"""
+Unit tests for HyperLogLog distinct-user sketches
+"""
+
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from unittest.mock import patch
+
+from database.hyperloglog import HyperLogLog, UniqueUserSketches
+
+NOW = datetime(2026, 3, 10, 15, 30)
+
+class TestHyperLogLog:
+    """Test estimation accuracy and merging"""
+
+    def test_large_count_within_error_bound(self):
+        """Test a 20k-value estimate lands inside three standard errors"""
+        sketch = HyperLogLog(12)
+        sketch.update(f"patient-{i}" for i in range(20_000))
+
+        assert abs(sketch.count() - 20_000) / 20_000 < 3 * sketch.std_error
+
+    def test_small_counts_near_exact(self):
+        """Test linear counting keeps small cardinalities close to exact"""
+        sketch = HyperLogLog(12)
+        sketch.update(["a", "b", "c", "a", "b"])
+
+        assert len(sketch) == 3
+        assert len(HyperLogLog(12)) == 0
+
+    def test_merge_equals_union(self):
+        """Test merged sketches equal the sketch of the union"""
+        left, right, union = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+        left.update(range(0, 3000))
+        right.update(range(2000, 5000))
+        union.update(range(0, 5000))
+
+        assert left.merge(right).registers == union.registers
+
+    def test_merge_rejects_other_precision(self):
+        """Test sketches of different precision refuse to merge"""
+        with pytest.raises(ValueError):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+class TestUniqueUserSketches:
+    """Test persisted per-worker sketches and range queries"""
+
+    @pytest.fixture
+    def database(self):
+        return mongomock.MongoClient().healthbot
+
+    def test_workers_merge_on_read(self, database):
+        """Test two workers' sketches for the same hour are unioned"""
+        first = UniqueUserSketches(database, worker_id="w1")
+        second = UniqueUserSketches(database, worker_id="w2")
+        for user in ("u1", "u2"):
+            first.add(user, NOW)
+        for user in ("u2", "u3"):
+            second.add(user, NOW)
+        second.flush()
+
+        assert first.unique_users(NOW - timedelta(hours=1), NOW + timedelta(hours=1))["estimate"] == 3
+        assert database.analytics_hll.count_documents({"worker": "w1"}) == 2
+
+    def test_range_uses_days_and_edge_hours(self, database):
+        """Test whole days come from day sketches and partial days from hours"""
+        sketches = UniqueUserSketches(database, worker_id="w1")
+        sketches.add("early", datetime(2026, 3, 8, 2))
+        sketches.add("middle", datetime(2026, 3, 9, 12))
+        sketches.add("late", datetime(2026, 3, 10, 20))
+
+        assert sketches.unique_users(datetime(2026, 3, 8, 3), datetime(2026, 3, 10, 21))["estimate"] == 2
+        assert sketches.unique_users(datetime(2026, 3, 8), datetime(2026, 3, 11))["estimate"] == 3
+        assert sketches.unique_users(datetime(2026, 3, 10, 12), datetime(2026, 3, 10, 20))["estimate"] == 0
+
+    def test_late_event_keeps_persisted_registers(self, database):
+        """Test reloading an evicted period never overwrites it with fewer users"""
+        sketches = UniqueUserSketches(database, worker_id="w1")
+        old = NOW - timedelta(days=30)
+        sketches.add("u1", old)
+        sketches.flush()
+        sketches._sketches.clear()
+
+        sketches.add("u2", old)
+
+        assert sketches.unique_users(old - timedelta(hours=1), old + timedelta(hours=1))["estimate"] == 2
+
+    def test_unique_users_reports_bounds(self, database):
+        """Test the result carries the standard error and a band around the estimate"""
+        sketches = UniqueUserSketches(database, precision=10, worker_id="w1")
+        for i in range(5000):
+            sketches.add(f"user-{i}", NOW)
+
+        result = sketches.unique_users(NOW.replace(hour=0), NOW.replace(hour=0) + timedelta(days=1))
+        assert result["std_error"] == round(1.04 / 32, 4)
+        assert result["low"] <= result["estimate"] <= result["high"]
+        assert result["low"] <= 5000 <= result["high"]
+
+    def test_add_survives_storage_errors(self, database):
+        """Test a failing periodic flush is logged, never raised into the writer, and retried later"""
+        sketches = UniqueUserSketches(database, flush_interval=0, worker_id="w1")
+
+        with patch.object(sketches.collection, "update_one", side_effect=ConnectionError("Atlas unreachable")):
+            sketches.add("u1", NOW)
+        assert sketches._dirty
+        sketches.add("u2", NOW)
+
+        assert not sketches._dirty
+        assert sketches.unique_users(NOW - timedelta(hours=1), NOW + timedelta(hours=1))["estimate"] == 2
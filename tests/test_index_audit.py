@@ -0,0 +1,104 @@
+"""
+Unit tests for index derivation, reconciliation and the explain() audit
+"""
+
+import pytest
+import mongomock
+from unittest.mock import Mock
+
+from database.conversation_store import BucketedConversationStore, TurnConversationStore
+from database.index_audit import (
+    QueryShape,
+    audit_query_plans,
+    derive_indexes,
+    main_query_shapes,
+    reconcile_indexes,
+    satisfies
+)
+from database.session_index import SessionIndex
+
+class TestIndexAudit:
+    """Test ESR derivation, reconciliation and plan auditing"""
+
+    @pytest.fixture
+    def database(self):
+        return mongomock.MongoClient().healthbot
+
+    def test_derive_orders_equality_sort_range(self):
+        """Test equality fields come first, then sort keys, then ranges"""
+        shape = QueryShape("q", "c", {"a": 1, "b": {"$gt": 2}, "c": {"$in": [1]}}, [("t", -1)])
+
+        derived = derive_indexes(shape)
+
+        assert len(derived) == 1
+        assert derived[0].keys == [("a", 1), ("c", 1), ("t", -1), ("b", 1)]
+
+    def test_derive_or_branches_separately(self):
+        """Test each $or branch gets its own index"""
+        shape = QueryShape("q", "users", {"$or": [{"username": "x"}, {"email": "y"}]})
+
+        assert [r.keys for r in derive_indexes(shape)] == [[("username", 1)], [("email", 1)]]
+
+    def test_satisfies_reversed_sort_and_permuted_equality(self):
+        """Test an index read backwards or with equality fields swapped still counts"""
+        required = derive_indexes(QueryShape("q", "c", {"s": 1, "u": 1}, [("t", -1), ("_id", -1)]))[0]
+
+        assert satisfies([("u", 1), ("s", 1), ("t", 1), ("_id", 1)], required)
+        assert not satisfies([("s", 1), ("u", 1), ("t", 1), ("_id", -1)], required)
+        assert not satisfies([("s", 1), ("t", 1)], required)
+        assert not satisfies([("s", "text")], required)
+
+    def test_reconcile_creates_only_missing_indexes(self, database):
+        """Test the reconciler fills gaps left by the stores' own indexes"""
+        TurnConversationStore(database).ensure_indexes()
+        SessionIndex(database).ensure_indexes()
+
+        report = reconcile_indexes(database, main_query_shapes("turns"))
+        created = {(c["collection"], tuple(c["keys"])) for c in report["created"]}
+
+        assert created == {
+            ("users", (("username", 1),)),
+            ("users", (("email", 1),)),
+            ("conversations", (("session_id", 1), ("user_id", 1), ("timestamp", 1), ("_id", 1)))
+        }
+        assert reconcile_indexes(database, main_query_shapes("turns"))["created"] == []
+
+    def test_reconcile_report_only(self, database):
+        """Test apply=False lists gaps without creating anything"""
+        BucketedConversationStore(database).ensure_indexes()
+
+        report = reconcile_indexes(database, main_query_shapes("bucketed"), apply=False)
+
+        assert report["created"] == []
+        # Context reads are scoped to the user, like every other bucket query main.py sends
+        assert {"query": "context_buckets", "collection": "conversation_buckets",
+                "keys": [("session_id", 1), ("user_id", 1), ("last_ts", -1)]} in report["missing"]
+        assert not any(entry["keys"] == [("session_id", 1), ("last_ts", -1)] for entry in report["missing"])
+
+    def test_audit_flags_collscan_and_sort(self):
+        """Test COLLSCAN and blocking SORT stages are reported"""
+        plans = {
+            "users": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}},
+            "conversations": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}
+        }
+        database = Mock()
+        database.command.side_effect = lambda _, cmd, **kw: {"queryPlanner": {"winningPlan": plans[cmd["find"]]}}
+        shapes = [
+            QueryShape("login", "users", {"username": "?"}),
+            QueryShape("history", "conversations", {"session_id": "?"}, [("timestamp", 1)])
+        ]
+
+        result = audit_query_plans(database, shapes)
+
+        assert [p["query"] for p in result["problems"]] == ["history"]
+        assert result["problems"][0]["problems"] == ["COLLSCAN", "SORT"]
+
+    def test_audit_records_unavailable_explain(self):
+        """Test servers without explain support do not break startup"""
+        database = Mock()
+        database.command.side_effect = Exception("explain not supported")
+
+        result = audit_query_plans(database, [QueryShape("login", "users", {"username": "?"})])
+
+        assert result["problems"] == []
+        assert result["unavailable"][0]["query"] == "login"
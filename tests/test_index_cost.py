@@ -0,0 +1,127 @@
+"""
+Unit tests for the index cost analyzer and the slimmed MongoDBIndexes
+"""
+
+import asyncio
+
+import pytest
+import mongomock
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from database.index_audit import REPOSITORY_SHAPES, USER_SHAPES
+from database.index_cost import (
+    apply_recommendation,
+    measure_write_overhead,
+    recommend_indexes,
+    sample_message
+)
+from database.mongodb.schema import MongoDBIndexes
+
+SHAPES = USER_SHAPES + REPOSITORY_SHAPES
+
+class TestIndexCost:
+    """Test recommendations, apply mode and overhead measurement"""
+
+    @pytest.fixture
+    def messages(self):
+        collection = mongomock.MongoClient().healthbot.messages
+        collection.create_indexes([
+            IndexModel([("conversation_id", ASCENDING), ("created_at", ASCENDING)], name="idx_conversation_timeline"),
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="idx_user_messages"),
+            IndexModel([("content", TEXT)], name="idx_message_content_search"),
+            IndexModel([("embedding", "2dsphere")], name="idx_embedding", sparse=True),
+            IndexModel([("metadata.$**", ASCENDING)], name="idx_message_metadata"),
+            IndexModel([("is_temporary", ASCENDING), ("created_at", ASCENDING)], expireAfterSeconds=86400,
+                       name="idx_temp_messages_ttl")
+        ])
+        return collection
+
+    def test_recommend_drops_unqueried_indexes(self, messages):
+        """Test indexes no registered query needs are dropped, constraints kept"""
+        result = recommend_indexes("messages", list(messages.list_indexes()), SHAPES)
+
+        kept = {entry["name"] for entry in result["keep"]}
+        assert kept == {"_id_", "idx_message_content_search", "idx_temp_messages_ttl"}
+        # Keyset paging needs _id after created_at; that index also replaces the old timeline
+        assert [entry["query"] for entry in result["missing"]] == ["conversation_messages"]
+        assert {entry["name"] for entry in result["drop"]} == {
+            "idx_conversation_timeline", "idx_user_messages", "idx_embedding", "idx_message_metadata"
+        }
+
+    def test_observed_usage_keeps_index(self, messages):
+        """Test an index with $indexStats accesses is never dropped"""
+        result = recommend_indexes("messages", list(messages.list_indexes()), SHAPES, usage={"idx_user_messages": 12})
+
+        assert "idx_user_messages" not in {entry["name"] for entry in result["drop"]}
+
+    @pytest.mark.parametrize("collection, models", [
+        ("users", MongoDBIndexes.user_indexes()),
+        ("conversations", MongoDBIndexes.conversation_indexes()),
+        ("messages", MongoDBIndexes.message_indexes())
+    ])
+    def test_slim_schema_is_minimal_and_complete(self, collection, models):
+        """Test MongoDBIndexes serves every registered query with nothing left over"""
+        # IndexModel documents keep partialFilterExpression, which mongomock drops
+        indexes = [{"name": "_id_", "key": {"_id": 1}}] + [model.document for model in models]
+
+        result = recommend_indexes(collection, indexes, SHAPES)
+
+        assert result["missing"] == []
+        assert result["drop"] == []
+
+    def test_apply_drops_only_allowed_indexes(self, messages):
+        """Test apply mode creates missing indexes but leaves drops to an explicit allow-list"""
+        database = messages.database
+        recommendation = recommend_indexes("messages", list(messages.list_indexes()), SHAPES)
+
+        result = apply_recommendation(database, "messages", recommendation, SHAPES, allow_drop=["idx_embedding"])
+
+        assert result["dropped"] == ["idx_embedding"]
+        assert sorted(result["skipped"]) == ["idx_conversation_timeline", "idx_message_metadata", "idx_user_messages"]
+        assert "idx_user_messages" in {index["name"] for index in messages.list_indexes()}
+
+    def test_apply_drops_and_creates(self, messages):
+        """Test apply mode converges on the recommended set once every drop is allowed"""
+        database = messages.database
+        recommendation = recommend_indexes("messages", list(messages.list_indexes()), SHAPES)
+
+        result = apply_recommendation(database, "messages", recommendation, SHAPES,
+                                      allow_drop=[index["name"] for index in recommendation["drop"]])
+
+        assert sorted(result["dropped"]) == [
+            "idx_conversation_timeline", "idx_embedding", "idx_message_metadata", "idx_user_messages"
+        ]
+        assert len(result["created"]) == 1
+        after = recommend_indexes("messages", list(messages.list_indexes()), SHAPES)
+        assert after["drop"] == [] and after["missing"] == []
+
+    def test_changed_index_keys_are_dropped_before_create(self, messages):
+        """Test an index whose name is reused with new keys is replaced instead of failing create_indexes"""
+        class AsyncCollection:
+            def __init__(self, collection):
+                self.collection = collection
+                self.name = collection.name
+
+            async def index_information(self):
+                return self.collection.index_information()
+
+            async def drop_index(self, name):
+                self.collection.drop_index(name)
+
+            async def create_indexes(self, models):
+                self.collection.create_indexes(models)
+
+        asyncio.run(MongoDBIndexes.create_message_indexes(AsyncCollection(messages)))
+
+        keys = list(messages.index_information()["idx_conversation_timeline"]["key"])
+        assert keys == [("conversation_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]
+
+    def test_measure_write_overhead_cleans_up(self, messages):
+        """Test each secondary index is measured and the scratch collection removed"""
+        database = messages.database
+
+        result = measure_write_overhead(database, "messages", list(messages.list_indexes()), sample_message, docs=200)
+
+        assert result["baseline_docs_per_sec"] > 0
+        assert set(result["per_index"]) == {index["name"] for index in messages.list_indexes()} - {"_id_"}
+        assert "__index_cost_messages" not in database.list_collection_names()
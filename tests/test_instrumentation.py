@@ -0,0 +1,98 @@
+"""
+Unit tests for span timers, latency histograms and the metrics middleware
+"""
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from server.instrumentation import Instrumentation, InstrumentationMiddleware, LatencyHistogram
+
+class TestLatencyHistogram:
+    """Test bucket precision, percentiles and Prometheus buckets"""
+
+    def test_percentiles_within_bucket_precision(self):
+        """Test percentiles of 1..1000 ms are within the ~1.6% bucket width"""
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.record(ms / 1000)
+
+        assert histogram.count == 1000
+        assert histogram.percentile(50) == pytest.approx(0.5, rel=0.02)
+        assert histogram.percentile(99) == pytest.approx(0.99, rel=0.02)
+        assert histogram.percentile(100) == pytest.approx(1.0, rel=0.02)
+
+    def test_cumulative_buckets(self):
+        """Test exported buckets are cumulative counts at each boundary"""
+        histogram = LatencyHistogram()
+        for seconds in (0.0005, 0.003, 0.003, 0.2, 40.0):
+            histogram.record(seconds)
+
+        buckets = dict(histogram.cumulative())
+        assert buckets[0.001] == 1
+        assert buckets[0.005] == 3
+        assert buckets[0.25] == 4
+        assert buckets[30.0] == 4
+
+class TestInstrumentationMiddleware:
+    """Test per-request stage timings, Server-Timing and /metrics output"""
+
+    @pytest.fixture
+    def instrumentation(self):
+        return Instrumentation(namespace="test")
+
+    @pytest.fixture
+    def client(self, instrumentation):
+        app = FastAPI()
+
+        def dependency():
+            # Sync dependencies run in the threadpool; the span must still reach the request
+            with instrumentation.span("verify_token"):
+                return "user"
+
+        @app.get("/items/{item_id}")
+        async def item(item_id: str, user: str = Depends(dependency)):
+            with instrumentation.span("query"):
+                pass
+            with instrumentation.span("query"):
+                pass
+            return {"item": item_id}
+
+        app.add_middleware(InstrumentationMiddleware, instrumentation=instrumentation)
+        return TestClient(app)
+
+    def test_server_timing_header(self, client):
+        """Test the header lists each stage once plus the total"""
+        response = client.get("/items/1")
+
+        stages = [part.split(";")[0] for part in response.headers["server-timing"].split(", ")]
+        assert stages == ["verify_token", "query", "total"]
+
+    def test_histograms_keyed_by_route_template(self, client, instrumentation):
+        """Test raw paths collapse into one endpoint label per route"""
+        for item_id in ("1", "2", "3"):
+            client.get(f"/items/{item_id}")
+        client.get("/missing")
+
+        snapshot = instrumentation.snapshot()
+        assert set(snapshot) == {"/items/{item_id}", "unmatched"}
+        assert snapshot["/items/{item_id}"]["query"]["count"] == 3
+        assert snapshot["/items/{item_id}"]["total"]["count"] == 3
+
+    def test_background_spans(self, instrumentation):
+        """Test spans outside a request are recorded under "background\""""
+        with instrumentation.span("insert_turns"):
+            pass
+
+        assert instrumentation.snapshot()["background"]["insert_turns"]["count"] == 1
+
+    def test_prometheus_rendering(self, client, instrumentation):
+        """Test histogram, counter and gauge families in the text format"""
+        instrumentation.register_gauge("queue_depth", "Queued items", lambda: 7)
+        client.get("/items/1")
+
+        text = instrumentation.render_prometheus()
+        assert "# TYPE test_stage_duration_seconds histogram" in text
+        assert 'test_stage_duration_seconds_bucket{endpoint="/items/{item_id}",stage="total",le="+Inf"} 1' in text
+        assert 'test_requests_total{endpoint="/items/{item_id}",method="GET",status="200"} 1' in text
+        assert "test_queue_depth 7.0" in text
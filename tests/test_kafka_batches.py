@@ -0,0 +1,151 @@
+"""
+Unit tests for windowed Kafka micro-batch extraction
+"""
+
+import json
+from collections import namedtuple
+
+import pytest
+
+from data_pipelines.ingestion.kafka_batches import KafkaMicroBatcher, decode_values
+
+Record = namedtuple("Record", "topic partition offset timestamp value")
+Partition = namedtuple("Partition", "topic partition")
+
+class FakeConsumer:
+    """Serves queued records per poll and records commits"""
+
+    def __init__(self, values, per_poll=3):
+        self.partition = Partition("healthbot.medical.queries", 0)
+        self.log = [Record(self.partition.topic, 0, offset, 1_773_000_000_000 + offset, value)
+                    for offset, value in enumerate(values)]
+        self.records = list(self.log)
+        self.per_poll = per_poll
+        self.commits = []
+        self.closed = False
+
+    def poll(self, timeout_ms=0, max_records=None):
+        take = min(self.per_poll, max_records or self.per_poll)
+        batch, self.records = self.records[:take], self.records[take:]
+        return {self.partition: batch} if batch else {}
+
+    def seek(self, partition, offset):
+        self.records = [record for record in self.log if record.offset >= offset]
+
+    def commit(self, offsets):
+        self.commits.append({tp.partition: meta.offset for tp, meta in offsets.items()})
+
+    def close(self):
+        self.closed = True
+
+def event(i):
+    return json.dumps({"event_type": "medical_query", "timestamp": "2026-03-10T09:00:00",
+                       "data": {"user_id": f"u{i}", "query": f"question {i}"}}).encode()
+
+class TestKafkaMicroBatcher:
+    """Test windows, bulk decoding and at-least-once commits"""
+
+    def test_count_window_and_flattened_columns(self):
+        """Test batches close at max_records and nested fields become columns"""
+        batcher = KafkaMicroBatcher(["q"], consumer=FakeConsumer([event(i) for i in range(10)]),
+                                    max_records=4, max_wait_s=5)
+
+        tables = list(batcher.batches(stop_when_idle=True, max_batches=3))
+
+        assert [t.num_rows for t in tables] == [4, 4, 2]
+        assert tables[0].column("data.user_id").to_pylist() == ["u0", "u1", "u2", "u3"]
+        assert tables[2].column("_offset").to_pylist() == [8, 9]
+
+    def test_time_window_returns_partial_batch(self):
+        """Test an idle topic ends the window at max_wait_s with what arrived"""
+        batcher = KafkaMicroBatcher(["q"], consumer=FakeConsumer([event(0), event(1)]),
+                                    max_records=100, max_wait_s=0.05)
+
+        assert batcher.poll_batch().num_rows == 2
+        assert batcher.poll_batch() is None
+
+    def test_offsets_committed_when_next_batch_requested(self):
+        """Test a batch is committed only after the caller moves on"""
+        consumer = FakeConsumer([event(i) for i in range(6)])
+        batcher = KafkaMicroBatcher(["q"], consumer=consumer, max_records=3, max_wait_s=5)
+        batches = batcher.batches()
+
+        next(batches)
+        assert consumer.commits == []
+        next(batches)
+        assert consumer.commits == [{0: 3}]
+        batcher.close(commit=True)
+        assert consumer.commits == [{0: 3}, {0: 6}] and consumer.closed
+
+    def test_malformed_messages_skipped(self):
+        """Test one bad message falls back to per-message decoding without losing the rest"""
+        table, kept = decode_values([event(0), b"{not json", event(2)])
+
+        assert kept == [0, 2]
+        assert table.num_rows == 2
+
+        consumer = FakeConsumer([event(0), b"{not json", event(2)])
+        batcher = KafkaMicroBatcher(["q"], consumer=consumer, max_records=3, max_wait_s=5)
+        batch = batcher.poll_batch()
+        assert batch.column("_offset").to_pylist() == [0, 2]
+        assert batcher.stats["malformed"] == 1
+
+    def test_conflicting_field_types_skipped(self):
+        """Test a message whose field type conflicts with the batch is skipped instead of failing it forever"""
+        pa = pytest.importorskip("pyarrow")
+        poison = json.dumps({"event_type": "medical_query", "timestamp": "2026-03-10T09:00:00",
+                             "data": {"user_id": 42, "query": ["not", "text"]}}).encode()
+
+        table, kept = decode_values([event(0), poison, event(2)])
+        assert kept == [0, 2]
+        assert table.column("data").to_pylist()[1]["user_id"] == "u2"
+
+        schema = pa.schema([("event_type", pa.string()), ("data", pa.struct([("user_id", pa.int64())]))])
+        table, kept = decode_values([event(0), poison], schema)
+        assert kept == [1] and table.schema == schema
+
+        consumer = FakeConsumer([event(0), poison, event(2)])
+        batcher = KafkaMicroBatcher(["q"], consumer=consumer, max_records=3, max_wait_s=5)
+        batch = batcher.poll_batch()
+        batcher.commit()
+
+        assert batch.column("_offset").to_pylist() == [0, 2]
+        assert batcher.stats["malformed"] == 1 and consumer.commits == [{0: 3}]
+
+    def test_tombstones_skipped_and_offsets_advance(self):
+        """Test null values (compacted-topic tombstones) are counted as malformed instead of failing the batch"""
+        table, kept = decode_values([None, event(1)])
+        assert kept == [1] and table.num_rows == 1
+
+        consumer = FakeConsumer([event(0), None, event(2), None])
+        batcher = KafkaMicroBatcher(["q"], consumer=consumer, max_records=4, max_wait_s=5)
+        batch = batcher.poll_batch()
+        batcher.commit()
+
+        assert batch.column("_offset").to_pylist() == [0, 2]
+        assert batcher.stats["malformed"] == 2 and consumer.commits == [{0: 4}]
+
+    def test_rewind_redelivers_uncommitted_batches(self):
+        """Test batches handed out since the last commit are polled again after rewind"""
+        consumer = FakeConsumer([event(i) for i in range(6)])
+        batcher = KafkaMicroBatcher(["q"], consumer=consumer, max_records=2, max_wait_s=5)
+        batcher.poll_batch()
+        batcher.commit()
+        batcher.poll_batch()
+        batcher.poll_batch()
+
+        batcher.rewind()
+        again = batcher.poll_batch()
+        batcher.commit()
+
+        assert again.column("_offset").to_pylist() == [2, 3]
+        assert consumer.commits == [{0: 2}, {0: 4}]
+
+    def test_explicit_schema(self):
+        """Test a fixed schema keeps column types stable across batches"""
+        pa = pytest.importorskip("pyarrow")
+        schema = pa.schema([("event_type", pa.string()), ("data", pa.struct([("user_id", pa.string())]))])
+
+        table, _ = decode_values([event(0), event(1)], schema)
+
+        assert table.schema == schema
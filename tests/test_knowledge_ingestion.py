@@ -0,0 +1,112 @@
+"""
+Unit tests for the bulk medical knowledge ingestion pipeline
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+import mongomock
+
+from data_pipelines.ingestion.knowledge_ingestion import (
+    chunk_text,
+    content_hash,
+    ensure_knowledge_indexes,
+    iter_record_batches,
+    ingest_file,
+    main,
+    HashingEmbedder
+)
+
+class TestKnowledgeIngestion:
+    """Test chunking, dedup and resumable writes"""
+
+    @pytest.fixture
+    def collection(self):
+        return mongomock.MongoClient().db.medical_knowledge
+
+    @pytest.fixture
+    def jsonl_file(self, tmp_path):
+        path = tmp_path / "guidelines.jsonl"
+        records = [
+            {"title": f"Guideline {i}", "content": f"Drink fluids for condition {i}.", "tags": "hydration"}
+            for i in range(10)
+        ]
+        # Exact duplicate content (different whitespace) must be skipped
+        records.append({"title": "Dup", "content": "Drink  fluids for condition 0."})
+        path.write_text("\n".join(json.dumps(r) for r in records))
+        return path
+
+    def test_chunk_text_respects_max_chars(self):
+        """Test long text is split into bounded chunks"""
+        text = " ".join(f"Sentence number {i} about fever." for i in range(200))
+        chunks = chunk_text(text, max_chars=300, overlap=50)
+
+        assert len(chunks) > 1
+        assert all(len(c) <= 300 for c in chunks)
+
+    def test_chunk_text_rejects_overlap_not_below_max_chars(self):
+        """Test an overlap that would never advance the hard split is refused"""
+        with pytest.raises(ValueError, match="overlap"):
+            chunk_text("x" * 400, max_chars=150, overlap=150)
+
+    def test_content_hash_ignores_whitespace(self):
+        """Test formatting-only differences hash the same"""
+        assert content_hash("Take  rest.\n") == content_hash("take rest.")
+
+    def test_hashing_embedder_is_normalized(self):
+        """Test embeddings are deterministic unit vectors"""
+        embedder = HashingEmbedder(dim=64)
+        first, second = embedder.embed(["headache and fever", "headache and fever"])
+
+        assert first == second
+        assert abs(sum(v * v for v in first) - 1.0) < 1e-9
+
+    def test_iter_record_batches_csv(self, tmp_path):
+        """Test CSV input is read in fixed-size batches"""
+        path = tmp_path / "kb.csv"
+        path.write_text("title,content\n" + "\n".join(f"t{i},c{i}" for i in range(5)))
+
+        batches = list(iter_record_batches(str(path), "csv", 2))
+
+        assert [len(b) for b in batches] == [2, 2, 1]
+
+    def test_ingest_deduplicates(self, collection, jsonl_file):
+        """Test duplicate content is counted but not inserted"""
+        report = ingest_file(str(jsonl_file), collection, batch_size=4, workers=0)
+
+        assert report["records"] == 11
+        assert report["inserted"] == 10
+        assert report["duplicates"] == 1
+        assert collection.count_documents({}) == 10
+        assert len(collection.find_one()["embedding"]) == 384
+
+    def test_hash_index_skips_documents_without_hash(self, collection):
+        """Test the unique dedup index is partial, so add_medical_knowledge documents do not collide on null"""
+        ensure_knowledge_indexes(collection, dim=8)
+
+        index = collection.index_information()["idx_content_hash_unique"]
+
+        assert index["unique"]
+        assert index["partialFilterExpression"] == {"content_hash": {"$exists": True}}
+
+    def test_ingest_resumes_from_checkpoint(self, collection, jsonl_file, tmp_path):
+        """Test a second run skips records already written"""
+        checkpoint = tmp_path / "ckpt.json"
+        ingest_file(str(jsonl_file), collection, batch_size=4, workers=0, checkpoint_path=str(checkpoint))
+
+        report = ingest_file(str(jsonl_file), collection, batch_size=4, workers=0, checkpoint_path=str(checkpoint))
+
+        assert report["records"] == 0
+        assert json.loads(checkpoint.read_text())["records_done"] == 11
+        assert collection.count_documents({}) == 10
+
+    def test_cli_ingests_and_reports(self, jsonl_file, tmp_path, capsys):
+        """Test the command line entry point runs end to end and closes the shared pool"""
+        client = mongomock.MongoClient()
+        with patch("pymongo.MongoClient", side_effect=lambda *a, **kw: client):
+            main([str(jsonl_file), "--workers", "0", "--checkpoint", str(tmp_path / "cli.ckpt.json"),
+                  "--mongo-uri", "mongodb://cli-test", "--database", "cli"])
+
+        assert json.loads(capsys.readouterr().out)["inserted"] == 10
+        assert client.cli.medical_knowledge.count_documents({}) == 10
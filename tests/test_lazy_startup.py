@@ -0,0 +1,109 @@
+"""
+Unit tests for lazy MongoDB/Cohere initialization and the /ready endpoint
+"""
+
+import time
+
+import mongomock
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import Mock, patch
+
+from database.mongodb.pool import ConnectionManager
+
+class TestLazyDatabase:
+    """Test module-level handles do not create clients until queried"""
+
+    def test_no_client_until_first_query(self):
+        """Test collection handles are free and the first query creates the client"""
+        manager = ConnectionManager(options={"maxPoolSize": 4})
+        with patch("pymongo.MongoClient", side_effect=lambda *a, **kw: mongomock.MongoClient()) as mongo_client:
+            db = manager.lazy_database("healthbot", "mongodb://a")
+            users = db["users"]
+            assert users.name == "users"
+            mongo_client.assert_not_called()
+
+            users.insert_one({"username": "alice"})
+            assert db["users"].find_one({"username": "alice"})["username"] == "alice"
+
+        mongo_client.assert_called_once()
+        assert manager.stats()["sync_clients"] == 1
+
+class TestLazyStartup:
+    """Test the API serves before dependencies are warm and reports readiness separately"""
+
+    @pytest.fixture
+    def app_module(self):
+        with patch("pymongo.MongoClient", side_effect=lambda *a, **kw: mongomock.MongoClient()):
+            import main
+            main.connection_manager.close()
+            for component in ("mongodb", "indexes", "cache_coherence"):
+                main.readiness[component] = "pending"
+            yield main
+            main.connection_manager.close()
+
+    def test_cohere_client_created_on_first_use(self, app_module, monkeypatch):
+        """Test the Cohere SDK client is built once, on first use"""
+        cohere = Mock()
+        monkeypatch.setattr(app_module, "COHERE_API_KEY", "key")
+        monkeypatch.setattr(app_module, "_cohere_client", None)
+        with patch.dict("sys.modules", {"cohere": cohere}):
+            first = app_module.get_cohere()
+            second = app_module.get_cohere()
+
+        assert first is second
+        cohere.Client.assert_called_once_with(api_key="key")
+
+    def test_ready_503_while_mongodb_unreachable(self, app_module, monkeypatch):
+        """Test liveness stays 200 while readiness reports the pending dependency"""
+        monkeypatch.setattr(app_module.connection_manager, "ping", lambda uri=None: {"ok": False, "error": "down"})
+
+        with TestClient(app_module.app) as client:
+            health = client.get("/health")
+            ready = client.get("/ready")
+
+        assert health.status_code == 200
+        assert health.json()["ready"] is False
+        assert ready.status_code == 503
+        assert ready.json()["components"]["mongodb"] == "pending"
+
+    def test_ready_200_after_warm_up(self, app_module, monkeypatch):
+        """Test /ready turns 200 once MongoDB is pinged and indexes are provisioned"""
+        monkeypatch.setenv("INDEX_AUDIT", "off")
+
+        with TestClient(app_module.app) as client:
+            deadline = time.monotonic() + 10
+            response = client.get("/ready")
+            while response.status_code != 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+                response = client.get("/ready")
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["mongodb_ping"]["ok"] is True
+        assert body["components"]["cache_coherence"] == "ready"
+
+    def test_failed_warm_up_is_reported_and_retried(self, app_module, monkeypatch):
+        """Test a warm-up error marks the component failed and the step is retried until ready"""
+        monkeypatch.setenv("INDEX_AUDIT", "off")
+        monkeypatch.setattr(app_module, "WARM_UP_RETRY_S", 0.01)
+        ensure_indexes = app_module.conversation_store.ensure_indexes
+        seen = []
+
+        def flaky_ensure_indexes():
+            seen.append(app_module.readiness["indexes"])
+            if len(seen) == 1:
+                raise ConnectionError("index build interrupted")
+            ensure_indexes()
+
+        monkeypatch.setattr(app_module.conversation_store, "ensure_indexes", flaky_ensure_indexes)
+
+        with TestClient(app_module.app) as client:
+            deadline = time.monotonic() + 10
+            response = client.get("/ready")
+            while response.status_code != 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+                response = client.get("/ready")
+
+        assert seen == ["pending", "failed"]
+        assert response.status_code == 200
@@ -0,0 +1,71 @@
+"""
+Unit tests for the event-loop lag and blocking-call watchdog
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from server.loop_monitor import LoopMonitor, attribute
+
+def blocking_handler():
+    time.sleep(0.25)
+
+class TestLoopMonitor:
+    """Test stall detection, attribution and lag measurement"""
+
+    @pytest.fixture
+    def monitor(self):
+        return LoopMonitor(threshold_ms=50, interval_ms=10)
+
+    def run(self, monitor, body):
+        async def scenario():
+            monitor.start()
+            try:
+                await asyncio.sleep(0.05)
+                await body()
+                await asyncio.sleep(0.1)
+            finally:
+                monitor.stop()
+        asyncio.run(scenario())
+
+    def test_blocking_call_attributed_to_call_site(self, monitor):
+        """Test a sync sleep in a coroutine is reported at the function that made it"""
+        async def handler():
+            blocking_handler()
+
+        self.run(monitor, handler)
+
+        report = monitor.report()
+        assert report["stalls"] == 1
+        top = report["top_sites"][0]
+        assert top["site"].startswith("tests/test_loop_monitor.py:") and top["site"].endswith("blocking_handler")
+        assert 150 <= top["blocked_ms"] <= 400
+        assert report["lag"]["max_ms"] >= 200
+
+    def test_awaiting_does_not_count_as_blocking(self, monitor):
+        """Test cooperative waits leave no stalls and low lag"""
+        async def handler():
+            await asyncio.sleep(0.25)
+
+        self.run(monitor, handler)
+
+        report = monitor.report()
+        assert report["stalls"] == 0
+        assert report["top_sites"] == []
+        assert report["lag"]["count"] > 5
+
+    def test_attribute_prefers_project_frame(self):
+        """Test the call site is our innermost frame and the blocking call the innermost overall"""
+        import traceback
+        stack = [
+            traceback.FrameSummary("/usr/lib/python3.11/asyncio/events.py", 80, "_run"),
+            traceback.FrameSummary(__file__, 10, "verify_password"),
+            traceback.FrameSummary("/venv/lib/site-packages/bcrypt/__init__.py", 84, "hashpw")
+        ]
+
+        site, blocking_call = attribute(stack)
+
+        assert site == "tests/test_loop_monitor.py:10 verify_password"
+        assert blocking_call == "bcrypt/__init__.py:84 hashpw"
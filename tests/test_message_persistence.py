@@ -0,0 +1,81 @@
+"""
+Unit tests for HealthBotDatabase message persistence
+"""
+
+import pytest
+import mongomock
+
+from database.healthbot_db import HealthBotDatabase
+
+class TestMessagePersistence:
+    """Test turn writes and conversation counters"""
+
+    @pytest.fixture
+    def healthbot_db(self):
+        return HealthBotDatabase(mongomock.MongoClient().healthbot)
+
+    def test_save_message_increments_counter(self, healthbot_db):
+        """Test the conversation counter is actually incremented"""
+        conversation_id = healthbot_db.create_conversation("user1")
+
+        healthbot_db.save_message(conversation_id, "user1", "I have a cough")
+
+        conversation = healthbot_db.get_conversation(conversation_id)
+        assert conversation["message_count"] == 1
+
+    def test_save_turn_writes_both_messages_in_order(self, healthbot_db):
+        """Test a turn stores user then assistant and counts both"""
+        conversation_id = healthbot_db.create_conversation("user1")
+
+        ids = healthbot_db.save_turn(conversation_id, "user1", "Fever?", "Rest and fluids.")
+
+        messages = healthbot_db.get_conversation_messages(conversation_id)
+        assert len(ids) == 2
+        assert [m["message_type"] for m in messages] == ["user", "assistant"]
+        assert healthbot_db.get_conversation(conversation_id)["message_count"] == 2
+
+    def test_batched_writes_coalesce(self, healthbot_db):
+        """Test batching flushes many turns in few round trips"""
+        first = healthbot_db.create_conversation("user1")
+        second = healthbot_db.create_conversation("user2")
+        batcher = healthbot_db.enable_write_batching(max_batch=1000, max_delay_ms=10000)
+
+        for i in range(5):
+            healthbot_db.save_turn(first, "user1", f"q{i}", f"a{i}")
+        healthbot_db.save_turn(second, "user2", "q", "a")
+        healthbot_db.flush_writes()
+
+        assert batcher.flushes == 1
+        assert healthbot_db.get_conversation(first)["message_count"] == 10
+        assert healthbot_db.get_conversation(second)["message_count"] == 2
+
+    def test_unavailable_database_is_noop(self):
+        """Test missing credentials still return gracefully"""
+        healthbot_db = HealthBotDatabase.__new__(HealthBotDatabase)
+        healthbot_db.available = False
+        healthbot_db._batcher = None
+
+        assert healthbot_db.save_turn("c", "u", "q", "a") == []
+
+    def test_failed_flush_requeues_messages(self, healthbot_db, monkeypatch):
+        """Test messages whose ids were handed out survive a failed flush and are counted once"""
+        conversation_id = healthbot_db.create_conversation("user1")
+        batcher = healthbot_db.enable_write_batching(max_batch=1000, max_delay_ms=10000)
+        insert_many = mongomock.collection.Collection.insert_many
+        outage = [True]
+
+        def flaky_insert_many(collection, docs, *args, **kwargs):
+            if outage[0]:
+                raise ConnectionError("Atlas unreachable")
+            return insert_many(collection, docs, *args, **kwargs)
+
+        monkeypatch.setattr(mongomock.collection.Collection, "insert_many", flaky_insert_many)
+        ids = healthbot_db.save_turn(conversation_id, "user1", "Fever?", "Rest and fluids.")
+
+        assert batcher.flush() == 0 and batcher.failed_flushes == 1
+        outage[0] = False
+        healthbot_db.flush_writes()
+
+        messages = healthbot_db.get_conversation_messages(conversation_id)
+        assert [str(m["_id"]) for m in messages] == ids
+        assert healthbot_db.get_conversation(conversation_id)["message_count"] == 2
@@ -0,0 +1,138 @@
+"""
+Unit tests for the incremental MongoDB to Parquet exporter
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import duckdb
+import mongomock
+import pytest
+from bson import ObjectId
+
+from data_pipelines.export.mongo_parquet import ParquetExporter, parquet_glob, user_bucket
+
+START = datetime(2026, 3, 10, 9)
+
+def message(i: int, user: str = "u1"):
+    at = START + timedelta(hours=i)
+    return {"_id": ObjectId.from_datetime(at - timedelta(days=1)), "conversation_id": "c1", "user_id": user,
+            "content": f"message {i}", "message_type": "user", "created_at": at, "metadata": {"n": i}}
+
+class TestParquetExporter:
+    """Test partitioning, watermarks and recovery of the Parquet export"""
+
+    @pytest.fixture
+    def database(self):
+        return mongomock.MongoClient().healthbot
+
+    def exporter(self, database, root, **kwargs):
+        return ParquetExporter(database, str(root), settle=timedelta(0), **kwargs)
+
+    def read(self, root, collection="messages"):
+        return duckdb.sql(
+            f"SELECT * FROM read_parquet('{parquet_glob(str(root), collection)}', hive_partitioning=true) ORDER BY _id"
+        ).fetchall()
+
+    def test_partitions_by_date_and_user_bucket(self, database, tmp_path):
+        """Test rows land in date=/user_bucket= directories readable by DuckDB"""
+        database.messages.insert_many([message(i, user=f"u{i % 3}") for i in range(30)])
+
+        result = self.exporter(database, tmp_path, user_buckets=4).export("messages")
+
+        assert result["rows"] == 30
+        partition = os.path.join(tmp_path, "messages", "date=2026-03-10", f"user_bucket={user_bucket('u0', 4):02d}")
+        assert any(name.endswith(".parquet") for name in os.listdir(partition))
+        rows = duckdb.sql(
+            f"SELECT date, count(*) FROM read_parquet('{parquet_glob(str(tmp_path), 'messages')}', "
+            f"hive_partitioning=true) GROUP BY date ORDER BY date"
+        ).fetchall()
+        assert [(str(date), count) for date, count in rows] == [("2026-03-10", 15), ("2026-03-11", 15)]
+
+    def test_incremental_runs_export_only_new_documents(self, database, tmp_path):
+        """Test a second run starts after the saved _id watermark"""
+        database.messages.insert_many([message(i) for i in range(5)])
+        self.exporter(database, tmp_path).export("messages")
+        database.messages.insert_many([message(i) for i in range(5, 8)])
+
+        second = self.exporter(database, tmp_path).export("messages")
+
+        assert second["rows"] == 3
+        assert [row[4] for row in self.read(tmp_path)] == [f"message {i}" for i in range(8)]
+
+    def test_small_batches_and_commits_keep_all_rows(self, database, tmp_path):
+        """Test bounded batches and intermediate commits write every document once"""
+        database.messages.insert_many([message(i, user=f"u{i % 5}") for i in range(100)])
+
+        result = self.exporter(database, tmp_path, batch_rows=7, buffer_rows=10, commit_rows=25).export("messages")
+
+        assert result["commits"] == 4
+        assert len({row[0] for row in self.read(tmp_path)}) == 100
+
+    def test_interrupted_run_files_are_replaced(self, database, tmp_path):
+        """Test parts and .tmp files from an uncommitted run are removed before resuming"""
+        database.messages.insert_many([message(i) for i in range(3)])
+        stale_dir = tmp_path / "messages" / "date=2026-03-10" / "user_bucket=00"
+        stale_dir.mkdir(parents=True)
+        (stale_dir / "part-0-00000.parquet").write_bytes(b"partial")
+        (stale_dir / "part-0-00001.parquet.tmp").write_bytes(b"partial")
+
+        self.exporter(database, tmp_path).export("messages")
+
+        assert len(self.read(tmp_path)) == 3
+        assert not (stale_dir / "part-0-00001.parquet.tmp").exists()
+
+    def test_unsettled_ids_wait_for_next_run(self, database, tmp_path):
+        """Test documents with very recent ObjectIds are left for the next run"""
+        database.messages.insert_one(message(0))
+        database.messages.insert_one({**message(1), "_id": ObjectId()})
+
+        result = ParquetExporter(database, str(tmp_path), settle=timedelta(minutes=5)).export("messages")
+
+        assert result["rows"] == 1
+
+    def test_mixed_conversation_documents_and_string_timestamps(self, database, tmp_path):
+        """Test turn and header documents share a schema and ISO strings become timestamps"""
+        database.conversations.insert_many([
+            {"user_id": "u1", "session_id": "s1", "message": "hi", "response": "hello", "timestamp": START},
+            {"user_id": "u1", "title": "Cough", "status": "active", "started_at": START, "message_count": 2}
+        ])
+        database.analytics_events.insert_one({"event_type": "chat_request", "user_id": "u1",
+                                              "timestamp": "2026-03-10T09:00:00Z"})
+        exporter = self.exporter(database, tmp_path)
+
+        assert [r["rows"] for r in exporter.export_all(["conversations", "analytics_events"])] == [2, 1]
+        events = self.read(tmp_path, "analytics_events")
+        assert events[0][5] == START
+
+    def test_unparseable_timestamp_becomes_null(self, database, tmp_path):
+        """Test a bad timestamp string is exported as null and partitioned by its ObjectId date"""
+        created = ObjectId.from_datetime(START)
+        database.analytics_events.insert_one({"_id": created, "event_type": "chat_request", "user_id": "u1",
+                                              "timestamp": "yesterday-ish"})
+
+        self.exporter(database, tmp_path).export("analytics_events")
+
+        rows = duckdb.sql(
+            f"SELECT timestamp, date FROM read_parquet('{parquet_glob(str(tmp_path), 'analytics_events')}', "
+            f"hive_partitioning=true)"
+        ).fetchall()
+        assert [(timestamp, str(date)) for timestamp, date in rows] == [(None, "2026-03-10")]
+
+    def test_bucketed_turns_appended_after_watermark_are_exported(self, database, tmp_path):
+        """Test turns pushed into an already-exported bucket are picked up by their own _id"""
+        def turn(i):
+            at = START + timedelta(minutes=i)
+            return {"_id": ObjectId.from_datetime(at), "message": f"q{i}", "response": f"a{i}", "timestamp": at}
+
+        database.conversation_buckets.insert_one({"session_id": "s1", "user_id": "u1", "count": 2,
+                                                  "turns": [turn(0), turn(1)]})
+        first = self.exporter(database, tmp_path).export("conversation_buckets")
+        database.conversation_buckets.update_one({"session_id": "s1"}, {"$push": {"turns": turn(2)}})
+
+        second = self.exporter(database, tmp_path).export("conversation_buckets")
+
+        assert (first["rows"], second["rows"]) == (2, 1)
+        rows = self.read(tmp_path, "conversation_buckets")
+        assert [(row[3], row[4]) for row in rows] == [("s1", "q0"), ("s1", "q1"), ("s1", "q2")]
+        assert len({row[1] for row in rows}) == 1
@@ -0,0 +1,36 @@
+"""
+Unit tests for the operational endpoint guard
+"""
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from server.ops_access import require_ops_token
+
+class TestOpsAccess:
+    """Test /metrics-style endpoints are disabled by default and token-gated when enabled"""
+
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+
+        @app.get("/metrics", dependencies=[Depends(require_ops_token)])
+        async def metrics():
+            return {"ok": True}
+
+        return TestClient(app)
+
+    def test_disabled_without_ops_token(self, client, monkeypatch):
+        """Test the endpoint does not exist until OPS_TOKEN is configured"""
+        monkeypatch.delenv("OPS_TOKEN", raising=False)
+
+        assert client.get("/metrics", headers={"Authorization": "Bearer anything"}).status_code == 404
+
+    def test_requires_matching_bearer_token(self, client, monkeypatch):
+        """Test only the configured token is accepted"""
+        monkeypatch.setenv("OPS_TOKEN", "s3cret")
+
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).json() == {"ok": True}
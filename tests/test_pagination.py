@@ -0,0 +1,95 @@
+"""
+Unit tests for keyset pagination helpers and paged history reads
+"""
+
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from database.conversation_store import BucketedConversationStore, TurnConversationStore
+from database.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    etag_matches,
+    keyset_filter,
+    keyset_sort,
+    make_etag,
+    split_page
+)
+
+class TestPagination:
+    """Test cursors, keyset predicates and ETags"""
+
+    @pytest.fixture
+    def collection(self):
+        collection = mongomock.MongoClient().healthbot.items
+        base = datetime(2026, 1, 1)
+        # Pairs of documents share a timestamp to exercise the _id tiebreaker
+        collection.insert_many([
+            {"_id": ObjectId(), "n": i, "ts": base + timedelta(seconds=i // 2)} for i in range(9)
+        ])
+        return collection
+
+    def read_all_pages(self, collection, direction, limit):
+        seen, after = [], None
+        while True:
+            docs = list(collection.find(keyset_filter({}, "ts", direction, after))
+                        .sort(keyset_sort("ts", direction)).limit(limit + 1))
+            page, after = split_page(docs, limit, "ts")
+            seen.extend(d["n"] for d in page)
+            if after is None:
+                return seen
+
+    def test_cursor_round_trip(self):
+        """Test cursors decode to the sort value and _id they encode"""
+        doc = {"_id": ObjectId(), "ts": datetime(2026, 1, 1, 12, 0, 0, 123000)}
+
+        assert decode_cursor(encode_cursor(doc, "ts")) == (doc["ts"], doc["_id"])
+
+    def test_invalid_cursor_raises(self):
+        """Test tampered cursors are rejected"""
+        with pytest.raises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+    def test_ascending_pages_cover_everything_once(self, collection):
+        """Test ties on the sort field are neither skipped nor repeated"""
+        assert self.read_all_pages(collection, 1, 2) == list(range(9))
+
+    def test_descending_pages_cover_everything_once(self, collection):
+        """Test newest-first paging"""
+        assert self.read_all_pages(collection, -1, 4) == list(range(8, -1, -1))
+
+    def test_etag_matching(self):
+        """Test strong, weak and wildcard If-None-Match values"""
+        etag = make_etag("s1", "u1", "v1")
+
+        assert etag_matches(etag, etag)
+        assert etag_matches(etag[2:], etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(make_etag("s1", "u1", "v2"), etag)
+        assert not etag_matches(None, etag)
+
+    @pytest.mark.parametrize("store_class", [TurnConversationStore, BucketedConversationStore])
+    def test_store_iter_history_resumes_after_cursor(self, store_class):
+        """Test history streaming continues strictly after the cursor"""
+        database = mongomock.MongoClient().healthbot
+        store = store_class(database) if store_class is TurnConversationStore else store_class(database, bucket_size=3)
+        turns = [{
+            "_id": ObjectId(),
+            "session_id": "s1",
+            "user_id": "u1",
+            "message": f"m{i}",
+            "response": "r",
+            "timestamp": datetime(2026, 1, 1) + timedelta(seconds=i)
+        } for i in range(7)]
+        store.insert_turns(turns)
+        version = store.history_version("s1", "u1")
+
+        after = encode_cursor(turns[3], "timestamp")
+        rest = [t["message"] for t in store.iter_history("s1", "u1", after=after)]
+
+        assert rest == ["m4", "m5", "m6"]
+        store.insert_turns([{**turns[0], "_id": ObjectId(), "timestamp": datetime(2026, 1, 2)}])
+        assert store.history_version("s1", "u1") != version
@@ -0,0 +1,89 @@
+"""
+Unit tests for declarative lazy Polars transformation plans
+"""
+
+from datetime import datetime
+
+import duckdb
+import pandas as pd
+import polars as pl
+import pytest
+
+from data_pipelines.transform.polars_plan import PlanError, build_plan, compile_expr
+
+@pytest.fixture
+def turns():
+    return pl.DataFrame({
+        "user_id": ["u1", "u1", "u2", "u3"],
+        "message_type": ["user", "assistant", "user", "user"],
+        "rating": [5, None, 2, 4],
+        "message": ["Fever again", "Rest", "Bad COUGH", "cough at night"],
+        "timestamp": [datetime(2026, 3, 10, h) for h in (9, 9, 14, 23)]
+    })
+
+class TestPolarsPlan:
+    """Test the expression compiler, steps and pushdown into Parquet scans"""
+
+    def test_filter_derive_aggregate(self, turns):
+        """Test a filter/derive/aggregate chain runs as one plan"""
+        result = build_plan(turns, [
+            {"type": "filter", "condition": {"op": "==", "args": ["message_type", {"lit": "user"}]}},
+            {"type": "derive", "columns": {"cough": {"fn": "contains", "pattern": "cough",
+                                                     "args": [{"fn": "lower", "args": ["message"]}]}}},
+            {"type": "aggregate", "group_by": ["cough"], "aggs": {
+                "turns": {"fn": "count"}, "rating": {"fn": "mean", "column": "rating"}
+            }},
+            {"type": "sort", "by": ["cough"]}
+        ]).collect()
+
+        assert result.to_dicts() == [{"cough": False, "turns": 1, "rating": 5.0},
+                                     {"cough": True, "turns": 2, "rating": 3.0}]
+
+    def test_original_step_types_still_work(self, turns):
+        """Test mean aggregates, joins on other_df and rolling windows keep their output names"""
+        users = pl.DataFrame({"user_id": ["u1", "u2", "u3"], "plan": ["free", "pro", "pro"]})
+        result = build_plan(turns.to_pandas(), [
+            {"type": "join", "other_df": users, "on": "user_id", "how": "left"},
+            {"type": "aggregate", "group_by": ["plan"], "columns": ["rating"]},
+            {"type": "sort", "by": ["plan"]},
+            {"type": "window", "columns": ["rating_mean"], "window": 1}
+        ]).collect()
+
+        assert result["rating_mean"].to_list() == [5.0, 3.0]
+        assert result["rating_mean_rolling_mean"].to_list() == [5.0, 3.0]
+
+    def test_specs_cannot_run_code(self, turns):
+        """Test code strings and unknown operations are rejected, not evaluated"""
+        with pytest.raises(PlanError):
+            build_plan(turns, [{"type": "filter", "condition": "rating.__class__ > 3"}])
+        with pytest.raises(PlanError):
+            compile_expr({"fn": "__import__", "args": ["os"]})
+        with pytest.raises(PlanError):
+            compile_expr({"op": "**", "args": ["rating", {"lit": 2}]})
+        with pytest.raises(PlanError):
+            build_plan(turns, [{"type": "drop_table"}])
+
+    def test_predicates_and_columns_pushed_into_parquet_scan(self, turns, tmp_path):
+        """Test Hive partitions and unused columns are pruned at the scan"""
+        for day in ("2026-03-09", "2026-03-10"):
+            (tmp_path / f"date={day}").mkdir()
+            turns.write_parquet(tmp_path / f"date={day}" / "part-0.parquet")
+
+        plan = build_plan(str(tmp_path), [
+            {"type": "filter", "condition": {"op": ">=", "args": ["date", {"lit": datetime(2026, 3, 10).date()}]}},
+            {"type": "select", "columns": ["user_id", "rating"]}
+        ])
+        explained = plan.explain()
+
+        assert "1 other source" not in explained and "date=2026-03-09" not in explained
+        assert "PROJECT" in explained
+        assert plan.collect().height == 4
+
+    def test_arrow_result_queried_by_duckdb(self, turns):
+        """Test the collected plan is handed to DuckDB as Arrow"""
+        table = build_plan(turns, [{"type": "select", "columns": ["user_id", "rating"]}]).collect().to_arrow()
+        conn = duckdb.connect()
+        conn.register("temp_data", table)
+
+        assert conn.execute("SELECT count(DISTINCT user_id), max(rating) FROM temp_data").fetchone() == (3, 5)
+        assert isinstance(conn.execute("SELECT * FROM temp_data").fetchdf(), pd.DataFrame)
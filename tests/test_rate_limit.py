@@ -0,0 +1,101 @@
+"""
+Unit tests for token-bucket rate limiting
+"""
+
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+from unittest.mock import Mock
+
+from server.rate_limit import Budget, MemoryBucketStore, MongoBucketStore, RateLimiter, build_rate_limiter, client_ip
+
+class TestTokenBuckets:
+    """Test burst capacity, refill and the shared Mongo backend"""
+
+    @pytest.fixture
+    def budget(self):
+        return Budget.parse("chat", "3/30")
+
+    def test_memory_burst_then_refill(self, budget):
+        """Test capacity requests pass, the next waits one refill interval"""
+        store = MemoryBucketStore()
+
+        assert [store.take(budget, "u1", now=0.0).allowed for _ in range(4)] == [True, True, True, False]
+        rejected = store.take(budget, "u1", now=0.0)
+        assert rejected.retry_after == pytest.approx(10.0)
+        assert store.take(budget, "u1", now=10.0).allowed
+        assert store.take(budget, "u2", now=0.0).allowed
+
+    def test_memory_store_is_bounded(self, budget):
+        """Test the least recently used bucket is evicted past max_keys"""
+        store = MemoryBucketStore(max_keys=2)
+        for key in ("a", "b", "c"):
+            store.take(budget, key, now=0.0)
+
+        assert list(store._buckets) == ["b", "c"]
+
+    def test_mongo_bucket_shared_between_workers(self, budget):
+        """Test two limiters on one collection draw from the same bucket"""
+        database = mongomock.MongoClient().healthbot
+        worker_a, worker_b = MongoBucketStore(database), MongoBucketStore(database)
+        now = datetime(2026, 1, 1)
+
+        results = [store.take(budget, "u1", now=now).allowed for store in (worker_a, worker_b, worker_a, worker_b)]
+
+        assert results == [True, True, True, False]
+        assert worker_a.take(budget, "u1", now=now + timedelta(seconds=10)).allowed
+        assert database.rate_limits.find_one({"_id": "chat:u1"})["expires_at"] == now + timedelta(seconds=40)
+
+    def test_backend_error_fails_open(self, budget):
+        """Test an unreachable backend lets requests through and is counted"""
+        store = Mock()
+        store.take.side_effect = Exception("no servers")
+        limiter = RateLimiter(store, {"chat": budget})
+
+        assert limiter.check("chat", "u1").allowed
+        assert limiter.backend_errors == 1
+
+class TestRateLimitDependency:
+    """Test 429 responses, Retry-After and per-budget rejection counts"""
+
+    @pytest.fixture
+    def limiter(self):
+        return RateLimiter(MemoryBucketStore(), {"auth": Budget.parse("auth", "2/60")})
+
+    @pytest.fixture
+    def client(self, limiter):
+        app = FastAPI()
+
+        async def limit_auth(request: Request):
+            await limiter.enforce("auth", f"ip:{client_ip(request)}")
+
+        @app.post("/auth/login", dependencies=[Depends(limit_auth)])
+        async def login():
+            return {"ok": True}
+
+        return TestClient(app)
+
+    def test_rejects_with_retry_after(self, client, limiter):
+        """Test the third login in a minute gets 429 and a Retry-After header"""
+        statuses = [client.post("/auth/login").status_code for _ in range(2)]
+        rejected = client.post("/auth/login")
+
+        assert statuses == [200, 200]
+        assert rejected.status_code == 429
+        assert rejected.headers["retry-after"] == "30"
+        assert limiter.rejections["auth"] == 1
+
+    def test_build_from_environment(self, monkeypatch):
+        """Test budgets and backend selection come from the environment"""
+        monkeypatch.setenv("RATE_LIMIT_CHAT", "5/10")
+        monkeypatch.setenv("RATE_LIMIT_AUTH", "off")
+
+        limiter = build_rate_limiter()
+
+        assert set(limiter.budgets) == {"chat"}
+        assert limiter.budgets["chat"].rate == 0.5
+        monkeypatch.setenv("RATE_LIMIT_BACKEND", "off")
+        assert build_rate_limiter() is None
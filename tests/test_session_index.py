@@ -0,0 +1,115 @@
+"""
+Unit tests for the maintained per-user session index
+"""
+
+import pytest
+import mongomock
+from datetime import datetime, timedelta
+from bson import ObjectId
+
+from database.conversation_store import BucketedConversationStore, TurnConversationStore
+from database.session_index import SessionIndex, session_title
+
+def make_turn(session_id, minute, message="How do I sleep better?", user_id="u1"):
+    return {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "session_id": session_id,
+        "message": message,
+        "response": "Keep a regular schedule.",
+        "timestamp": datetime(2026, 1, 1) + timedelta(minutes=minute)
+    }
+
+class TestSessionIndex:
+    """Test incremental session summaries and paging"""
+
+    @pytest.fixture
+    def database(self):
+        return mongomock.MongoClient().healthbot
+
+    @pytest.fixture
+    def index(self, database):
+        index = SessionIndex(database)
+        index.ensure_indexes()
+        return index
+
+    def test_record_turns_accumulates_summary(self, index):
+        """Test title comes from the first turn and counters accumulate across batches"""
+        index.record_turns([make_turn("s1", 1, "First question"), make_turn("s1", 2, "Second")])
+        index.record_turns([make_turn("s1", 5, "Third")])
+
+        summary = index.collection.find_one({"session_id": "s1"})
+
+        assert summary["title"] == "First question"
+        assert summary["turn_count"] == 3
+        assert summary["created_at"] == datetime(2026, 1, 1, 0, 1)
+        assert summary["updated_at"] == datetime(2026, 1, 1, 0, 5)
+
+    def test_list_sessions_pages_most_recent_first(self, index):
+        """Test keyset pages cover every session exactly once"""
+        index.record_turns([make_turn(f"s{i}", i) for i in range(5)])
+        index.record_turns([make_turn("s1", 10)])
+
+        seen, after = [], None
+        while True:
+            page, after = index.list_sessions("u1", limit=2, after=after)
+            seen.extend(s["session_id"] for s in page)
+            if after is None:
+                break
+
+        assert seen == ["s1", "s4", "s3", "s2", "s0"]
+
+    def test_sessions_are_per_user(self, index):
+        """Test users only see their own sessions"""
+        index.record_turns([make_turn("s1", 1), make_turn("s2", 2, user_id="u2")])
+
+        page, _ = index.list_sessions("u2")
+
+        assert [s["session_id"] for s in page] == ["s2"]
+
+    def test_replayed_turns_are_not_counted_twice(self, database, index):
+        """Test only turns the store actually wrote reach the index"""
+        store = TurnConversationStore(database)
+        turns = [make_turn("s1", 1), make_turn("s1", 2)]
+        index.record_turns(store.insert_turns(turns))
+
+        index.record_turns(store.insert_turns(turns + [make_turn("s1", 3)], skip_existing=True))
+
+        assert index.collection.find_one({"session_id": "s1"})["turn_count"] == 3
+
+    @pytest.mark.parametrize("store_class", [TurnConversationStore, BucketedConversationStore])
+    def test_refresh_is_idempotent_for_retried_batches(self, database, index, store_class):
+        """Test a batch stored and counted before its flush failed is not counted again, nor lost"""
+        store = store_class(database)
+        counted = [make_turn("s1", 1, "First"), make_turn("s2", 2)]
+        index.record_turns(store.insert_turns(counted))
+        uncounted = [make_turn("s1", 3), make_turn("s1", 4)]
+        store.insert_turns(uncounted)  # Written, then record_turns failed
+
+        retry = uncounted + [make_turn("s1", 5)]
+        for _ in range(2):
+            store.insert_turns(retry, skip_existing=True)
+            index.refresh(store, retry)
+
+        summary = index.collection.find_one({"session_id": "s1"})
+        assert summary["turn_count"] == 4 and summary["title"] == "First"
+        assert summary["updated_at"] == datetime(2026, 1, 1, 0, 5)
+        assert index.collection.find_one({"session_id": "s2"})["turn_count"] == 1
+
+    @pytest.mark.parametrize("store_class", [TurnConversationStore, BucketedConversationStore])
+    def test_rebuild_matches_incremental_summary(self, database, index, store_class):
+        """Test a backfill from stored transcripts reproduces the maintained summaries"""
+        store = store_class(database)
+        turns = [make_turn("s1", i, f"Question {i}") for i in range(4)] + [make_turn("s2", 9)]
+        index.record_turns(store.insert_turns(turns))
+        expected = list(index.collection.find({}, {"_id": 0}).sort("session_id", 1))
+
+        index.collection.delete_many({})
+        assert index.rebuild(store) == 2
+
+        assert list(index.collection.find({}, {"_id": 0}).sort("session_id", 1)) == expected
+
+    def test_session_title_truncates(self):
+        """Test long first messages are shortened"""
+        assert session_title("x" * 60) == "x" * 40 + "..."
+        assert session_title(None) == "New Chat"
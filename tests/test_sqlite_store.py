@@ -0,0 +1,199 @@
+"""
+Unit tests for the SQLite storage backend (STORAGE_BACKEND=sqlite)
+"""
+
+import importlib
+import shutil
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError
+
+from database.pagination import encode_cursor
+from database.sqlite_store import SQLiteStorage
+
+T0 = datetime(2026, 3, 10, 9, 0)
+
+def make_turns(session_id, count, user_id="1", start=T0):
+    return [{"_id": ObjectId(), "user_id": user_id, "session_id": session_id, "message": f"question {i}",
+             "response": f"answer {i}", "timestamp": start + timedelta(seconds=i)} for i in range(count)]
+
+@pytest.fixture
+def storage(tmp_path):
+    path = tmp_path / "healthbot.db"
+    shutil.copy("config/healthbot.db", path)
+    storage = SQLiteStorage(str(path))
+    storage.ensure_schema()
+    yield storage
+    storage.close()
+
+class TestSQLiteStore:
+    """Test the repositories main.py uses, on the existing healthbot.db schema"""
+
+    def test_schema_migrated_in_place(self, tmp_path):
+        """Test legacy rows get turn ids and summaries, and WAL plus the timeline index are on"""
+        path = tmp_path / "legacy.db"
+        shutil.copy("config/healthbot.db", path)
+        legacy = sqlite3.connect(path)
+        legacy.execute("INSERT INTO users (username, email, password) VALUES ('old', 'old@x.org', 'h')")
+        legacy.execute("INSERT INTO sessions (session_id, user_id, created_at) VALUES ('s-old', 1, '2025-01-01 10:00:00')")
+        legacy.execute("INSERT INTO conversations (user_id, username, session_id, message, response, timestamp) "
+                       "VALUES (1, 'old', 's-old', 'hi', 'hello', '2025-01-01 10:00:05')")
+        legacy.commit()
+        legacy.close()
+
+        storage = SQLiteStorage(str(path))
+        storage.ensure_schema()
+        conn = storage.engine.connection()
+
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT turn_id FROM conversations WHERE session_id = ? "
+                            "ORDER BY timestamp, turn_id", ("s-old",)).fetchall()
+        assert "idx_conversations_session_ts" in plan[0][3] and len(plan) == 1
+        assert [t["message"] for t in storage.conversations.history("s-old", "1")] == ["hi"]
+        sessions, _ = storage.sessions.list_sessions("1")
+        assert sessions[0]["turn_count"] == 1 and sessions[0]["updated_at"] == datetime(2025, 1, 1, 10, 0, 5)
+        storage.close()
+
+    def test_turns_batched_and_replay_safe(self, storage):
+        """Test a batch is one transaction and replayed turns are neither stored nor counted twice"""
+        turns = make_turns("s1", 5)
+        before = storage.engine.transactions
+
+        written = storage.conversations.insert_turns(turns)
+        storage.sessions.record_turns(written)
+        replayed = storage.conversations.insert_turns(turns[3:] + make_turns("s1", 1, start=T0 + timedelta(1)),
+                                                      skip_existing=True)
+        storage.sessions.record_turns(replayed)
+
+        assert storage.engine.transactions - before == 4
+        assert len(written) == 5 and len(replayed) == 1
+        assert [t["message"] for t in storage.conversations.context_turns("s1", limit=2)] == ["question 4",
+                                                                                            "question 0"]
+        assert storage.sessions.get_sessions("1", ["s1"])["s1"]["turn_count"] == 6
+        for _ in range(2):
+            storage.sessions.refresh(storage.conversations, turns)
+        assert storage.sessions.get_sessions("1", ["s1"])["s1"]["turn_count"] == 6
+
+    def test_history_keyset_pages(self, storage):
+        """Test history pages resume strictly after the cursor and the version follows the newest turn"""
+        turns = make_turns("s1", 7)
+        storage.conversations.insert_turns(turns)
+
+        first = list(storage.conversations.iter_history("s1", "1", limit=3))
+        rest = list(storage.conversations.iter_history("s1", "1", after=encode_cursor(first[2], "timestamp")))
+
+        assert len(first) == 4
+        assert [t["_id"] for t in first[:3] + rest] == [t["_id"] for t in turns]
+        assert storage.conversations.history_version("s1", "1") == str(turns[-1]["_id"])
+        assert storage.conversations.history_version("s1", "2") == "empty"
+
+    def test_sessions_newest_first_with_cursor(self, storage):
+        """Test the session list pages by updated_at like the MongoDB index"""
+        for index in range(5):
+            storage.sessions.record_turns(make_turns(f"s{index}", 1, start=T0 + timedelta(minutes=index)))
+
+        page, cursor = storage.sessions.list_sessions("1", limit=3)
+        rest, end = storage.sessions.list_sessions("1", limit=3, after=cursor)
+
+        assert [s["session_id"] for s in page + rest] == ["s4", "s3", "s2", "s1", "s0"]
+        assert end is None and page[0]["title"] == "question 0"
+
+    def test_session_ids_unique_per_user(self, storage):
+        """Test two users writing the same session id keep separate summaries and context"""
+        for user_id in ("1", "2"):
+            turns = make_turns("session_1", 1, user_id=user_id)
+            turns[0]["message"] = f"from {user_id}"
+            storage.sessions.record_turns(storage.conversations.insert_turns(turns))
+
+        for user_id in ("1", "2"):
+            sessions, _ = storage.sessions.list_sessions(user_id)
+            assert [(s["session_id"], s["turn_count"]) for s in sessions] == [("session_1", 1)]
+            context = storage.conversations.context_turns("session_1", user_id=user_id)
+            assert [t["message"] for t in context] == [f"from {user_id}"]
+
+    def test_users_lookup_and_duplicates(self, storage):
+        """Test Mongo-style user filters and unique usernames"""
+        result = storage.users.insert_one({"username": "alice", "email": "alice@x.org", "password": "hash"})
+
+        found = storage.users.find_one({"$or": [{"username": "nobody"}, {"email": "alice@x.org"}]})
+        assert found["_id"] == result.inserted_id and found["role"] == "user"
+        assert storage.users.find_one({"username": "bob"}) is None
+        with pytest.raises(DuplicateKeyError):
+            storage.users.insert_one({"username": "alice", "email": "other@x.org", "password": "hash"})
+
+    def test_connection_per_thread(self, storage):
+        """Test each thread writes through its own connection without lock errors"""
+        errors = []
+
+        def write(index):
+            try:
+                storage.conversations.insert_turns(make_turns(f"t{index}", 50))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert storage.engine.stats()["connections"] >= 8
+        count = storage.engine.connection().execute("SELECT count(*) FROM conversations").fetchone()[0]
+        assert count == 400
+
+class TestSQLiteBackendApp:
+    """Test main.py serves auth, chat and history from SQLite"""
+
+    @pytest.fixture
+    def app_module(self, tmp_path, monkeypatch):
+        import main
+
+        monkeypatch.setenv("STORAGE_BACKEND", "sqlite")
+        monkeypatch.setenv("SQLITE_PATH", str(tmp_path / "healthbot.db"))
+        monkeypatch.delenv("COHERE_API_KEY", raising=False)
+        yield importlib.reload(main)
+        monkeypatch.undo()
+        importlib.reload(main)
+
+    def test_register_chat_history(self, app_module, tmp_path):
+        """Test a user registers, chats and reads the session back without MongoDB"""
+        with TestClient(app_module.app) as client:
+            token = client.post("/auth/register", json={
+                "username": "edge", "email": "edge@x.org", "password": "secret"
+            }).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            for text in ("I have a fever", "Since yesterday"):
+                client.post("/chat", json={"message": text, "session_id": "s-edge"}, headers=headers)
+
+            history = client.get("/history/s-edge", headers=headers).json()
+            sessions = client.get("/sessions", headers=headers).json()["sessions"]
+            ready = client.get("/ready").json()
+
+        assert [turn["message"] for turn in history["history"]] == ["I have a fever", "Since yesterday"]
+        assert sessions[0]["session_id"] == "s-edge" and sessions[0]["turn_count"] == 2
+        assert ready["components"]["sqlite"] == "ready" and ready["sqlite_ping"]["ok"]
+        stored = sqlite3.connect(tmp_path / "healthbot.db").execute(
+            "SELECT username, message FROM conversations ORDER BY timestamp").fetchall()
+        assert stored == [("edge", "I have a fever"), ("edge", "Since yesterday")]
+
+    def test_pending_sessions_keep_first_page_within_limit(self, app_module, monkeypatch):
+        """Test queued turns fold into page one without overflowing it or repeating on page two"""
+        sessions = app_module.session_index
+        for index in range(3):
+            sessions.record_turns(app_module.conversation_store.insert_turns(
+                make_turns(f"s{index}", 1, start=T0 + timedelta(minutes=index))))
+        queued = make_turns("s-new", 2, start=T0 + timedelta(hours=1))
+        monkeypatch.setattr(app_module.transcript_queue, "pending",
+                            lambda **match: [t for t in queued if t["user_id"] == match["user_id"]])
+
+        first, cursor = app_module.with_pending_sessions(*sessions.list_sessions("1", limit=2), "1", 2)
+        rest, end = sessions.list_sessions("1", limit=2, after=cursor)
+
+        assert [(s["session_id"], s["turn_count"]) for s in first] == [("s-new", 2), ("s2", 1)]
+        assert [s["session_id"] for s in rest] == ["s1", "s0"] and end is None
@@ -0,0 +1,123 @@
+"""
+Unit tests for the Space-Saving trending-queries summary
+"""
+
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import mongomock
+import pytest
+
+from database.healthbot_db import HealthBotDatabase
+from database.trending_queries import SpaceSaving, TrendingQueries, normalize_query
+
+NOW = datetime(2026, 3, 10, 15, 30)
+
+class TestSpaceSaving:
+    """Test normalization and the heavy-hitters guarantees"""
+
+    def test_normalize_query(self):
+        """Test case, punctuation and whitespace variants share one key"""
+        assert normalize_query("  What causes a HEADACHE?? ") == "what causes a headache"
+        assert normalize_query("what causes a headache") == normalize_query("What causes a headache!")
+        assert normalize_query("?!") == ""
+
+    def test_heavy_hitters_survive_bounded_capacity(self):
+        """Test frequent queries are kept and counts overestimate by at most their error"""
+        rng = random.Random(7)
+        stream = [f"q{int(500 * rng.random() ** 3)}" for _ in range(20_000)]
+        exact = Counter(stream)
+        summary = SpaceSaving(capacity=50)
+        for key in stream:
+            summary.add(key)
+
+        assert len(summary.counts) == 50
+        for key, count in exact.items():
+            if count > len(stream) / 50:
+                assert key in summary.counts
+        for item in summary.top():
+            assert item["count"] - item["error"] <= exact[item["key"]] <= item["count"]
+        assert [item["key"] for item in summary.top(3)] == [key for key, _ in exact.most_common(3)]
+
+    def test_new_query_inherits_min_count(self):
+        """Test an evicting insert records the evicted count as its error"""
+        summary = SpaceSaving(capacity=2)
+        for key in ("a", "a", "b", "c"):
+            summary.add(key)
+
+        assert summary.counts == {"a": 2, "c": 2}
+        assert summary.errors["c"] == 1
+        assert summary.min_count == 2
+
+class TestTrendingQueries:
+    """Test persisted per-hour summaries and window merges"""
+
+    @pytest.fixture
+    def database(self):
+        return mongomock.MongoClient().healthbot
+
+    def test_one_document_per_hour_and_worker(self, database):
+        """Test many events flush as a single summary document"""
+        trending = TrendingQueries(database, worker_id="w1")
+        for i in range(100):
+            trending.add(f"Fever for {i % 5} days?", NOW)
+        trending.flush()
+
+        doc = database.medical_queries_topk.find_one()
+        assert database.medical_queries_topk.count_documents({}) == 1
+        assert doc["_id"] == "h:2026-03-10T15:w1"
+        assert doc["total"] == 100 and len(doc["items"]) == 5
+
+    def test_trending_merges_hours_and_workers(self, database):
+        """Test counts add up across workers and hours in the window"""
+        first = TrendingQueries(database, worker_id="w1")
+        second = TrendingQueries(database, worker_id="w2")
+        for _ in range(3):
+            first.add("Sore throat remedies", NOW)
+        second.add("sore throat remedies!", NOW - timedelta(hours=2))
+        second.add("Back pain", NOW)
+        second.flush()
+
+        top = first.trending(limit=2, hours=24, until=NOW)
+        assert [(item["normalized"], item["count"]) for item in top] == [("sore throat remedies", 4), ("back pain", 1)]
+        assert top[0]["query"] == "Sore throat remedies"
+        assert first.trending(limit=5, hours=1, until=NOW)[0]["count"] == 3
+
+    def test_missing_from_full_summary_widens_error(self, database):
+        """Test a query absent from a full summary gets that summary's floor as error"""
+        full = TrendingQueries(database, capacity=1, worker_id="w1")
+        full.add("cough", NOW)
+        full.add("cough", NOW)
+        full.flush()
+        other = TrendingQueries(database, worker_id="w2")
+        other.add("rash", NOW)
+
+        top = {item["normalized"]: item for item in other.trending(hours=1, until=NOW)}
+        assert top["cough"]["error"] == 0
+        assert top["rash"]["error"] == 2
+
+    def test_add_survives_storage_errors(self, database):
+        """Test a failing load or periodic flush is logged, never raised into the consumer, and retried later"""
+        trending = TrendingQueries(database, flush_interval=0, worker_id="w1")
+
+        with patch.object(trending.collection, "find_one", side_effect=ConnectionError("Atlas unreachable")):
+            trending.add("Fever for 3 days?", NOW)
+        assert not trending._summaries
+        with patch.object(trending.collection, "update_one", side_effect=ConnectionError("Atlas unreachable")):
+            trending.add("Fever for 3 days?", NOW)
+        assert trending._dirty
+        trending.add("Fever for 3 days?", NOW)
+
+        assert not trending._dirty
+        assert database.medical_queries_topk.find_one()["total"] == 2
+
+    def test_database_exposes_trending(self, database):
+        """Test HealthBotDatabase wires the summary and flushes it with buffered writes"""
+        healthbot = HealthBotDatabase(database)
+        healthbot.trending.add("Chest pain when breathing", datetime.utcnow())
+        healthbot.flush_writes()
+
+        assert database.medical_queries_topk.count_documents({}) == 1
+        assert healthbot.get_trending_queries(limit=1)[0]["query"] == "Chest pain when breathing"
@@ -0,0 +1,142 @@
+"""
+Unit tests for bulk warehouse loading through Parquet staging files
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from data_pipelines.load.warehouse_loader import (BulkLoader, DuckDBTarget, SQLiteTarget, SnowflakeTarget,
+                                                  load_with_config, stage_parquet)
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "user_id": [f"u{i % 7}" for i in range(1000)],
+        "rating": [i % 5 + 1 for i in range(1000)],
+        "response_ms": [i * 1.5 for i in range(1000)],
+        "timestamp": [datetime(2026, 3, 10, i % 24) for i in range(1000)]
+    })
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        self.log.append((threading.current_thread().name, sql))
+
+    def fetchall(self):
+        return [("file", "LOADED", 400, 400)]
+
+class FakeSnowflake(SnowflakeTarget):
+    """SnowflakeTarget with the connector replaced by a statement log"""
+
+    def __init__(self):
+        self.config = {}
+        self.log = []
+        self.conn = self
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def close(self):
+        pass
+
+class TestWarehouseLoader:
+    """Test staging, local targets and the Snowflake PUT/COPY sequence"""
+
+    def test_staging_splits_files(self, frame, tmp_path):
+        """Test data is staged as zstd Parquet files of at most rows_per_file rows"""
+        pq = pytest.importorskip("pyarrow.parquet")
+        paths = stage_parquet(frame, str(tmp_path), rows_per_file=400)
+
+        assert [pq.ParquetFile(p).metadata.num_rows for p in paths] == [400, 400, 200]
+        assert pq.ParquetFile(paths[0]).metadata.row_group(0).column(0).compression == "ZSTD"
+
+    def test_duckdb_target_creates_and_appends(self, frame, tmp_path):
+        """Test the table is created from the Parquet schema and later loads append"""
+        target = DuckDBTarget()
+        loader = BulkLoader(target, staging_dir=str(tmp_path), rows_per_file=300)
+
+        result = loader.load(frame, "conversations")
+        loader.load(frame.head(10), "conversations")
+
+        assert result["rows"] == 1000 and result["files"] == 4
+        assert target.conn.execute("SELECT count(*), sum(rating) FROM conversations").fetchone() == (1010, 3030)
+        assert os.listdir(tmp_path) == []
+
+    def test_sqlite_target_single_transaction(self, frame, tmp_path):
+        """Test SQLite receives every row with typed columns and ISO timestamps"""
+        path = str(tmp_path / "warehouse.db")
+        target = SQLiteTarget(path)
+
+        result = BulkLoader(target, rows_per_file=256).load(frame, "conversations")
+        target.close()
+
+        conn = sqlite3.connect(path)
+        assert result["rows"] == 1000
+        assert conn.execute("SELECT count(*), sum(rating) FROM conversations").fetchone() == (1000, 3000)
+        assert conn.execute("SELECT timestamp FROM conversations LIMIT 1").fetchone()[0].startswith("2026-03-10")
+        types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(conversations)")}
+        assert types == {"user_id": "TEXT", "rating": "INTEGER", "response_ms": "REAL", "timestamp": "TEXT"}
+
+    def test_snowflake_parallel_put_then_copy(self, frame):
+        """Test staged files are PUT from worker threads before one COPY INTO with PURGE"""
+        target = FakeSnowflake()
+
+        result = BulkLoader(target, rows_per_file=400, upload_workers=3).load(frame, "analytics.conversations")
+
+        puts = [(thread, sql) for thread, sql in target.log if sql.startswith("PUT")]
+        copies = [sql for _, sql in target.log if sql.startswith("COPY")]
+        assert len(puts) == 3 and all(thread.startswith("warehouse-upload") for thread, _ in puts)
+        assert target.log[-1][1] == copies[0] and len(copies) == 1
+        assert "FROM @analytics.%conversations " in copies[0] and "PURGE = TRUE" in copies[0]
+        assert all(" @analytics.%conversations " in sql for _, sql in puts)
+        assert result["rows"] == 400
+
+    def test_snowflake_table_created_before_put(self, frame):
+        """Test the table (and so its stage) exists before files are PUT to @%table"""
+        target = FakeSnowflake()
+
+        BulkLoader(target, rows_per_file=400).load(frame, "analytics.conversations")
+
+        assert target.log[0][1] == ('CREATE TABLE IF NOT EXISTS analytics.conversations ("user_id" VARCHAR, '
+                                    '"rating" NUMBER, "response_ms" FLOAT, "timestamp" TIMESTAMP_NTZ)')
+        assert target.log[1][1].startswith("PUT")
+
+    def test_snowflake_stage_for_qualified_names(self, frame):
+        """Test the table stage is @%table, with any database/schema qualifier before the %"""
+        target = FakeSnowflake()
+
+        BulkLoader(target, rows_per_file=400).load(frame, "conversations")
+        BulkLoader(target, rows_per_file=400).load(frame, "healthbot.analytics.conversations")
+
+        puts = [sql for _, sql in target.log if sql.startswith("PUT")]
+        copies = [sql for _, sql in target.log if sql.startswith("COPY")]
+        assert " @%conversations " in puts[0] and "FROM @%conversations " in copies[0]
+        assert " @healthbot.analytics.%conversations " in puts[-1]
+        assert "FROM @healthbot.analytics.%conversations " in copies[1]
+
+    def test_load_with_config_connects_and_closes(self, frame, tmp_path):
+        """Test a configured load builds the target, loads the table and closes the connection"""
+        path = str(tmp_path / "warehouse.db")
+
+        result = load_with_config(frame, {"type": "sqlite", "path": path, "table": "feedback", "rows_per_file": 500})
+
+        assert (result["rows"], result["files"]) == (1000, 2)
+        assert sqlite3.connect(path).execute("SELECT count(*) FROM feedback").fetchone() == (1000,)
+
+    def test_invalid_table_rejected(self, frame):
+        """Test table names that are not plain identifiers never reach SQL"""
+        with pytest.raises(ValueError):
+            BulkLoader(DuckDBTarget()).load(frame, "x; DROP TABLE users")
@@ -0,0 +1,162 @@
+"""
+Unit tests for the write-behind transcript queue
+"""
+
+import asyncio
+import fcntl
+import os
+
+import pytest
+import mongomock
+
+from database.write_behind import WriteBehindQueue
+
+class TestWriteBehindQueue:
+    """Test batching, shutdown flush and journal recovery"""
+
+    @pytest.fixture
+    def collection(self):
+        return mongomock.MongoClient().healthbot.conversations
+
+    def make_queue(self, collection, journal_dir, **kwargs):
+        return WriteBehindQueue(
+            sink=lambda docs: collection.insert_many(docs, ordered=False),
+            journal_dir=str(journal_dir),
+            **kwargs
+        )
+
+    def test_enqueue_does_not_write_until_flush(self, collection, tmp_path):
+        """Test documents are queued, visible as pending, then batched"""
+        queue = self.make_queue(collection, tmp_path, max_batch=100, flush_interval_ms=60000)
+
+        async def scenario():
+            await queue.start()
+            for i in range(3):
+                queue.enqueue({"session_id": "s1", "message": f"m{i}"})
+            assert collection.count_documents({}) == 0
+            assert queue.depth == 3
+            assert len(queue.pending(session_id="s1")) == 3
+            await queue.close()
+
+        asyncio.run(scenario())
+
+        assert collection.count_documents({}) == 3
+        assert queue.stats["flushes"] == 1
+
+    def test_flushes_when_batch_is_full(self, collection, tmp_path):
+        """Test reaching max_batch wakes the flusher early"""
+        queue = self.make_queue(collection, tmp_path, max_batch=2, flush_interval_ms=60000)
+
+        async def scenario():
+            await queue.start()
+            queue.enqueue({"message": "a"})
+            queue.enqueue({"message": "b"})
+            await asyncio.sleep(0.05)
+            written = collection.count_documents({})
+            await queue.close()
+            return written
+
+        assert asyncio.run(scenario()) == 2
+
+    def test_recovers_journal_after_crash(self, collection, tmp_path):
+        """Test unflushed documents are replayed on next start"""
+        crashed = self.make_queue(collection, tmp_path, flush_interval_ms=60000)
+
+        async def crash():
+            await crashed.start()
+            crashed.enqueue({"message": "lost?"})
+            crashed._task.cancel()
+            crashed._journal.close()  # Process dies without close()
+
+        asyncio.run(crash())
+        assert collection.count_documents({}) == 0
+
+        restarted = self.make_queue(collection, tmp_path, flush_interval_ms=10)
+
+        async def restart():
+            await restarted.start()
+            await restarted.close()
+
+        asyncio.run(restart())
+
+        assert restarted.stats["recovered"] == 1
+        assert collection.count_documents({"message": "lost?"}) == 1
+
+    def test_journal_is_locked_before_it_can_be_claimed(self, collection, tmp_path, monkeypatch):
+        """Test a starting worker's journal only gets its globbed name once it is locked"""
+        rename = os.rename
+        locked = []
+
+        def checked_rename(src, dst):
+            with open(src) as other:
+                try:
+                    fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked.append(False)
+                except OSError:
+                    locked.append(True)
+            rename(src, dst)
+
+        monkeypatch.setattr(os, "rename", checked_rename)
+        first = self.make_queue(collection, tmp_path, flush_interval_ms=60000)
+        second = self.make_queue(collection, tmp_path, flush_interval_ms=60000)
+
+        async def scenario():
+            await first.start()
+            first.enqueue({"message": "mine"})
+            await second.start()
+            await second.close()
+            assert os.path.exists(first._journal_path)
+            await first.close()
+
+        asyncio.run(scenario())
+
+        assert locked == [True, True]
+        assert second.stats["recovered"] == 0
+        assert collection.count_documents({"message": "mine"}) == 1
+
+    def test_failed_flush_keeps_documents(self, tmp_path):
+        """Test a sink outage leaves documents queued for retry"""
+        def failing_sink(docs):
+            raise ConnectionError("Atlas unreachable")
+
+        queue = WriteBehindQueue(sink=failing_sink, journal_dir=str(tmp_path), flush_interval_ms=60000)
+
+        async def scenario():
+            await queue.start()
+            queue.enqueue({"message": "keep me"})
+            ok = await queue.flush()
+            queue._task.cancel()
+            return ok
+
+        assert asyncio.run(scenario()) is False
+        assert queue.depth == 1
+        assert queue.stats["failed_flushes"] == 1
+
+    def test_retry_after_failed_flush_is_a_replay(self, collection, tmp_path):
+        """Test a batch that failed after a partial write is retried through the replay sink"""
+        calls = []
+
+        def flaky_sink(docs):
+            calls.append("sink")
+            collection.insert_many(docs[:1])
+            raise ConnectionError("Connection reset after write")
+
+        def replay_sink(docs):
+            calls.append("replay")
+            stored = {d["_id"] for d in collection.find({"_id": {"$in": [d["_id"] for d in docs]}})}
+            collection.insert_many([d for d in docs if d["_id"] not in stored])
+
+        queue = WriteBehindQueue(sink=flaky_sink, replay_sink=replay_sink, journal_dir=str(tmp_path),
+                                 flush_interval_ms=60000)
+
+        async def scenario():
+            await queue.start()
+            queue.enqueue({"message": "a"})
+            queue.enqueue({"message": "b"})
+            results = [await queue.flush(), await queue.flush()]
+            await queue.close()
+            return results
+
+        assert asyncio.run(scenario()) == [False, True]
+        assert calls == ["sink", "replay"]
+        assert collection.count_documents({}) == 2